@@ -10,6 +10,13 @@ from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
 from core.utils.gc_manager import get_gc_manager
+from core.utils.diagnostics import loop_lag_monitor
+from core.utils.audioRateController import audio_pacing_scheduler
+from core.utils.dsp_workers import dsp_worker_pool
+from core.utils.timer_wheel import housekeeping_timers
+from core.utils.admission import admission_controller
+from core.utils.private_config_cache import private_config_cache
+from core.utils.latency_trace import close_trace_exporter
 
 TAG = __name__
 logger = setup_logging()
@@ -68,6 +75,26 @@ async def main():
     gc_manager = get_gc_manager(interval_seconds=300)
     await gc_manager.start()
 
+    # 启动事件循环阻塞检测
+    watchdog_config = config.get("diagnostics", {}).get("watchdog", {})
+    if watchdog_config.get("enable", False):
+        loop_lag_monitor.configure(watchdog_config)
+        loop_lag_monitor.start()
+
+    # 音频发送节拍器在首次发送音频时启动
+    audio_pacing_scheduler.configure(config.get("audio_pacing"))
+    # 连接定时任务共享的时间轮在首次登记定时器时启动
+    housekeeping_timers.configure(config.get("housekeeping_timers"))
+    # 新连接的接入速率与初始化并发控制
+    admission_controller.configure(config.get("admission_control"))
+    private_config_cache.configure(config.get("private_config_cache"))
+
+    # 启动音频前端DSP工作进程
+    dsp_config = config.get("dsp_workers") or {}
+    if dsp_config.get("enable", False):
+        dsp_worker_pool.configure(dsp_config)
+        dsp_worker_pool.start()
+
     # 启动 WebSocket 服务器
     ws_server = WebSocketServer(config)
     ws_task = asyncio.create_task(ws_server.start())
@@ -88,6 +115,18 @@ async def main():
         get_local_ip(),
         port,
     )
+    if config.get("metrics", {}).get("enable", False):
+        logger.bind(tag=TAG).info(
+            "指标接口是\thttp://{}:{}/metrics",
+            get_local_ip(),
+            port,
+        )
+    if config.get("diagnostics", {}).get("enable", False):
+        logger.bind(tag=TAG).info(
+            "诊断接口是\thttp://{}:{}/xiaozhi/diagnostics/",
+            get_local_ip(),
+            port,
+        )
     mcp_endpoint = config.get("mcp_endpoint", None)
     if mcp_endpoint is not None and "你" not in mcp_endpoint:
         # 校验MCP接入点格式
@@ -129,6 +168,11 @@ async def main():
     finally:
         # 停止全局GC管理器
         await gc_manager.stop()
+        loop_lag_monitor.stop()
+        dsp_worker_pool.stop()
+        housekeeping_timers.stop()
+        audio_pacing_scheduler.stop()
+        close_trace_exporter()
 
         # 取消所有任务（关键修复点）
         stdin_task.cancel()
@@ -78,6 +78,10 @@ async def get_config_from_api_async(config):
             "auth_key": config["server"].get("auth_key", ""),
         }
     config_data["server"]["auth"] = {"enabled": auth_enabled}
+    # 准入控制与差异化配置缓存是本服务的部署参数，以本地为准
+    for key in ("admission_control", "private_config_cache"):
+        if config.get(key):
+            config_data[key] = config[key]
     # 如果服务器没有prompt_template，则从本地配置读取
     if not config_data.get("prompt_template"):
         config_data["prompt_template"] = config.get("prompt_template")
@@ -0,0 +1,83 @@
+import copy
+import threading
+
+_wrap_lock = threading.Lock()
+
+
+class LayeredConfig(dict):
+    """共享基础配置之上的连接级配置层（写时复制）
+
+    创建时只浅拷贝一层键值引用，嵌套的字典在首次读取时才包装为新的配置层，
+    列表在首次读取时浅拷贝，因此对本层的任何写入（包括 config["TTS"][name]["xx"] = ...）
+    都只落在本层，不会修改其他连接共享的基础配置。未被访问的配置块不产生任何拷贝。
+
+    本类是 dict 的子类，json.dumps、isinstance(x, dict) 等用法均保持不变；
+    deepcopy 与 pickle 得到的是普通 dict。
+    """
+
+    __slots__ = ("_layered",)
+
+    def __init__(self, base=None):
+        super().__init__(base or {})
+        # 已在本层包装或写入过的键，这些键的值属于本层，读取时不再包装
+        self._layered = set()
+
+    def _layer(self, key, value):
+        if key in self._layered or type(value) not in (dict, list):
+            return value
+        with _wrap_lock:
+            # 其他线程可能已经完成包装
+            if key in self._layered:
+                return dict.__getitem__(self, key)
+            value = LayeredConfig(value) if type(value) is dict else list(value)
+            dict.__setitem__(self, key, value)
+            self._layered.add(key)
+        return value
+
+    def __getitem__(self, key):
+        return self._layer(key, dict.__getitem__(self, key))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._layered.add(key)
+
+    def __iter__(self):
+        # 覆盖 __iter__ 使 dict(config)、{**config} 走 keys() + __getitem__，
+        # 拿到的嵌套字典同样是配置层而不是基础配置本身
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if not dict.__contains__(self, key):
+            return default
+        return self[key]
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        self._layered.discard(key)
+        return dict.pop(self, key, *default)
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def copy(self):
+        return LayeredConfig(self)
+
+    def to_dict(self) -> dict:
+        """导出为与基础配置无关的普通 dict"""
+        return copy.deepcopy(self)
+
+    def __deepcopy__(self, memo):
+        return {
+            copy.deepcopy(key, memo): copy.deepcopy(value, memo)
+            for key, value in dict.items(self)
+        }
+
+    def __reduce__(self):
+        return dict, (dict(dict.items(self)),)
@@ -0,0 +1,127 @@
+import hmac
+import asyncio
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils import diagnostics
+
+TAG = __name__
+
+
+class DiagnosticsHandler(BaseHandler):
+    """运行时诊断接口，需在请求头携带 Authorization: Bearer <diagnostics.token>"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        diagnostics_config = config.get("diagnostics") or {}
+        # 未单独配置密钥时使用 server.auth_key
+        self.token = diagnostics_config.get("token") or config["server"].get(
+            "auth_key", ""
+        )
+        self.max_profile_seconds = float(
+            diagnostics_config.get("max_profile_seconds", 60)
+        )
+
+    def routes(self):
+        prefix = "/xiaozhi/diagnostics"
+        return [
+            web.get(f"{prefix}/profile", self.handle_profile),
+            web.post(f"{prefix}/tracemalloc/start", self.handle_tracemalloc_start),
+            web.post(f"{prefix}/tracemalloc/stop", self.handle_tracemalloc_stop),
+            web.get(f"{prefix}/tracemalloc", self.handle_tracemalloc_top),
+            web.get(f"{prefix}/tasks", self.handle_tasks),
+            web.get(f"{prefix}/blocking", self.handle_blocking),
+            web.get(f"{prefix}/connections", self.handle_connections),
+        ]
+
+    def _authorized(self, request) -> bool:
+        header = request.headers.get("Authorization", "")
+        if not self.token or not header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(header[7:].encode(), self.token.encode())
+
+    def _json(self, data, status=200):
+        response = web.json_response(data, status=status)
+        self._add_cors_headers(response)
+        return response
+
+    @staticmethod
+    def _number(request, name, default, cast=float):
+        try:
+            return cast(request.query.get(name, default))
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text=f"参数 {name} 无效")
+
+    async def handle_profile(self, request):
+        """采样所有线程 seconds 秒，返回折叠栈文本，可直接用于 flamegraph.pl 或 speedscope"""
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        seconds = min(self._number(request, "seconds", 10), self.max_profile_seconds)
+        interval = max(self._number(request, "interval_ms", 10), 1) / 1000
+        try:
+            folded = await asyncio.to_thread(
+                diagnostics.sample_cpu_profile, seconds, interval
+            )
+        except RuntimeError as e:
+            return self._json({"error": str(e)}, status=409)
+        self.logger.bind(tag=TAG).info(f"完成CPU采样: {seconds}s")
+        response = web.Response(text=folded, content_type="text/plain")
+        self._add_cors_headers(response)
+        return response
+
+    async def handle_tracemalloc_start(self, request):
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        frames = int(self._number(request, "frames", 1, int))
+        diagnostics.allocation_tracker.start(max(frames, 1))
+        self.logger.bind(tag=TAG).info("已开启 tracemalloc")
+        return self._json({"tracing": True})
+
+    async def handle_tracemalloc_stop(self, request):
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        diagnostics.allocation_tracker.stop()
+        self.logger.bind(tag=TAG).info("已关闭 tracemalloc")
+        return self._json({"tracing": False})
+
+    async def handle_tracemalloc_top(self, request):
+        """分配最多的代码行，diff=1 时返回与上一次调用之间的差异"""
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        limit = int(self._number(request, "limit", 20, int))
+        diff = request.query.get("diff") in ("1", "true")
+        try:
+            result = await asyncio.to_thread(
+                diagnostics.allocation_tracker.top, limit, diff
+            )
+        except RuntimeError as e:
+            return self._json({"error": str(e)}, status=409)
+        return self._json(result)
+
+    async def handle_tasks(self, request):
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        tasks = diagnostics.dump_tasks(int(self._number(request, "stack", 5, int)))
+        return self._json(
+            {
+                "task_count": len(tasks),
+                "loop_lag": diagnostics.loop_lag_monitor.snapshot(),
+                "tasks": tasks,
+            }
+        )
+
+    async def handle_blocking(self, request):
+        """阻塞事件循环的调用：按模块统计及最近事件的调用栈"""
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        return self._json(
+            {
+                "loop_lag": diagnostics.loop_lag_monitor.snapshot(),
+                **diagnostics.loop_lag_monitor.blocking_report(),
+            }
+        )
+
+    async def handle_connections(self, request):
+        if not self._authorized(request):
+            return self._json({"error": "unauthorized"}, status=401)
+        connections = diagnostics.connection_snapshot()
+        return self._json({"count": len(connections), "connections": connections})
@@ -0,0 +1,32 @@
+import hmac
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.metrics import registry
+
+TAG = __name__
+
+
+class MetricsHandler(BaseHandler):
+    """Prometheus 指标接口，配置了 metrics.token 时需携带 Authorization: Bearer <token>"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.token = (config.get("metrics") or {}).get("token", "")
+
+    def _authorized(self, request) -> bool:
+        if not self.token:
+            return True
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(header[7:].encode(), self.token.encode())
+
+    async def handle_get(self, request):
+        if not self._authorized(request):
+            return web.Response(status=401, text="unauthorized")
+        return web.Response(
+            text=registry.render(),
+            content_type="text/plain",
+            charset="utf-8",
+            headers={"Cache-Control": "no-store"},
+        )
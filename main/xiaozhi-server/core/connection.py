@@ -1,6 +1,5 @@
 import os
 import sys
-import copy
 import json
 import re
 import uuid
@@ -10,9 +9,9 @@ import asyncio
 import threading
 import traceback
 import subprocess
+import concurrent.futures
 import websockets
 import opuslib_next
-import numpy as np
 
 from core.utils.util import (
     extract_json_from_string,
@@ -37,11 +36,33 @@ from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse, all_function_registry, module_func_map
 from core.auth import AuthenticationError
-from config.config_loader import get_private_config_from_api
+from config.layered_config import LayeredConfig
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
+from core.providers.vad.base import DspOffloadMixin
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException, generate_and_save_chat_title
 from core.utils.prompt_manager import PromptManager
+from core.utils.diagnostics import register_connection
+from core.utils.aec import apply_aec
+from core.utils.dsp_workers import DspFrame, dsp_worker_pool
+from core.utils.timer_wheel import housekeeping_timers
+from core.utils.hibernation import pack_snapshot, unpack_snapshot
+from core.utils.admission import admission_controller, AdmissionRejected
+from core.utils.private_config_cache import private_config_cache
+from core.utils.metrics import (
+    connections_total,
+    hibernation_wake_ms,
+    observe_latency,
+    opus_frames_total,
+    provider_latency_ms,
+    provider_name,
+    ws_bytes_total,
+)
+from core.utils.latency_trace import (
+    create_latency_tracer,
+    STAGE_MEMORY,
+    STAGE_LLM_FIRST_TOKEN,
+)
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils.util import get_system_error_response
 from core.utils import textUtils
@@ -55,6 +76,14 @@ auto_import_modules("plugins_func.functions")
 class TTSException(RuntimeError):
     pass
 
+# AEC缓存过期检查间隔（秒）
+AEC_CACHE_CHECK_INTERVAL = 30
+# 连接线程池的最大线程数
+EXECUTOR_MAX_WORKERS = 5
+
+# 无需LLM二次处理、可直接播报的工具结果类型
+IMMEDIATE_TOOL_ACTIONS = (Action.RESPONSE, Action.NOTFOUND, Action.ERROR)
+
 # direct_answer 虚拟工具定义
 # 不是真实工具，是路由机制：将"调不调工具"的二选一变为"调哪个"的多选，防止小模型误触发真实工具
 DIRECT_ANSWER_TOOL = {
@@ -88,7 +117,8 @@ class ConnectionHandler:
             server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 共享的基础配置之上叠加连接级配置层，差异化配置只写入本层
+        self.config = LayeredConfig(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -111,6 +141,7 @@ class ConnectionHandler:
         self.chat_history_conf = 0
         self.audio_format = "opus"
         self.sample_rate = 24000  # 默认采样率，从客户端 hello 消息中动态更新
+        self.opus_profile = None  # Opus编码档位，收到 hello 消息后协商
 
         # 客户端状态相关
         self.client_abort = False
@@ -121,7 +152,7 @@ class ConnectionHandler:
         # 线程任务相关
         self.loop = None  # 在 handle_connection 中获取运行中的事件循环
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        self.executor = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS)
 
         # 添加上报线程池
         self.report_queue = queue.Queue()
@@ -150,8 +181,12 @@ class ConnectionHandler:
         self.first_activity_time = 0.0  # 记录首次活动的时间（毫秒）
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.vad_last_voice_time = 0.0  # 记录用户最后一次说话的时间（毫秒）
+        self.vad_speech_start_time = 0.0  # 记录本句开始说话的时间（毫秒）
+        self.vad_silence_probs = []  # 本句说话后静音期间的语音概率，用于判定是否说完
         self.client_voice_stop = False
         self.last_is_voice = False
+        # 开启DSP工作进程时，本连接在工作进程中的音频流
+        self.dsp_stream = None
 
         # asr相关变量
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
@@ -184,7 +219,22 @@ class ConnectionHandler:
         self.timeout_seconds = (
                 int(self.config.get("close_connection_no_voice_time", 120)) + 60
         )  # 在原来第一道关闭的基础上加60秒，进行二道关闭
-        self.timeout_task = None
+        # 登记在共享时间轮中的定时器：空闲超时、AEC缓存过期、唤醒后恢复VAD
+        self.timeout_timer = None
+        self.aec_expiry_timer = None
+        self.vad_resume_timer = None
+
+        # 空闲休眠：长时间没有收发音频时释放连接级资源，收到下一帧音频时恢复
+        self.hibernate_timer = None
+        self.hibernated = False
+        self.hibernation_idle_seconds = 0
+        self._hibernation_snapshot = None
+        self._hibernation_lock = asyncio.Lock()
+        self.last_audio_time = 0.0  # 最后一次收发音频的时间（秒，单调时钟）
+
+        # 准入控制：初始化排队凭证与后台初始化任务
+        self.init_ticket = None
+        self.init_task = None
 
         # {"mcp":true} 表示启用MCP功能
         self.features = None
@@ -195,15 +245,30 @@ class ConnectionHandler:
         # 初始化提示词管理器
         self.prompt_manager = PromptManager(self.config, self.logger)
 
+        # 对话链路耗时追踪，未开启时为空实现
+        self.latency_tracer = create_latency_tracer(self.config, self.session_id)
+
         # 初始化通话状态
         self.calling = False
         # 标记当前是否为来电接听模式
         self.incoming_call = None
 
+    @property
+    def dialogue(self) -> Dialogue:
+        if self._dialogue is None:
+            # 休眠期间访问对话历史（如连接关闭时保存记忆）先还原快照
+            self._restore_snapshot()
+        return self._dialogue
+
+    @dialogue.setter
+    def dialogue(self, dialogue: Dialogue):
+        self._dialogue = dialogue
+
     async def handle_connection(self, ws: websockets.ServerConnection):
         try:
             # 获取运行中的事件循环（必须在异步上下文中）
             self.loop = asyncio.get_running_loop()
+            register_connection(self)
 
             # 获取并验证headers
             self.headers = dict(ws.request.headers)
@@ -219,6 +284,7 @@ class ConnectionHandler:
             )
 
             self.device_id = self.headers.get("device-id", None)
+            self.latency_tracer.device_id = self.device_id
 
             # 认证通过,继续处理
             self.websocket = ws
@@ -228,16 +294,30 @@ class ConnectionHandler:
             self.conn_from_mqtt_gateway = request_path.endswith("?from=mqtt_gateway")
             if self.conn_from_mqtt_gateway:
                 self.logger.bind(tag=TAG).info("连接来自:MQTT网关")
+            connections_total.inc(
+                source="mqtt_gateway" if self.conn_from_mqtt_gateway else "websocket"
+            )
 
             # 初始化活动时间戳
             self.first_activity_time = time.time() * 1000
             self.last_activity_time = time.time() * 1000
 
-            # 启动超时检查任务
-            self.timeout_task = asyncio.create_task(self._check_timeout())
-
-            # 启动AEC缓存清理任务
-            self._aec_cache_cleanup_task = asyncio.create_task(self._check_aec_cache_expiry())
+            # 登记超时检查与AEC缓存清理定时器
+            self.timeout_timer = housekeeping_timers.call_later(
+                self.timeout_seconds, self._check_timeout
+            )
+            self.aec_expiry_timer = housekeeping_timers.call_later(
+                AEC_CACHE_CHECK_INTERVAL, self._check_aec_cache_expiry
+            )
+            hibernation_config = self.config.get("hibernation") or {}
+            if hibernation_config.get("enable", False):
+                self.hibernation_idle_seconds = int(
+                    hibernation_config.get("idle_seconds", 300)
+                )
+                self.last_audio_time = time.monotonic()
+                self.hibernate_timer = housekeeping_timers.call_later(
+                    self.hibernation_idle_seconds, self._check_hibernate
+                )
 
             self.welcome_msg = self.config["xiaozhi"]
             self.welcome_msg["session_id"] = self.session_id
@@ -247,7 +327,8 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).info(f"配置输出音频采样率为: {self.sample_rate}")
 
             # 在后台初始化配置和组件（完全不阻塞主循环）
-            asyncio.create_task(self._background_initialize())
+            self.init_ticket = admission_controller.create_ticket(self.device_id)
+            self.init_task = asyncio.create_task(self._background_initialize())
 
             try:
                 async for message in self.websocket:
@@ -347,8 +428,15 @@ class ConnectionHandler:
         # 检查是否已经获取到真实的绑定状态
         if not self.bind_completed_event.is_set():
             # 还没有获取到真实状态，等待直到获取到真实状态或超时
+            bind_wait_timeout = 1
+            if self.init_ticket is not None and self.init_ticket.waiting:
+                # 仍在排队等待初始化：设备已经开始使用，提前初始化，并等到排队结束
+                admission_controller.promote(self.init_ticket)
+                bind_wait_timeout += admission_controller.queue_timeout
             try:
-                await asyncio.wait_for(self.bind_completed_event.wait(), timeout=1)
+                await asyncio.wait_for(
+                    self.bind_completed_event.wait(), timeout=bind_wait_timeout
+                )
             except asyncio.TimeoutError:
                 # 超时仍未获取到真实状态，丢弃消息
                 await self._discard_message_with_bind_prompt()
@@ -363,9 +451,29 @@ class ConnectionHandler:
         # 不需要绑定，继续处理消息
 
         if isinstance(message, str):
+            ws_bytes_total.inc(len(message), direction="in", kind="text")
             await handleTextMessage(self, message)
         elif isinstance(message, bytes):
+            ws_bytes_total.inc(len(message), direction="in", kind="audio")
+            opus_frames_total.inc(direction="in")
             if self.vad is None or self.asr is None:
+                # 组件仍在排队初始化时设备已经在说话，提前初始化
+                admission_controller.promote(self.init_ticket)
+                return
+            self.last_audio_time = time.monotonic()
+            if self.hibernated:
+                await self.wake()
+
+            # 开启DSP工作进程时，解码、AEC与VAD推理交给工作进程
+            dsp_stream = self._get_dsp_stream()
+            if dsp_stream is not None:
+                if self.conn_from_mqtt_gateway and len(message) >= 16:
+                    timestamp = int.from_bytes(message[8:12], "big")
+                    dsp_stream.submit_audio(
+                        message[16:], timestamp if self.client_aec else 0
+                    )
+                else:
+                    dsp_stream.submit_audio(message)
                 return
 
             # 处理来自MQTT网关的音频包
@@ -379,6 +487,32 @@ class ConnectionHandler:
             if pcm_frame:
                 self.asr_audio_queue.put(pcm_frame)
 
+    def _get_dsp_stream(self):
+        """获取本连接在DSP工作进程中的音频流，未开启或VAD不支持时返回 None
+
+        工作进程异常退出后音频流会被关闭，此时重新分配到其他工作进程，都不可用时回到本进程处理
+        """
+        if self.dsp_stream is not None and not self.dsp_stream.closed:
+            return self.dsp_stream
+        self.dsp_stream = None
+        if not dsp_worker_pool.running or not isinstance(self.vad, DspOffloadMixin):
+            return None
+        select_vad_module = self.config["selected_module"]["VAD"]
+        vad_config = self.config["VAD"][select_vad_module]
+        self.dsp_stream = dsp_worker_pool.open_stream(
+            {
+                "type": vad_config.get("type", select_vad_module),
+                "config": vad_config,
+            },
+            self._on_dsp_frame,
+        )
+        return self.dsp_stream
+
+    def _on_dsp_frame(self, frame: DspFrame):
+        """工作进程返回的PCM与语音概率，与本进程解码的PCM一样进入ASR音频队列"""
+        if frame.pcm:
+            self.asr_audio_queue.put(frame)
+
     async def _process_mqtt_audio_message(self, message):
         """
         处理来自MQTT网关的音频消息，解析16字节头部并提取音频数据，在入队前进行AEC处理
@@ -414,114 +548,9 @@ class ConnectionHandler:
     def _apply_aec(self, timestamp: int, pcm_frame: bytes) -> bytes:
         """应用AEC处理 - 综合算法：互相关延迟估计 + Wiener滤波 + 频谱减法"""
         try:
-            if not pcm_frame or len(pcm_frame) == 0:
-                return pcm_frame
-
-            if not hasattr(self, "aec_audio_cache") or not self.aec_audio_cache:
-                return pcm_frame
-
-            mic_audio = np.frombuffer(pcm_frame, dtype=np.int16).astype(np.float32)
-            mic_rms = np.sqrt(np.mean(mic_audio ** 2))
-
-            if mic_rms < 100:
+            if not hasattr(self, "aec_audio_cache"):
                 return pcm_frame
-
-            sorted_timestamps = sorted(self.aec_audio_cache.keys())
-            if len(sorted_timestamps) < 2:
-                return pcm_frame
-
-            # ========== 匹配参考帧（对数功率谱匹配） ==========
-            n = len(mic_audio)
-
-            # 找最接近的timestamp作为起点
-            closest_idx = min(range(len(sorted_timestamps)), key=lambda i: abs(sorted_timestamps[i] - timestamp))
-
-            # 预计算 mic_audio 的对数功率谱（循环内共用，避免重复FFT）
-            mic_window = np.hanning(n)
-            mic_fft = np.fft.rfft(mic_audio * mic_window)
-            mic_psd = np.abs(mic_fft) ** 2
-            mic_log_psd = 10 * np.log10(mic_psd + 1e-8)
-            mic_P_xx = np.dot(mic_log_psd, mic_log_psd)
-
-            # 用对数功率谱匹配找最佳帧：前后各找2帧
-            best_corr = -1
-            best_ref_idx = closest_idx
-            best_ref_rms = 0.0
-
-            for offset in range(-2, 3):  # T-2, T-1, T, T+1, T+2
-                test_idx = closest_idx + offset
-                if test_idx < 0 or test_idx >= len(sorted_timestamps):
-                    continue
-                test_ts = sorted_timestamps[test_idx]
-                test_ref = np.frombuffer(self.aec_audio_cache[test_ts], dtype=np.int16).astype(np.float32)
-                test_ref_rms = np.sqrt(np.mean(test_ref ** 2))
-                if test_ref_rms < 50:
-                    continue
-
-                # 对数功率谱相关性
-                test_window = np.hanning(len(test_ref))
-                test_fft = np.fft.rfft(test_ref * test_window)
-                test_psd = np.abs(test_fft) ** 2
-                test_log_psd = 10 * np.log10(test_psd + 1e-8)
-                P_xy = np.dot(mic_log_psd, test_log_psd)
-                P_yy = np.dot(test_log_psd, test_log_psd)
-                corr = abs(P_xy) / (np.sqrt(mic_P_xx) * np.sqrt(P_yy) + 1e-8)
-
-                if corr > best_corr:
-                    best_corr = corr
-                    best_ref_idx = test_idx
-                    best_ref_rms = test_ref_rms
-
-            best_ts = sorted_timestamps[best_ref_idx]
-            best_ref = np.frombuffer(self.aec_audio_cache[best_ts], dtype=np.int16).astype(np.float32)
-            ref_rms = best_ref_rms
-
-            if ref_rms < 50:
-                return pcm_frame
-
-            # 对齐参考信号（直接截取相同长度）
-            aligned_ref = best_ref[:n]
-            if len(aligned_ref) < n:
-                aligned_ref = np.pad(aligned_ref, (0, n - len(aligned_ref)))
-
-            # ========== 频域 AEC 处理（谱减法） ==========
-            # 时域信号经过声学路径后相位失真，导致时域相关性低且P_xy正负不定
-            # 频域幅度谱不受相位影响，对数功率谱相关性稳定在0.97+
-            # 公式：result_mag = max(|mic_fft| - |ref_fft| * scale * coef, 0)
-
-            mic_mag = np.abs(mic_fft)
-            mic_phase = np.angle(mic_fft)
-            ref_fft = np.fft.rfft(aligned_ref * np.hanning(n))
-            ref_mag = np.abs(ref_fft)
-
-            # 频域计算回声比例 scale
-            scale = np.sum(mic_mag * ref_mag) / (np.dot(ref_mag, ref_mag) + 1e-8)
-
-            # 自适应系数：根据scale和coh动态调整
-            # scale大（回声强）-> coef大；coh高（匹配准）-> coef大
-            raw_coef = 1.0 + scale * 3 + (best_corr - 0.97) * 30
-            coef = max(0.5, min(3.0, raw_coef))
-
-            # 谱减法（过减 + 半波整流）
-            echo_mag = ref_mag * scale * coef
-            result_mag = np.maximum(mic_mag - echo_mag * 1.5, mic_mag * 0.1)
-
-            # 保留相位重建信号
-            result_fft = result_mag * np.exp(1j * mic_phase)
-            output = np.fft.irfft(result_fft, n)
-
-            # 高置信度是纯回声时，再压一下确保VAD检测不到
-            if best_corr >= 0.97 and ref_rms > 500:
-                output = output * 0.3
-
-            # 后处理：限幅
-            output = np.clip(output, -32768, 32767)
-
-            # 转换为bytes
-            result = output.astype(np.int16).tobytes()
-
-            return result
-
+            return apply_aec(pcm_frame, self.aec_audio_cache, timestamp)
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"[AEC] 处理失败: {e}")
             return pcm_frame
@@ -785,28 +814,61 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
     async def _background_initialize(self):
-        """在后台初始化配置和组件（完全不阻塞主循环）"""
+        """在后台初始化配置和组件（完全不阻塞主循环）
+
+        第一阶段不排队：已缓存差异化配置的设备直接使用缓存，立即确定绑定状态；
+        第二阶段按准入控制的并发数排队：拉取差异化配置、初始化模块与组件。
+        """
         try:
-            # 异步获取差异化配置
-            await self._initialize_private_config_async()
-            # 在线程池中初始化组件
-            self.executor.submit(self._initialize_components)
+            private_config = None
+            if self.read_config_from_api:
+                private_config = private_config_cache.peek(
+                    self.config,
+                    self.headers.get("device-id"),
+                    self.headers.get("client-id", self.headers.get("device-id")),
+                )
+                if private_config is not None:
+                    self.need_bind = False
+                    self.bind_completed_event.set()
+            await admission_controller.acquire(self.init_ticket)
+            try:
+                # 异步获取差异化配置
+                await self._initialize_private_config_async(private_config)
+                # 在线程池中初始化组件，完成后才归还初始化名额
+                await self.loop.run_in_executor(
+                    self.executor, self._initialize_components
+                )
+            finally:
+                admission_controller.release(self.init_ticket)
+        except AdmissionRejected as e:
+            self.logger.bind(tag=TAG).warning(f"初始化排队超时，关闭连接: {e}")
+            # 1013 Try Again Later：让设备稍后重连
+            await self.websocket.close(
+                1013, f"server busy, retry after {e.retry_after}s"
+            )
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"后台初始化失败: {e}")
 
-    async def _initialize_private_config_async(self):
-        """从接口异步获取差异化配置（异步版本，不阻塞主循环）"""
+    async def _initialize_private_config_async(self, private_config=None):
+        """从接口异步获取差异化配置（异步版本，不阻塞主循环）
+
+        Args:
+            private_config: 已缓存的差异化配置，传入时不再请求接口
+        """
         if not self.read_config_from_api:
             self.need_bind = False
             self.bind_completed_event.set()
             return
         try:
             begin_time = time.time()
-            private_config = await get_private_config_from_api(
-                self.config,
-                self.headers.get("device-id"),
-                self.headers.get("client-id", self.headers.get("device-id")),
-            )
+            if private_config is None:
+                private_config = await private_config_cache.get(
+                    self.config,
+                    self.headers.get("device-id"),
+                    self.headers.get("client-id", self.headers.get("device-id")),
+                )
             private_config["delete_audio"] = bool(self.config.get("delete_audio", True))
             self.logger.bind(tag=TAG).info(
                 f"{time.time() - begin_time} 秒，异步获取差异化配置成功: {json.dumps(filter_sensitive_info(private_config), ensure_ascii=False)}"
@@ -1059,6 +1121,7 @@ class ConnectionHandler:
         if depth == 0:
             current_sentence_id = str(uuid.uuid4().hex)
             self.sentence_id = current_sentence_id  # 更新共享属性
+            self.latency_tracer.bind_sentence(current_sentence_id, replace=True)
             self.dialogue.put(Message(role="user", content=query))
             self.tts.tts_text_queue.put(
                 TTSMessageDTO(
@@ -1112,7 +1175,9 @@ class ConnectionHandler:
                 future = asyncio.run_coroutine_threadsafe(
                     self.memory.query_memory(query), self.loop
                 )
-                memory_str = future.result()
+                with observe_latency("memory", self.memory):
+                    memory_str = future.result()
+                self.latency_tracer.mark(STAGE_MEMORY, current_sentence_id)
 
             # 仅在该说话人首次出现时把身份注入 system，之后靠对话历史首轮保留，
             # 避免每轮在 system 重复出现名字诱导模型反复称呼
@@ -1122,6 +1187,7 @@ class ConnectionHandler:
                 self.system_introduced_speakers.add(cs)
                 speaker_for_system = cs
 
+            llm_start_time = time.monotonic()
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
                 llm_responses = self.llm.response_with_functions(
@@ -1143,272 +1209,401 @@ class ConnectionHandler:
             return None
 
         # 处理流式响应
+        first_token_observed = False
         tool_call_flag = False
         # 支持多个并行工具调用 - 使用列表存储
         tool_calls_list = []  # 格式: [{"id": "", "name": "", "arguments": ""}]
         content_arguments = ""
         emotion_flag = True
+        # 流式参数拼成完整JSON后提前启动工具，默认关闭（有副作用的工具可能被提前执行）
+        speculative_tool_call = bool(self.config.get("tool_call_speculative", False))
+        # 提前启动的工具调用在任何退出路径（打断、出错、direct_answer 提前返回）都要取消，
+        # 已被采用的会从工具调用数据中取走，不受影响
+        speculative_calls = tool_calls_list
         try:
-            for response in llm_responses:
-                if self.client_abort:
-                    break
-                if self.intent_type == "function_call" and functions is not None:
-                    content, tools_call = response
-                    if "content" in response:
-                        content = response["content"]
-                        tools_call = None
-                    if content is not None and len(content) > 0:
-                        content_arguments += content
-
-                    if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                        # print("content_arguments", content_arguments)
-                        tool_call_flag = True
-
-                    if tools_call is not None and len(tools_call) > 0:
-                        tool_call_flag = True
-                        self._merge_tool_calls(tool_calls_list, tools_call)
-
-                    # 流式提取 direct_answer 的 response 参数，实时送 TTS
-                    # 使用安全缓冲区，防止 JSON 闭合符号泄漏到 TTS
-                    _DA_STREAM_BUFFER = 5
-                    for tc in tool_calls_list:
-                        if tc["name"] == "direct_answer" and tc.get("arguments"):
-                            da_text = self._extract_direct_answer_response(tc["arguments"])
-                            sent_len = tc.get("_da_sent", 0)
-                            if da_text and len(da_text) > sent_len:
-                                safe_end = max(sent_len, len(da_text) - _DA_STREAM_BUFFER)
-                                if safe_end > sent_len:
-                                    new_part = da_text[sent_len:safe_end]
-                                    # 清理 delta 中可能泄漏的 JSON 闭合垃圾
-                                    new_part = self._clean_response_garbage(new_part)
-                                    if new_part:
-                                        tc["_da_sent"] = safe_end
-                                        self.tts.tts_text_queue.put(
-                                            TTSMessageDTO(
-                                                sentence_id=current_sentence_id,
-                                                sentence_type=SentenceType.MIDDLE,
-                                                content_type=ContentType.TEXT,
-                                                content_detail=new_part,
-                                            )
-                                        )
-                else:
-                    content = response
-
-                # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
-                if emotion_flag and content is not None and content.strip():
-                    if (self.features or {}).get("emoji", True):
-                        asyncio.run_coroutine_threadsafe(
-                            textUtils.get_emotion(self, content),
-                            self.loop,
+            try:
+                for response in llm_responses:
+                    if self.client_abort:
+                        break
+                    self.latency_tracer.mark(STAGE_LLM_FIRST_TOKEN, current_sentence_id)
+                    if not first_token_observed:
+                        first_token_observed = True
+                        provider_latency_ms.observe(
+                            (time.monotonic() - llm_start_time) * 1000,
+                            kind="llm",
+                            provider=provider_name(self.llm),
                         )
-                    emotion_flag = False
-
-                if content is not None and len(content) > 0:
-                    if not tool_call_flag:
-                        response_message.append(content)
-                        self.tts.tts_text_queue.put(
-                            TTSMessageDTO(
-                                sentence_id=current_sentence_id,
-                                sentence_type=SentenceType.MIDDLE,
-                                content_type=ContentType.TEXT,
-                                content_detail=content,
+                    if self.intent_type == "function_call" and functions is not None:
+                        content, tools_call = response
+                        if "content" in response:
+                            content = response["content"]
+                            tools_call = None
+                        if content is not None and len(content) > 0:
+                            content_arguments += content
+
+                        if not tool_call_flag and content_arguments.startswith("<tool_call>"):
+                            # print("content_arguments", content_arguments)
+                            tool_call_flag = True
+
+                        if tools_call is not None and len(tools_call) > 0:
+                            tool_call_flag = True
+                            self._merge_tool_calls(tool_calls_list, tools_call)
+                            if speculative_tool_call:
+                                self._start_speculative_tool_calls(tool_calls_list)
+
+                        # 流式提取 direct_answer 的 response 参数，实时送 TTS
+                        # 使用安全缓冲区，防止 JSON 闭合符号泄漏到 TTS
+                        _DA_STREAM_BUFFER = 5
+                        for tc in tool_calls_list:
+                            if tc["name"] == "direct_answer" and tc.get("arguments"):
+                                da_text = self._extract_direct_answer_response(tc["arguments"])
+                                sent_len = tc.get("_da_sent", 0)
+                                if da_text and len(da_text) > sent_len:
+                                    safe_end = max(sent_len, len(da_text) - _DA_STREAM_BUFFER)
+                                    if safe_end > sent_len:
+                                        new_part = da_text[sent_len:safe_end]
+                                        # 清理 delta 中可能泄漏的 JSON 闭合垃圾
+                                        new_part = self._clean_response_garbage(new_part)
+                                        if new_part:
+                                            tc["_da_sent"] = safe_end
+                                            self.tts.tts_text_queue.put(
+                                                TTSMessageDTO(
+                                                    sentence_id=current_sentence_id,
+                                                    sentence_type=SentenceType.MIDDLE,
+                                                    content_type=ContentType.TEXT,
+                                                    content_detail=new_part,
+                                                )
+                                            )
+                    else:
+                        content = response
+
+                    # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
+                    if emotion_flag and content is not None and content.strip():
+                        if (self.features or {}).get("emoji", True):
+                            asyncio.run_coroutine_threadsafe(
+                                textUtils.get_emotion(self, content),
+                                self.loop,
                             )
-                        )
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"LLM stream processing error: {e}")
-            self.tts.tts_text_queue.put(
-                TTSMessageDTO(
-                    sentence_id=current_sentence_id,
-                    sentence_type=SentenceType.MIDDLE,
-                    content_type=ContentType.TEXT,
-                    content_detail=get_system_error_response(self.config),
-                )
-            )
-            if depth == 0:
+                        emotion_flag = False
+
+                    if content is not None and len(content) > 0:
+                        if not tool_call_flag:
+                            response_message.append(content)
+                            self.tts.tts_text_queue.put(
+                                TTSMessageDTO(
+                                    sentence_id=current_sentence_id,
+                                    sentence_type=SentenceType.MIDDLE,
+                                    content_type=ContentType.TEXT,
+                                    content_detail=content,
+                                )
+                            )
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"LLM stream processing error: {e}")
                 self.tts.tts_text_queue.put(
                     TTSMessageDTO(
                         sentence_id=current_sentence_id,
-                        sentence_type=SentenceType.LAST,
-                        content_type=ContentType.ACTION,
+                        sentence_type=SentenceType.MIDDLE,
+                        content_type=ContentType.TEXT,
+                        content_detail=get_system_error_response(self.config),
                     )
                 )
-            return
-        # 处理function call
-        if tool_call_flag:
-            bHasError = False
-            # 处理基于文本的工具调用格式
-            if len(tool_calls_list) == 0 and content_arguments:
-                a = extract_json_from_string(content_arguments)
-                if a is not None:
-                    try:
-                        content_arguments_json = json.loads(a)
-                        tool_calls_list.append(
-                            {
-                                "id": str(uuid.uuid4().hex),
-                                "name": content_arguments_json["name"],
-                                "arguments": json.dumps(
-                                    content_arguments_json["arguments"],
-                                    ensure_ascii=False,
-                                ),
-                            }
+                if depth == 0:
+                    self.tts.tts_text_queue.put(
+                        TTSMessageDTO(
+                            sentence_id=current_sentence_id,
+                            sentence_type=SentenceType.LAST,
+                            content_type=ContentType.ACTION,
                         )
-                    except Exception as e:
-                        bHasError = True
-                        response_message.append(a)
-                else:
-                    bHasError = True
-                    response_message.append(content_arguments)
-                if bHasError:
-                    self.logger.bind(tag=TAG).error(
-                        f"function call error: {content_arguments}"
                     )
+                return
+            # 处理function call
+            if tool_call_flag:
+                bHasError = False
+                # 处理基于文本的工具调用格式
+                if len(tool_calls_list) == 0 and content_arguments:
+                    a = extract_json_from_string(content_arguments)
+                    if a is not None:
+                        try:
+                            content_arguments_json = json.loads(a)
+                            tool_calls_list.append(
+                                {
+                                    "id": str(uuid.uuid4().hex),
+                                    "name": content_arguments_json["name"],
+                                    "arguments": json.dumps(
+                                        content_arguments_json["arguments"],
+                                        ensure_ascii=False,
+                                    ),
+                                }
+                            )
+                        except Exception as e:
+                            bHasError = True
+                            response_message.append(a)
+                    else:
+                        bHasError = True
+                        response_message.append(content_arguments)
+                    if bHasError:
+                        self.logger.bind(tag=TAG).error(
+                            f"function call error: {content_arguments}"
+                        )
 
-            if not bHasError and len(tool_calls_list) > 0:
-                # 处理 direct_answer 虚拟工具
-                direct_answer_calls = [tc for tc in tool_calls_list if tc["name"] == "direct_answer"]
-                real_tool_calls = [tc for tc in tool_calls_list if tc["name"] != "direct_answer"]
+                if not bHasError and len(tool_calls_list) > 0:
+                    # 处理 direct_answer 虚拟工具
+                    direct_answer_calls = [tc for tc in tool_calls_list if tc["name"] == "direct_answer"]
+                    real_tool_calls = [tc for tc in tool_calls_list if tc["name"] != "direct_answer"]
 
-                if direct_answer_calls:
-                    self.logger.bind(tag=TAG).debug(
-                        f"模型选择 direct_answer，流式已播报，写入对话历史"
-                    )
-                    for tc in direct_answer_calls:
-                        da_response = self._extract_direct_answer_response(tc.get("arguments", "{}"))
-                        if da_response:
-                            # 刷新流式缓冲区中未发送的部分
-                            sent_len = tc.get("_da_sent", 0)
-                            remaining = da_response[sent_len:]
-                            if remaining:
-                                remaining = self._clean_response_garbage(remaining)
+                    if direct_answer_calls:
+                        self.logger.bind(tag=TAG).debug(
+                            f"模型选择 direct_answer，流式已播报，写入对话历史"
+                        )
+                        for tc in direct_answer_calls:
+                            da_response = self._extract_direct_answer_response(tc.get("arguments", "{}"))
+                            if da_response:
+                                # 刷新流式缓冲区中未发送的部分
+                                sent_len = tc.get("_da_sent", 0)
+                                remaining = da_response[sent_len:]
                                 if remaining:
-                                    self.tts.tts_text_queue.put(
-                                        TTSMessageDTO(
-                                            sentence_id=current_sentence_id,
-                                            sentence_type=SentenceType.MIDDLE,
-                                            content_type=ContentType.TEXT,
-                                            content_detail=remaining,
+                                    remaining = self._clean_response_garbage(remaining)
+                                    if remaining:
+                                        self.tts.tts_text_queue.put(
+                                            TTSMessageDTO(
+                                                sentence_id=current_sentence_id,
+                                                sentence_type=SentenceType.MIDDLE,
+                                                content_type=ContentType.TEXT,
+                                                content_detail=remaining,
+                                            )
                                         )
+                                # 写入对话历史
+                                da_response = self._clean_response_garbage(da_response)
+                                self.tts.store_tts_text(current_sentence_id, da_response)
+                                self.dialogue.put(Message(role="assistant", content=da_response))
+
+                        if not real_tool_calls:
+                            if depth == 0:
+                                self.tts.tts_text_queue.put(
+                                    TTSMessageDTO(
+                                        sentence_id=current_sentence_id,
+                                        sentence_type=SentenceType.LAST,
+                                        content_type=ContentType.ACTION,
                                     )
-                            # 写入对话历史
-                            da_response = self._clean_response_garbage(da_response)
-                            self.tts.store_tts_text(current_sentence_id, da_response)
-                            self.dialogue.put(Message(role="assistant", content=da_response))
-
-                    if not real_tool_calls:
-                        if depth == 0:
-                            self.tts.tts_text_queue.put(
-                                TTSMessageDTO(
-                                    sentence_id=current_sentence_id,
-                                    sentence_type=SentenceType.LAST,
-                                    content_type=ContentType.ACTION,
                                 )
-                            )
-                        return
+                            return
 
-                    tool_calls_list = real_tool_calls
+                        tool_calls_list = real_tool_calls
 
-            if not bHasError and len(tool_calls_list) > 0:
-                self.logger.bind(tag=TAG).debug(
-                    f"检测到 {len(tool_calls_list)} 个工具调用"
-                )
-
-                # LLM 流式阶段已播报过的文本
-                streamed_text = ""
-                if len(response_message) > 0:
-                    streamed_text = "".join(response_message)
-                    self.tts.store_tts_text(current_sentence_id, streamed_text)
-                    self.dialogue.put(Message(role="assistant", content=streamed_text))
-                response_message.clear()
-
-                # 收集所有工具调用的 Future
-                futures_with_data = []
-                for tool_call_data in tool_calls_list:
+                if not bHasError and len(tool_calls_list) > 0:
                     self.logger.bind(tag=TAG).debug(
-                        f"function_name={tool_call_data['name']}, function_id={tool_call_data['id']}, function_arguments={tool_call_data['arguments']}"
+                        f"检测到 {len(tool_calls_list)} 个工具调用"
                     )
 
-                    # 使用公共方法上报工具调用
-                    tool_input = json.loads(tool_call_data.get("arguments") or "{}")
-                    enqueue_tool_report(self, tool_call_data['name'], tool_input)
-
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.func_handler.handle_llm_function_call(
-                            self, tool_call_data
-                        ),
-                        self.loop,
-                    )
-                    futures_with_data.append((future, tool_call_data, tool_input))
+                    # LLM 流式阶段已播报过的文本
+                    streamed_text = ""
+                    if len(response_message) > 0:
+                        streamed_text = "".join(response_message)
+                        self.tts.store_tts_text(current_sentence_id, streamed_text)
+                        self.dialogue.put(Message(role="assistant", content=streamed_text))
+                    response_message.clear()
+
+                    # 收集所有工具调用的 Future
+                    futures_with_data = []
+                    for tool_call_data in tool_calls_list:
+                        self.logger.bind(tag=TAG).debug(
+                            f"function_name={tool_call_data['name']}, function_id={tool_call_data['id']}, function_arguments={tool_call_data['arguments']}"
+                        )
 
-                # 工具调用超时时间，可配置，默认30秒
-                tool_call_timeout = int(self.config.get("tool_call_timeout", 30))
-                # 等待协程结束（实际等待时长为最慢的那个）
-                tool_results = []
+                        # 使用公共方法上报工具调用
+                        tool_input = json.loads(tool_call_data.get("arguments") or "{}")
+                        enqueue_tool_report(self, tool_call_data['name'], tool_input)
+
+                        future = self._take_speculative_tool_call(tool_call_data)
+                        if future is None:
+                            future = self._submit_tool_call(tool_call_data)
+                        futures_with_data.append((future, tool_call_data, tool_input))
+
+                    # 工具调用超时时间，可配置，默认30秒
+                    tool_call_timeout = int(self.config.get("tool_call_timeout", 30))
+                    if self.config.get("tool_call_as_completed", True):
+                        # 按完成顺序处理：无需LLM二次处理的结果先播报，剩余结果交给统一处理
+                        tool_results = self._collect_tool_results_as_completed(
+                            futures_with_data, tool_call_timeout, streamed_text
+                        )
+                    else:
+                        tool_results = self._collect_tool_results(
+                            futures_with_data, tool_call_timeout
+                        )
 
-                for future, tool_call_data, tool_input in futures_with_data:
-                    try:
-                        result = future.result(timeout=tool_call_timeout)
-                        tool_results.append((result, tool_call_data))
-                        # 使用公共方法上报工具调用结果
-                        enqueue_tool_report(self, tool_call_data['name'], tool_input, str(result.result) if result.result else None, report_tool_call=False)
+                    # 统一处理工具调用结果
+                    if tool_results:
+                        self._handle_function_result(tool_results, depth=depth, streamed_text=streamed_text)
 
-                    except Exception as e:
-                        self.logger.bind(tag=TAG).error(
-                            f"工具调用超时或异常: {tool_call_data['name']}, 错误: {e}"
-                        )
-                        # 超时时返回错误响应，避免整个流程卡死
-                        tool_results.append((
-                            ActionResponse(action=Action.ERROR, result="哎呀，网络遇到点问题，请稍后再试下！"),
-                            tool_call_data
-                        ))
-                        # 上报工具调用错误
-                        enqueue_tool_report(self, tool_call_data['name'], tool_input, str(e), report_tool_call=False)
-
-                # 统一处理工具调用结果
-                if tool_results:
-                    self._handle_function_result(tool_results, depth=depth, streamed_text=streamed_text)
-
-        # 存储对话内容
-        if len(response_message) > 0:
-            text_buff = "".join(response_message)
-            self.tts.store_tts_text(current_sentence_id, text_buff)
-            self.dialogue.put(Message(role="assistant", content=text_buff))
+            # 存储对话内容
+            if len(response_message) > 0:
+                text_buff = "".join(response_message)
+                self.tts.store_tts_text(current_sentence_id, text_buff)
+                self.dialogue.put(Message(role="assistant", content=text_buff))
 
-        if depth == 0:
-            self.tts.tts_text_queue.put(
-                TTSMessageDTO(
-                    sentence_id=current_sentence_id,
-                    sentence_type=SentenceType.LAST,
-                    content_type=ContentType.ACTION,
+            if depth == 0:
+                self.tts.tts_text_queue.put(
+                    TTSMessageDTO(
+                        sentence_id=current_sentence_id,
+                        sentence_type=SentenceType.LAST,
+                        content_type=ContentType.ACTION,
+                    )
+                )
+                # 使用lambda延迟计算，只有在DEBUG级别时才执行get_llm_dialogue()
+                self.logger.bind(tag=TAG).debug(
+                    lambda: json.dumps(
+                        self.dialogue.get_llm_dialogue(), indent=4, ensure_ascii=False
+                    )
                 )
+
+            return True
+        finally:
+            self._cancel_speculative_tool_calls(speculative_calls)
+
+    def _submit_tool_call(self, tool_call_data):
+        """将工具调用提交到事件循环，返回 concurrent.futures.Future"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.func_handler.handle_llm_function_call(self, tool_call_data),
+            self.loop,
+        )
+        # 记录提交时间，用于统计单个工具耗时
+        future.tool_start_time = time.monotonic()
+        return future
+
+    def _start_speculative_tool_calls(self, tool_calls_list):
+        """流式阶段参数已是完整JSON的工具调用，提前提交执行"""
+        for tc in tool_calls_list:
+            if tc.get("_spec_future") is not None:
+                continue
+            if not tc["name"] or tc["name"] == "direct_answer" or not tc.get("arguments"):
+                continue
+            try:
+                arguments = json.loads(tc["arguments"])
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if not isinstance(arguments, dict):
+                continue
+            if not self.func_handler.has_tool(tc["name"]):
+                continue
+            self.logger.bind(tag=TAG).debug(
+                f"工具参数已完整，提前启动: {tc['name']}, 参数: {tc['arguments']}"
             )
-            # 使用lambda延迟计算，只有在DEBUG级别时才执行get_llm_dialogue()
+            tc["_spec_arguments"] = tc["arguments"]
+            tc["_spec_future"] = self._submit_tool_call(dict(tc))
+
+    def _take_speculative_tool_call(self, tool_call_data):
+        """取出提前启动的工具调用；参数在启动后又发生变化则取消并返回None"""
+        future = tool_call_data.pop("_spec_future", None)
+        spec_arguments = tool_call_data.pop("_spec_arguments", None)
+        if future is None:
+            return None
+        if spec_arguments != tool_call_data.get("arguments"):
+            future.cancel()
             self.logger.bind(tag=TAG).debug(
-                lambda: json.dumps(
-                    self.dialogue.get_llm_dialogue(), indent=4, ensure_ascii=False
-                )
+                f"工具参数在提前启动后发生变化，重新执行: {tool_call_data['name']}"
             )
+            return None
+        return future
+
+    def _cancel_speculative_tool_calls(self, tool_calls_list):
+        """取消所有尚未被采用的提前启动的工具调用"""
+        for tc in tool_calls_list:
+            future = tc.pop("_spec_future", None)
+            tc.pop("_spec_arguments", None)
+            if future is not None:
+                future.cancel()
+
+    def _log_tool_latency(self, future, tool_call_data, result):
+        """输出单个工具调用的耗时"""
+        start_time = getattr(future, "tool_start_time", None)
+        if start_time is None:
+            return
+        elapsed_ms = (time.monotonic() - start_time) * 1000
+        action = result.action.name if result is not None else "NONE"
+        self.logger.bind(tag=TAG).info(
+            f"工具调用完成: {tool_call_data['name']}, 耗时: {elapsed_ms:.0f}ms, 动作: {action}"
+        )
+
+    def _on_tool_call_error(self, tool_call_data, tool_input, error):
+        """工具调用超时或异常时，返回兜底错误响应并上报"""
+        self.logger.bind(tag=TAG).error(
+            f"工具调用超时或异常: {tool_call_data['name']}, 错误: {error}"
+        )
+        # 上报工具调用错误
+        enqueue_tool_report(self, tool_call_data['name'], tool_input, str(error), report_tool_call=False)
+        # 超时时返回错误响应，避免整个流程卡死
+        return ActionResponse(action=Action.ERROR, result="哎呀，网络遇到点问题，请稍后再试下！")
+
+    def _collect_tool_results(self, futures_with_data, tool_call_timeout):
+        """按提交顺序依次等待工具结果（实际等待时长为最慢的那个）"""
+        tool_results = []
+        for future, tool_call_data, tool_input in futures_with_data:
+            try:
+                result = future.result(timeout=tool_call_timeout)
+                self._log_tool_latency(future, tool_call_data, result)
+                # 使用公共方法上报工具调用结果
+                enqueue_tool_report(self, tool_call_data['name'], tool_input, str(result.result) if result.result else None, report_tool_call=False)
+            except Exception as e:
+                result = self._on_tool_call_error(tool_call_data, tool_input, e)
+            tool_results.append((result, tool_call_data))
+        return tool_results
 
-        return True
+    def _collect_tool_results_as_completed(self, futures_with_data, tool_call_timeout, streamed_text=""):
+        """按完成顺序处理工具结果。
+
+        RESPONSE/NOTFOUND/ERROR 类结果在完成时立即播报，不必等待慢工具；
+        需要LLM二次处理或仅记录的结果按原调用顺序返回，由 _handle_function_result 统一处理。
+        """
+        pending = {
+            future: (index, tool_call_data, tool_input)
+            for index, (future, tool_call_data, tool_input) in enumerate(futures_with_data)
+        }
+        deferred = []
+        try:
+            for future in concurrent.futures.as_completed(
+                list(pending.keys()), timeout=tool_call_timeout
+            ):
+                index, tool_call_data, tool_input = pending.pop(future)
+                try:
+                    result = future.result()
+                    self._log_tool_latency(future, tool_call_data, result)
+                    enqueue_tool_report(self, tool_call_data['name'], tool_input, str(result.result) if result.result else None, report_tool_call=False)
+                except Exception as e:
+                    result = self._on_tool_call_error(tool_call_data, tool_input, e)
+
+                if result.action in IMMEDIATE_TOOL_ACTIONS:
+                    self._speak_tool_result(result, tool_call_data, streamed_text)
+                else:
+                    deferred.append((index, result, tool_call_data))
+        except concurrent.futures.TimeoutError as e:
+            # 超时未完成的工具，取消并按错误处理
+            for future, (index, tool_call_data, tool_input) in pending.items():
+                future.cancel()
+                result = self._on_tool_call_error(tool_call_data, tool_input, e)
+                self._speak_tool_result(result, tool_call_data, streamed_text)
+
+        deferred.sort(key=lambda item: item[0])
+        return [(result, tool_call_data) for _, result, tool_call_data in deferred]
+
+    def _speak_tool_result(self, result, tool_call_data, streamed_text=""):
+        """播报无需LLM二次处理的工具结果并写入对话历史"""
+        text = result.response if result.response else result.result
+        if streamed_text and text in streamed_text:
+            self.logger.bind(tag=TAG).debug(
+                f"Skipping duplicate TTS for tool {tool_call_data['name']}, already streamed"
+            )
+        else:
+            self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
+            self.tts.store_tts_text(self.sentence_id, text)
+        self.dialogue.put(Message(role="assistant", content=text))
 
     def _handle_function_result(self, tool_results, depth, streamed_text=""):
         need_llm_tools = []
         record_tools = []
 
         for result, tool_call_data in tool_results:
-            if result.action in [
-                Action.RESPONSE,
-                Action.NOTFOUND,
-                Action.ERROR,
-            ]:
-                text = result.response if result.response else result.result
-                if streamed_text and text in streamed_text:
-                    self.logger.bind(tag=TAG).debug(
-                        f"Skipping duplicate TTS for tool {tool_call_data['name']}, already streamed"
-                    )
-                else:
-                    self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
-                    self.tts.store_tts_text(self.sentence_id, text)
-                self.dialogue.put(Message(role="assistant", content=text))
+            if result.action in IMMEDIATE_TOOL_ACTIONS:
+                self._speak_tool_result(result, tool_call_data, streamed_text)
             elif result.action == Action.REQLLM:
                 need_llm_tools.append((result, tool_call_data))
             elif result.action == Action.RECORD:
@@ -1547,6 +1742,11 @@ class ConnectionHandler:
             ):
                 self.vad.release_conn_resources(self)
 
+            # 关闭DSP工作进程中的音频流
+            if self.dsp_stream is not None:
+                self.dsp_stream.close()
+                self.dsp_stream = None
+
             # 清理opus解码器
             if hasattr(self, "_connection_opus_decoder"):
                 try:
@@ -1558,23 +1758,27 @@ class ConnectionHandler:
             if hasattr(self, "audio_buffer"):
                 self.audio_buffer.clear()
 
-            # 取消超时任务
-            if self.timeout_task and not self.timeout_task.done():
-                self.timeout_task.cancel()
-                try:
-                    await self.timeout_task
-                except asyncio.CancelledError:
-                    pass
-                self.timeout_task = None
+            # 连接关闭时未完成的一轮不再导出
+            self.latency_tracer.discard()
 
-            # 取消AEC缓存清理任务
-            if hasattr(self, "_aec_cache_cleanup_task") and self._aec_cache_cleanup_task and not self._aec_cache_cleanup_task.done():
-                self._aec_cache_cleanup_task.cancel()
-                try:
-                    await self._aec_cache_cleanup_task
-                except asyncio.CancelledError:
-                    pass
-                self._aec_cache_cleanup_task = None
+            # 取消登记在时间轮中的定时器
+            for timer in (
+                self.timeout_timer,
+                self.aec_expiry_timer,
+                self.vad_resume_timer,
+                self.hibernate_timer,
+            ):
+                if timer is not None:
+                    timer.cancel()
+            self.timeout_timer = None
+            self.aec_expiry_timer = None
+            self.vad_resume_timer = None
+            self.hibernate_timer = None
+
+            # 仍在排队的初始化不再进行；记录断开前是否还在对话，重连时优先初始化
+            if self.init_ticket is not None and self.init_ticket.waiting:
+                self.init_task.cancel()
+            admission_controller.note_disconnect(self.device_id, self.last_audio_time)
 
             # 清理AEC缓存
             if hasattr(self, "aec_audio_cache"):
@@ -1676,7 +1880,7 @@ class ConnectionHandler:
                     except queue.Empty:
                         break
 
-            # 重置音频流控器（取消后台任务并清空队列）
+            # 重置音频流控器（停止发送并清空队列）
             if hasattr(self, "audio_rate_controller") and self.audio_rate_controller:
                 self.audio_rate_controller.reset()
                 self.logger.bind(tag=TAG).debug("已重置音频流控器")
@@ -1691,11 +1895,16 @@ class ConnectionHandler:
         """
         # Reset VAD states
         self.client_audio_buffer.clear()
+        if self.dsp_stream is not None:
+            # 可能在ASR线程中调用，音频流只能在事件循环线程中操作
+            self.loop.call_soon_threadsafe(self.dsp_stream.reset)
         self.client_have_voice = False
         self.client_voice_stop = False
         self.client_voice_window.clear()
         self.last_is_voice = False
         self.vad_last_voice_time = 0.0
+        self.vad_speech_start_time = 0.0
+        self.vad_silence_probs.clear()
 
         # Clear ASR buffers
         self.asr_audio.clear()
@@ -1713,56 +1922,196 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"Chat and close error: {str(e)}")
 
-    async def _check_timeout(self):
-        """检查连接超时"""
+    def _check_timeout(self):
+        """超时定时器到期：检查连接是否超时，未超时则按最后活动时间重新登记"""
+        self.timeout_timer = None
+        if self.stop_event.is_set():
+            return
+        last_activity_time = self.last_activity_time
+        if self.need_bind:
+            last_activity_time = self.first_activity_time
+
+        # 活动时间只在这里检查，更新活动时间时无需改动定时器
+        timeout_ms = self.timeout_seconds * 1000
+        remaining_ms = timeout_ms
+        if last_activity_time > 0.0:
+            remaining_ms = last_activity_time + timeout_ms - time.time() * 1000
+        if remaining_ms < 0:
+            self.logger.bind(tag=TAG).info("连接超时，准备关闭")
+            # 设置停止事件，防止重复处理
+            self.stop_event.set()
+            return self._close_on_timeout()
+        self.timeout_timer = housekeeping_timers.call_later(
+            max(remaining_ms / 1000, 1), self._check_timeout
+        )
+
+    async def _close_on_timeout(self):
+        # 使用 try-except 包装关闭操作，确保不会因为异常而阻塞
         try:
-            while not self.stop_event.is_set():
-                last_activity_time = self.last_activity_time
-                if self.need_bind:
-                    last_activity_time = self.first_activity_time
-
-                # 检查是否超时（只有在时间戳已初始化的情况下）
-                if last_activity_time > 0.0:
-                    current_time = time.time() * 1000
-                    if current_time - last_activity_time > self.timeout_seconds * 1000:
-                        if not self.stop_event.is_set():
-                            self.logger.bind(tag=TAG).info("连接超时，准备关闭")
-                            # 设置停止事件，防止重复处理
-                            self.stop_event.set()
-                            # 使用 try-except 包装关闭操作，确保不会因为异常而阻塞
-                            try:
-                                await self.close(self.websocket)
-                            except Exception as close_error:
-                                self.logger.bind(tag=TAG).error(
-                                    f"超时关闭连接时出错: {close_error}"
-                                )
-                        break
-                # 每10秒检查一次，避免过于频繁
-                await asyncio.sleep(10)
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"超时检查任务出错: {e}")
-        finally:
-            self.logger.bind(tag=TAG).info("超时检查任务已退出")
+            await self.close(self.websocket)
+        except Exception as close_error:
+            self.logger.bind(tag=TAG).error(f"超时关闭连接时出错: {close_error}")
 
-    async def _check_aec_cache_expiry(self):
+    def _check_aec_cache_expiry(self):
         """定期清理过期的AEC缓存"""
+        self.aec_expiry_timer = None
+        if self.stop_event.is_set():
+            return
+        try:
+            if hasattr(self, "aec_audio_cache") and self.aec_audio_cache:
+                current_time = time.time()
+                expired_keys = [
+                    ts for ts, cache_time in list(self.aec_audio_cache_time.items())
+                    if current_time - cache_time > 120  # 2分钟过期
+                ]
+                for ts in expired_keys:
+                    self.aec_audio_cache.pop(ts, None)
+                    self.aec_audio_cache_time.pop(ts, None)
+                if expired_keys:
+                    self.logger.bind(tag=TAG).debug(f"[AEC] 清理过期缓存 {len(expired_keys)} 条")
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"AEC缓存清理出错: {e}")
+        self.aec_expiry_timer = housekeeping_timers.call_later(
+            AEC_CACHE_CHECK_INTERVAL, self._check_aec_cache_expiry
+        )
+
+    def _is_idle(self) -> bool:
+        """组件已初始化，且没有正在说话、播放或排队处理的音频"""
+        if self.need_bind or self.tts is None or self.asr is None:
+            return False
+        rate_controller = getattr(self, "audio_rate_controller", None)
+        return not (
+            self.client_have_voice
+            or self.client_is_speaking
+            or self.asr_audio_queue.qsize()
+            or self.tts.tts_text_queue.qsize()
+            or self.tts.tts_audio_queue.qsize()
+            or (rate_controller is not None and rate_controller.sending)
+        )
+
+    def _check_hibernate(self):
+        """休眠定时器到期：空闲足够久则休眠，否则按最后收发音频的时间重新登记"""
+        self.hibernate_timer = None
+        if self.stop_event.is_set() or self.hibernated:
+            return
+        now = time.monotonic()
+        if not self._is_idle():
+            # 播放中或仍有待处理的音频，视为有音频收发
+            self.last_audio_time = now
+        remaining = self.last_audio_time + self.hibernation_idle_seconds - now
+        if remaining <= 0:
+            return self.hibernate()
+        self.hibernate_timer = housekeeping_timers.call_later(
+            max(remaining, 1), self._check_hibernate
+        )
+
+    async def hibernate(self):
+        """释放连接级资源，对话与说话人状态压缩为快照，收到下一帧音频或非心跳消息时恢复"""
+        async with self._hibernation_lock:
+            if self.hibernated or self.stop_event.is_set():
+                return
+            if not self._is_idle():
+                self.hibernate_timer = housekeeping_timers.call_later(
+                    self.hibernation_idle_seconds, self._check_hibernate
+                )
+                return
+            try:
+                # 对话历史、说话人状态与当前 sentence_id
+                if self._dialogue is not None:
+                    self._hibernation_snapshot = pack_snapshot(
+                        self._dialogue,
+                        self.current_speaker,
+                        self.introduced_speakers,
+                        self.system_introduced_speakers,
+                        self.sentence_id,
+                    )
+                    self._dialogue = None
+                    self.current_speaker = None
+                    self.introduced_speakers = set()
+                    self.system_introduced_speakers = set()
+                    self.sentence_id = None
+
+                # 上行：VAD状态、DSP工作进程中的音频流、Opus解码器与音频缓冲，收到音频时按需重建
+                self.vad.release_conn_resources(self)
+                if self.dsp_stream is not None:
+                    self.dsp_stream.close()
+                    self.dsp_stream = None
+                for attr in (
+                    "_connection_opus_decoder",
+                    "_send_opus_decoder",
+                    "aec_audio_cache",
+                    "aec_audio_cache_time",
+                    "audio_rate_controller",
+                    "audio_flow_control",
+                ):
+                    if hasattr(self, attr):
+                        delattr(self, attr)
+                self.reset_audio_states()
+
+                # 下行：停止TTS合成与播放线程，关闭TTS服务连接
+                await self.tts.release_audio_channels()
+
+                # 线程池中的空闲线程随旧线程池退出，新线程池在提交任务时才创建线程
+                self.executor.shutdown(wait=False)
+                self.executor = ThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS)
+
+                # 提示词管理器只在初始化组件时使用
+                self.prompt_manager = None
+                self.hibernated = True
+                self.logger.bind(tag=TAG).info("连接空闲，进入休眠")
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"连接休眠失败，保持唤醒: {e}")
+                await self._abort_hibernate()
+
+    async def _abort_hibernate(self):
+        """休眠中途失败：还原对话快照、重新打开已释放的TTS通道，连接保持唤醒，其余资源在使用时重建；
+        仍无法恢复时关闭连接，由设备重连"""
         try:
-            while not self.stop_event.is_set():
-                if hasattr(self, "aec_audio_cache") and self.aec_audio_cache:
-                    current_time = time.time()
-                    expired_keys = [
-                        ts for ts, cache_time in list(self.aec_audio_cache_time.items())
-                        if current_time - cache_time > 120  # 2分钟过期
-                    ]
-                    for ts in expired_keys:
-                        self.aec_audio_cache.pop(ts, None)
-                        self.aec_audio_cache_time.pop(ts, None)
-                    if expired_keys:
-                        self.logger.bind(tag=TAG).debug(f"[AEC] 清理过期缓存 {len(expired_keys)} 条")
-                # 每30秒检查一次
-                await asyncio.sleep(30)
+            if self._dialogue is None:
+                self._restore_snapshot()
+            if not self.tts.audio_channels_open:
+                await self.tts.open_audio_channels(self)
         except Exception as e:
-            self.logger.bind(tag=TAG).error(f"AEC缓存清理任务出错: {e}")
+            self.logger.bind(tag=TAG).error(f"休眠失败后恢复资源失败，关闭连接: {e}")
+            await self.close(self.websocket)
+            return
+        self.hibernate_timer = housekeeping_timers.call_later(
+            self.hibernation_idle_seconds, self._check_hibernate
+        )
+
+    async def wake(self):
+        """从休眠中恢复：还原对话快照并重新打开TTS通道，其余资源在使用时重建"""
+        async with self._hibernation_lock:
+            if not self.hibernated:
+                return
+            start_time = time.monotonic()
+            try:
+                if self._dialogue is None:
+                    self._restore_snapshot()
+                await self.tts.open_audio_channels(self)
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"连接恢复失败: {e}")
+            self.hibernated = False
+            self.last_audio_time = time.monotonic()
+            wake_ms = (self.last_audio_time - start_time) * 1000
+            hibernation_wake_ms.observe(wake_ms)
+            self.logger.bind(tag=TAG).info(f"连接从休眠中恢复，耗时 {wake_ms:.1f}ms")
+            if not self.stop_event.is_set():
+                self.hibernate_timer = housekeeping_timers.call_later(
+                    self.hibernation_idle_seconds, self._check_hibernate
+                )
+
+    def _restore_snapshot(self):
+        if self._hibernation_snapshot is None:
+            self._dialogue = Dialogue()
+            return
+        state = unpack_snapshot(self._hibernation_snapshot)
+        self._hibernation_snapshot = None
+        self._dialogue = state["dialogue"]
+        self.current_speaker = state["current_speaker"]
+        self.introduced_speakers = state["introduced_speakers"]
+        self.system_introduced_speakers = state["system_introduced_speakers"]
+        self.sentence_id = state["sentence_id"]
 
     @staticmethod
     def _extract_direct_answer_response(arguments_str):
@@ -1,3 +1,4 @@
+import os
 import time
 import json
 import uuid
@@ -8,11 +9,16 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from core.connection import ConnectionHandler
 from core.utils.dialogue import Message
-from core.utils.util import audio_to_data
+from core.utils.util import audio_to_data, audio_bytes_to_data_stream
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.wakeup_word import WakeupWordsConfig
-from core.handle.sendAudioHandle import sendAudioMessage, send_tts_message
-from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
+from core.utils.opus_encoder_utils import resolve_opus_profile
+from core.handle.sendAudioHandle import (
+    sendAudioMessage,
+    send_tts_message,
+    get_frame_duration,
+)
+from core.utils.util import remove_punctuation_and_length
 from core.providers.tools.device_mcp import MCPClient, send_mcp_initialize_message
 
 TAG = __name__
@@ -47,6 +53,16 @@ async def handleHelloMessage(conn: "ConnectionHandler", msg_json):
         conn.logger.bind(tag=TAG).debug(f"客户端音频格式: {format}")
         conn.audio_format = format
         conn.welcome_msg["audio_params"] = audio_params
+    # 按设备上报的音频参数和智能体配置协商Opus编码档位，并告知设备下行帧时长
+    conn.opus_profile = resolve_opus_profile(conn.config, audio_params)
+    conn.welcome_msg["audio_params"] = {
+        **conn.welcome_msg["audio_params"],
+        "frame_duration": conn.opus_profile.frame_duration,
+    }
+    encoder = getattr(conn.tts, "opus_encoder", None)
+    if encoder is not None and encoder.profile != conn.opus_profile:
+        encoder.apply_profile(conn.opus_profile)
+    conn.logger.bind(tag=TAG).debug(f"Opus编码档位: {conn.opus_profile.tag}")
     features = msg_json.get("features")
     if features:
         conn.logger.bind(tag=TAG).debug(f"客户端特性: {features}")
@@ -92,18 +108,25 @@ async def checkWakeupWords(conn: "ConnectionHandler", text):
     if not voice:
         voice = "default"
 
-    # 获取唤醒词回复配置
-    response = wakeup_words_config.get_wakeup_response(voice)
-    if not response or not response.get("file_path"):
+    # 获取唤醒词回复（已按当前音色、采样率和帧时长编码好的Opus帧）
+    frame_duration = get_frame_duration(conn)
+    response = wakeup_words_config.get_wakeup_response(
+        voice, conn.sample_rate, frame_duration
+    )
+    if response:
+        opus_packets = response["frames"]
+    else:
         response = {
             "voice": "default",
-            "file_path": "config/assets/wakeup_words_short.wav",
             "time": 0,
             "text": "我在这里哦！",
         }
+        # 默认回复只需转码一次，之后从音频缓存读取
+        opus_packets = await audio_to_data(
+            "config/assets/wakeup_words_short.wav",
+            frame_duration=frame_duration,
+        )
 
-    # 获取音频数据
-    opus_packets = await audio_to_data(response.get("file_path"), use_cache=False)
     # 播放唤醒词回复
     conn.client_abort = False
 
@@ -124,6 +147,24 @@ async def checkWakeupWords(conn: "ConnectionHandler", text):
     return True
 
 
+def _audio_file_to_frames(file_path, sample_rate, frame_duration):
+    """读取TTS生成的音频文件并编码为Opus帧，文件不存在（生成失败）时返回空列表"""
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, "rb") as f:
+        audio_bytes = f.read()
+    frames = []
+    audio_bytes_to_data_stream(
+        audio_bytes,
+        file_type=os.path.splitext(file_path)[1].lstrip("."),
+        is_opus=True,
+        callback=frames.append,
+        sample_rate=sample_rate,
+        frame_duration=frame_duration,
+    )
+    return frames
+
+
 async def wakeupWordsResponse(conn: "ConnectionHandler"):
     if not conn.tts:
         return
@@ -139,20 +180,25 @@ async def wakeupWordsResponse(conn: "ConnectionHandler"):
             return
 
         # 生成TTS音频
+        frame_duration = get_frame_duration(conn)
         tts_result = await asyncio.to_thread(conn.tts.to_tts, result)
+        if isinstance(tts_result, str):
+            # 未开启 delete_audio 时 to_tts 返回音频文件路径，按连接的采样率和帧时长转为Opus帧
+            tts_result = await asyncio.to_thread(
+                _audio_file_to_frames, tts_result, conn.sample_rate, frame_duration
+            )
         if not tts_result:
             return
 
         # 获取当前音色
         voice = getattr(conn.tts, "voice", "default")
+        if not voice:
+            voice = "default"
 
-        # 使用链接的sample_rate
-        wav_bytes = opus_datas_to_wav_bytes(tts_result, sample_rate=conn.sample_rate)
-        file_path = wakeup_words_config.generate_file_path(voice)
-        with open(file_path, "wb") as f:
-            f.write(wav_bytes)
-        # 更新配置
-        wakeup_words_config.update_wakeup_response(voice, file_path, result)
+        # 直接保存TTS生成的Opus帧（已按连接的采样率和帧时长编码），唤醒时无需再转码
+        await wakeup_words_config.update_wakeup_response(
+            voice, conn.sample_rate, frame_duration, tts_result, result
+        )
     finally:
         # 确保在任何情况下都释放锁
         if _wakeup_response_lock.locked():
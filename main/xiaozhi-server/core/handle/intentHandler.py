@@ -46,6 +46,7 @@ async def handle_user_intent(conn: "ConnectionHandler", text):
         return False
     # 会话开始时生成sentence_id
     conn.sentence_id = str(uuid.uuid4().hex)
+    conn.latency_tracer.bind_sentence(conn.sentence_id)
     # 处理各种意图
     return await process_intent_result(conn, intent_result, text)
 
@@ -1,6 +1,5 @@
 import time
 import json
-import asyncio
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -9,20 +8,31 @@ from core.utils.util import audio_to_data
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
-from core.handle.sendAudioHandle import send_stt_message, SentenceType
+from core.utils.latency_trace import STAGE_TEXT_INPUT, STAGE_INTENT
+from core.utils.metrics import observe_latency
+from core.utils.dsp_workers import DspFrame
+from core.utils.timer_wheel import housekeeping_timers
+from core.handle.sendAudioHandle import send_stt_message, SentenceType, get_frame_duration
 
 TAG = __name__
 
 
 async def handleAudioMessage(conn: "ConnectionHandler", pcm_frame):
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, pcm_frame)
+    if isinstance(pcm_frame, DspFrame):
+        # DSP工作进程已完成解码与VAD推理，这里只根据语音概率更新说话状态
+        have_voice = conn.vad.apply_speech_probs(conn, pcm_frame.speech_probs)
+        pcm_frame = pcm_frame.pcm
+    else:
+        have_voice = conn.vad.is_vad(conn, pcm_frame)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
         # 设置一个短暂延迟后恢复VAD检测
-        if not hasattr(conn, "vad_resume_task") or conn.vad_resume_task.done():
-            conn.vad_resume_task = asyncio.create_task(resume_vad_detection(conn))
+        if conn.vad_resume_timer is None or not conn.vad_resume_timer.pending:
+            conn.vad_resume_timer = housekeeping_timers.call_later(
+                2, resume_vad_detection, conn
+            )
         return
     # 服务端AEC功能需要实时触发打断
     if conn.client_aec and have_voice:
@@ -34,9 +44,8 @@ async def handleAudioMessage(conn: "ConnectionHandler", pcm_frame):
     await conn.asr.receive_audio(conn, pcm_frame, have_voice)
 
 
-async def resume_vad_detection(conn: "ConnectionHandler"):
-    # 等待2秒后恢复VAD检测
-    await asyncio.sleep(2)
+def resume_vad_detection(conn: "ConnectionHandler"):
+    # 唤醒2秒后恢复VAD检测
     conn.just_woken_up = False
 
 
@@ -87,8 +96,13 @@ async def startToChat(conn: "ConnectionHandler", text):
     if conn.client_is_speaking and conn.client_listen_mode != "manual":
         await handleAbortMessage(conn)
 
+    # 文本输入、结束语等不经过VAD的对话在这里开始计时
+    conn.latency_tracer.ensure_turn(STAGE_TEXT_INPUT)
+
     # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    with observe_latency("intent", conn.intent):
+        intent_handled = await handle_user_intent(conn, actual_text)
+    conn.latency_tracer.mark(STAGE_INTENT)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
@@ -136,7 +150,10 @@ async def max_out_size(conn: "ConnectionHandler"):
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
     file_path = "config/assets/max_output_size.wav"
-    opus_packets = await audio_to_data(file_path)
+    opus_packets = await audio_to_data(
+        file_path,
+        frame_duration=get_frame_duration(conn),
+    )
     conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
     conn.close_after_chat = True
 
@@ -155,7 +172,10 @@ async def check_bind_device(conn: "ConnectionHandler"):
 
         # 播放提示音
         music_path = "config/assets/bind_code.wav"
-        opus_packets = await audio_to_data(music_path)
+        opus_packets = await audio_to_data(
+            music_path,
+            frame_duration=get_frame_duration(conn),
+        )
         conn.tts.tts_audio_queue.put((SentenceType.FIRST, opus_packets, text))
 
         # 逐个播放数字
@@ -163,7 +183,10 @@ async def check_bind_device(conn: "ConnectionHandler"):
             try:
                 digit = conn.bind_code[i]
                 num_path = f"config/assets/bind_code/{digit}.wav"
-                num_packets = await audio_to_data(num_path)
+                num_packets = await audio_to_data(
+                    num_path,
+                    frame_duration=get_frame_duration(conn),
+                )
                 conn.tts.tts_audio_queue.put((SentenceType.MIDDLE, num_packets, None))
             except Exception as e:
                 conn.logger.bind(tag=TAG).error(f"播放数字音频失败: {e}")
@@ -175,5 +198,8 @@ async def check_bind_device(conn: "ConnectionHandler"):
         text = f"没有找到该设备的版本信息，请正确配置 OTA地址，然后重新编译固件。"
         await send_stt_message(conn, text)
         music_path = "config/assets/bind_not_found.wav"
-        opus_packets = await audio_to_data(music_path)
+        opus_packets = await audio_to_data(
+            music_path,
+            frame_duration=get_frame_duration(conn),
+        )
         conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
@@ -10,9 +10,12 @@ from core.utils import textUtils
 from core.utils.util import audio_to_data
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.audioRateController import AudioRateController
+from core.utils.latency_trace import STAGE_FIRST_PACKET_SENT
+from core.utils.opus_encoder_utils import opus_packet_duration_ms
+from core.utils.metrics import opus_frames_total, ws_bytes_total
 
 TAG = __name__
-# 音频帧时长（毫秒）
+# 默认音频帧时长（毫秒），实际以连接协商的编码档位为准
 AUDIO_FRAME_DURATION = 60
 # 预缓冲包数量，直接发送以减少延迟
 PRE_BUFFER_COUNT = 5
@@ -51,6 +54,7 @@ async def sendAudioMessage(conn: "ConnectionHandler", sentenceType, audios, text
     # 通话需要维持speaking状态
     if not conn.calling and sentenceType == SentenceType.LAST:
         await send_tts_message(conn, "stop", None)
+        conn.latency_tracer.finish(sentence_id)
         if conn.close_after_chat:
             await conn.close()
 
@@ -90,13 +94,17 @@ async def _send_to_mqtt_gateway(
         sequence: 序列号
     """
     # 如果启用了服务端AEC，缓存PCM数据用于后续AEC处理
-    if conn.client_aec and timestamp > 0:
+    dsp_stream = conn.dsp_stream
+    if conn.client_aec and timestamp > 0 and dsp_stream is not None and not dsp_stream.closed:
+        # 上行音频在DSP工作进程中做AEC，参考信号也交给工作进程解码缓存
+        dsp_stream.submit_reference(opus_packet, timestamp)
+    elif conn.client_aec and timestamp > 0:
         if not hasattr(conn, "aec_audio_cache"):
             conn.aec_audio_cache = {}
             conn.aec_audio_cache_time = {}
             conn._send_opus_decoder = opuslib_next.Decoder(16000, 1)
-        # 解码opus为PCM后缓存
-        pcm_data = conn._send_opus_decoder.decode(bytes(opus_packet), 960)
+        # 解码opus为PCM后缓存，按单包最长120ms分配缓冲以兼容不同帧时长
+        pcm_data = conn._send_opus_decoder.decode(bytes(opus_packet), 1920)
         conn.aec_audio_cache[timestamp] = bytes(pcm_data)
         conn.aec_audio_cache_time[timestamp] = time.time()
 
@@ -113,8 +121,24 @@ async def _send_to_mqtt_gateway(
     await conn.websocket.send(complete_packet)
 
 
+def get_frame_duration(conn: "ConnectionHandler") -> int:
+    """连接协商的帧时长（毫秒）"""
+    profile = getattr(conn, "opus_profile", None)
+    return profile.frame_duration if profile is not None else AUDIO_FRAME_DURATION
+
+
+def _packet_duration(conn: "ConnectionHandler", packet, frame_duration) -> float:
+    """单个音频包的播放时长：Opus包按TOC解析，PCM按字节数计算
+
+    缓存的音频（唤醒词、语音缓存等）可能与当前档位的帧时长不同，按包的实际时长计时才能保证节奏准确
+    """
+    if conn.audio_format == "pcm":
+        return len(packet) * 1000 / (conn.sample_rate * 2)
+    return opus_packet_duration_ms(packet) or frame_duration
+
+
 async def sendAudio(
-    conn: "ConnectionHandler", audios, frame_duration=AUDIO_FRAME_DURATION
+    conn: "ConnectionHandler", audios, frame_duration=None
 ):
     """
     发送音频包，使用 AudioRateController 进行精确的流量控制
@@ -122,11 +146,14 @@ async def sendAudio(
     Args:
         conn: 连接对象
         audios: 单个opus包(bytes) 或 opus包列表
-        frame_duration: 帧时长（毫秒），默认使用全局常量AUDIO_FRAME_DURATION
+        frame_duration: 帧时长（毫秒），默认使用连接协商的帧时长
     """
     if audios is None or len(audios) == 0:
         return
 
+    if frame_duration is None:
+        frame_duration = get_frame_duration(conn)
+
     send_delay = conn.config.get("tts_audio_send_delay", -1) / 1000.0
     is_single_packet = isinstance(audios, bytes)
 
@@ -167,11 +194,8 @@ def _get_or_create_rate_controller(
     else:
         rate_controller = conn.audio_rate_controller
 
-        # 后台发送任务已停止, 则需要重置
-        if (
-            not rate_controller.pending_send_task
-            or rate_controller.pending_send_task.done()
-        ):
+        # 发送已停止（出错或被中止）, 则需要重置
+        if not rate_controller.sending:
             need_reset = True
         # 当sentence_id 变化，需要重置
         elif (
@@ -186,6 +210,7 @@ def _get_or_create_rate_controller(
             conn.audio_rate_controller = AudioRateController(frame_duration)
         else:
             conn.audio_rate_controller.reset()
+            conn.audio_rate_controller.frame_duration = frame_duration
 
         # 初始化 flow_control
         conn.audio_flow_control = {
@@ -194,7 +219,7 @@ def _get_or_create_rate_controller(
             "sentence_id": conn.sentence_id,
         }
 
-        # 启动后台发送循环
+        # 启动发送
         _start_background_sender(
             conn, conn.audio_rate_controller, conn.audio_flow_control
         )
@@ -204,7 +229,7 @@ def _get_or_create_rate_controller(
 
 def _start_background_sender(conn: "ConnectionHandler", rate_controller, flow_control):
     """
-    启动后台发送循环任务
+    启动发送，由进程内共享的节拍器按播放时间驱动
 
     Args:
         conn: 连接对象
@@ -220,7 +245,6 @@ def _start_background_sender(conn: "ConnectionHandler", rate_controller, flow_co
         conn.last_activity_time = time.time() * 1000
         await _do_send_audio(conn, packet, flow_control)
 
-    # 使用 start_sending 启动后台循环
     rate_controller.start_sending(send_callback)
 
 
@@ -251,8 +275,10 @@ async def _send_audio_with_rate_control(
             await asyncio.sleep(send_delay)
             await _do_send_audio(conn, packet, flow_control)
         else:
-            # 动态流控模式：仅添加到队列，由后台循环负责发送
-            rate_controller.add_audio(packet)
+            # 动态流控模式：仅添加到队列，由节拍器按播放时间发送
+            rate_controller.add_audio(
+                packet, _packet_duration(conn, packet, rate_controller.frame_duration)
+            )
 
 
 async def _do_send_audio(conn: "ConnectionHandler", opus_packet, flow_control):
@@ -270,6 +296,13 @@ async def _do_send_audio(conn: "ConnectionHandler", opus_packet, flow_control):
     else:
         # 直接发送opus数据包
         await conn.websocket.send(opus_packet)
+    ws_bytes_total.inc(len(opus_packet), direction="out", kind="audio")
+    opus_frames_total.inc(direction="out")
+
+    if packet_index == 0:
+        conn.latency_tracer.mark(
+            STAGE_FIRST_PACKET_SENT, flow_control.get("sentence_id")
+        )
 
     # 更新流控状态
     flow_control["packet_count"] = packet_index + 1
@@ -294,7 +327,11 @@ async def send_tts_message(conn: "ConnectionHandler", state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios = await audio_to_data(stop_tts_notify_voice, is_opus=True)
+            audios = await audio_to_data(
+                stop_tts_notify_voice,
+                is_opus=True,
+                frame_duration=get_frame_duration(conn),
+            )
             await sendAudio(conn, audios)
         # 等待所有音频包发送完成
         await _wait_for_audio_completion(conn)
@@ -303,7 +340,7 @@ async def send_tts_message(conn: "ConnectionHandler", state, text=None):
         if current_sentence_id != conn.sentence_id:
             return
 
-        # 停止音频发送循环（仅在流控器已初始化时调用）
+        # 停止音频发送（仅在流控器已初始化时调用）
         if hasattr(conn, "audio_rate_controller") and conn.audio_rate_controller:
             conn.audio_rate_controller.stop_sending()
         conn.clearSpeakStatus()
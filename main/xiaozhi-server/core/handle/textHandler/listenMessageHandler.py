@@ -8,6 +8,7 @@ if TYPE_CHECKING:
 
 from core.utils.dialogue import Message
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.latency_trace import STAGE_LISTEN_STOP
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.handle.sendAudioHandle import send_stt_message, send_tts_message
@@ -41,6 +42,7 @@ class ListenTextMessageHandler(TextMessageHandler):
                 return
 
             conn.client_voice_stop = True
+            conn.latency_tracer.begin_turn(STAGE_LISTEN_STOP)
             if conn.asr.interface_type == InterfaceType.STREAM:
                 # 流式模式下，发送结束请求
                 asyncio.create_task(conn.asr._send_stop_request())
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from core.connection import ConnectionHandler
 from core.handle.textMessageHandlerRegistry import TextMessageHandlerRegistry
+from core.handle.textMessageType import TextMessageType
 
 TAG = __name__
 
@@ -27,6 +28,10 @@ class TextMessageProcessor:
                 # 记录日志
                 conn.logger.bind(tag=TAG).info(f"收到{message_type}消息：{message}")
 
+                # 休眠中的连接收到心跳以外的消息时先恢复
+                if conn.hibernated and message_type != TextMessageType.PING.value:
+                    await conn.wake()
+
                 # 获取并执行处理器
                 handler = self.registry.get_handler(message_type)
                 if handler:
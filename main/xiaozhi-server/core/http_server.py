@@ -3,6 +3,9 @@ from aiohttp import web
 from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
 from core.api.vision_handler import VisionHandler
+from core.api.diagnostics_handler import DiagnosticsHandler
+from core.api.metrics_handler import MetricsHandler
+from core.utils.diagnostics import loop_lag_monitor
 
 TAG = __name__
 
@@ -13,6 +16,12 @@ class SimpleHttpServer:
         self.logger = setup_logging()
         self.ota_handler = OTAHandler(config)
         self.vision_handler = VisionHandler(config)
+        self.diagnostics_handler = None
+        if config.get("diagnostics", {}).get("enable", False):
+            self.diagnostics_handler = DiagnosticsHandler(config)
+        self.metrics_handler = None
+        if config.get("metrics", {}).get("enable", False):
+            self.metrics_handler = MetricsHandler(config)
 
     def _get_websocket_url(self, local_ip: str, port: int) -> str:
         """获取websocket地址
@@ -75,6 +84,17 @@ class SimpleHttpServer:
                     ]
                 )
 
+                # 运行时诊断接口
+                if self.diagnostics_handler is not None:
+                    app.add_routes(self.diagnostics_handler.routes())
+                    loop_lag_monitor.start()
+
+                # Prometheus 指标接口
+                if self.metrics_handler is not None:
+                    app.add_routes(
+                        [web.get("/metrics", self.metrics_handler.handle_get)]
+                    )
+
                 # 运行服务
                 runner = web.AppRunner(app)
                 await runner.setup()
@@ -11,6 +11,7 @@ from urllib import parse
 from datetime import datetime
 from config.logger import setup_logging
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.uplink import AudioUplink
 from core.providers.asr.dto.dto import InterfaceType
 from typing import TYPE_CHECKING
 
@@ -97,6 +98,8 @@ class ASRProvider(ASRProviderBase):
         self.expire_time = None
 
         self.task_id = uuid.uuid4().hex
+        # 音频以二进制PCM原样发送，发送失败时清理识别会话
+        self.uplink = AudioUplink(config, bytes, on_error=self._cleanup)
 
         # Token管理
         if self.access_key_id and self.access_key_secret:
@@ -141,11 +144,7 @@ class ASRProvider(ASRProviderBase):
                 return
 
         if self.asr_ws and self.is_processing and self.server_ready:
-            try:
-                await self.asr_ws.send(pcm_frame)
-            except Exception as e:
-                logger.bind(tag=TAG).warning(f"发送音频失败: {str(e)}")
-                await self._cleanup()
+            self.uplink.push(pcm_frame)
 
     async def _start_recognition(self, conn: "ConnectionHandler"):
         """开始识别会话"""
@@ -227,17 +226,18 @@ class ASRProvider(ASRProviderBase):
                         self.server_ready = True
                         logger.bind(tag=TAG).debug("服务器已准备，开始发送缓存音频...")
 
-                        # 发送缓存音频
-                        if conn.asr_audio:
-                            for cached_pcm in conn.asr_audio[-10:]:
-                                try:
-                                    await self.asr_ws.send(cached_pcm)
-                                except Exception as e:
-                                    logger.bind(tag=TAG).warning(f"发送缓存音频失败: {e}")
-                                    break
+                        # 开始发送音频，先发送缓存音频
+                        self.uplink.start(self.asr_ws)
+                        for cached_pcm in conn.asr_audio[-10:]:
+                            self.uplink.push(cached_pcm)
+                        continue
+                    elif message_name == "TranscriptionResultChanged":
+                        # 中间结果，用于判定用户是否已经说完
+                        self.partial_text = payload.get("result", "")
                         continue
                     elif message_name == "SentenceEnd":
                         # 句子结束（每个句子都会触发）
+                        self.partial_text = ""
                         text = payload.get("result", "")
                         if text:
                             logger.bind(tag=TAG).info(f"识别到文本: {text}")
@@ -282,8 +282,9 @@ class ASRProvider(ASRProviderBase):
         """发送停止识别请求（不关闭连接）"""
         if self.asr_ws:
             try:
-                # 先停止音频发送
+                # 先停止音频发送，已合并但未发送的音频先发出
                 self.is_processing = False
+                await self.uplink.flush()
 
                 stop_msg = {
                     "header": {
@@ -306,6 +307,8 @@ class ASRProvider(ASRProviderBase):
         # 状态重置
         self.is_processing = False
         self.server_ready = False
+        self.partial_text = ""
+        self.uplink.stop()
         logger.bind(tag=TAG).debug("ASR状态已重置")
 
         # 关闭连接
@@ -9,6 +9,7 @@ if TYPE_CHECKING:
 
 from config.logger import setup_logging
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.uplink import AudioUplink
 from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
@@ -49,6 +50,8 @@ class ASRProvider(ASRProviderBase):
 
         self.output_dir = config.get("output_dir", "./audio_output")
         self.delete_audio_file = delete_audio_file
+        # 音频以二进制PCM原样发送，发送失败时清理识别会话
+        self.uplink = AudioUplink(config, bytes, on_error=self._cleanup)
 
     async def open_audio_channels(self, conn):
         await super().open_audio_channels(conn)
@@ -68,11 +71,7 @@ class ASRProvider(ASRProviderBase):
 
         # 发送音频数据
         if self.asr_ws and self.is_processing and self.server_ready:
-            try:
-                await self.asr_ws.send(pcm_frame)
-            except Exception as e:
-                logger.bind(tag=TAG).warning(f"发送音频失败: {str(e)}")
-                await self._cleanup()
+            self.uplink.push(pcm_frame)
 
     async def _start_recognition(self, conn: "ConnectionHandler"):
         """开始识别会话"""
@@ -173,14 +172,10 @@ class ASRProvider(ASRProviderBase):
                         self.server_ready = True
                         logger.bind(tag=TAG).debug("服务器已准备，开始发送缓存音频...")
 
-                        # 发送缓存音频
-                        if conn.asr_audio:
-                            for cached_pcm in conn.asr_audio[-10:]:
-                                try:
-                                    await self.asr_ws.send(cached_pcm)
-                                except Exception as e:
-                                    logger.bind(tag=TAG).warning(f"发送缓存音频失败: {e}")
-                                    break
+                        # 开始发送音频，先发送缓存音频
+                        self.uplink.start(self.asr_ws)
+                        for cached_pcm in conn.asr_audio[-10:]:
+                            self.uplink.push(cached_pcm)
                         continue
 
                     # 处理result-generated事件
@@ -195,6 +190,9 @@ class ASRProvider(ASRProviderBase):
                         # 判断是否为最终结果(sentence_end为True且end_time不为null)
                         is_final = sentence_end and end_time is not None
 
+                        # 中间结果，用于判定用户是否已经说完
+                        self.partial_text = "" if is_final else text
+
                         if is_final:
                             logger.bind(tag=TAG).info(f"识别到文本: {text}")
 
@@ -249,8 +247,9 @@ class ASRProvider(ASRProviderBase):
         """发送停止请求(用于手动模式停止录音)"""
         if self.asr_ws:
             try:
-                # 先停止音频发送
+                # 先停止音频发送，已合并但未发送的音频先发出
                 self.is_processing = False
+                await self.uplink.flush()
 
                 logger.bind(tag=TAG).debug("收到停止请求，发送finish-task指令")
                 await self._send_finish_task()
@@ -283,6 +282,8 @@ class ASRProvider(ASRProviderBase):
         # 状态重置
         self.is_processing = False
         self.server_ready = False
+        self.partial_text = ""
+        self.uplink.stop()
         logger.bind(tag=TAG).debug("ASR状态已重置")
 
         # 关闭连接
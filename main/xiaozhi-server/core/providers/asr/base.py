@@ -16,6 +16,8 @@ from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
+from core.utils.latency_trace import STAGE_ASR_FINAL
+from core.utils.metrics import provider_errors_total, provider_latency_ms, provider_name
 from core.utils.util import remove_punctuation_and_length
 from core.handle.receiveAudioHandle import handleAudioMessage
 from typing import Optional, Tuple, List, NamedTuple, TYPE_CHECKING
@@ -29,6 +31,9 @@ logger = setup_logging()
 
 
 class ASRProviderBase(ABC):
+    # 流式识别的中间结果，用于判定用户是否已经说完；非流式识别始终为空
+    partial_text = ""
+
     def __init__(self):
         pass
 
@@ -96,6 +101,7 @@ class ASRProviderBase(ABC):
                 wav_data = self._pcm_to_wav(combined_pcm_data)
 
             # 定义ASR任务
+            asr_start_time = time.monotonic()
             asr_task = self.speech_to_text_wrapper(
                 asr_audio_task, conn.session_id
             )
@@ -111,6 +117,15 @@ class ASRProviderBase(ABC):
             else:
                 asr_result = await asr_task
                 voiceprint_result = None
+            conn.latency_tracer.mark(STAGE_ASR_FINAL)
+            if isinstance(asr_result, Exception):
+                provider_errors_total.inc(kind="asr", provider=provider_name(self))
+            else:
+                provider_latency_ms.observe(
+                    (time.monotonic() - asr_start_time) * 1000,
+                    kind="asr",
+                    provider=provider_name(self),
+                )
 
             # 记录识别结果 - 检查是否为异常
             if isinstance(asr_result, Exception):
@@ -4,6 +4,7 @@ import uuid
 import asyncio
 import websockets
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.uplink import AudioUplink
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
 from typing import TYPE_CHECKING
@@ -62,6 +63,9 @@ class ASRProvider(ASRProviderBase):
         self.secret = config.get("secret", "access_secret")
         end_window_size = config.get("end_window_size")
         self.end_window_size = int(end_window_size) if end_window_size else 200
+        # 音频包的gzip压缩级别，0为不压缩
+        self.compress_level = int(config.get("compress_level", 1))
+        self.uplink = AudioUplink(config, self._encode_audio)
 
     async def open_audio_channels(self, conn):
         await super().open_audio_channels(conn)
@@ -119,21 +123,10 @@ class ASRProvider(ASRProviderBase):
                 # 启动接收ASR结果的异步任务
                 self.forward_task = asyncio.create_task(self._forward_asr_results(conn))
 
-                # 发送缓存的音频数据
-                if conn.asr_audio and len(conn.asr_audio) > 0:
-                    for cached_pcm in conn.asr_audio[-10:]:
-                        try:
-                            payload = gzip.compress(cached_pcm)
-                            audio_request = bytearray(
-                                self.generate_audio_default_header()
-                            )
-                            audio_request.extend(len(payload).to_bytes(4, "big"))
-                            audio_request.extend(payload)
-                            await self.asr_ws.send(audio_request)
-                        except Exception as e:
-                            logger.bind(tag=TAG).info(
-                                f"发送缓存音频数据时发生错误: {e}"
-                            )
+                # 开始发送音频，先发送缓存的音频数据
+                self.uplink.start(self.asr_ws)
+                for cached_pcm in conn.asr_audio[-10:]:
+                    self.uplink.push(cached_pcm)
 
             except Exception as e:
                 logger.bind(tag=TAG).error(f"建立ASR连接失败: {str(e)}")
@@ -147,14 +140,19 @@ class ASRProvider(ASRProviderBase):
 
         # 发送当前音频数据
         if self.asr_ws and self.is_processing and not self._is_stopping:
-            try:
-                payload = gzip.compress(pcm_frame)
-                audio_request = bytearray(self.generate_audio_default_header())
-                audio_request.extend(len(payload).to_bytes(4, "big"))
-                audio_request.extend(payload)
-                await self.asr_ws.send(audio_request)
-            except Exception as e:
-                logger.bind(tag=TAG).info(f"发送音频数据时发生错误: {e}")
+            self.uplink.push(pcm_frame)
+
+    def _encode_audio(self, pcm: bytes) -> bytearray:
+        """一段PCM编码为音频请求"""
+        if self.compress_level > 0:
+            payload = gzip.compress(pcm, compresslevel=self.compress_level)
+            audio_request = self.generate_audio_default_header()
+        else:
+            payload = pcm
+            audio_request = self.generate_header(message_type=0x02, compression_type=0x00)
+        audio_request.extend(len(payload).to_bytes(4, "big"))
+        audio_request.extend(payload)
+        return audio_request
 
     async def _forward_asr_results(self, conn: "ConnectionHandler"):
         try:
@@ -201,6 +199,13 @@ class ASRProvider(ASRProviderBase):
                                     await self.handle_voice_stop(conn, audio_data)
                                     break
 
+                            # 未确定的分句为中间结果，用于判定用户是否已经说完
+                            self.partial_text = "".join(
+                                utterance.get("text", "")
+                                for utterance in utterances
+                                if not utterance.get("definite", False)
+                            )
+
                             for utterance in utterances:
                                 if utterance.get("definite", False):
                                     current_text = utterance["text"]
@@ -249,15 +254,18 @@ class ASRProvider(ASRProviderBase):
             if hasattr(e, "__cause__") and e.__cause__:
                 logger.bind(tag=TAG).error(f"错误原因: {str(e.__cause__)}")
         finally:
+            self.uplink.stop()
             if self.asr_ws:
                 await self.asr_ws.close()
                 self.asr_ws = None
             self.is_processing = False
             self._is_stopping = False
+            self.partial_text = ""
             # 重置所有音频相关状态
             conn.reset_audio_states()
 
     def stop_ws_connection(self):
+        self.uplink.stop()
         if self.asr_ws:
             asyncio.create_task(self.asr_ws.close())
             self.asr_ws = None
@@ -268,6 +276,8 @@ class ASRProvider(ASRProviderBase):
         """发送最后一个音频帧以通知服务器结束"""
         self._is_stopping = True  # 先标记为停止状态，阻止后续音频发送
         if self.asr_ws:
+            # 先发出已合并但未发送的音频
+            await self.uplink.flush()
             try:
                 # 发送结束标记的音频帧（gzip压缩的空数据）
                 empty_payload = gzip.compress(b"")
@@ -417,6 +427,7 @@ class ASRProvider(ASRProviderBase):
 
     async def close(self):
         """资源清理方法"""
+        self.uplink.stop()
         if self.asr_ws:
             await self.asr_ws.close()
             self.asr_ws = None
@@ -0,0 +1,213 @@
+import os
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+import sherpa_onnx
+
+from config.logger import setup_logging
+from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.sherpa_onnx_local import CaptureOutput
+from core.utils.latency_trace import STAGE_ASR_ENDPOINT
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+# 结束时补一段静音，把模型右侧上下文还未处理的帧推出来（sherpa-onnx 示例的取值）
+TAIL_PADDING = np.zeros(int(0.66 * SAMPLE_RATE), dtype=np.float32)
+
+# 各模型类型默认的模型文件名
+MODEL_FILES = {
+    # 例如 sherpa-onnx-streaming-zipformer-bilingual-zh-en-2023-02-20
+    "zipformer": {
+        "encoder": "encoder-epoch-99-avg-1.int8.onnx",
+        "decoder": "decoder-epoch-99-avg-1.onnx",
+        "joiner": "joiner-epoch-99-avg-1.int8.onnx",
+        "tokens": "tokens.txt",
+    },
+    # 例如 sherpa-onnx-streaming-paraformer-bilingual-zh-en
+    "paraformer": {
+        "encoder": "encoder.int8.onnx",
+        "decoder": "decoder.int8.onnx",
+        "tokens": "tokens.txt",
+    },
+}
+
+# 流式识别器按模型配置缓存，所有连接共享同一份模型，每个连接只创建自己的解码流
+_recognizers: Dict[tuple, "sherpa_onnx.OnlineRecognizer"] = {}
+_recognizers_lock = threading.Lock()
+
+
+def _load_recognizer(config: dict) -> "sherpa_onnx.OnlineRecognizer":
+    model_dir = config.get("model_dir")
+    model_type = config.get("model_type", "zipformer")
+    if model_type not in MODEL_FILES:
+        raise ValueError(f"不支持的流式模型类型: {model_type}")
+    model_files = {
+        name: os.path.join(model_dir, config.get(name) or file_name)
+        for name, file_name in MODEL_FILES[model_type].items()
+    }
+    options = dict(
+        num_threads=int(config.get("num_threads", 2)),
+        sample_rate=SAMPLE_RATE,
+        feature_dim=80,
+        decoding_method="greedy_search",
+        enable_endpoint_detection=bool(config.get("enable_endpoint", True)),
+        # 尚未识别出文字时，尾部静音超过该时长（秒）判定为结束
+        rule1_min_trailing_silence=float(config.get("rule1_min_trailing_silence", 2.4)),
+        # 已识别出文字时，尾部静音超过该时长（秒）判定为结束
+        rule2_min_trailing_silence=float(config.get("rule2_min_trailing_silence", 0.8)),
+        # 一句话超过该时长（秒）强制结束
+        rule3_min_utterance_length=float(config.get("rule3_min_utterance_length", 20)),
+    )
+    key = (
+        model_type,
+        tuple(sorted(model_files.items())),
+        tuple(sorted(options.items())),
+    )
+
+    with _recognizers_lock:
+        recognizer = _recognizers.get(key)
+        if recognizer is not None:
+            return recognizer
+
+        for file_path in model_files.values():
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(
+                    f"模型文件不存在: {file_path}，请先下载sherpa-onnx流式模型，"
+                    "下载地址：https://github.com/k2-fsa/sherpa-onnx/releases/tag/asr-models"
+                )
+
+        with CaptureOutput():
+            if model_type == "paraformer":
+                recognizer = sherpa_onnx.OnlineRecognizer.from_paraformer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    **options,
+                )
+            else:
+                recognizer = sherpa_onnx.OnlineRecognizer.from_transducer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    joiner=model_files["joiner"],
+                    **options,
+                )
+        _recognizers[key] = recognizer
+        logger.bind(tag=TAG).info(f"流式识别模型加载完成: {model_dir}")
+        return recognizer
+
+
+class ASRProvider(ASRProviderBase):
+    """sherpa-onnx 本地流式语音识别
+
+    音频到达时逐帧送入解码流并增量解码，说话结束（VAD静音、识别器端点检测或手动模式松开按键）时
+    只需解码尾部少量音频即可得到最终结果，无需等说话结束后再整句识别。
+    """
+
+    def __init__(self, config: dict, delete_audio_file: bool):
+        super().__init__()
+        self.interface_type = InterfaceType.STREAM
+        self.config = config
+        self.output_dir = config.get("output_dir", "tmp/")
+        self.delete_audio_file = delete_audio_file
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.recognizer = _load_recognizer(config)
+        self.conn: Optional["ConnectionHandler"] = None
+        # 当前一句话的解码流，说话开始时创建，得到最终结果后释放
+        self.stream = None
+        self.text = ""
+        self.partial_text = ""
+        # 解码在线程中执行，保证同一连接的解码请求按顺序进行
+        self._decode_lock = asyncio.Lock()
+
+    async def open_audio_channels(self, conn: "ConnectionHandler"):
+        self.conn = conn
+        await super().open_audio_channels(conn)
+
+    async def receive_audio(
+        self, conn: "ConnectionHandler", pcm_frame, audio_have_voice
+    ):
+        # 先调用父类方法处理基础逻辑
+        await super().receive_audio(conn, pcm_frame, audio_have_voice)
+
+        async with self._decode_lock:
+            if self.stream is None:
+                if not audio_have_voice:
+                    return
+                # 检测到说话时开始新的一句，连同说话前缓存的音频一起送入
+                self.stream = self.recognizer.create_stream()
+                frames = conn.asr_audio[-10:]
+            else:
+                frames = [pcm_frame]
+            text, is_endpoint = await asyncio.to_thread(
+                self._decode, self.stream, frames
+            )
+
+        if text != self.partial_text:
+            self.partial_text = text
+            logger.bind(tag=TAG).debug(f"识别中间结果: {text}")
+
+        # 手动模式下等待松开按键（_send_stop_request）再结束
+        if conn.client_listen_mode == "manual":
+            return
+        if conn.client_voice_stop:
+            await self._finish(conn)
+        elif is_endpoint and text:
+            # 识别器先于VAD判定说话结束，以此作为本轮开始
+            conn.latency_tracer.begin_turn(STAGE_ASR_ENDPOINT)
+            await self._finish(conn)
+
+    def _decode(self, stream, frames: List[bytes]) -> Tuple[str, bool]:
+        for pcm in frames:
+            samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+            stream.accept_waveform(SAMPLE_RATE, samples)
+        while self.recognizer.is_ready(stream):
+            self.recognizer.decode_stream(stream)
+        return self.recognizer.get_result(stream), self.recognizer.is_endpoint(stream)
+
+    def _flush(self, stream) -> str:
+        stream.accept_waveform(SAMPLE_RATE, TAIL_PADDING)
+        stream.input_finished()
+        while self.recognizer.is_ready(stream):
+            self.recognizer.decode_stream(stream)
+        return self.recognizer.get_result(stream)
+
+    async def _finish(self, conn: "ConnectionHandler"):
+        """结束当前一句：解码剩余音频并提交最终结果"""
+        async with self._decode_lock:
+            stream, self.stream = self.stream, None
+            if stream is None:
+                return
+            text = await asyncio.to_thread(self._flush, stream)
+        self.partial_text = ""
+
+        if text:
+            logger.bind(tag=TAG).info(f"识别到文本: {text}")
+            self.text = text
+            await self.handle_voice_stop(conn, conn.asr_audio.copy())
+        conn.reset_audio_states()
+
+    async def _send_stop_request(self):
+        """收到客户端停止拾音后立即结束当前一句"""
+        if self.conn is not None:
+            await self._finish(self.conn)
+
+    async def speech_to_text(self, opus_data, session_id, artifacts=None):
+        """获取识别结果"""
+        result = self.text
+        self.text = ""
+        return result, None
+
+    async def close(self):
+        """释放解码流，模型由所有连接共享，不在这里释放"""
+        self.stream = None
+        self.conn = None
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Optional, Tuple, List
+from config.logger import setup_logging
+from core.utils.synthetic import SyntheticBehavior
+from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.base import ASRProviderBase
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_TEXTS = [
+    "今天天气怎么样",
+    "给我讲个笑话吧",
+    "现在几点了",
+    "帮我介绍一下你自己",
+]
+
+
+class ASRProvider(ASRProviderBase):
+    """模拟语音识别，不访问网络：按配置的延迟返回固定的识别结果，同样的音频总是得到同样的文本"""
+
+    def __init__(self, config: dict, delete_audio_file: bool):
+        super().__init__()
+        self.interface_type = InterfaceType.NON_STREAM
+        self.output_dir = config.get("output_dir", "tmp/")
+        self.delete_audio_file = delete_audio_file
+        self.texts = config.get("texts") or DEFAULT_TEXTS
+        self.behavior = SyntheticBehavior(config)
+        self.latency = self.behavior.latency(config.get("latency_ms", 200))
+
+    async def speech_to_text(
+        self, opus_data: List[bytes], session_id: str, artifacts=None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        await asyncio.sleep(self.latency.sample())
+        self.behavior.maybe_fail("语音识别")
+        if artifacts is None:
+            return "", None
+        text = self.behavior.pick(self.texts, artifacts.pcm_bytes)
+        logger.bind(tag=TAG).debug(f"模拟语音识别结果: {text}")
+        return text, None
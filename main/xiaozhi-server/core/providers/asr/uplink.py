@@ -0,0 +1,133 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 上行音频为16kHz、16位单声道PCM，每毫秒32字节
+BYTES_PER_MS = 32
+
+
+class AudioUplink:
+    """流式ASR的上行音频发送
+
+    音频先合并到配置的包时长（uplink_packet_ms，0为每帧发送一次）再交给服务各自的编码函数，
+    由后台任务发送，接收音频的流程不再等待网络发送。发送被阻塞（网络拥塞或服务端读取慢）
+    期间到达的音频在下一次发送时合并为一个包（最长 uplink_max_batch_ms），
+    积压超过 uplink_max_pending_ms 时丢弃最早的音频。
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        encode: Callable[[bytes], Any],
+        on_error: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        """
+        Args:
+            config: ASR服务配置
+            encode: 把一段PCM编码为一条WebSocket消息
+            on_error: 后台发送失败时调用（发送已停止），如清理识别会话、关闭服务连接
+        """
+        self.encode = encode
+        self.on_error = on_error
+        self.packet_bytes = int(config.get("uplink_packet_ms", 0)) * BYTES_PER_MS
+        self.max_batch_bytes = max(
+            self.packet_bytes,
+            int(config.get("uplink_max_batch_ms", 1000)) * BYTES_PER_MS,
+        )
+        self.max_pending_bytes = max(
+            self.max_batch_bytes,
+            int(config.get("uplink_max_pending_ms", 5000)) * BYTES_PER_MS,
+        )
+        self._ws = None
+        self._buffer = bytearray()
+        self._ready: Optional[asyncio.Event] = None
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, ws):
+        """识别会话建立后开始向 ws 发送音频"""
+        self.stop()
+        self._ws = ws
+        self._ready = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    def push(self, pcm: bytes):
+        """追加一段PCM，未开始或已停止时丢弃"""
+        if self._task is None or not pcm:
+            return
+        self._buffer += pcm
+        overflow = len(self._buffer) - self.max_pending_bytes
+        if overflow > 0:
+            del self._buffer[:overflow]
+            if self.dropped_bytes == 0:
+                logger.bind(tag=TAG).warning(
+                    f"ASR上行音频积压超过 {self.max_pending_bytes // BYTES_PER_MS}ms，丢弃最早的音频"
+                )
+            self.dropped_bytes += overflow
+        if len(self._buffer) >= max(self.packet_bytes, 1):
+            self._ready.set()
+
+    async def flush(self):
+        """立即发送剩余音频（包括不足一个包的部分），在发送结束标记前调用"""
+        if self._task is None:
+            return
+        try:
+            await self._send_pending(flush=True)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"发送剩余音频失败: {e}")
+            self.stop()
+
+    def stop(self):
+        """停止发送并丢弃未发送的音频"""
+        if self._task is not None:
+            if self._task is not asyncio.current_task():
+                self._task.cancel()
+            self._task = None
+        self._buffer.clear()
+        self._ws = None
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                await self._send_pending(flush=False)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"发送音频失败: {e}")
+            self.stop()
+            if self.on_error is not None:
+                try:
+                    await self.on_error()
+                except Exception as cleanup_error:
+                    logger.bind(tag=TAG).error(
+                        f"处理音频发送失败时出错: {cleanup_error}"
+                    )
+
+    async def _send_pending(self, flush: bool):
+        async with self._send_lock:
+            # 持锁期间可能已被停止
+            while self._ws is not None and self._buffer:
+                size = min(len(self._buffer), self.max_batch_bytes)
+                if not flush and self.packet_bytes:
+                    # 只发送整数个包，不足一个包的部分等后续音频
+                    size -= size % self.packet_bytes
+                    if size == 0:
+                        break
+                chunk = bytes(self._buffer[:size])
+                del self._buffer[:size]
+                await self._ws.send(self.encode(chunk))
+                self.sent_messages += 1
+                self.sent_bytes += size
@@ -15,6 +15,7 @@ if TYPE_CHECKING:
 from config.logger import setup_logging
 from wsgiref.handlers import format_date_time
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.uplink import AudioUplink
 from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
@@ -55,6 +56,12 @@ class ASRProvider(ASRProviderBase):
 
         self.output_dir = config.get("output_dir", "tmp/")
         self.delete_audio_file = delete_audio_file
+        # 首帧与结束帧直接发送，中间帧经合并后发送；发送失败时清理识别会话
+        self.uplink = AudioUplink(
+            config,
+            lambda pcm: self._build_audio_frame(pcm, STATUS_CONTINUE_FRAME),
+            on_error=self._cleanup,
+        )
 
     def create_url(self) -> str:
         """生成认证URL"""
@@ -113,11 +120,7 @@ class ASRProvider(ASRProviderBase):
 
         # 发送当前音频数据
         if self.asr_ws and self.is_processing and self.server_ready:
-            try:
-                await self._send_audio_frame(pcm_frame, STATUS_CONTINUE_FRAME)
-            except Exception as e:
-                logger.bind(tag=TAG).warning(f"发送音频数据时发生错误: {e}")
-                await self._cleanup()
+            self.uplink.push(pcm_frame)
 
     async def _start_recognition(self, conn: "ConnectionHandler"):
         """开始识别会话"""
@@ -150,13 +153,10 @@ class ASRProvider(ASRProviderBase):
                 self.server_ready = True
                 logger.bind(tag=TAG).info("已发送首帧，开始识别")
 
-                # 发送缓存的音频数据
+                # 开始发送音频，先发送缓存的音频数据
+                self.uplink.start(self.asr_ws)
                 for cached_pcm in conn.asr_audio[-10:]:
-                    try:
-                        await self._send_audio_frame(cached_pcm, STATUS_CONTINUE_FRAME)
-                    except Exception as e:
-                        logger.bind(tag=TAG).info(f"发送缓存音频数据时发生错误: {e}")
-                        break
+                    self.uplink.push(cached_pcm)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立ASR连接失败: {str(e)}")
@@ -172,7 +172,9 @@ class ASRProvider(ASRProviderBase):
         """发送音频帧"""
         if not self.asr_ws:
             return
+        await self.asr_ws.send(self._build_audio_frame(audio_data, status))
 
+    def _build_audio_frame(self, audio_data: bytes, status: int) -> str:
         audio_b64 = base64.b64encode(audio_data).decode("utf-8")
 
         frame_data = {
@@ -183,7 +185,7 @@ class ASRProvider(ASRProviderBase):
             },
         }
 
-        await self.asr_ws.send(json.dumps(frame_data, ensure_ascii=False))
+        return json.dumps(frame_data, ensure_ascii=False)
 
     async def _forward_results(self, conn: "ConnectionHandler"):
         """转发识别结果"""
@@ -220,6 +222,8 @@ class ASRProvider(ASRProviderBase):
                                 for j in i.get("cw", []):
                                     w = j.get("w", "")
                                     self.text += w
+                            # 未开启动态修正时结果逐段追加，已识别的文本即为中间结果，用于判定用户是否已经说完
+                            self.partial_text = self.text
 
                     if status == 2:
                         logger.bind(tag=TAG).debug("收到最终识别结果，触发处理")
@@ -257,6 +261,7 @@ class ASRProvider(ASRProviderBase):
             # 先发送最后一帧表示音频结束
             if self.asr_ws and self.is_processing:
                 try:
+                    await self.uplink.flush()
                     await self._send_audio_frame(b"", STATUS_LAST_FRAME)
                     logger.bind(tag=TAG).debug(f"已发送停止请求")
 
@@ -272,6 +277,7 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).debug(f"异常详情: {traceback.format_exc()}")
 
     def stop_ws_connection(self):
+        self.uplink.stop()
         if self.asr_ws:
             asyncio.create_task(self.asr_ws.close())
             self.asr_ws = None
@@ -281,8 +287,9 @@ class ASRProvider(ASRProviderBase):
         """发送停止识别请求（不关闭连接）"""
         if self.asr_ws:
             try:
-                # 先停止音频发送
+                # 先停止音频发送，已合并但未发送的音频先发出
                 self.is_processing = False
+                await self.uplink.flush()
                 await self._send_audio_frame(b"", STATUS_LAST_FRAME)
                 logger.bind(tag=TAG).debug("已发送停止请求")
             except Exception as e:
@@ -297,6 +304,8 @@ class ASRProvider(ASRProviderBase):
         # 状态重置
         self.is_processing = False
         self.server_ready = False
+        self.partial_text = ""
+        self.uplink.stop()
         logger.bind(tag=TAG).debug("ASR状态已重置")
 
         # 关闭连接
@@ -323,6 +332,7 @@ class ASRProvider(ASRProviderBase):
 
     async def close(self):
         """资源清理方法"""
+        self.uplink.stop()
         if self.asr_ws:
             await self.asr_ws.close()
             self.asr_ws = None
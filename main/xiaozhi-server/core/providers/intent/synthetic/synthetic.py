@@ -0,0 +1,31 @@
+import json
+import asyncio
+from typing import List, Dict
+from ..base import IntentProviderBase
+from config.logger import setup_logging
+from core.utils.synthetic import SyntheticBehavior
+
+TAG = __name__
+logger = setup_logging()
+
+
+class IntentProvider(IntentProviderBase):
+    """模拟意图识别，不访问网络：按配置的延迟返回结果，文本包含关键词时返回对应的函数调用"""
+
+    def __init__(self, config):
+        super().__init__(config)
+        # 关键词 -> 函数名，例如 {"几点": "get_time"}
+        self.keywords: Dict[str, str] = config.get("keywords") or {}
+        self.behavior = SyntheticBehavior(config)
+        self.latency = self.behavior.latency(config.get("latency_ms", 150))
+
+    async def detect_intent(self, conn, dialogue_history: List[Dict], text: str) -> str:
+        await asyncio.sleep(self.latency.sample())
+        self.behavior.maybe_fail("意图识别")
+        for keyword, function_name in self.keywords.items():
+            if keyword in text:
+                return json.dumps(
+                    {"function_call": {"name": function_name, "arguments": {}}},
+                    ensure_ascii=False,
+                )
+        return '{"function_call": {"name": "continue_chat"}}'
@@ -0,0 +1,104 @@
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from config.logger import setup_logging
+from core.utils.synthetic import SyntheticBehavior
+from core.providers.llm.base import LLMProviderBase
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_RESPONSES = [
+    "好的，我来帮你看看。今天天气晴朗，气温二十度左右，很适合出门散步。记得多喝水哦！",
+    "这个问题很有意思。简单来说，就是多练习、多总结，慢慢就会越来越熟练的。",
+    "当然可以！从前有一只小猫，它每天都在窗台上晒太阳。有一天，它发现了一只蝴蝶，于是追了一整个下午。",
+]
+
+
+class LLMProvider(LLMProviderBase):
+    """模拟大模型，不访问网络：按配置的首字延迟和输出速度流式返回固定回复，可按比例返回工具调用"""
+
+    def __init__(self, config):
+        self.model_name = config.get("model_name", "synthetic")
+        self.responses = config.get("responses") or DEFAULT_RESPONSES
+        # 每个流式片段的字符数
+        self.chars_per_token = max(1, int(config.get("chars_per_token", 2)))
+        # 每秒输出的片段数，0 表示不限速
+        self.tokens_per_second = float(config.get("tokens_per_second", 30))
+        # 命中工具调用的用户消息比例，以及调用的工具
+        self.tool_call_ratio = float(config.get("tool_call_ratio", 0) or 0)
+        # 默认调用始终加载的本地工具 get_lunar
+        self.tool_call = config.get("tool_call") or {
+            "name": "get_lunar",
+            "arguments": {"query": "农历"},
+        }
+        self.behavior = SyntheticBehavior(config)
+        self.first_token_latency = self.behavior.latency(
+            config.get("first_token_latency_ms", 300)
+        )
+
+    @staticmethod
+    def _last_message(dialogue):
+        return dialogue[-1] if dialogue else {"role": "user", "content": ""}
+
+    def _stream_text(self, text):
+        time.sleep(self.first_token_latency.sample())
+        self.behavior.maybe_fail("大模型")
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        start = time.monotonic()
+        for index, pos in enumerate(range(0, len(text), self.chars_per_token)):
+            if interval:
+                delay = start + index * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield text[pos : pos + self.chars_per_token]
+
+    def response(self, session_id, dialogue, **kwargs):
+        last = self._last_message(dialogue)
+        yield from self._stream_text(
+            self.behavior.pick(self.responses, str(last.get("content") or ""))
+        )
+
+    def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        last = self._last_message(dialogue)
+        content = str(last.get("content") or "")
+        tool_name = self.tool_call.get("name")
+        available = {
+            (f.get("function") or {}).get("name") for f in (functions or [])
+        }
+        # 工具结果返回后正常回复，避免循环调用
+        if (
+            last.get("role") == "user"
+            and tool_name in available
+            and self.behavior.chance(self.tool_call_ratio, content)
+        ):
+            time.sleep(self.first_token_latency.sample())
+            self.behavior.maybe_fail("大模型")
+            arguments = json.dumps(self.tool_call.get("arguments") or {}, ensure_ascii=False)
+            call_id = uuid.uuid4().hex
+            yield None, [
+                SimpleNamespace(
+                    index=0,
+                    id=call_id,
+                    type="function",
+                    function=SimpleNamespace(name=tool_name, arguments=""),
+                )
+            ]
+            # 参数分片流式返回，与真实接口一致
+            for pos in range(0, len(arguments), self.chars_per_token):
+                yield None, [
+                    SimpleNamespace(
+                        index=0,
+                        id=None,
+                        type="function",
+                        function=SimpleNamespace(
+                            name=None,
+                            arguments=arguments[pos : pos + self.chars_per_token],
+                        ),
+                    )
+                ]
+            return
+
+        for token in self.response(session_id, dialogue, **kwargs):
+            yield token, None
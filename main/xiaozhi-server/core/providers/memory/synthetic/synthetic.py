@@ -0,0 +1,31 @@
+"""
+模拟记忆服务，不访问网络：按配置的延迟返回固定的记忆内容，用于压测和回归测试
+"""
+
+import asyncio
+from core.utils.synthetic import SyntheticBehavior
+from ..base import MemoryProviderBase, logger
+
+TAG = __name__
+
+DEFAULT_MEMORY = "用户喜欢听轻音乐，住在北京，养了一只叫小白的猫。"
+
+
+class MemoryProvider(MemoryProviderBase):
+    def __init__(self, config, summary_memory=None):
+        super().__init__(config)
+        self.memory = config.get("memory", DEFAULT_MEMORY)
+        self.behavior = SyntheticBehavior(config)
+        self.query_latency = self.behavior.latency(config.get("query_latency_ms", 50))
+        self.save_latency = self.behavior.latency(config.get("save_latency_ms", 200))
+
+    async def save_memory(self, msgs, session_id=None):
+        await asyncio.sleep(self.save_latency.sample())
+        self.behavior.maybe_fail("记忆保存")
+        logger.bind(tag=TAG).debug(f"模拟保存记忆: {len(msgs)} 条消息")
+        return None
+
+    async def query_memory(self, query: str) -> str:
+        await asyncio.sleep(self.query_latency.sample())
+        self.behavior.maybe_fail("记忆查询")
+        return self.memory
@@ -0,0 +1,174 @@
+"""工具调用结果缓存"""
+
+import json
+import hashlib
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager, CacheType
+from plugins_func.register import Action, ActionResponse, CachePolicy
+
+TAG = __name__
+
+# 默认只缓存正常返回的结果，错误和未找到不缓存
+CACHEABLE_ACTIONS = (Action.REQLLM, Action.RESPONSE, Action.RECORD)
+
+
+def default_normalizer(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """默认参数归一化：去掉空值，字符串去除首尾空白"""
+    normalized = {}
+    for key, value in arguments.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        normalized[key] = value
+    return normalized
+
+
+class ToolResultCache:
+    """工具结果缓存，所有连接共享
+
+    - 结果存放在全局缓存管理器中，按工具声明的TTL过期
+    - 同一缓存键的并发请求只回源一次（single-flight），其余请求等待同一结果
+    - 按工具统计命中率
+    """
+
+    def __init__(self):
+        self.logger = setup_logging()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    def build_key(
+        self,
+        policy: CachePolicy,
+        arguments: Dict[str, Any],
+        device_id: Optional[str],
+        conn=None,
+    ) -> str:
+        """根据缓存范围、工具配置和归一化后的参数生成缓存键"""
+        normalizer = policy.normalizer or default_normalizer
+        normalized = normalizer(dict(arguments or {}))
+        key = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+        if policy.config_key is not None:
+            config = json.dumps(
+                policy.config_key(conn), sort_keys=True, ensure_ascii=False, default=str
+            )
+            # 配置中可能含有密钥，只保留摘要
+            key = f"{hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]}|{key}"
+        if policy.scope == CachePolicy.SCOPE_DEVICE:
+            key = f"{device_id}|{key}"
+        return key
+
+    def _is_cacheable(self, policy: CachePolicy, result: ActionResponse) -> bool:
+        if result is None:
+            return False
+        if policy.cache_if is not None:
+            return bool(policy.cache_if(result))
+        return result.action in CACHEABLE_ACTIONS
+
+    def _record(self, tool_name: str, field: str):
+        with self._stats_lock:
+            stats = self._stats.setdefault(
+                tool_name, {"hits": 0, "misses": 0, "shared": 0}
+            )
+            stats[field] += 1
+
+    async def execute(
+        self,
+        tool_name: str,
+        policy: CachePolicy,
+        arguments: Dict[str, Any],
+        device_id: Optional[str],
+        loader: Callable[[], Awaitable[ActionResponse]],
+        conn=None,
+    ) -> ActionResponse:
+        """优先从缓存返回结果，未命中时调用 loader 回源并写入缓存"""
+        try:
+            key = self.build_key(policy, arguments, device_id, conn)
+        except Exception as e:
+            self.logger.bind(tag=TAG).warning(f"生成工具缓存键失败: {tool_name}, {e}")
+            return await loader()
+
+        cached = cache_manager.get(CacheType.TOOL_RESULT, key, namespace=tool_name)
+        if cached is not None:
+            self._record(tool_name, "hits")
+            self.logger.bind(tag=TAG).debug(f"工具缓存命中: {tool_name}, 键: {key}")
+            return cached
+
+        loop = asyncio.get_running_loop()
+        inflight_key = f"{tool_name}|{key}"
+        inflight = self._inflight.get(inflight_key)
+        if inflight is not None and inflight.get_loop() is loop:
+            # 相同请求正在回源，等待同一结果
+            self._record(tool_name, "shared")
+        else:
+            self._record(tool_name, "misses")
+            # 回源在独立任务中执行，发起方被取消（如设备打断）不影响其他等待同一结果的设备
+            inflight = loop.create_task(self._load(tool_name, policy, key, loader))
+            self._waiters[inflight] = 0
+            self._inflight[inflight_key] = inflight
+            inflight.add_done_callback(
+                lambda task: self._on_load_done(inflight_key, task)
+            )
+        return await self._wait(inflight)
+
+    async def _load(
+        self,
+        tool_name: str,
+        policy: CachePolicy,
+        key: str,
+        loader: Callable[[], Awaitable[ActionResponse]],
+    ) -> ActionResponse:
+        result = await loader()
+        if self._is_cacheable(policy, result):
+            cache_manager.set(
+                CacheType.TOOL_RESULT, key, result, ttl=policy.ttl, namespace=tool_name
+            )
+        return result
+
+    async def _wait(self, task: asyncio.Task) -> ActionResponse:
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if not task.done():
+                self._waiters[task] -= 1
+                # 所有等待者都已取消时不再需要结果，停止回源
+                if self._waiters[task] == 0:
+                    task.cancel()
+
+    def _on_load_done(self, inflight_key: str, task: asyncio.Task):
+        if self._inflight.get(inflight_key) is task:
+            self._inflight.pop(inflight_key, None)
+        self._waiters.pop(task, None)
+        if not task.cancelled():
+            # 标记异常已被读取，避免等待者都已取消时输出未处理异常的警告
+            task.exception()
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """获取每个工具的缓存统计信息"""
+        with self._stats_lock:
+            statistics = {}
+            for tool_name, stats in self._stats.items():
+                total = stats["hits"] + stats["misses"] + stats["shared"]
+                statistics[tool_name] = {
+                    **stats,
+                    "hit_rate": (
+                        round((stats["hits"] + stats["shared"]) / total, 4)
+                        if total
+                        else 0.0
+                    ),
+                }
+            return statistics
+
+    def invalidate(self, tool_name: str):
+        """清空指定工具的缓存"""
+        cache_manager.clear(CacheType.TOOL_RESULT, namespace=tool_name)
+
+
+# 创建全局工具结果缓存实例
+tool_result_cache = ToolResultCache()
@@ -225,6 +225,10 @@ class UnifiedToolHandler:
         """获取工具统计信息"""
         return self.tool_manager.get_tool_statistics()
 
+    def get_cache_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """获取工具结果缓存的命中统计"""
+        return self.tool_manager.get_cache_statistics()
+
     async def cleanup(self):
         """清理资源"""
         try:
@@ -1,9 +1,12 @@
 """统一工具管理器"""
 
+import time
 from typing import Dict, List, Optional, Any
 from config.logger import setup_logging
-from plugins_func.register import Action, ActionResponse
+from plugins_func.register import Action, ActionResponse, CachePolicy, all_function_registry
 from .base import ToolType, ToolDefinition, ToolExecutor
+from .tool_result_cache import tool_result_cache
+from core.utils.metrics import tool_call_duration_ms
 
 
 class ToolManager:
@@ -93,7 +96,25 @@ class ToolManager:
 
             # 执行工具
             self.logger.info(f"执行工具: {tool_name}，参数: {arguments}")
-            result = await executor.execute(self.conn, tool_name, arguments)
+            start_time = time.monotonic()
+            cache_policy = self._get_cache_policy(tool_name, tool_type)
+            if cache_policy is not None:
+                result = await tool_result_cache.execute(
+                    tool_name,
+                    cache_policy,
+                    arguments,
+                    self.conn.device_id,
+                    lambda: executor.execute(self.conn, tool_name, arguments),
+                    self.conn,
+                )
+            else:
+                result = await executor.execute(self.conn, tool_name, arguments)
+            tool_call_duration_ms.observe(
+                (time.monotonic() - start_time) * 1000,
+                tool=tool_name,
+                tool_type=tool_type.value,
+                action=result.action.name if result is not None else "NONE",
+            )
             self.logger.debug(f"工具执行结果: {result}")
             return result
 
@@ -101,6 +122,15 @@ class ToolManager:
             self.logger.error(f"执行工具 {tool_name} 时出错: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
 
+    def _get_cache_policy(
+        self, tool_name: str, tool_type: ToolType
+    ) -> Optional[CachePolicy]:
+        """获取工具声明的缓存策略，目前只有服务端插件支持缓存"""
+        if tool_type != ToolType.SERVER_PLUGIN:
+            return None
+        func_item = all_function_registry.get(tool_name)
+        return getattr(func_item, "cache", None)
+
     def get_supported_tool_names(self) -> List[str]:
         """获取所有支持的工具名称"""
         tools = self.get_all_tools()
@@ -122,3 +152,7 @@ class ToolManager:
                 self.logger.error(f"获取{tool_type.value}工具统计时出错: {e}")
                 stats[tool_type.value] = 0
         return stats
+
+    def get_cache_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """获取可缓存工具的命中统计（所有连接共享）"""
+        return tool_result_cache.get_statistics()
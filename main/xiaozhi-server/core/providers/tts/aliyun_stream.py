@@ -215,7 +215,7 @@ class TTSProvider(TTSProviderBase):
 
     def tts_text_priority_thread(self):
         """流式文本处理线程"""
-        while not self.conn.stop_event.is_set():
+        while not self._channels_stopped():
             try:
                 message = self.tts_text_queue.get(timeout=1)
 
@@ -1,23 +1,32 @@
 import os
 import re
+import json
+import time
 import uuid
+import hashlib
 import queue
 import asyncio
 import threading
 import traceback
+import functools
 import concurrent.futures
 
 from core.utils import p3
 from datetime import datetime
 from core.utils import textUtils
-from typing import Callable, Any
+from typing import Callable, Any, List, NamedTuple, Optional
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.tts import MarkdownCleaner, convert_percentage_to_range
 from core.utils.output_counter import add_device_output
+from core.utils.latency_trace import STAGE_TTS_FIRST_AUDIO
+from core.utils.metrics import provider_errors_total, provider_latency_ms, provider_name
+from core.utils.sentence_segmenter import StreamingSentenceSegmenter
+from core.utils.tts_audio_cache import get_tts_audio_cache
+from core.utils.synthesis_pipeline import SynthesisPipeline
 from core.handle.reportHandle import enqueue_tts_report
-from core.handle.sendAudioHandle import sendAudioMessage
+from core.handle.sendAudioHandle import sendAudioMessage, get_frame_duration
 from core.utils.util import audio_bytes_to_data_stream, audio_to_data_stream
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
@@ -30,6 +39,23 @@ TAG = __name__
 logger = setup_logging()
 
 
+# 等待合成与播放线程退出的最长时间（秒），线程每秒检查一次停止事件
+RELEASE_JOIN_TIMEOUT = 2
+
+
+class SynthesisResult(NamedTuple):
+    """一句话的合成结果，frames、audio_bytes、audio_file 三者之一有效，命中缓存时没有 cache_key"""
+
+    frames: Optional[List[bytes]] = None
+    """命中语音缓存的音频帧"""
+    audio_bytes: Optional[bytes] = None
+    """TTS服务返回的音频数据"""
+    audio_file: Optional[str] = None
+    """TTS服务生成的音频文件"""
+    cache_key: Optional[str] = None
+    """播放成功后写入语音缓存使用的键"""
+
+
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
@@ -45,6 +71,20 @@ class TTSProviderBase(ABC):
         self.report_on_last = False
         # sentence_id 到文本的映射，用于流式TTS获取正确的字幕文本
         self._sentence_text_map = {}
+        # 语音缓存，在 open_audio_channels 中按服务配置获取
+        self.audio_cache = None
+        # 非流式TTS的并行预合成流水线，在文本处理线程启动时按配置创建
+        self.synthesis_pipeline = None
+        # 本次打开的音频通道的停止事件，释放通道（连接休眠）时置位，合成与播放线程随之退出
+        self._channels_stop_event: Optional[threading.Event] = None
+        # 各合成与播放线程启动时所属通道的停止事件，重新打开后旧线程仍只看自己的事件
+        self._channel_local = threading.local()
+        # 配置（音色、语速、音调等）摘要，作为语音缓存键的一部分，配置变化时不会命中旧音频
+        self._audio_cache_digest = hashlib.sha1(
+            json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode(
+                "utf-8"
+            )
+        ).hexdigest()
         # 加载替换词，用于一次性正则替换
         raw_words = config.get("correct_words", [])
         self.correct_words = {}
@@ -78,7 +118,6 @@ class TTSProviderBase(ABC):
 
         # 流式滑动窗口：待匹配的缓存文本
         self._pending_prefix = ""
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -104,8 +143,18 @@ class TTSProviderBase(ABC):
             "：",
         )
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+        # 流式文本分句器
+        # first_sentence_split: 第一句是否按逗号等短停顿切分，尽快开始合成
+        # max_segment_length: 长文本没有分句标点时的强制切分长度，0表示不限制
+        self.segmenter = StreamingSentenceSegmenter(
+            self.punctuations,
+            (
+                self.first_sentence_punctuations
+                if config.get("first_sentence_split", True)
+                else None
+            ),
+            max_segment_length=int(config.get("max_segment_length", 0)),
+        )
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -123,10 +172,45 @@ class TTSProviderBase(ABC):
     def to_tts_stream(self, text, opus_handler: Callable[[bytes], None] = None) -> None:
         # 保留原始文本用于显示/上报
         original_text = text
+        result = self._synthesize_segment(self._normalize_tts_text(text), original_text)
+        self._play_synthesized(original_text, result, opus_handler)
+
+    def _normalize_tts_text(self, text):
         text = MarkdownCleaner.clean_markdown(text)
         # 使用正则一次性替换，避免重复遍历和部分匹配问题
         if self._correct_words_pattern:
             text = self._correct_words_pattern.sub(lambda m: self.correct_words[m.group(0)], text)
+        return text
+
+    def _synthesize_segment(self, text, original_text) -> Optional["SynthesisResult"]:
+        """请求TTS服务合成一句话（失败重试），只生成音频不播放，可在多个线程中并发调用
+
+        Args:
+            text: 规范化后的文本
+            original_text: 原始文本，用于日志
+        """
+        # 命中语音缓存时不请求TTS服务
+        cache_key = self._get_audio_cache_key(text)
+        if cache_key is not None:
+            cached_frames = self.audio_cache.get(cache_key)
+            if cached_frames is not None:
+                logger.bind(tag=TAG).debug(f"语音缓存命中: {original_text}")
+                return SynthesisResult(frames=cached_frames)
+
+        start_time = time.monotonic()
+        result = self._request_synthesis(text, original_text, cache_key)
+        if result is None or (result.audio_file and not os.path.exists(result.audio_file)):
+            provider_errors_total.inc(kind="tts", provider=provider_name(self))
+        else:
+            provider_latency_ms.observe(
+                (time.monotonic() - start_time) * 1000,
+                kind="tts",
+                provider=provider_name(self),
+            )
+        return result
+
+    def _request_synthesis(self, text, original_text, cache_key) -> Optional["SynthesisResult"]:
+        """请求TTS服务合成，失败时最多重试5次"""
         max_repeat_time = 5
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
@@ -134,17 +218,10 @@ class TTSProviderBase(ABC):
                 try:
                     audio_bytes = asyncio.run(self.text_to_speak(text, None))
                     if audio_bytes:
-                        # 使用原始文本用于显示/上报
-                        self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, getattr(self, 'current_sentence_id', None)))
-                        audio_bytes_to_data_stream(
-                            audio_bytes,
-                            file_type=self.audio_file_type,
-                            is_opus=True,
-                            callback=opus_handler,
-                            sample_rate=self.conn.sample_rate,
-                            opus_encoder=self.opus_encoder,
+                        logger.bind(tag=TAG).info(
+                            f"语音生成成功: {original_text}，重试{5 - max_repeat_time}次"
                         )
-                        break
+                        return SynthesisResult(audio_bytes=audio_bytes, cache_key=cache_key)
                     else:
                         max_repeat_time -= 1
                 except Exception as e:
@@ -152,44 +229,87 @@ class TTSProviderBase(ABC):
                         f"语音生成失败{5 - max_repeat_time + 1}次: {original_text}，错误: {e}"
                     )
                     max_repeat_time -= 1
+            logger.bind(tag=TAG).error(
+                f"语音生成失败: {original_text}，请检查网络或服务是否正常"
+            )
+            return None
+        else:
+            tmp_file = self.generate_filename()
+            while not os.path.exists(tmp_file) and max_repeat_time > 0:
+                try:
+                    asyncio.run(self.text_to_speak(text, tmp_file))
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(
+                        f"语音生成失败{5 - max_repeat_time + 1}次: {original_text}，错误: {e}"
+                    )
+                    # 未执行成功，删除文件
+                    if os.path.exists(tmp_file):
+                        os.remove(tmp_file)
+                    max_repeat_time -= 1
+
             if max_repeat_time > 0:
                 logger.bind(tag=TAG).info(
-                    f"语音生成成功: {original_text}，重试{5 - max_repeat_time}次"
+                    f"语音生成成功: {original_text}:{tmp_file}，重试{5 - max_repeat_time}次"
                 )
             else:
                 logger.bind(tag=TAG).error(
                     f"语音生成失败: {original_text}，请检查网络或服务是否正常"
                 )
+                cache_key = None
+            return SynthesisResult(audio_file=tmp_file, cache_key=cache_key)
+
+    def _play_synthesized(self, original_text, result, opus_handler: Callable[[bytes], None]):
+        """将合成结果编码后放入播放队列，同一连接的编码器有状态，需按句子顺序调用"""
+        if result is None:
+            return
+        sentence_id = getattr(self, 'current_sentence_id', None)
+        if result.frames is not None:
+            self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, sentence_id))
+            for frame in result.frames:
+                opus_handler(frame)
+            return
+
+        if result.cache_key is not None:
+            # 记录生成的音频帧，成功后写入缓存
+            recorded_frames = []
+            play_handler = opus_handler
+
+            def opus_handler(frame):
+                recorded_frames.append(frame)
+                play_handler(frame)
+
+        try:
+            # 使用原始文本用于显示/上报
+            self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, sentence_id))
+            if result.audio_bytes is not None:
+                audio_bytes_to_data_stream(
+                    result.audio_bytes,
+                    file_type=self.audio_file_type,
+                    is_opus=True,
+                    callback=opus_handler,
+                    sample_rate=self.conn.sample_rate,
+                    opus_encoder=self.opus_encoder,
+                )
+            else:
+                self._process_audio_file_stream(result.audio_file, callback=opus_handler)
+            if result.cache_key is not None:
+                self.audio_cache.put(result.cache_key, recorded_frames)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
+
+    def _get_audio_cache_key(self, text):
+        """返回规范化文本对应的语音缓存键，未开启缓存或文本不适合缓存时返回 None"""
+        if self.audio_cache is None or not self.audio_cache.is_cacheable(text):
             return None
-        else:
-            tmp_file = self.generate_filename()
-            try:
-                while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                    try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
-                    except Exception as e:
-                        logger.bind(tag=TAG).warning(
-                            f"语音生成失败{5 - max_repeat_time + 1}次: {original_text}，错误: {e}"
-                        )
-                        # 未执行成功，删除文件
-                        if os.path.exists(tmp_file):
-                            os.remove(tmp_file)
-                        max_repeat_time -= 1
+        return self.audio_cache.build_key(
+            type(self).__module__,
+            self._audio_cache_digest,
+            self.conn.sample_rate,
+            # 不同编码档位的音频帧不能混用
+            f"{self.conn.audio_format}:{self.opus_encoder.profile.tag}",
+            text,
+        )
 
-                if max_repeat_time > 0:
-                    logger.bind(tag=TAG).info(
-                        f"语音生成成功: {original_text}:{tmp_file}，重试{5 - max_repeat_time}次"
-                    )
-                else:
-                    logger.bind(tag=TAG).error(
-                        f"语音生成失败: {original_text}，请检查网络或服务是否正常"
-                    )
-                self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, getattr(self, 'current_sentence_id', None)))
-                self._process_audio_file_stream(tmp_file, callback=opus_handler)
-            except Exception as e:
-                logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
-                return None
-    
     def to_tts(self, text):
         # 保留原始文本用于日志/显示
         original_text = text
@@ -210,6 +330,7 @@ class TTSProviderBase(ABC):
                             is_opus=True,
                             callback=lambda data: audio_datas.append(data),
                             sample_rate=self.conn.sample_rate,
+                            frame_duration=get_frame_duration(self.conn),
                         )
                         return audio_datas
                     else:
@@ -303,24 +424,75 @@ class TTSProviderBase(ABC):
 
     async def open_audio_channels(self, conn):
         self.conn = conn
+        self.audio_cache = get_tts_audio_cache(conn.config)
 
-        # 根据conn的sample_rate创建编码器，如果子类已经创建则不覆盖（IndexTTS接口返回为24kHZ-待重采样处理）
+        # 编码档位在收到 hello 后协商，此前按配置的默认档位
+        profile = conn.opus_profile or opus_encoder_utils.resolve_opus_profile(conn.config)
+        # 根据conn的sample_rate创建编码器，如果子类已经创建则不覆盖采样率（IndexTTS接口返回为24kHZ-待重采样处理）
         if not hasattr(self, 'opus_encoder') or self.opus_encoder is None:
             self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
-                sample_rate=conn.sample_rate, channels=1, frame_size_ms=60
+                sample_rate=conn.sample_rate,
+                channels=1,
+                frame_size_ms=profile.frame_duration,
+                profile=profile,
             )
+        elif self.opus_encoder.profile != profile:
+            self.opus_encoder.apply_profile(profile)
 
+        self._channels_stop_event = threading.Event()
         # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
+        self.tts_priority_thread = self._start_channel_thread(
+            self.tts_text_priority_thread
         )
-        self.tts_priority_thread.start()
 
         # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
+        self.audio_play_priority_thread = self._start_channel_thread(
+            self._audio_play_priority_thread
         )
-        self.audio_play_priority_thread.start()
+
+    @property
+    def audio_channels_open(self) -> bool:
+        """合成与播放线程是否已打开（open_audio_channels 之后、release_audio_channels 之前）"""
+        return self._channels_stop_event is not None
+
+    def _start_channel_thread(self, target) -> threading.Thread:
+        stop_event = self._channels_stop_event
+
+        def run():
+            self._channel_local.stop_event = stop_event
+            target()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _channels_stopped(self) -> bool:
+        """合成与播放线程的退出条件：连接已关闭，或本线程所属的音频通道已释放"""
+        if self.conn.stop_event.is_set():
+            return True
+        stop_event = getattr(self._channel_local, "stop_event", None)
+        return stop_event is not None and stop_event.is_set()
+
+    async def release_audio_channels(self):
+        """停止合成与播放线程并关闭服务连接（连接休眠时调用），恢复时重新 open_audio_channels"""
+        if self._channels_stop_event is None:
+            return
+        self._channels_stop_event.set()
+        self._channels_stop_event = None
+        if self.synthesis_pipeline is not None:
+            self.synthesis_pipeline.close()
+            self.synthesis_pipeline = None
+        # 等旧线程退出后才能重新打开，避免新旧线程同时消费队列
+        for thread in (self.tts_priority_thread, self.audio_play_priority_thread):
+            if thread is not None and thread.is_alive():
+                await asyncio.to_thread(thread.join, RELEASE_JOIN_TIMEOUT)
+                if thread.is_alive():
+                    logger.bind(tag=TAG).warning(
+                        f"TTS线程未在{RELEASE_JOIN_TIMEOUT}秒内退出，将在当前操作结束后退出"
+                    )
+        self.tts_priority_thread = None
+        self.audio_play_priority_thread = None
+        await self.close()
 
     def store_tts_text(self, sentence_id, text):
         """存储指定 sentence_id 对应的文本，用于流式TTS获取正确的字幕文本
@@ -366,7 +538,8 @@ class TTSProviderBase(ABC):
     # 这里默认是非流式的处理方式
     # 流式处理方式请在子类中重写
     def tts_text_priority_thread(self):
-        while not self.conn.stop_event.is_set():
+        self.synthesis_pipeline = self._create_synthesis_pipeline()
+        while not self._channels_stopped():
             try:
                 message = self.tts_text_queue.get(timeout=1)
                 if self.conn.client_abort:
@@ -378,26 +551,31 @@ class TTSProviderBase(ABC):
                 if message.sentence_type == SentenceType.FIRST:
                     self.current_sentence_id = message.sentence_id
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
+                    self.segmenter.reset()
+                    self.segmenter.is_first_sentence = True
                     self.tts_audio_first_sentence = True
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
+                    segment_text = self._get_segment_text(message.content_detail)
                     if segment_text:
-                        self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
+                        self._speak_segment(segment_text, self.handle_opus)
                 elif ContentType.FILE == message.content_type:
                     self._process_remaining_text_stream(opus_handler=self.handle_opus)
                     tts_file = message.content_file
                     if tts_file and os.path.exists(tts_file):
-                        self._process_audio_file_stream(
-                            tts_file, callback=self.handle_opus
+                        self._play_in_order(
+                            functools.partial(
+                                self._process_audio_file_stream,
+                                tts_file,
+                                callback=self.handle_opus,
+                            )
                         )
                 if message.sentence_type == SentenceType.LAST:
                     self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail, message.sentence_id)
+                    self._play_in_order(
+                        functools.partial(
+                            self.tts_audio_queue.put,
+                            (message.sentence_type, [], message.content_detail, message.sentence_id),
+                        )
                     )
 
             except queue.Empty:
@@ -408,11 +586,45 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
+    def _create_synthesis_pipeline(self):
+        """非流式TTS按配置开启并行预合成，并发数为1时逐句合成"""
+        if self.interface_type != InterfaceType.NON_STREAM:
+            return None
+        concurrency = int(self.conn.config.get("tts_synthesis_concurrency", 1))
+        if concurrency <= 1:
+            return None
+        return SynthesisPipeline(
+            concurrency,
+            is_stale=lambda sentence_id: self.conn.client_abort
+            or sentence_id != self.conn.sentence_id,
+            stop_event=self.conn.stop_event,
+        )
+
+    def _speak_segment(self, text, opus_handler: Callable[[bytes], None]):
+        """合成并播放一句话，开启并行预合成时提交到流水线，按句子顺序播放"""
+        if self.synthesis_pipeline is None:
+            self.to_tts_stream(text, opus_handler=opus_handler)
+            return
+        normalized_text = self._normalize_tts_text(text)
+        # 文本处理线程只处理当前轮次的消息，提交时的 sentence_id 即为本句所属轮次
+        self.synthesis_pipeline.submit(
+            self.conn.sentence_id,
+            functools.partial(self._synthesize_segment, normalized_text, text),
+            functools.partial(self._play_synthesized, text, opus_handler=opus_handler),
+        )
+
+    def _play_in_order(self, play: Callable[[], Any]):
+        """排在已提交的句子之后执行的播放操作"""
+        if self.synthesis_pipeline is None:
+            play()
+        else:
+            self.synthesis_pipeline.submit_emit(self.conn.sentence_id, play)
+
     def _audio_play_priority_thread(self):
         # 需要上报的文本和音频列表
         enqueue_text = None
         enqueue_audio = []
-        while not self.conn.stop_event.is_set():
+        while not self._channels_stopped():
             text = None
             try:
                 try:
@@ -423,7 +635,7 @@ class TTSProviderBase(ABC):
                         sentence_type, audio_datas, text = item
                         sentence_id = None
                 except queue.Empty:
-                    if self.conn.stop_event.is_set():
+                    if self._channels_stopped():
                         break
                     continue
 
@@ -454,6 +666,9 @@ class TTSProviderBase(ABC):
                 if isinstance(audio_datas, bytes):
                     enqueue_audio.append(audio_datas)
 
+                if audio_datas:
+                    self.conn.latency_tracer.mark(STAGE_TTS_FIRST_AUDIO, sentence_id)
+
                 # 发送音频
                 future = asyncio.run_coroutine_threadsafe(
                     sendAudioMessage(self.conn, sentence_type, audio_datas, text, sentence_id),
@@ -480,44 +695,18 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
+    def _get_segment_text(self, text=None):
+        """追加大模型输出的文本，返回可以送去合成的一句话"""
+        segment_text_raw = self.segmenter.feed(text)
+        if segment_text_raw is not None:
+            return textUtils.get_string_no_punctuation_or_emoji(segment_text_raw)
+        if self.tts_stop_request:
+            # 已请求停止时原样返回剩余文本
+            remaining_text = self.segmenter.remaining()
+            if remaining_text:
+                self.segmenter.is_first_sentence = True
+                return remaining_text
+        return None
 
     def _process_audio_file_stream(
         self, tts_file, callback: Callable[[Any], Any]
@@ -557,13 +746,12 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
+        remaining_text = self.segmenter.remaining()
         if remaining_text:
             segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
             if segment_text:
-                self.to_tts_stream(segment_text, opus_handler=opus_handler)
-                self.processed_chars += len(full_text)
+                self._speak_segment(segment_text, opus_handler)
+                self.segmenter.reset()
                 return True
         return False
 
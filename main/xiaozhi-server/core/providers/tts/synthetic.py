@@ -0,0 +1,149 @@
+import io
+import os
+import time
+import uuid
+import wave
+import queue
+import traceback
+import numpy as np
+from config.logger import setup_logging
+from core.utils import textUtils
+from core.utils.synthetic import SyntheticBehavior
+from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
+
+TAG = __name__
+logger = setup_logging()
+
+
+class TTSProvider(TTSProviderBase):
+    """模拟语音合成，不访问网络：按文本长度生成正弦波音频
+
+    - 非流式（默认）：按配置的延迟返回整段WAV，走与其他非流式TTS相同的解码、编码流程
+    - 流式（stream: true）：首包延迟后按实时速度逐帧编码为Opus推送，模拟流式TTS
+    """
+
+    def __init__(self, config, delete_audio_file):
+        super().__init__(config, delete_audio_file)
+        self.stream = bool(config.get("stream", False))
+        if self.stream:
+            self.interface_type = InterfaceType.SINGLE_STREAM
+        self.audio_file_type = "wav"
+        self.output_dir = config.get("output_dir", "tmp/")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.voice = config.get("voice", "synthetic")
+        # 每个字的音频时长（毫秒）
+        self.ms_per_char = float(config.get("ms_per_char", 200))
+        self.frequency = float(config.get("frequency", 440))
+        # 流式推送速度，1 表示按实时速度，0 表示不限速
+        self.realtime_factor = float(config.get("realtime_factor", 1.0))
+        self.behavior = SyntheticBehavior(config)
+        self.latency = self.behavior.latency(config.get("latency_ms", 300))
+
+    def generate_filename(self, extension=".wav"):
+        return os.path.join(self.output_dir, f"tts-{uuid.uuid4().hex}{extension}")
+
+    def _sample_rate(self):
+        return self.conn.sample_rate if getattr(self, "conn", None) else 16000
+
+    def _generate_pcm(self, text, sample_rate):
+        """生成与文本长度对应的正弦波，首尾淡入淡出避免爆音"""
+        duration = max(len(text), 1) * self.ms_per_char / 1000
+        t = np.arange(int(sample_rate * duration)) / sample_rate
+        wave_data = 0.3 * np.sin(2 * np.pi * self.frequency * t)
+        fade = min(len(t) // 2, int(sample_rate * 0.01))
+        if fade:
+            ramp = np.linspace(0, 1, fade)
+            wave_data[:fade] *= ramp
+            wave_data[-fade:] *= ramp[::-1]
+        return (wave_data * 32767).astype(np.int16).tobytes()
+
+    async def text_to_speak(self, text, output_file):
+        time.sleep(self.latency.sample())
+        self.behavior.maybe_fail("语音合成")
+        sample_rate = self._sample_rate()
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(self._generate_pcm(text, sample_rate))
+        if output_file:
+            with open(output_file, "wb") as f:
+                f.write(buffer.getvalue())
+            return None
+        return buffer.getvalue()
+
+    def tts_text_priority_thread(self):
+        if not self.stream:
+            return super().tts_text_priority_thread()
+
+        while not self._channels_stopped():
+            try:
+                message = self.tts_text_queue.get(timeout=1)
+                if self.conn.client_abort or message.sentence_id != self.conn.sentence_id:
+                    continue
+                if message.sentence_type == SentenceType.FIRST:
+                    self.current_sentence_id = message.sentence_id
+                    self.tts_stop_request = False
+                    self.segmenter.reset()
+                    self.segmenter.is_first_sentence = True
+                    self.before_stop_play_files.clear()
+                elif ContentType.TEXT == message.content_type:
+                    segment_text = self._get_segment_text(message.content_detail)
+                    if segment_text:
+                        self._stream_segment(segment_text)
+                elif ContentType.FILE == message.content_type:
+                    if message.content_file and os.path.exists(message.content_file):
+                        self._process_audio_file_stream(
+                            message.content_file,
+                            callback=lambda audio_data, text=message.content_detail: self.handle_audio_file(
+                                audio_data, text
+                            ),
+                        )
+                if message.sentence_type == SentenceType.LAST:
+                    remaining_text = textUtils.get_string_no_punctuation_or_emoji(
+                        self.segmenter.remaining()
+                    )
+                    if remaining_text:
+                        self._stream_segment(remaining_text)
+                    self.segmenter.reset()
+                    self._process_before_stop_play_files()
+            except queue.Empty:
+                continue
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                )
+
+    def _stream_segment(self, text):
+        """首包延迟后按实时速度逐帧编码推送"""
+        text = self._normalize_tts_text(text)
+        try:
+            time.sleep(self.latency.sample())
+            self.behavior.maybe_fail("语音合成")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"TTS请求异常: {e}")
+            return
+
+        self.tts_audio_queue.put(
+            (SentenceType.FIRST, [], text, getattr(self, "current_sentence_id", None))
+        )
+        encoder = self.opus_encoder
+        frame_bytes = encoder.sample_rate * encoder.frame_size_ms // 1000 * 2
+        frame_duration = encoder.frame_size_ms / 1000
+        pcm = self._generate_pcm(text, encoder.sample_rate)
+        start = time.monotonic()
+        for index, pos in enumerate(range(0, len(pcm), frame_bytes)):
+            if self.conn.client_abort or self._channels_stopped():
+                break
+            if self.realtime_factor > 0:
+                delay = start + index * frame_duration / self.realtime_factor - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            frame = pcm[pos : pos + frame_bytes]
+            encoder.encode_pcm_to_opus_stream(
+                frame,
+                end_of_stream=len(frame) < frame_bytes,
+                callback=self.handle_opus,
+            )
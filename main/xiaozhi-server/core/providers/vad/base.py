@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import List
 
 
 class VADProviderBase(ABC):
@@ -7,3 +7,17 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+
+class DspOffloadMixin(ABC):
+    """支持将模型推理放到DSP工作进程的VAD：推理在工作进程执行，判定仍在连接所在进程执行"""
+
+    @abstractmethod
+    def speech_probs(self, conn, pcm_frame) -> List[float]:
+        """模型推理部分：返回各分块的语音概率"""
+        pass
+
+    @abstractmethod
+    def apply_speech_probs(self, conn, probs) -> bool:
+        """判定部分：根据语音概率更新连接的说话状态"""
+        pass
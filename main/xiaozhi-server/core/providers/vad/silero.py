@@ -1,15 +1,18 @@
 import time
 import os
 import numpy as np
+from typing import List
 import onnxruntime
 from config.logger import setup_logging
-from core.providers.vad.base import VADProviderBase
+from core.providers.vad.base import VADProviderBase, DspOffloadMixin
+from core.utils.latency_trace import STAGE_VAD_END
+from core.utils.end_of_turn import EndOfTurnDetector
 
 TAG = __name__
 logger = setup_logging()
 
 
-class VADProvider(VADProviderBase):
+class VADProvider(VADProviderBase, DspOffloadMixin):
     def __init__(self, config):
         logger.bind(tag=TAG).info("SileroVAD", config)
 
@@ -35,6 +38,10 @@ class VADProvider(VADProviderBase):
         )
 
         self.frame_window_threshold = 3
+        # 自适应说话结束判定，未开启时等同于固定的静音阈值
+        self.end_of_turn = EndOfTurnDetector(
+            config, self.silence_threshold_ms, self.vad_threshold_low
+        )
 
     def _init_connection_state(self, conn):
         """为连接初始化独立的 VAD 状态"""
@@ -58,59 +65,86 @@ class VADProvider(VADProviderBase):
             return True
 
         try:
-            self._init_connection_state(conn)
-
-            # pcm_frame已经是处理后的PCM数据
-            conn.client_audio_buffer.extend(pcm_frame)
-
-            client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_input = np.concatenate(
-                    [conn._vad_context, audio_float32.reshape(1, -1)], axis=1
-                ).astype(np.float32)
-
-                ort_inputs = {
-                    "input": audio_input,
-                    "state": conn._vad_state,
-                    "sr": np.array(16000, dtype=np.int64),
-                }
-                out, state = self.session.run(None, ort_inputs)
-
-                conn._vad_state = state
-                conn._vad_context = audio_input[:, -64:]
-                speech_prob = out.item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (
-                    conn.client_voice_window.count(True) >= self.frame_window_threshold
-                )
-
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.vad_last_voice_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.vad_last_voice_time = time.time() * 1000
-
-            return client_have_voice
+            return self.apply_speech_probs(conn, self.speech_probs(conn, pcm_frame))
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    def speech_probs(self, conn, pcm_frame) -> List[float]:
+        """模型推理：按512采样点切块计算每块的语音概率，不足一块的部分留到下一帧
+
+        只读写 conn 上的模型状态与音频缓冲，DSP工作进程中可传入独立的状态对象
+        """
+        self._init_connection_state(conn)
+
+        # pcm_frame已经是处理后的PCM数据
+        conn.client_audio_buffer.extend(pcm_frame)
+
+        probs = []
+        while len(conn.client_audio_buffer) >= 512 * 2:
+            chunk = conn.client_audio_buffer[: 512 * 2]
+            conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
+
+            audio_int16 = np.frombuffer(chunk, dtype=np.int16)
+            audio_float32 = audio_int16.astype(np.float32) / 32768.0
+            audio_input = np.concatenate(
+                [conn._vad_context, audio_float32.reshape(1, -1)], axis=1
+            ).astype(np.float32)
+
+            ort_inputs = {
+                "input": audio_input,
+                "state": conn._vad_state,
+                "sr": np.array(16000, dtype=np.int64),
+            }
+            out, state = self.session.run(None, ort_inputs)
+
+            conn._vad_state = state
+            conn._vad_context = audio_input[:, -64:]
+            probs.append(out.item())
+        return probs
+
+    def apply_speech_probs(self, conn, probs) -> bool:
+        """根据各块的语音概率更新连接的说话状态，返回当前片段是否有人说话"""
+        if conn.client_listen_mode == "manual":
+            return True
+
+        client_have_voice = False
+        for speech_prob in probs:
+            # 双阈值判断
+            if speech_prob >= self.vad_threshold:
+                is_voice = True
+            elif speech_prob <= self.vad_threshold_low:
+                is_voice = False
+            else:
+                is_voice = conn.last_is_voice
+
+            # 声音没低于最低值则延续前一个状态，判断为有声音
+            conn.last_is_voice = is_voice
+
+            # 更新滑动窗口
+            conn.client_voice_window.append(is_voice)
+            client_have_voice = (
+                conn.client_voice_window.count(True) >= self.frame_window_threshold
+            )
+
+            # 如果之前有声音，但本次没有声音，且静音时长已经达到说话结束的判定条件，则认为已经说完一句话
+            if conn.client_have_voice and not client_have_voice:
+                conn.vad_silence_probs.append(speech_prob)
+                stop_duration = time.time() * 1000 - conn.vad_last_voice_time
+                if self.end_of_turn.is_end_of_turn(
+                    stop_duration,
+                    conn.vad_last_voice_time - conn.vad_speech_start_time,
+                    conn.vad_silence_probs,
+                    conn.asr.partial_text if conn.asr else "",
+                ):
+                    if not conn.client_voice_stop:
+                        conn.latency_tracer.begin_turn(STAGE_VAD_END)
+                    conn.client_voice_stop = True
+            if client_have_voice:
+                now = time.time() * 1000
+                if not conn.client_have_voice:
+                    conn.vad_speech_start_time = now
+                conn.client_have_voice = True
+                conn.vad_last_voice_time = now
+                conn.vad_silence_probs.clear()
+
+        return client_have_voice
@@ -0,0 +1,244 @@
+"""连接准入控制与分阶段初始化
+
+网络抖动后大量设备会同时重连，每个连接都要拉取差异化配置、初始化模块、加载记忆等，
+不加限制时会挤占正在进行的对话。这里在握手阶段用令牌桶限制接入速率，
+重活放进有并发上限的优先级队列，超出能力时明确告诉客户端稍后重试：
+
+- 握手：令牌桶没有令牌（短暂等待后仍没有）或初始化队列已满时返回 503 与 Retry-After
+- 初始化：同时初始化的连接数有上限，排队时正在说话的设备优先，其次是断开前还在对话的设备
+- 分阶段：已缓存差异化配置（见 private_config_cache）的设备不排队即可确定绑定状态
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config.logger import setup_logging
+from core.utils.metrics import init_queue_wait_ms
+
+TAG = __name__
+logger = setup_logging()
+
+# 初始化排队优先级，数值越小越先初始化
+PRIORITY_SPEAKING = 0  # 排队期间已经在发送音频或消息
+PRIORITY_RECENT = 1  # 上一个连接断开前还在对话
+PRIORITY_NORMAL = 2
+# 记录最近断开设备的数量上限
+RECENT_DEVICES_MAX = 10000
+
+
+class AdmissionRejected(Exception):
+    """超出准入能力，retry_after 为建议客户端等待的秒数"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"{reason}, retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 burst 个"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """预占一个令牌，返回需要等待的秒数；等待超过 max_wait 时不预占，返回 None"""
+        self._refill()
+        wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        if wait > max_wait:
+            return None
+        # 允许令牌为负，后来者的等待时间随之顺延
+        self.tokens -= 1
+        return wait
+
+
+class InitTicket:
+    """一个连接在初始化队列中的位置"""
+
+    __slots__ = ("device_id", "priority", "seq", "enqueued_at", "granted", "_future")
+
+    def __init__(self, device_id: Optional[str], priority: int, seq: int):
+        self.device_id = device_id
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = 0.0
+        self.granted = False
+        self._future: Optional[asyncio.Future] = None
+
+    @property
+    def waiting(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+
+class AdmissionController:
+    def __init__(self):
+        self.enabled = False
+        self.max_accept_wait = 0.5
+        self.init_concurrency = 20
+        self.init_queue_size = 1000
+        self.queue_timeout = 30.0
+        self.retry_after = 5
+        self.recent_active_seconds = 60.0
+        self._bucket: Optional[TokenBucket] = None
+        self._seq = itertools.count()
+        self._queue: List[tuple] = []
+        self._queued = 0
+        self._running = 0
+        self._recent_devices: "OrderedDict[str, float]" = OrderedDict()
+        self.stats = {
+            "accepted": 0,
+            "rejected_rate": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+        }
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 admission_control 配置"""
+        config = config or {}
+        self.enabled = bool(config.get("enable", False))
+        self._bucket = TokenBucket(
+            max(float(config.get("accept_rate", 50)), 0.1),
+            max(float(config.get("accept_burst", 100)), 1),
+        )
+        self.max_accept_wait = float(config.get("max_accept_wait", 0.5))
+        self.init_concurrency = max(int(config.get("init_concurrency", 20)), 1)
+        self.init_queue_size = int(config.get("init_queue_size", 1000))
+        self.queue_timeout = float(config.get("queue_timeout", 30))
+        self.retry_after = max(int(config.get("retry_after", 5)), 1)
+        self.recent_active_seconds = float(config.get("recent_active_seconds", 60))
+        if self.enabled:
+            logger.bind(tag=TAG).info(
+                f"连接准入控制已开启: 接入速率 {self._bucket.rate}/s，"
+                f"初始化并发 {self.init_concurrency}，排队上限 {self.init_queue_size}"
+            )
+
+    def _retry_after(self) -> int:
+        # 加入随机抖动，避免被拒绝的设备在同一时刻再次重连
+        return self.retry_after + random.randint(0, self.retry_after)
+
+    # ------------------------------------------------------------------
+    # 握手阶段
+    # ------------------------------------------------------------------
+
+    async def admit(self):
+        """WebSocket 握手前调用，超出准入能力时抛出 AdmissionRejected"""
+        if not self.enabled:
+            return
+        if self.init_queue_size > 0 and self._queued >= self.init_queue_size:
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected("init queue full", self._retry_after())
+        wait = self._bucket.reserve(self.max_accept_wait)
+        if wait is None:
+            self.stats["rejected_rate"] += 1
+            raise AdmissionRejected("accept rate exceeded", self._retry_after())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.stats["accepted"] += 1
+
+    # ------------------------------------------------------------------
+    # 初始化队列
+    # ------------------------------------------------------------------
+
+    def create_ticket(self, device_id: Optional[str]) -> Optional[InitTicket]:
+        """为新连接创建初始化排队凭证，未开启准入控制时返回 None"""
+        if not self.enabled:
+            return None
+        priority = PRIORITY_NORMAL
+        if device_id is not None:
+            disconnected_at = self._recent_devices.pop(device_id, None)
+            if (
+                disconnected_at is not None
+                and time.monotonic() - disconnected_at <= self.recent_active_seconds
+            ):
+                priority = PRIORITY_RECENT
+        return InitTicket(device_id, priority, next(self._seq))
+
+    def promote(self, ticket: Optional[InitTicket], priority: int = PRIORITY_SPEAKING):
+        """排队中的连接提高优先级（如设备已经开始说话）"""
+        if ticket is None or not ticket.waiting or ticket.priority <= priority:
+            return
+        ticket.priority = priority
+        # 旧的队列项在出队时按优先级不一致跳过
+        heapq.heappush(self._queue, (priority, ticket.seq, ticket))
+
+    async def acquire(self, ticket: Optional[InitTicket]):
+        """等待初始化名额，排队超过 queue_timeout 时抛出 AdmissionRejected"""
+        if ticket is None:
+            return
+        if self._running < self.init_concurrency and self._queued == 0:
+            self._running += 1
+            ticket.granted = True
+            init_queue_wait_ms.observe(0)
+            return
+        ticket._future = asyncio.get_running_loop().create_future()
+        ticket.enqueued_at = time.monotonic()
+        heapq.heappush(self._queue, (ticket.priority, ticket.seq, ticket))
+        self._queued += 1
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(ticket._future), timeout=self.queue_timeout
+            )
+        except BaseException as e:
+            if ticket._future.done() and not ticket._future.cancelled():
+                # 名额已分配但等待方被取消或超时，归还名额
+                self.release(ticket)
+            else:
+                ticket._future.cancel()
+                self._queued -= 1
+            ticket._future = None
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["rejected_queue_timeout"] += 1
+                raise AdmissionRejected("init queue timeout", self._retry_after())
+            raise
+        ticket._future = None
+
+    def release(self, ticket: Optional[InitTicket]):
+        """初始化完成，把名额交给队列中优先级最高的连接"""
+        if ticket is None or not ticket.granted:
+            return
+        ticket.granted = False
+        self._running -= 1
+        while self._queue and self._running < self.init_concurrency:
+            priority, _, waiter = heapq.heappop(self._queue)
+            if priority != waiter.priority or not waiter.waiting:
+                continue
+            self._queued -= 1
+            self._running += 1
+            waiter.granted = True
+            waiter._future.set_result(None)
+            init_queue_wait_ms.observe((time.monotonic() - waiter.enqueued_at) * 1000)
+
+    def note_disconnect(self, device_id: Optional[str], last_audio_time: float):
+        """连接关闭时记录断开前是否还在对话，重连时优先初始化"""
+        if not self.enabled or device_id is None:
+            return
+        now = time.monotonic()
+        if last_audio_time and now - last_audio_time <= self.recent_active_seconds:
+            self._recent_devices[device_id] = now
+            self._recent_devices.move_to_end(device_id)
+            while len(self._recent_devices) > RECENT_DEVICES_MAX:
+                self._recent_devices.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._running,
+            "queued": self._queued,
+            "tokens": round(self._bucket.tokens, 1) if self._bucket else 0,
+            **self.stats,
+        }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,129 @@
+"""服务端回声消除（AEC）
+
+设备开启服务端AEC后，下行音频按时间戳缓存为参考信号，上行音频按时间戳匹配参考帧后在频域做谱减法。
+算法本身不依赖连接对象，供连接处理与DSP工作进程共用。
+"""
+
+from typing import Dict
+
+import numpy as np
+
+
+def apply_aec(pcm_frame: bytes, ref_cache: Dict[int, bytes], timestamp: int) -> bytes:
+    """对一帧上行PCM做回声消除 - 综合算法：互相关延迟估计 + Wiener滤波 + 频谱减法
+
+    Args:
+        pcm_frame: 上行16kHz单声道PCM
+        ref_cache: 下行参考PCM，时间戳 -> PCM
+        timestamp: 上行帧的时间戳
+
+    Returns:
+        bytes: 处理后的PCM，无需处理时原样返回
+    """
+    if not pcm_frame or not ref_cache:
+        return pcm_frame
+
+    mic_audio = np.frombuffer(pcm_frame, dtype=np.int16).astype(np.float32)
+    mic_rms = np.sqrt(np.mean(mic_audio**2))
+
+    if mic_rms < 100:
+        return pcm_frame
+
+    sorted_timestamps = sorted(ref_cache.keys())
+    if len(sorted_timestamps) < 2:
+        return pcm_frame
+
+    # ========== 匹配参考帧（对数功率谱匹配） ==========
+    n = len(mic_audio)
+
+    # 找最接近的timestamp作为起点
+    closest_idx = min(
+        range(len(sorted_timestamps)),
+        key=lambda i: abs(sorted_timestamps[i] - timestamp),
+    )
+
+    # 预计算 mic_audio 的对数功率谱（循环内共用，避免重复FFT）
+    mic_window = np.hanning(n)
+    mic_fft = np.fft.rfft(mic_audio * mic_window)
+    mic_psd = np.abs(mic_fft) ** 2
+    mic_log_psd = 10 * np.log10(mic_psd + 1e-8)
+    mic_P_xx = np.dot(mic_log_psd, mic_log_psd)
+
+    # 用对数功率谱匹配找最佳帧：前后各找2帧
+    best_corr = -1
+    best_ref_idx = closest_idx
+    best_ref_rms = 0.0
+
+    for offset in range(-2, 3):  # T-2, T-1, T, T+1, T+2
+        test_idx = closest_idx + offset
+        if test_idx < 0 or test_idx >= len(sorted_timestamps):
+            continue
+        test_ts = sorted_timestamps[test_idx]
+        test_ref = np.frombuffer(ref_cache[test_ts], dtype=np.int16).astype(np.float32)
+        test_ref_rms = np.sqrt(np.mean(test_ref**2))
+        if test_ref_rms < 50:
+            continue
+
+        # 对数功率谱相关性
+        test_window = np.hanning(len(test_ref))
+        test_fft = np.fft.rfft(test_ref * test_window)
+        test_psd = np.abs(test_fft) ** 2
+        test_log_psd = 10 * np.log10(test_psd + 1e-8)
+        P_xy = np.dot(mic_log_psd, test_log_psd)
+        P_yy = np.dot(test_log_psd, test_log_psd)
+        corr = abs(P_xy) / (np.sqrt(mic_P_xx) * np.sqrt(P_yy) + 1e-8)
+
+        if corr > best_corr:
+            best_corr = corr
+            best_ref_idx = test_idx
+            best_ref_rms = test_ref_rms
+
+    best_ts = sorted_timestamps[best_ref_idx]
+    best_ref = np.frombuffer(ref_cache[best_ts], dtype=np.int16).astype(np.float32)
+    ref_rms = best_ref_rms
+
+    if ref_rms < 50:
+        return pcm_frame
+
+    # 对齐参考信号（直接截取相同长度）
+    aligned_ref = best_ref[:n]
+    if len(aligned_ref) < n:
+        aligned_ref = np.pad(aligned_ref, (0, n - len(aligned_ref)))
+
+    # ========== 频域 AEC 处理（谱减法） ==========
+    # 时域信号经过声学路径后相位失真，导致时域相关性低且P_xy正负不定
+    # 频域幅度谱不受相位影响，对数功率谱相关性稳定在0.97+
+    # 公式：result_mag = max(|mic_fft| - |ref_fft| * scale * coef, 0)
+
+    mic_mag = np.abs(mic_fft)
+    mic_phase = np.angle(mic_fft)
+    ref_fft = np.fft.rfft(aligned_ref * np.hanning(n))
+    ref_mag = np.abs(ref_fft)
+
+    # 频域计算回声比例 scale
+    scale = np.sum(mic_mag * ref_mag) / (np.dot(ref_mag, ref_mag) + 1e-8)
+
+    # 自适应系数：根据scale和coh动态调整
+    # scale大（回声强）-> coef大；coh高（匹配准）-> coef大
+    raw_coef = 1.0 + scale * 3 + (best_corr - 0.97) * 30
+    coef = max(0.5, min(3.0, raw_coef))
+
+    # 谱减法（过减 + 半波整流）
+    echo_mag = ref_mag * scale * coef
+    result_mag = np.maximum(mic_mag - echo_mag * 1.5, mic_mag * 0.1)
+
+    # 保留相位重建信号
+    result_fft = result_mag * np.exp(1j * mic_phase)
+    output = np.fft.irfft(result_fft, n)
+
+    # 高置信度是纯回声时，再压一下确保VAD检测不到
+    if best_corr >= 0.97 and ref_rms > 500:
+        output = output * 0.3
+
+    # 后处理：限幅
+    output = np.clip(output, -32768, 32767)
+
+    # 转换为bytes
+    result = output.astype(np.int16).tobytes()
+
+    return result
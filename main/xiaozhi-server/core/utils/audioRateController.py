@@ -1,39 +1,122 @@
+import sys
 import time
 import asyncio
 from collections import deque
+from typing import Any, Dict, Optional
 from config.logger import setup_logging
+from core.utils.timer_wheel import TimerWheel
 
 TAG = __name__
 logger = setup_logging()
 
+# Python 3.12 起 asyncio.Task 支持 eager_start
+_EAGER_START = sys.version_info >= (3, 12)
+
+
+def _start_task(coro) -> Optional[asyncio.Task]:
+    """以独立任务执行发送协程，首次执行即完成时返回 None
+
+    websocket 发送通常直接写入传输层缓冲区而不挂起，Python 3.12 起用 eager_start
+    在创建时同步执行到第一次挂起，不必等下一轮事件循环；低版本退回普通任务。
+    发送协程总是运行在自己的任务中，其中的超时、取消不会波及节拍器任务。
+    """
+    loop = asyncio.get_running_loop()
+    if _EAGER_START:
+        task = asyncio.Task(coro, loop=loop, eager_start=True)
+    else:
+        task = loop.create_task(coro)
+    return None if task.done() else task
+
+
+class AudioPacingScheduler:
+    """进程内共享的音频发送节拍器
+
+    基于独立的 TimerWheel 实例（tick 默认20ms），每个连接在其下一个音频包的播放时间登记一次，
+    同一 tick 到期的连接一次性发送，替代每个连接各自的发送协程与逐包定时器。没有待发送的连接时不再计时。
+    """
+
+    def __init__(self, tick_ms: float = 20):
+        self.wheel = TimerWheel(tick_ms)
+        self.packets = 0
+
+    @property
+    def tick(self) -> float:
+        """节拍间隔（秒）"""
+        return self.wheel.tick
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 audio_pacing 配置，需在首次发送音频前调用"""
+        self.wheel.configure(config)
+
+    def ensure_running(self):
+        self.wheel.ensure_running()
+
+    def schedule(self, controller: "AudioRateController", due_time: float):
+        """在距 due_time（time.monotonic 时间）最近的节拍唤醒 controller"""
+        self.unschedule(controller)
+        controller._timer = self.wheel.call_at(due_time, controller._flush)
+
+    def unschedule(self, controller: "AudioRateController"):
+        if controller._timer is not None:
+            controller._timer.cancel()
+            controller._timer = None
+
+    def stop(self):
+        self.wheel.stop()
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = self.wheel.snapshot()
+        return {
+            "tick_ms": snapshot["tick_ms"],
+            "streams": snapshot["timers"],
+            "ticks": snapshot["ticks"],
+            "packets": self.packets,
+            "max_tick_lag_ms": snapshot["max_tick_lag_ms"],
+        }
+
+
+audio_pacing_scheduler = AudioPacingScheduler()
+
 
 class AudioRateController:
     """
-    音频速率控制器 - 按照60ms帧时长精确控制音频发送
+    音频速率控制器 - 按照音频帧时长精确控制音频发送
     解决高并发下的时间累积误差问题
+
+    各连接只维护自己的队列与播放位置，到期发送由进程内共享的 AudioPacingScheduler 统一驱动。
     """
 
-    def __init__(self, frame_duration=60):
+    def __init__(self, frame_duration=60, scheduler: AudioPacingScheduler = None):
         """
         Args:
-            frame_duration: 单个音频帧时长（毫秒），默认60ms
+            frame_duration: 单个音频帧时长（毫秒），默认60ms，入队时未指定包时长则按此计算
+            scheduler: 发送节拍器，默认使用进程内共享的实例
         """
         self.frame_duration = frame_duration
+        self.scheduler = scheduler or audio_pacing_scheduler
         self.queue = deque()
         self.play_position = 0  # 虚拟播放位置（毫秒）
         self.start_timestamp = None  # 开始时间戳（只读，不修改）
-        self.pending_send_task = None
         self.logger = logger
         self.queue_empty_event = asyncio.Event()  # 队列清空事件
         self.queue_empty_event.set()  # 初始为空状态
         self.queue_has_data_event = asyncio.Event()  # 队列数据事件
         self._last_queue_empty_time = 0  # 上次队列清空的时间（秒）
+        self._send_audio_callback = None
+        self._sending = False
+        # 每次重置或停止时递增，用于让已挂起的旧发送流程失效
+        self._generation = 0
+        self._timer = None  # 在时间轮中登记的定时器，到期或未排期时不再等待
+        self._flush_task = None  # 发送遇到背压时仍在执行的任务
+
+    @property
+    def sending(self) -> bool:
+        """发送是否在进行中，发送出错或被中止后为 False，需要重新 start_sending"""
+        return self._sending
 
     def reset(self):
         """重置控制器状态"""
-        if self.pending_send_task and not self.pending_send_task.done():
-            self.pending_send_task.cancel()
-            # 取消任务后，任务会在下次事件循环时清理，无需阻塞等待
+        self._stop()
 
         self.queue.clear()
         self.play_position = 0
@@ -43,13 +126,14 @@ class AudioRateController:
         self.queue_empty_event.set()
         self.queue_has_data_event.clear()
 
-    def add_audio(self, opus_packet):
-        """添加音频包到队列"""
+    def _resume_timestamp(self):
         # 如果队列之前为空，需要调整时间戳以保持播放时间连续
         # 这样工具调用等待期间，新加入的音频不会提前播放
         # 如果间隔很短（<1帧），说明是正常的流式传输，不需要重置
         if len(self.queue) == 0 and self.play_position > 0:
-            elapsed_since_empty = (time.monotonic() - self._last_queue_empty_time) * 1000
+            elapsed_since_empty = (
+                time.monotonic() - self._last_queue_empty_time
+            ) * 1000
             # 只有间隔超过1帧时长，才认为是真正的"暂停恢复"
             if elapsed_since_empty >= self.frame_duration:
                 self.start_timestamp = time.monotonic() - (self.play_position / 1000)
@@ -57,10 +141,16 @@ class AudioRateController:
                     f"队列从空恢复，重置时间戳，当前播放位置: {self.play_position}ms，间隔: {elapsed_since_empty:.0f}ms"
                 )
 
-        self.queue.append(("audio", opus_packet))
-        # 相关事件处理
-        self.queue_empty_event.clear()
-        self.queue_has_data_event.set()
+    def add_audio(self, opus_packet, duration_ms=None):
+        """添加音频包到队列
+
+        Args:
+            opus_packet: 音频包
+            duration_ms: 该包的播放时长（毫秒），默认为 frame_duration
+        """
+        self._resume_timestamp()
+        self.queue.append(("audio", opus_packet, duration_ms or self.frame_duration))
+        self._on_data()
 
     def add_message(self, message_callback):
         """
@@ -69,18 +159,22 @@ class AudioRateController:
         Args:
             message_callback: 消息发送回调函数 async def()
         """
-        if len(self.queue) == 0 and self.play_position > 0:
-            elapsed_since_empty = (time.monotonic() - self._last_queue_empty_time) * 1000
-            if elapsed_since_empty >= self.frame_duration:
-                self.start_timestamp = time.monotonic() - (self.play_position / 1000)
-                self.logger.bind(tag=TAG).debug(
-                    f"队列从空恢复，重置时间戳，当前播放位置: {self.play_position}ms，间隔: {elapsed_since_empty:.0f}ms"
-                )
+        self._resume_timestamp()
+        self.queue.append(("message", message_callback, 0))
+        self._on_data()
 
-        self.queue.append(("message", message_callback))
+    def _on_data(self):
         # 相关事件处理
         self.queue_empty_event.clear()
         self.queue_has_data_event.set()
+        if not self._sending or self._flush_task is not None:
+            return
+        if self._timer is None or not self._timer.pending:
+            # 队列原本为空时不在时间轮中，需要在下一个节拍唤醒
+            self.scheduler.schedule(self, time.monotonic())
+        else:
+            # 已排期时确认时间轮仍在运行（被停止后由此恢复）
+            self.scheduler.ensure_running()
 
     def _get_elapsed_ms(self):
         """获取已经过的时间（毫秒）"""
@@ -88,96 +182,99 @@ class AudioRateController:
             return 0
         return (time.monotonic() - self.start_timestamp) * 1000
 
-    async def check_queue(self, send_audio_callback):
-        """
-        检查队列并按时发送音频/消息
+    def _flush(self):
+        """由节拍器调用，发送所有已到期的消息与音频包"""
+        self._timer = None
+        if self._flush_task is not None or not self._sending:
+            return
+        task = _start_task(self._send_due(self._generation))
+        if task is not None:
+            self._flush_task = task
+            task.add_done_callback(self._on_flush_done)
 
-        Args:
-            send_audio_callback: 发送音频的回调函数 async def(opus_packet)
+    def _on_flush_done(self, task):
+        if self._flush_task is task:
+            self._flush_task = None
+            # 挂起期间新加入的数据需要重新排期
+            if (
+                self._sending
+                and self.queue
+                and (self._timer is None or not self._timer.pending)
+            ):
+                self.scheduler.schedule(self, time.monotonic())
+
+    async def _send_due(self, generation):
+        """
+        检查队列并发送已到期的音频/消息，遇到未到期的音频包时按其播放时间重新排期
         """
-        while self.queue:
-            item = self.queue[0]
-            item_type = item[0]
+        try:
+            while self.queue and generation == self._generation:
+                item_type, payload, duration_ms = self.queue[0]
 
-            if item_type == "message":
-                # 消息类型：立即发送，不占用播放时间
-                _, message_callback = item
-                self.queue.popleft()
-                try:
-                    await message_callback()
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"发送消息失败: {e}")
-                    raise
+                if item_type == "message":
+                    # 消息类型：立即发送，不占用播放时间
+                    self.queue.popleft()
+                    await payload()
+                    continue
 
-            elif item_type == "audio":
                 if self.start_timestamp is None:
                     self.start_timestamp = time.monotonic()
 
-                _, opus_packet = item
-
-                # 循环等待直到时间到达
-                while True:
-                    # 计算时间差
-                    elapsed_ms = self._get_elapsed_ms()
-                    output_ms = self.play_position
-
-                    if elapsed_ms < output_ms:
-                        # 还不到发送时间，计算等待时长
-                        wait_ms = output_ms - elapsed_ms
-
-                        # 等待后继续检查（允许被中断）
-                        try:
-                            await asyncio.sleep(wait_ms / 1000)
-                        except asyncio.CancelledError:
-                            self.logger.bind(tag=TAG).debug("音频发送任务被取消")
-                            raise
-                        # 等待结束后重新检查时间（循环回到 while True）
-                    else:
-                        # 时间已到，跳出等待循环
-                        break
+                # 播放时间在半个节拍以内的包在本节拍发送，各包发送时间的误差不超过半个节拍且不累积
+                if (
+                    self._get_elapsed_ms() + self.scheduler.tick * 500
+                    < self.play_position
+                ):
+                    # 还不到发送时间，在该包的播放时间所在节拍再唤醒
+                    self.scheduler.schedule(
+                        self, self.start_timestamp + self.play_position / 1000
+                    )
+                    return
 
                 # 时间已到，从队列移除并发送
                 self.queue.popleft()
-                self.play_position += self.frame_duration
-                try:
-                    await send_audio_callback(opus_packet)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"发送音频失败: {e}")
-                    raise
-
-        # 队列处理完后清除事件
-        self.queue_empty_event.set()
-        self.queue_has_data_event.clear()
-        self._last_queue_empty_time = time.monotonic()  # 记录队列清空时间
+                self.play_position += duration_ms
+                self.scheduler.packets += 1
+                await self._send_audio_callback(payload)
+        except asyncio.CancelledError:
+            self.logger.bind(tag=TAG).debug("音频发送已停止")
+            if generation == self._generation:
+                self._stop()
+            return
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"发送音频失败: {e}")
+            if generation == self._generation:
+                self._stop()
+            return
+
+        if generation == self._generation:
+            # 队列处理完后清除事件
+            self.queue_empty_event.set()
+            self.queue_has_data_event.clear()
+            self._last_queue_empty_time = time.monotonic()  # 记录队列清空时间
 
     def start_sending(self, send_audio_callback):
         """
-        启动异步发送任务
+        启动发送，由节拍器按播放时间驱动
 
         Args:
-            send_audio_callback: 发送音频的回调函数
-
-        Returns:
-            asyncio.Task: 发送任务
+            send_audio_callback: 发送音频的回调函数 async def(opus_packet)
         """
-
-        async def _send_loop():
-            try:
-                while True:
-                    # 等待队列数据事件，不轮询等待占用CPU
-                    await self.queue_has_data_event.wait()
-
-                    await self.check_queue(send_audio_callback)
-            except asyncio.CancelledError:
-                self.logger.bind(tag=TAG).debug("音频发送循环已停止")
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"音频发送循环异常: {e}")
-
-        self.pending_send_task = asyncio.create_task(_send_loop())
-        return self.pending_send_task
+        self._send_audio_callback = send_audio_callback
+        self._sending = True
+        if self.queue:
+            self.scheduler.schedule(self, time.monotonic())
 
     def stop_sending(self):
-        """停止发送任务"""
-        if self.pending_send_task and not self.pending_send_task.done():
-            self.pending_send_task.cancel()
-            self.logger.bind(tag=TAG).debug("已取消音频发送任务")
+        """停止发送"""
+        if self._sending:
+            self.logger.bind(tag=TAG).debug("已停止音频发送")
+        self._stop()
+
+    def _stop(self):
+        self._generation += 1
+        self._sending = False
+        self.scheduler.unschedule(self)
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
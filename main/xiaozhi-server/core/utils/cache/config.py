@@ -20,6 +20,9 @@ class CacheType(Enum):
     DEVICE_PROMPT = "device_prompt"
     VOICEPRINT_HEALTH = "voiceprint_health"  # 声纹识别健康检查
     AUDIO_DATA = "audio_data"  # 音频数据缓存
+    TOOL_RESULT = "tool_result"  # 工具调用结果缓存
+    NEWS = "news"  # 新闻列表缓存
+    CONTEXT_DATA = "context_data"  # 设备动态上下文数据缓存
 
 
 @dataclass
@@ -62,5 +65,14 @@ class CacheConfig:
             CacheType.AUDIO_DATA: cls(
                 strategy=CacheStrategy.TTL, ttl=600, max_size=100  # 10分钟过期
             ),
+            CacheType.TOOL_RESULT: cls(
+                strategy=CacheStrategy.TTL_LRU, ttl=300, max_size=2000  # 按工具声明的TTL过期
+            ),
+            CacheType.NEWS: cls(
+                strategy=CacheStrategy.TTL, ttl=300, max_size=100  # 5分钟过期
+            ),
+            CacheType.CONTEXT_DATA: cls(
+                strategy=CacheStrategy.TTL_LRU, ttl=86400, max_size=5000  # 24小时，期间按刷新间隔后台更新
+            ),
         }
         return configs.get(cache_type, cls())
@@ -181,6 +181,12 @@ class GlobalCacheManager:
 
         return deleted_count
 
+    def get_statistics(self) -> Dict[str, int]:
+        """获取命中、未命中、淘汰等累计统计及当前条目数"""
+        stats = dict(self._stats)
+        stats["entries"] = sum(len(cache) for cache in list(self._caches.values()))
+        return stats
+
     def _cleanup_expired(self, cache_name: str) -> int:
         """清理过期条目"""
         if cache_name not in self._caches:
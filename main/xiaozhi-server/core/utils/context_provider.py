@@ -1,64 +1,230 @@
+import time
+import asyncio
 import httpx
-from typing import Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
 from config.logger import setup_logging
 
 TAG = __name__
 
+# 单个上下文源的请求超时时间（秒）
+PROVIDER_REQUEST_TIMEOUT = 3
+# 所有上下文源并发请求的总超时时间（秒），超时未返回的请求在后台继续完成并写入缓存
+DEFAULT_FETCH_DEADLINE = 3
+# 缓存刷新间隔（秒），超过后先返回缓存内容，再在后台刷新
+DEFAULT_REFRESH_INTERVAL = 300
+
+# 进程内共享的异步HTTP客户端（复用连接池），与创建它的事件循环绑定
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的 httpx.AsyncClient，必须在事件循环中调用"""
+    global _shared_client, _shared_client_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client_loop is not loop or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(PROVIDER_REQUEST_TIMEOUT, connect=2.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _shared_client_loop = loop
+    return _shared_client
+
+
+@dataclass
+class ContextEntry:
+    """单个上下文源在某设备下的缓存条目"""
+
+    lines: List[str] = field(default_factory=list)
+    etag: Optional[str] = None
+    fetched_at: float = 0.0
+
+
 class ContextDataProvider:
-    """数据上下文填充，负责从配置的API获取数据"""
-    
+    """数据上下文填充，负责从配置的API获取数据
+
+    - 所有上下文源并发请求，总耗时受 fetch_deadline 限制
+    - 结果按设备缓存在全局缓存管理器中，支持 ETag 条件请求
+    - 缓存超过 refresh_interval 后先返回旧数据，并在后台刷新
+    """
+
+    # 正在后台刷新的 (device_id, url)，避免重复刷新
+    _refreshing = set()
+    # 持有后台任务的引用，防止任务执行中被垃圾回收
+    _background_tasks = set()
+
     def __init__(self, config: Dict[str, Any], logger=None):
         self.config = config
         self.logger = logger or setup_logging()
         self.context_data = ""
 
-    def fetch_all(self, device_id: str) -> str:
-        """获取所有配置的上下文数据"""
-        context_providers = self.config.get("context_providers", [])
-        if not context_providers:
+        from core.utils.cache.manager import cache_manager, CacheType
+
+        self.cache_manager = cache_manager
+        self.CacheType = CacheType
+
+    def _settings(self):
+        settings = self.config.get("context_provider_settings") or {}
+        fetch_deadline = float(settings.get("timeout", DEFAULT_FETCH_DEADLINE))
+        refresh_interval = float(
+            settings.get("refresh_interval", DEFAULT_REFRESH_INTERVAL)
+        )
+        return fetch_deadline, refresh_interval
+
+    def _get_providers(self) -> List[Dict[str, Any]]:
+        context_providers = self.config.get("context_providers", []) or []
+        return [p for p in context_providers if isinstance(p, dict) and p.get("url")]
+
+    def fetch_all(self, device_id: str, loop: asyncio.AbstractEventLoop) -> str:
+        """在线程中同步获取所有上下文数据，实际请求在事件循环中并发执行"""
+        if not self._get_providers():
+            self.context_data = ""
             return ""
+        fetch_deadline, _ = self._settings()
+        future = asyncio.run_coroutine_threadsafe(
+            self.fetch_all_async(device_id), loop
+        )
+        try:
+            return future.result(timeout=fetch_deadline + 1)
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"获取上下文数据失败: {e}")
+            return self.context_data
 
-        formatted_lines = []
-        for provider in context_providers:
-            url = provider.get("url")
-            headers = provider.get("headers", {})
+    async def fetch_all_async(self, device_id: str) -> str:
+        """获取所有配置的上下文数据"""
+        providers = self._get_providers()
+        if not providers:
+            self.context_data = ""
+            return ""
 
-            if not url:
+        fetch_deadline, refresh_interval = self._settings()
+        now = time.time()
+        results: List[List[str]] = [[] for _ in providers]
+        tasks = {}
+        for index, provider in enumerate(providers):
+            url = provider["url"]
+            entry = self.cache_manager.get(
+                self.CacheType.CONTEXT_DATA, self._cache_key(device_id, url)
+            )
+            if entry is None:
+                tasks[index] = asyncio.create_task(
+                    self._fetch_one(device_id, provider, None)
+                )
                 continue
+            results[index] = entry.lines
+            if now - entry.fetched_at > refresh_interval:
+                self._schedule_refresh(device_id, provider, entry)
+
+        if tasks:
+            # 超时未完成的请求不取消，完成后写入缓存供下次使用
+            done, pending = await asyncio.wait(
+                tasks.values(), timeout=fetch_deadline
+            )
+            for index, task in tasks.items():
+                if task in done and not task.cancelled() and task.exception() is None:
+                    results[index] = task.result()
+            for task in pending:
+                self._keep_task(task)
+            if pending:
+                self.logger.bind(tag=TAG).warning(
+                    f"{len(pending)} 个上下文源在 {fetch_deadline} 秒内未返回，本次跳过"
+                )
 
-            try:
-                headers = headers.copy() if isinstance(headers, dict) else {}
-                # 将 device_id 添加到请求头
-                headers["device-id"] = device_id
-                
-                # 发送请求
-                response = httpx.get(url, headers=headers, timeout=3)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, dict):
-                        if result.get("code") == 0:
-                            data = result.get("data")
-                            # 格式化数据
-                            if isinstance(data, dict):
-                                for k, v in data.items():
-                                    formatted_lines.append(f"- **{k}：** {v}")
-                            elif isinstance(data, list):
-                                for item in data:
-                                    formatted_lines.append(f"- {item}")
-                            else:
-                                formatted_lines.append(f"- {data}")
-                        else:
-                            self.logger.bind(tag=TAG).warning(f"API {url} 返回错误码: {result.get('msg')}")
-                    else:
-                        self.logger.bind(tag=TAG).warning(f"API {url} 返回的不是JSON字典")
-                else:
-                    self.logger.bind(tag=TAG).warning(f"API {url} 请求失败: {response.status_code}")
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"获取上下文数据 {url} 失败: {e}")
-        
         # 将所有格式化后的行拼接成一个字符串
-        self.context_data = "\n".join(formatted_lines)
+        self.context_data = "\n".join(line for lines in results for line in lines)
         if self.context_data:
             self.logger.bind(tag=TAG).debug(f"已注入动态上下文数据:\n{self.context_data}")
         return self.context_data
+
+    def _schedule_refresh(self, device_id: str, provider: Dict[str, Any], entry):
+        refresh_key = (device_id, provider["url"])
+        if refresh_key in ContextDataProvider._refreshing:
+            return
+        ContextDataProvider._refreshing.add(refresh_key)
+
+        async def _refresh():
+            try:
+                await self._fetch_one(device_id, provider, entry)
+            finally:
+                ContextDataProvider._refreshing.discard(refresh_key)
+
+        self._keep_task(asyncio.create_task(_refresh()))
+
+    @classmethod
+    def _keep_task(cls, task: asyncio.Task):
+        cls._background_tasks.add(task)
+        task.add_done_callback(cls._background_tasks.discard)
+
+    async def _fetch_one(
+        self, device_id: str, provider: Dict[str, Any], entry: Optional[ContextEntry]
+    ) -> List[str]:
+        """请求单个上下文源，返回格式化后的行，并更新缓存"""
+        url = provider.get("url")
+        headers = provider.get("headers", {})
+        try:
+            headers = headers.copy() if isinstance(headers, dict) else {}
+            # 将 device_id 添加到请求头
+            headers["device-id"] = device_id
+            if entry is not None and entry.etag:
+                headers["If-None-Match"] = entry.etag
+
+            # 发送请求
+            client = get_shared_http_client()
+            response = await client.get(url, headers=headers)
+
+            if response.status_code == 304 and entry is not None:
+                # 内容未变化，仅刷新时间
+                entry.fetched_at = time.time()
+                self._store(device_id, url, entry)
+                return entry.lines
+
+            if response.status_code != 200:
+                self.logger.bind(tag=TAG).warning(f"API {url} 请求失败: {response.status_code}")
+                return entry.lines if entry else []
+
+            result = response.json()
+            if not isinstance(result, dict):
+                self.logger.bind(tag=TAG).warning(f"API {url} 返回的不是JSON字典")
+                return entry.lines if entry else []
+            if result.get("code") != 0:
+                self.logger.bind(tag=TAG).warning(f"API {url} 返回错误码: {result.get('msg')}")
+                return entry.lines if entry else []
+
+            lines = self._format_data(result.get("data"))
+            self._store(
+                device_id,
+                url,
+                ContextEntry(
+                    lines=lines,
+                    etag=response.headers.get("etag"),
+                    fetched_at=time.time(),
+                ),
+            )
+            return lines
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"获取上下文数据 {url} 失败: {e}")
+            return entry.lines if entry else []
+
+    @staticmethod
+    def _cache_key(device_id: str, url: str) -> str:
+        return f"{device_id}|{url}"
+
+    def _store(self, device_id: str, url: str, entry: ContextEntry):
+        self.cache_manager.set(
+            self.CacheType.CONTEXT_DATA, self._cache_key(device_id, url), entry
+        )
+
+    @staticmethod
+    def _format_data(data) -> List[str]:
+        """格式化数据"""
+        formatted_lines = []
+        if isinstance(data, dict):
+            for k, v in data.items():
+                formatted_lines.append(f"- **{k}：** {v}")
+        elif isinstance(data, list):
+            for item in data:
+                formatted_lines.append(f"- {item}")
+        else:
+            formatted_lines.append(f"- {data}")
+        return formatted_lines
@@ -0,0 +1,507 @@
+"""运行时诊断
+
+线上节点性能下降时用于定位问题，由HTTP服务的诊断接口调用：
+- 按需采样所有线程的调用栈，输出火焰图工具可直接使用的折叠栈格式（flamegraph.pl / speedscope）
+- tracemalloc 内存分配排行及两次快照的差异
+- asyncio 任务列表和事件循环延迟直方图
+- 阻塞事件循环的调用检测，按模块归因并保留调用栈
+- 每个连接的线程与队列积压情况
+
+未调用诊断接口时只有事件循环延迟监测在运行（默认每50毫秒投递一次探测回调），其余功能不产生开销。
+"""
+
+import os
+import sys
+import time
+import asyncio
+import weakref
+import threading
+import contextlib
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 事件循环延迟直方图的桶上限（毫秒）
+LOOP_LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# 项目根目录（xiaozhi-server），用于把阻塞调用归因到项目内的模块
+_PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+# ---------------------------------------------------------------------------
+# 连接登记
+# ---------------------------------------------------------------------------
+
+_connections: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def register_connection(conn):
+    """登记活跃连接，连接对象被回收后自动移除"""
+    _connections.add(conn)
+
+
+def _queue_size(obj, name) -> Optional[int]:
+    q = getattr(obj, name, None) if obj is not None else None
+    try:
+        return q.qsize() if q is not None else None
+    except Exception:
+        return None
+
+
+def _thread_alive(obj, name) -> Optional[bool]:
+    thread = getattr(obj, name, None) if obj is not None else None
+    return thread.is_alive() if isinstance(thread, threading.Thread) else None
+
+
+def connection_snapshot() -> List[Dict[str, Any]]:
+    """每个连接的线程与队列积压情况"""
+    now = time.time() * 1000
+    result = []
+    for conn in list(_connections):
+        tts = getattr(conn, "tts", None)
+        executor = getattr(conn, "executor", None)
+        last_activity = getattr(conn, "last_activity_time", 0) or 0
+        result.append(
+            {
+                "session_id": getattr(conn, "session_id", None),
+                "device_id": getattr(conn, "device_id", None),
+                "client_ip": getattr(conn, "client_ip", None),
+                "closed": conn.stop_event.is_set() if hasattr(conn, "stop_event") else None,
+                "client_is_speaking": getattr(conn, "client_is_speaking", None),
+                "hibernated": getattr(conn, "hibernated", False),
+                "idle_seconds": round((now - last_activity) / 1000, 1) if last_activity else None,
+                "queues": {
+                    "asr_audio": _queue_size(conn, "asr_audio_queue"),
+                    "report": _queue_size(conn, "report_queue"),
+                    "tts_text": _queue_size(tts, "tts_text_queue"),
+                    "tts_audio": _queue_size(tts, "tts_audio_queue"),
+                },
+                "threads": {
+                    "executor_workers": len(getattr(executor, "_threads", ()) or ()),
+                    "executor_pending": _queue_size(executor, "_work_queue"),
+                    "asr": _thread_alive(conn, "asr_priority_thread"),
+                    "report": _thread_alive(conn, "report_thread"),
+                    "tts_text": _thread_alive(tts, "tts_priority_thread"),
+                    "tts_audio": _thread_alive(tts, "audio_play_priority_thread"),
+                },
+            }
+        )
+    return result
+
+
+# ---------------------------------------------------------------------------
+# CPU 采样
+# ---------------------------------------------------------------------------
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    # 缩短路径，火焰图中只保留项目内的相对路径或库文件名
+    for marker in ("xiaozhi-server/", "site-packages/"):
+        pos = filename.rfind(marker)
+        if pos != -1:
+            filename = filename[pos + len(marker) :]
+            break
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+def sample_cpu_profile(seconds: float, interval: float = 0.01) -> str:
+    """采样所有线程的调用栈，返回折叠栈文本（每行：线程;外层;...;内层 次数）
+
+    同一时间只允许一个采样任务，采样线程自身不计入结果。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("已有CPU采样正在进行")
+    try:
+        own_ident = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(interval)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    finally:
+        _profile_lock.release()
+
+
+# ---------------------------------------------------------------------------
+# 内存分配
+# ---------------------------------------------------------------------------
+
+
+class AllocationTracker:
+    """tracemalloc 的开关与快照对比，只在开启期间有开销"""
+
+    def __init__(self):
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._last_snapshot = None
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._last_snapshot = None
+
+    def top(self, limit: int = 20, diff: bool = False) -> Dict[str, Any]:
+        """返回分配最多的代码行；diff 为 True 时与上一次快照对比"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc 未开启")
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                )
+            )
+            previous = self._last_snapshot
+            self._last_snapshot = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "diff": bool(diff and previous is not None),
+            "top": [],
+        }
+        if diff and previous is not None:
+            for stat in snapshot.compare_to(previous, "lineno")[:limit]:
+                frame = stat.traceback[0]
+                result["top"].append(
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size_bytes": stat.size,
+                        "size_diff_bytes": stat.size_diff,
+                        "count": stat.count,
+                        "count_diff": stat.count_diff,
+                    }
+                )
+        else:
+            for stat in snapshot.statistics("lineno")[:limit]:
+                frame = stat.traceback[0]
+                result["top"].append(
+                    {
+                        "location": f"{frame.filename}:{frame.lineno}",
+                        "size_bytes": stat.size,
+                        "count": stat.count,
+                    }
+                )
+        return result
+
+
+allocation_tracker = AllocationTracker()
+
+
+# ---------------------------------------------------------------------------
+# asyncio
+# ---------------------------------------------------------------------------
+
+
+class BlockingCallError(RuntimeError):
+    """严格模式下检测到超过阈值的阻塞调用"""
+
+    def __init__(self, violations: List[Dict[str, Any]]):
+        self.violations = violations
+        lines = [
+            f"{v['duration_ms']}ms 来自 {v['module']}: {v['stack'][-1] if v['stack'] else '?'}"
+            for v in violations
+        ]
+        super().__init__(f"检测到 {len(violations)} 次阻塞事件循环的调用:\n" + "\n".join(lines))
+
+
+class LoopLagMonitor:
+    """事件循环延迟监测与阻塞调用检测
+
+    后台线程每隔 interval_ms 向事件循环投递一个探测回调，以回调等待执行的时间衡量事件循环延迟；
+    等待超过 threshold_ms 时抓取事件循环线程的调用栈，并归因到栈中最内层的项目模块
+    （如 core.providers.asr.sherpa_onnx_local），按模块统计次数与耗时直方图。
+
+    严格模式（strict_ms > 0）下超过 strict_ms 的阻塞记为违规，测试中可用 strict() 包裹被测代码，
+    退出时若有违规则抛出 BlockingCallError。
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = 50,
+        threshold_ms: float = 100,
+        strict_ms: float = 0,
+        stack_limit: int = 20,
+        max_events: int = 50,
+        log_interval: float = 60,
+    ):
+        self.interval = interval_ms / 1000
+        self.threshold_ms = threshold_ms
+        self.strict_ms = strict_ms
+        self.stack_limit = stack_limit
+        # 同一模块的阻塞告警日志最短间隔（秒），避免刷屏
+        self.log_interval = log_interval
+        self.buckets = [0] * (len(LOOP_LAG_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.modules: Dict[str, Dict[str, Any]] = {}
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        # 严格模式长时间开启时只保留最近的违规记录
+        self.violations: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_log: Dict[str, float] = {}
+        self._suppressed: Counter = Counter()
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 diagnostics.watchdog 配置"""
+        config = config or {}
+        if "interval_ms" in config:
+            self.interval = max(float(config["interval_ms"]), 1) / 1000
+        self.threshold_ms = float(config.get("threshold_ms", self.threshold_ms))
+        self.strict_ms = float(config.get("strict_ms", self.strict_ms) or 0)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """在事件循环中调用，启动探测线程"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            done = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(done.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                break
+            stack = None
+            capture_ms = (
+                min(self.threshold_ms, self.strict_ms)
+                if self.strict_ms > 0
+                else self.threshold_ms
+            )
+            if not done.wait(capture_ms / 1000):
+                # 事件循环仍被占用，抓取此刻的调用栈
+                stack = self._capture_stack()
+                while not done.wait(self.interval) and not self._stop.is_set():
+                    pass
+            lag_ms = (time.monotonic() - sent) * 1000
+            # 抓栈后事件循环恰好空闲时不计为阻塞事件
+            self.observe(lag_ms, stack if lag_ms >= capture_ms else None)
+
+    def _capture_stack(self) -> Tuple[str, List[str]]:
+        """在事件循环阻塞期间抓取调用栈，立即生成模块归因和帧描述
+
+        只返回字符串，不持有帧对象：事件循环恢复后帧的行号会变化，持有帧还会使局部变量无法释放
+        """
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = []
+        try:
+            while frame is not None and len(frames) < self.stack_limit:
+                frames.append(frame)
+                frame = frame.f_back
+            # 由外到内
+            frames.reverse()
+            return self._attribute(frames), [_frame_label(f) for f in frames]
+        finally:
+            del frame, frames
+
+    @staticmethod
+    def _attribute(frames) -> str:
+        """取最内层的项目代码帧所在模块，库代码内部的阻塞归到调用它的项目模块"""
+        for frame in reversed(frames):
+            filename = frame.f_code.co_filename
+            if filename.startswith(_PROJECT_ROOT) and "site-packages" not in filename:
+                return frame.f_globals.get("__name__", filename)
+        if frames:
+            return frames[-1].f_globals.get("__name__", frames[-1].f_code.co_filename)
+        return "unknown"
+
+    @staticmethod
+    def _bucket(lag_ms: float) -> int:
+        for i, bound in enumerate(LOOP_LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                return i
+        return len(LOOP_LAG_BUCKETS_MS)
+
+    def observe(self, lag_ms: float, stack: Optional[Tuple[str, List[str]]] = None):
+        index = self._bucket(lag_ms)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total_ms += lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+        if stack is None:
+            return
+
+        module, labels = stack
+        event = {
+            "time": time.time(),
+            "duration_ms": round(lag_ms, 1),
+            "module": module,
+            "stack": labels,
+        }
+        with self._lock:
+            stats = self.modules.setdefault(
+                module,
+                {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "buckets": [0] * (len(LOOP_LAG_BUCKETS_MS) + 1),
+                },
+            )
+            stats["count"] += 1
+            stats["total_ms"] += lag_ms
+            stats["max_ms"] = max(stats["max_ms"], lag_ms)
+            stats["buckets"][index] += 1
+            self.events.append(event)
+            if self.strict_ms > 0 and lag_ms >= self.strict_ms:
+                self.violations.append(event)
+        if lag_ms >= self.threshold_ms:
+            self._log_event(event)
+
+    def _log_event(self, event):
+        module = event["module"]
+        now = time.monotonic()
+        if now - self._last_log.get(module, -self.log_interval) < self.log_interval:
+            self._suppressed[module] += 1
+            return
+        self._last_log[module] = now
+        suppressed = self._suppressed.pop(module, 0)
+        logger.bind(tag=TAG).warning(
+            f"事件循环被阻塞 {event['duration_ms']}ms，来源: {module}"
+            + (f"（期间另有 {suppressed} 次未记录）" if suppressed else "")
+            + "\n    "
+            + "\n    ".join(event["stack"][-5:])
+        )
+
+    def check(self):
+        """存在严格模式违规时抛出 BlockingCallError，并清空违规记录"""
+        with self._lock:
+            violations = list(self.violations)
+            self.violations.clear()
+        if violations:
+            raise BlockingCallError(violations)
+
+    @contextlib.asynccontextmanager
+    async def strict(self, max_ms: float):
+        """测试用：代码块内任何超过 max_ms 的阻塞都会在退出时抛出 BlockingCallError
+
+        async with loop_lag_monitor.strict(50):
+            await run_scenario()
+        """
+        previous = self.strict_ms
+        started_here = not self.running
+        with self._lock:
+            self.violations.clear()
+        self.strict_ms = max_ms
+        if started_here:
+            self.start()
+        try:
+            yield self
+            # 等待最后一个探测完成
+            await asyncio.sleep(self.interval * 2)
+        finally:
+            self.strict_ms = previous
+            if started_here:
+                self.stop()
+        self.check()
+
+    @staticmethod
+    def _histogram(buckets) -> Dict[str, int]:
+        labels = [f"<={bound}ms" for bound in LOOP_LAG_BUCKETS_MS] + [
+            f">{LOOP_LAG_BUCKETS_MS[-1]}ms"
+        ]
+        return dict(zip(labels, buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "samples": self.count,
+                "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 2),
+                "histogram": self._histogram(self.buckets),
+            }
+
+    def blocking_report(self) -> Dict[str, Any]:
+        """按模块统计的阻塞次数、耗时直方图及最近的阻塞事件（含调用栈）"""
+        with self._lock:
+            modules = {
+                name: {
+                    "count": stats["count"],
+                    "total_ms": round(stats["total_ms"], 1),
+                    "max_ms": round(stats["max_ms"], 1),
+                    "histogram": self._histogram(stats["buckets"]),
+                }
+                for name, stats in sorted(
+                    self.modules.items(), key=lambda item: -item[1]["total_ms"]
+                )
+            }
+            return {
+                "threshold_ms": self.threshold_ms,
+                "strict_ms": self.strict_ms,
+                "violations": len(self.violations),
+                "modules": modules,
+                "events": list(self.events),
+            }
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+def dump_tasks(stack_limit: int = 5) -> List[Dict[str, Any]]:
+    """列出当前事件循环中的所有任务及其挂起位置，需在事件循环线程中调用"""
+    result = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        # 协程的 get_stack(limit) 保留最内层的帧
+        frames = task.get_stack(limit=stack_limit)
+        result.append(
+            {
+                "name": task.get_name(),
+                "coro": getattr(coro, "__qualname__", repr(coro)),
+                "done": task.done(),
+                # 由外到内的挂起位置
+                "stack": [_frame_label(frame) for frame in frames],
+            }
+        )
+    result.sort(key=lambda item: item["coro"])
+    return result
@@ -4,6 +4,45 @@ from typing import List, Dict
 from datetime import datetime
 
 
+CURRENT_TIME_PLACEHOLDER = "{{current_time}}"
+MEMORY_BLOCK_PATTERN = re.compile(r"<memory>.*?</memory>", flags=re.DOTALL)
+
+
+class CompiledSystemPrompt:
+    """预编译的系统提示词
+
+    系统提示词在会话内很少变化，但每轮都需要填充当前时间和记忆。
+    这里在提示词变化时一次性切分出静态片段和动态占位（时间、记忆块），
+    每轮只需拼接片段，避免对整段提示词做字符串替换和正则匹配。
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        # 片段列表：(False, 按时间占位切分的文本片段) 或 (True, 原始记忆块的切分片段)
+        self.segments = []
+        last_end = 0
+        for match in MEMORY_BLOCK_PATTERN.finditer(source):
+            self.segments.append(
+                (False, source[last_end : match.start()].split(CURRENT_TIME_PLACEHOLDER))
+            )
+            self.segments.append(
+                (True, match.group(0).split(CURRENT_TIME_PLACEHOLDER))
+            )
+            last_end = match.end()
+        self.segments.append(
+            (False, source[last_end:].split(CURRENT_TIME_PLACEHOLDER))
+        )
+
+    def render(self, current_time: str, memory_str: str = None) -> str:
+        parts = []
+        for is_memory_block, pieces in self.segments:
+            if is_memory_block and memory_str is not None:
+                parts.append(f"<memory>\n{memory_str}\n</memory>")
+            else:
+                parts.append(current_time.join(pieces))
+        return "".join(parts)
+
+
 class Message:
     def __init__(
             self,
@@ -27,6 +66,7 @@ class Dialogue:
         self.dialogue: List[Message] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._compiled_system_prompt: CompiledSystemPrompt = None
 
     def put(self, message: Message):
         self.dialogue.append(message)
@@ -61,6 +101,16 @@ class Dialogue:
         else:
             self.put(Message(role="system", content=new_content))
 
+    def _get_compiled_system_prompt(self, content: str) -> CompiledSystemPrompt:
+        """系统提示词内容变化时才重新编译"""
+        compiled = self._compiled_system_prompt
+        if compiled is None or (
+            compiled.source is not content and compiled.source != content
+        ):
+            compiled = CompiledSystemPrompt(content or "")
+            self._compiled_system_prompt = compiled
+        return compiled
+
     def _ensure_tool_calls_complete(self, messages: List[Message]) -> List[Message]:
         """
         确保所有 tool_calls 都有对应的 tool 响应
@@ -104,21 +154,10 @@ class Dialogue:
         )
 
         if system_message:
-            full_prompt = system_message.content
-
-            # 替换时间占位符
-            full_prompt = full_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
-            )
-
-            # 填充记忆
-            if memory_str is not None:
-                full_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    full_prompt,
-                    flags=re.DOTALL,
-                )
+            # 替换时间占位符并填充记忆
+            full_prompt = self._get_compiled_system_prompt(
+                system_message.content
+            ).render(datetime.now().strftime("%H:%M"), memory_str)
 
             # 追加说话人信息
             try:
@@ -0,0 +1,513 @@
+"""音频前端DSP工作进程
+
+开启后每个连接被分配到一个工作进程，上行Opus包经共享内存环形缓冲区送入工作进程，
+由工作进程完成Opus解码、服务端AEC与VAD模型推理，再把PCM和各分块的语音概率经另一个
+环形缓冲区送回。主进程只负责收发与说话状态判定，CPU密集的部分不再占用事件循环和GIL。
+
+每个工作进程有一对单生产者单消费者的环形缓冲区（主进程 -> 工作进程、工作进程 -> 主进程），
+写入数据后通过管道写一个字节通知对方，主进程用事件循环的 add_reader 接收通知，不需要额外线程。
+"""
+
+import os
+import json
+import time
+import struct
+import asyncio
+import itertools
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 消息类型
+MSG_OPEN = 1  # 打开音频流，负载为JSON格式的VAD配置
+MSG_AUDIO = 2  # 上行Opus包，timestamp>0 时做AEC
+MSG_REFERENCE = 3  # 下行Opus包，作为AEC参考信号
+MSG_RESET = 4  # 清空VAD未满一块的缓冲
+MSG_CLOSE = 5  # 关闭音频流
+MSG_RESULT = 6  # 工作进程返回的PCM与语音概率
+
+# 每条消息的头部：负载长度、音频流ID、消息类型、时间戳
+_HEADER = struct.Struct("<IIII")
+# 环形缓冲区头部，存放写计数与读计数
+_RING_HEADER_SIZE = 128
+
+# 上行音频固定为16kHz单声道，单包最长按120ms分配解码缓冲
+SAMPLE_RATE = 16000
+MAX_FRAME_SIZE = SAMPLE_RATE * 120 // 1000
+# AEC参考信号的保留时长（秒），与连接内缓存的过期时间一致
+REFERENCE_TTL = 120
+
+
+class DspFrame(NamedTuple):
+    """工作进程处理后的一帧上行音频"""
+
+    pcm: bytes
+    speech_probs: List[float]
+
+
+class ShmRing:
+    """基于共享内存的单生产者单消费者环形缓冲区，每个槽位存放一条消息
+
+    写入方先写数据再递增写计数，读取方先读数据再递增读计数。两个进程不经过锁直接读写共享内存时，
+    只有在 x86 这类保证存储顺序的CPU上，对方才一定先看到数据再看到计数；ARM 等弱内存序的CPU上
+    可能先看到计数而读到旧数据。因此计数的读写都在跨进程锁内进行，锁的获取与释放同时起到内存屏障的作用，
+    槽位数据本身仍在锁外拷贝。通知管道只用于唤醒对方，不承担可见性保证。
+    """
+
+    def __init__(self, slots: int, slot_size: int, lock, name: Optional[str] = None):
+        """
+        Args:
+            slots: 槽位数
+            slot_size: 单个槽位字节数
+            lock: 保护读写计数的跨进程锁（multiprocessing 的 Lock），两端需使用同一把锁
+            name: 共享内存名称，为空时创建新的共享内存
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.lock = lock
+        size = _RING_HEADER_SIZE + slots * slot_size
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self._buf = self.shm.buf
+        self._counters = self._buf[:16].cast("Q")
+        if self.owner:
+            self._counters[0] = 0
+            self._counters[1] = 0
+
+    @property
+    def max_payload(self) -> int:
+        return self.slot_size - _HEADER.size
+
+    def __len__(self):
+        with self.lock:
+            return self._counters[0] - self._counters[1]
+
+    def put(
+        self, stream_id: int, msg_type: int, timestamp: int, payload: bytes
+    ) -> bool:
+        """写入一条消息，缓冲区已满或负载过大时返回 False"""
+        if len(payload) > self.max_payload:
+            return False
+        with self.lock:
+            write_index = self._counters[0]
+            if write_index - self._counters[1] >= self.slots:
+                return False
+        offset = _RING_HEADER_SIZE + (write_index % self.slots) * self.slot_size
+        _HEADER.pack_into(
+            self._buf, offset, len(payload), stream_id, msg_type, timestamp
+        )
+        start = offset + _HEADER.size
+        self._buf[start : start + len(payload)] = payload
+        # 数据写完后再在锁内发布写计数，读取方在锁内看到新计数时数据一定已可见
+        with self.lock:
+            self._counters[0] = write_index + 1
+        return True
+
+    def get(self):
+        """读取一条消息，返回 (stream_id, msg_type, timestamp, payload)，为空时返回 None"""
+        with self.lock:
+            read_index = self._counters[1]
+            if read_index == self._counters[0]:
+                return None
+        offset = _RING_HEADER_SIZE + (read_index % self.slots) * self.slot_size
+        length, stream_id, msg_type, timestamp = _HEADER.unpack_from(self._buf, offset)
+        start = offset + _HEADER.size
+        payload = bytes(self._buf[start : start + length])
+        with self.lock:
+            self._counters[1] = read_index + 1
+        return stream_id, msg_type, timestamp, payload
+
+    def close(self):
+        self._counters.release()
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _drain_pipe(fd: int) -> bool:
+    """读空非阻塞的通知管道，对端已关闭时返回 False"""
+    while True:
+        try:
+            if not os.read(fd, 4096):
+                return False
+        except BlockingIOError:
+            return True
+
+
+def pack_result(pcm: bytes, speech_probs: List[float]) -> bytes:
+    return (
+        struct.pack(f"<H{len(speech_probs)}f", len(speech_probs), *speech_probs) + pcm
+    )
+
+
+def unpack_result(payload: bytes) -> DspFrame:
+    (count,) = struct.unpack_from("<H", payload)
+    probs = list(struct.unpack_from(f"<{count}f", payload, 2))
+    return DspFrame(payload[2 + count * 4 :], probs)
+
+
+# ---------------------------------------------------------------------------
+# 工作进程
+# ---------------------------------------------------------------------------
+
+
+class _StreamState:
+    """工作进程中单个音频流的状态，属性名与连接对象一致，以便复用 VAD 的推理代码"""
+
+    def __init__(self, vad):
+        import opuslib_next
+
+        self.vad = vad
+        self.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1)
+        self.reference_decoder = None
+        self.client_audio_buffer = bytearray()
+        # AEC参考信号：时间戳 -> PCM，按写入顺序过期
+        self.aec_audio_cache: Dict[int, bytes] = {}
+        self.aec_audio_cache_time: Dict[int, float] = {}
+
+    def add_reference(self, opus_packet: bytes, timestamp: int):
+        import opuslib_next
+
+        if self.reference_decoder is None:
+            self.reference_decoder = opuslib_next.Decoder(SAMPLE_RATE, 1)
+        now = time.time()
+        self.aec_audio_cache[timestamp] = bytes(
+            self.reference_decoder.decode(opus_packet, MAX_FRAME_SIZE)
+        )
+        self.aec_audio_cache_time[timestamp] = now
+        for ts, cache_time in list(self.aec_audio_cache_time.items()):
+            if now - cache_time <= REFERENCE_TTL:
+                break
+            self.aec_audio_cache.pop(ts, None)
+            self.aec_audio_cache_time.pop(ts, None)
+
+    def process(self, opus_packet: bytes, timestamp: int):
+        pcm = bytes(self.decoder.decode(opus_packet, MAX_FRAME_SIZE))
+        if timestamp > 0 and self.aec_audio_cache:
+            from core.utils.aec import apply_aec
+
+            try:
+                pcm = apply_aec(pcm, self.aec_audio_cache, timestamp)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"[AEC] 处理失败: {e}")
+        probs = self.vad.speech_probs(self, pcm) if self.vad is not None else []
+        return pcm, probs
+
+
+def _create_vad(vad_config: Optional[Dict[str, Any]], cache: Dict[str, Any]):
+    """同一工作进程内相同配置的VAD共用一个模型实例"""
+    if not vad_config:
+        return None
+    key = json.dumps(vad_config, sort_keys=True, ensure_ascii=False)
+    if key not in cache:
+        from core.utils.vad import create_instance
+
+        cache[key] = create_instance(vad_config["type"], vad_config["config"])
+    return cache[key]
+
+
+def _worker_main(
+    index,
+    request_ring,
+    result_ring,
+    slots,
+    slot_size,
+    request_pipe,
+    result_pipe,
+    request_lock,
+    result_lock,
+):
+    # 依赖缺失时直接退出，主进程读到管道EOF后改为本进程处理
+    import opuslib_next  # noqa: F401
+
+    requests = ShmRing(slots, slot_size, request_lock, name=request_ring)
+    results = ShmRing(slots, slot_size, result_lock, name=result_ring)
+    request_fd = request_pipe.fileno()
+    result_fd = result_pipe.fileno()
+    streams: Dict[int, _StreamState] = {}
+    vad_cache: Dict[str, Any] = {}
+    logger.bind(tag=TAG).info(f"DSP工作进程 {index} 已启动, pid={os.getpid()}")
+
+    try:
+        # 阻塞等待通知，一次读完管道中积压的所有通知；主进程退出时读到EOF
+        while os.read(request_fd, 65536):
+            produced = False
+            while True:
+                message = requests.get()
+                if message is None:
+                    break
+                stream_id, msg_type, timestamp, payload = message
+                try:
+                    if msg_type == MSG_AUDIO:
+                        stream = streams.get(stream_id)
+                        if stream is None:
+                            continue
+                        pcm, probs = stream.process(payload, timestamp)
+                        result = pack_result(pcm, probs)
+                        # 主进程来不及取走结果时等待，而不是丢弃已解码的音频
+                        while not results.put(stream_id, MSG_RESULT, timestamp, result):
+                            os.write(result_fd, b"\0")
+                            time.sleep(0.001)
+                        produced = True
+                    elif msg_type == MSG_REFERENCE:
+                        stream = streams.get(stream_id)
+                        if stream is not None:
+                            stream.add_reference(payload, timestamp)
+                    elif msg_type == MSG_OPEN:
+                        vad = _create_vad(json.loads(payload), vad_cache)
+                        streams[stream_id] = _StreamState(vad)
+                    elif msg_type == MSG_RESET:
+                        stream = streams.get(stream_id)
+                        if stream is not None:
+                            stream.client_audio_buffer.clear()
+                    elif msg_type == MSG_CLOSE:
+                        streams.pop(stream_id, None)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(
+                        f"DSP工作进程 {index} 处理消息失败: type={msg_type}, {e}"
+                    )
+            if produced:
+                os.write(result_fd, b"\0")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        requests.close()
+        results.close()
+
+
+# ---------------------------------------------------------------------------
+# 主进程
+# ---------------------------------------------------------------------------
+
+
+class DspStream:
+    """主进程中一个连接的音频流句柄，只能在事件循环线程中调用"""
+
+    def __init__(self, worker: "_WorkerHandle", stream_id: int, on_result):
+        self.worker = worker
+        self.stream_id = stream_id
+        self.on_result = on_result
+        self.closed = False
+
+    def submit_audio(self, opus_packet: bytes, timestamp: int = 0) -> bool:
+        """提交上行Opus包，timestamp>0 时在工作进程中做AEC"""
+        return self._submit(MSG_AUDIO, timestamp, opus_packet)
+
+    def submit_reference(self, opus_packet: bytes, timestamp: int) -> bool:
+        """提交下行Opus包作为AEC参考信号"""
+        return self._submit(MSG_REFERENCE, timestamp, opus_packet)
+
+    def reset(self):
+        self._submit(MSG_RESET, 0, b"")
+
+    def close(self):
+        if not self.closed:
+            self._submit(MSG_CLOSE, 0, b"")
+            self.closed = True
+            self.worker.streams.pop(self.stream_id, None)
+
+    def _submit(self, msg_type, timestamp, payload) -> bool:
+        if self.closed:
+            return False
+        return self.worker.submit(self.stream_id, msg_type, timestamp, payload)
+
+
+class _WorkerHandle:
+    def __init__(self, index, ctx, slots, slot_size):
+        self.index = index
+        self.requests = ShmRing(slots, slot_size, ctx.Lock())
+        self.results = ShmRing(slots, slot_size, ctx.Lock())
+        request_reader, request_writer = ctx.Pipe(duplex=False)
+        result_reader, result_writer = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.requests.name,
+                self.results.name,
+                slots,
+                slot_size,
+                request_reader,
+                result_writer,
+                self.requests.lock,
+                self.results.lock,
+            ),
+            name=f"dsp-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        # 子进程已持有各自的一端，主进程关闭不用的一端，对端退出时才能读到EOF
+        request_reader.close()
+        result_writer.close()
+        self._request_pipe = request_writer
+        self._result_pipe = result_reader
+        self.request_fd = request_writer.fileno()
+        self.result_fd = result_reader.fileno()
+        os.set_blocking(self.request_fd, False)
+        os.set_blocking(self.result_fd, False)
+        self.streams: Dict[int, DspStream] = {}
+        self.alive = True
+        self.dropped = 0
+        self._last_drop_log = 0.0
+        self._notify_pending = False
+        self._loop = None
+
+    def attach(self, loop):
+        self._loop = loop
+        loop.add_reader(self.result_fd, self._on_results)
+
+    def submit(self, stream_id, msg_type, timestamp, payload) -> bool:
+        if not self.alive:
+            return False
+        if not self.requests.put(stream_id, msg_type, timestamp, payload):
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._last_drop_log >= 10:
+                self._last_drop_log = now
+                logger.bind(tag=TAG).warning(
+                    f"DSP工作进程 {self.index} 请求缓冲区已满，累计丢弃 {self.dropped} 条"
+                )
+            return False
+        # 同一轮事件循环内的多次提交只通知一次
+        if not self._notify_pending:
+            self._notify_pending = True
+            self._loop.call_soon(self._notify)
+        return True
+
+    def _notify(self):
+        self._notify_pending = False
+        try:
+            os.write(self.request_fd, b"\0")
+        except BlockingIOError:
+            # 管道已满说明工作进程尚未读取之前的通知，届时会一并处理
+            pass
+        except OSError:
+            self._mark_dead()
+
+    def _on_results(self):
+        if not _drain_pipe(self.result_fd):
+            self._mark_dead()
+        while True:
+            message = self.results.get()
+            if message is None:
+                break
+            stream_id, _, _, payload = message
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                continue
+            try:
+                stream.on_result(unpack_result(payload))
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"处理DSP结果失败: {e}")
+
+    def _mark_dead(self):
+        if not self.alive:
+            return
+        self.alive = False
+        logger.bind(tag=TAG).error(
+            f"DSP工作进程 {self.index} 已退出，{len(self.streams)} 个连接改为在本进程处理"
+        )
+        if self._loop is not None:
+            self._loop.remove_reader(self.result_fd)
+        for stream in list(self.streams.values()):
+            stream.closed = True
+        self.streams.clear()
+
+    def stop(self):
+        if self._loop is not None and self.alive:
+            self._loop.remove_reader(self.result_fd)
+        self.alive = False
+        self._request_pipe.close()
+        self._result_pipe.close()
+        self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.requests.close()
+        self.results.close()
+
+
+class DspWorkerPool:
+    """DSP工作进程池，连接按当前音频流数量分配到最空闲的工作进程"""
+
+    def __init__(self, workers: int = 2, ring_slots: int = 1024, slot_size: int = 4096):
+        self.workers = workers
+        self.ring_slots = ring_slots
+        self.slot_size = slot_size
+        self._handles: List[_WorkerHandle] = []
+        self._stream_ids = itertools.count(1)
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 dsp_workers 配置"""
+        config = config or {}
+        workers = int(config.get("workers", 0) or 0)
+        self.workers = workers if workers > 0 else max(1, (os.cpu_count() or 2) // 2)
+        self.ring_slots = int(config.get("ring_slots", self.ring_slots))
+        self.slot_size = int(config.get("slot_size", self.slot_size))
+
+    @property
+    def running(self) -> bool:
+        return any(handle.alive for handle in self._handles)
+
+    def start(self):
+        """在事件循环中调用，启动工作进程"""
+        if self._handles:
+            return
+        loop = asyncio.get_running_loop()
+        # 主进程已有多个线程，使用 spawn 避免 fork 后继承锁的状态
+        ctx = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            handle = _WorkerHandle(index, ctx, self.ring_slots, self.slot_size)
+            handle.attach(loop)
+            self._handles.append(handle)
+        logger.bind(tag=TAG).info(f"已启动 {self.workers} 个DSP工作进程")
+
+    def stop(self):
+        for handle in self._handles:
+            try:
+                handle.stop()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"停止DSP工作进程失败: {e}")
+        self._handles = []
+
+    def open_stream(
+        self,
+        vad_config: Optional[Dict[str, Any]],
+        on_result: Callable[[DspFrame], Any],
+    ) -> Optional[DspStream]:
+        """为一个连接打开音频流，vad_config 为 {"type": ..., "config": {...}}，None 表示不做VAD推理"""
+        alive = [handle for handle in self._handles if handle.alive]
+        if not alive:
+            return None
+        handle = min(alive, key=lambda h: len(h.streams))
+        stream = DspStream(handle, next(self._stream_ids) & 0xFFFFFFFF, on_result)
+        payload = json.dumps(vad_config, ensure_ascii=False).encode("utf-8")
+        if not handle.submit(stream.stream_id, MSG_OPEN, 0, payload):
+            return None
+        handle.streams[stream.stream_id] = stream
+        return stream
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "worker": handle.index,
+                "pid": handle.process.pid,
+                "alive": handle.alive,
+                "streams": len(handle.streams),
+                "queued": len(handle.requests),
+                "dropped": handle.dropped,
+            }
+            for handle in self._handles
+        ]
+
+
+dsp_worker_pool = DspWorkerPool()
@@ -0,0 +1,134 @@
+"""自适应说话结束判定
+
+固定的静音阈值（min_silence_duration_ms）需要兼顾句中停顿，每轮对话都要多等这段时间。
+这里根据静音期间的语音概率、本句说话时长和流式识别的中间结果估计句子是否已经说完，
+说完的可能性越大，需要等待的静音越短，最短不低于配置的下限。
+"""
+
+import re
+from typing import Sequence
+
+# 句末标点
+FINAL_PUNCTUATION = tuple("。？！?!.")
+# 句末语气词，出现时通常表示一句话已经说完
+FINAL_PARTICLES = tuple("吗呢吧啊呀啦嘛哦哈了")
+# 以这些词结尾时话通常还没说完（连词、助词、口头停顿）
+INCOMPLETE_ENDINGS = (
+    "的",
+    "和",
+    "跟",
+    "与",
+    "或者",
+    "还有",
+    "然后",
+    "但是",
+    "可是",
+    "因为",
+    "所以",
+    "如果",
+    "就是",
+    "那个",
+    "这个",
+    "一个",
+    "嗯",
+    "呃",
+    "额",
+    "把",
+    "给",
+    "在",
+    "想",
+)
+INCOMPLETE_WORDS = ("and", "but", "or", "the", "a", "to", "because", "so", "um", "uh")
+
+# 各项特征对完整度的权重
+WEIGHT_SILENCE = 0.4
+WEIGHT_LENGTH = 0.2
+WEIGHT_TRANSCRIPT = 0.4
+# 说话时长短于该值（毫秒）时可能是咳嗽、杂音或只说了一个字，不提前结束
+MIN_SPEECH_MS = 300
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s，,、；;：:…~～\"'“”]+$")
+
+
+def transcript_completeness(text: str) -> float:
+    """根据识别中间结果估计句子完整度，返回 0~1；-1 表示明显没说完"""
+    text = _TRAILING_PUNCTUATION.sub("", text or "")
+    if not text:
+        return 0.0
+    if text.endswith(FINAL_PUNCTUATION):
+        return 1.0
+    if text.endswith(INCOMPLETE_ENDINGS):
+        return -1.0
+    last_word = text.rsplit(maxsplit=1)[-1].lower()
+    if last_word in INCOMPLETE_WORDS:
+        return -1.0
+    if text.endswith(FINAL_PARTICLES):
+        return 0.8
+    return 0.3
+
+
+class EndOfTurnDetector:
+    """根据完整度在 [min_silence_ms, max_silence_ms] 之间确定本次需要等待的静音时长"""
+
+    def __init__(self, config: dict, max_silence_ms: float, threshold_low: float):
+        self.enabled = str(config.get("adaptive_endpoint", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.max_silence_ms = float(max_silence_ms)
+        floor = config.get("min_silence_floor_ms", 300)
+        floor = float(floor) if floor else 300.0
+        # 未开启或下限不低于固定阈值时，行为与固定阈值相同
+        self.min_silence_ms = (
+            min(floor, self.max_silence_ms) if self.enabled else self.max_silence_ms
+        )
+        self.threshold_low = threshold_low
+
+    def completeness(
+        self, speech_ms: float, silence_probs: Sequence[float], partial_text: str
+    ) -> float:
+        """估计一句话已经说完的可能性，返回 0~1"""
+        if speech_ms < MIN_SPEECH_MS:
+            return 0.0
+        text_score = transcript_completeness(partial_text)
+        if text_score < 0:
+            return 0.0
+
+        # 静音越干净（语音概率远低于低阈值）越可能是说完了，停顿思考时概率通常在低阈值附近徘徊
+        silence_score = 0.0
+        if silence_probs and self.threshold_low > 0:
+            mean_prob = sum(silence_probs) / len(silence_probs)
+            silence_score = max(0.0, 1.0 - mean_prob / self.threshold_low)
+
+        return (
+            WEIGHT_SILENCE * silence_score
+            + WEIGHT_LENGTH
+            + WEIGHT_TRANSCRIPT * text_score
+        )
+
+    def required_silence_ms(
+        self, speech_ms: float, silence_probs: Sequence[float], partial_text: str
+    ) -> float:
+        """本次需要等待的静音时长（毫秒）"""
+        if self.min_silence_ms >= self.max_silence_ms:
+            return self.max_silence_ms
+        completeness = self.completeness(speech_ms, silence_probs, partial_text)
+        return self.max_silence_ms - completeness * (
+            self.max_silence_ms - self.min_silence_ms
+        )
+
+    def is_end_of_turn(
+        self,
+        silence_ms: float,
+        speech_ms: float,
+        silence_probs: Sequence[float],
+        partial_text: str,
+    ) -> bool:
+        if silence_ms < self.min_silence_ms:
+            return False
+        if silence_ms >= self.max_silence_ms:
+            return True
+        return silence_ms >= self.required_silence_ms(
+            speech_ms, silence_probs, partial_text
+        )
@@ -0,0 +1,67 @@
+"""空闲连接休眠
+
+设备长时间不说话时连接仍然保持，但解码器、VAD状态、AEC缓存、TTS线程等都不再需要。
+休眠时释放这些资源，把对话历史、说话人状态和当前 sentence_id 压缩成一份快照，
+收到下一帧音频或非心跳消息时再恢复。
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Optional
+from core.utils.dialogue import Dialogue, Message
+
+# 压缩级别：快照只在休眠和恢复时各处理一次，取速度与体积的折中
+COMPRESS_LEVEL = 6
+# 消息中需要保存的字段，与 Message 的构造参数一致
+MESSAGE_FIELDS = (
+    "role",
+    "content",
+    "uniq_id",
+    "tool_calls",
+    "tool_call_id",
+    "is_temporary",
+)
+
+
+def pack_snapshot(
+    dialogue: Dialogue,
+    current_speaker: Optional[str],
+    introduced_speakers: set,
+    system_introduced_speakers: set,
+    sentence_id: Optional[str],
+) -> bytes:
+    """把对话与说话人状态序列化为压缩后的 JSON"""
+    messages = []
+    for message in dialogue.dialogue:
+        item = {}
+        for field in MESSAGE_FIELDS:
+            value = getattr(message, field)
+            # 省略默认值，减小快照体积
+            if value is not None and value is not False:
+                item[field] = value
+        messages.append(item)
+    state = {
+        "messages": messages,
+        "current_time": dialogue.current_time,
+        "current_speaker": current_speaker,
+        "introduced_speakers": sorted(introduced_speakers),
+        "system_introduced_speakers": sorted(system_introduced_speakers),
+        "sentence_id": sentence_id,
+    }
+    data = json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=str)
+    return zlib.compress(data.encode("utf-8"), COMPRESS_LEVEL)
+
+
+def unpack_snapshot(snapshot: bytes) -> Dict[str, Any]:
+    """还原快照，返回的 dialogue 为新的 Dialogue 对象，说话人集合为 set"""
+    state = json.loads(zlib.decompress(snapshot).decode("utf-8"))
+    dialogue = Dialogue()
+    dialogue.current_time = state["current_time"]
+    dialogue.dialogue = [Message(**item) for item in state["messages"]]
+    return {
+        "dialogue": dialogue,
+        "current_speaker": state["current_speaker"],
+        "introduced_speakers": set(state["introduced_speakers"]),
+        "system_introduced_speakers": set(state["system_introduced_speakers"]),
+        "sentence_id": state["sentence_id"],
+    }
@@ -0,0 +1,366 @@
+"""对话链路耗时追踪
+
+每轮对话记录各阶段相对本轮开始（VAD检测到说话结束）的耗时，
+本轮最后一段音频发送完成后导出到配置的输出端（JSONL文件、Prometheus直方图）。
+未开启时连接上挂载的是空实现，各埋点只有一次空方法调用的开销。
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 追踪阶段
+STAGE_VAD_END = "vad_end"
+STAGE_LISTEN_STOP = "listen_stop"
+STAGE_ASR_ENDPOINT = "asr_endpoint"
+STAGE_TEXT_INPUT = "text_input"
+STAGE_ASR_FINAL = "asr_final"
+STAGE_INTENT = "intent"
+STAGE_MEMORY = "memory"
+STAGE_LLM_FIRST_TOKEN = "llm_first_token"
+STAGE_TTS_FIRST_AUDIO = "tts_first_audio"
+STAGE_FIRST_PACKET_SENT = "first_packet_sent"
+STAGE_TURN_END = "turn_end"
+
+# Prometheus 直方图的桶边界（毫秒）
+DEFAULT_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+
+class TurnTrace:
+    """单轮对话的追踪记录"""
+
+    __slots__ = (
+        "turn_id",
+        "source",
+        "sentence_id",
+        "wall_time",
+        "start",
+        "stages",
+    )
+
+    def __init__(self, source: str):
+        self.turn_id = uuid.uuid4().hex
+        self.source = source
+        self.sentence_id = None
+        self.wall_time = time.time()
+        self.start = time.monotonic()
+        # 阶段名 -> 距本轮开始的毫秒数，只记录第一次到达的时间
+        self.stages: Dict[str, float] = {source: 0.0}
+
+    def mark(self, stage: str):
+        if stage not in self.stages:
+            self.stages[stage] = round((time.monotonic() - self.start) * 1000, 1)
+
+    def to_record(self, session_id, device_id, completed: bool) -> Dict[str, Any]:
+        return {
+            "turn_id": self.turn_id,
+            "session_id": session_id,
+            "device_id": device_id,
+            "sentence_id": self.sentence_id,
+            "source": self.source,
+            "start_time": round(self.wall_time, 3),
+            "completed": completed,
+            "stages": dict(self.stages),
+        }
+
+
+class TraceSink(ABC):
+    """追踪记录输出端"""
+
+    @abstractmethod
+    def export(self, record: Dict[str, Any]):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonlTraceSink(TraceSink):
+    """每轮对话一行JSON追加写入文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class PrometheusTraceSink(TraceSink):
+    """按阶段累计直方图，以 Prometheus 文本格式写入文件（供 node_exporter textfile 采集）"""
+
+    METRIC_NAME = "xiaozhi_turn_stage_latency_ms"
+
+    def __init__(self, path: str, buckets=DEFAULT_BUCKETS_MS, flush_interval=10):
+        self.path = path
+        self.buckets = tuple(sorted(buckets))
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # 阶段名 -> [各桶计数..., +Inf计数, 总和]
+        self._histograms: Dict[str, List[float]] = {}
+        self._turns = {"completed": 0, "aborted": 0}
+        self._last_flush = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, record: Dict[str, Any]):
+        with self._lock:
+            self._turns["completed" if record["completed"] else "aborted"] += 1
+            for stage, value in record["stages"].items():
+                if stage == record["source"]:
+                    continue
+                histogram = self._histograms.setdefault(
+                    stage, [0] * (len(self.buckets) + 1) + [0.0]
+                )
+                for i, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        histogram[i] += 1
+                histogram[len(self.buckets)] += 1
+                histogram[-1] += value
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式"""
+        name = self.METRIC_NAME
+        lines = [
+            f"# HELP {name} 每轮对话各阶段距说话结束的耗时(毫秒)",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for i, bound in enumerate(self.buckets):
+                    lines.append(
+                        f'{name}_bucket{{stage="{stage}",le="{bound}"}} {histogram[i]}'
+                    )
+                count = histogram[len(self.buckets)]
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram[-1]:.1f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+            lines.append("# HELP xiaozhi_turns_total 已追踪的对话轮数")
+            lines.append("# TYPE xiaozhi_turns_total counter")
+            for status, count in self._turns.items():
+                lines.append(f'xiaozhi_turns_total{{status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def _flush(self):
+        # 先写临时文件再替换，避免采集端读到半个文件
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self._flush()
+
+
+class TraceExporter:
+    """进程内共享的导出器，在独立线程中写入各输出端，不阻塞对话链路"""
+
+    def __init__(self, sinks: List[TraceSink]):
+        self.sinks = sinks
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.bind(tag=TAG).warning("耗时追踪导出队列已满，丢弃记录")
+
+    def close(self, timeout: float = 3.0):
+        """停止导出线程，写完队列中剩余的记录后关闭各输出端（Prometheus 在此写入最终结果）"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.bind(tag=TAG).warning("耗时追踪导出线程未能及时结束，跳过关闭输出端")
+            return
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"关闭耗时追踪输出端失败: {type(sink).__name__}, {e}"
+                )
+
+    def _worker(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            for sink in self.sinks:
+                try:
+                    sink.export(record)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(
+                        f"耗时追踪导出失败: {type(sink).__name__}, {e}"
+                    )
+
+
+class LatencyTracer:
+    """连接级别的耗时追踪器，同一时间只追踪当前一轮对话
+
+    埋点可能来自事件循环、LLM线程和TTS线程，每个方法只读一次当前记录，
+    阶段只在第一次到达时记录，因此无需加锁。
+    """
+
+    enabled = True
+
+    def __init__(self, exporter: TraceExporter, session_id: str):
+        self.exporter = exporter
+        self.session_id = session_id
+        self.device_id = None
+        self._trace: Optional[TurnTrace] = None
+
+    def begin_turn(self, source: str):
+        """开始新一轮，上一轮如果已开始对话但未播放结束，按未完成导出"""
+        previous = self._trace
+        self._trace = TurnTrace(source)
+        if previous is not None and previous.sentence_id is not None:
+            self._export(previous, completed=False)
+
+    def ensure_turn(self, source: str):
+        """没有进行中的一轮时开始新一轮（如文本输入、结束语等不经过VAD的对话）"""
+        trace = self._trace
+        if trace is None or trace.sentence_id is not None:
+            self.begin_turn(source)
+
+    def bind_sentence(self, sentence_id: str, replace: bool = False):
+        """将当前一轮与本轮对话的 sentence_id 关联
+
+        意图识别先为本轮生成 sentence_id，交给大模型继续对话时 chat() 会生成新的，
+        此时以 replace=True 改为关联新的 sentence_id，播放结束时才能按完成导出。
+        """
+        trace = self._trace
+        if trace is not None and (replace or trace.sentence_id is None):
+            trace.sentence_id = sentence_id
+
+    def mark(self, stage: str, sentence_id: Optional[str] = None):
+        """记录阶段耗时，传入 sentence_id 时只记录到对应的一轮"""
+        trace = self._trace
+        if trace is None:
+            return
+        if sentence_id is not None and trace.sentence_id != sentence_id:
+            return
+        trace.mark(stage)
+
+    def finish(self, sentence_id: Optional[str]):
+        """本轮播放结束，导出记录"""
+        trace = self._trace
+        if trace is None or trace.sentence_id is None:
+            return
+        if sentence_id is not None and trace.sentence_id != sentence_id:
+            return
+        trace.mark(STAGE_TURN_END)
+        self._trace = None
+        self._export(trace, completed=True)
+
+    def discard(self):
+        self._trace = None
+
+    def _export(self, trace: TurnTrace, completed: bool):
+        self.exporter.submit(
+            trace.to_record(self.session_id, self.device_id, completed)
+        )
+
+
+class NullLatencyTracer:
+    """未开启追踪时使用的空实现"""
+
+    enabled = False
+    device_id = None
+
+    def begin_turn(self, source):
+        pass
+
+    def ensure_turn(self, source):
+        pass
+
+    def bind_sentence(self, sentence_id, replace=False):
+        pass
+
+    def mark(self, stage, sentence_id=None):
+        pass
+
+    def finish(self, sentence_id):
+        pass
+
+    def discard(self):
+        pass
+
+
+NULL_TRACER = NullLatencyTracer()
+
+_exporter: Optional[TraceExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def _build_sinks(trace_config: Dict[str, Any]) -> List[TraceSink]:
+    sinks = []
+    for sink_type in trace_config.get("sinks") or ["jsonl"]:
+        if sink_type == "jsonl":
+            sinks.append(
+                JsonlTraceSink(trace_config.get("jsonl_path", "tmp/latency_trace.jsonl"))
+            )
+        elif sink_type == "prometheus":
+            sinks.append(
+                PrometheusTraceSink(
+                    trace_config.get("prometheus_path", "tmp/latency_trace.prom"),
+                    flush_interval=trace_config.get("prometheus_flush_interval", 10),
+                )
+            )
+        else:
+            logger.bind(tag=TAG).warning(f"不支持的耗时追踪输出端: {sink_type}")
+    return sinks
+
+
+def get_trace_exporter(config: Dict[str, Any]) -> TraceExporter:
+    """获取进程内共享的导出器，首次调用时按配置创建输出端"""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = TraceExporter(
+                    _build_sinks(config.get("latency_trace") or {})
+                )
+    return _exporter
+
+
+def peek_trace_exporter() -> Optional[TraceExporter]:
+    """返回已创建的导出器，未开启追踪时返回 None"""
+    return _exporter
+
+
+def close_trace_exporter():
+    """服务关闭时调用，导出剩余记录并关闭输出端"""
+    global _exporter
+    with _exporter_lock:
+        exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.close()
+
+
+def create_latency_tracer(config: Dict[str, Any], session_id: str):
+    """根据配置为连接创建追踪器，未开启时返回空实现"""
+    trace_config = config.get("latency_trace") or {}
+    if not trace_config.get("enable", False):
+        return NULL_TRACER
+    return LatencyTracer(get_trace_exporter(config), session_id)
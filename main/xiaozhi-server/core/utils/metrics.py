@@ -0,0 +1,573 @@
+"""进程内指标注册表，以 Prometheus 文本格式通过 HTTP 服务的 /metrics 接口导出
+
+- Counter / Gauge / Histogram（固定桶）三种指标，更新只是一次加锁的字典操作
+- 每个指标的标签组合数有上限，超出后新的组合计入 other，避免基数膨胀；
+  因此不要使用 device_id、session_id 这类随连接变化的值作为标签
+- 连接数、队列积压、缓存命中等已有状态在采集时由 collector 读取，平时不产生开销
+"""
+
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+from config.logger import setup_logging
+from core.utils.latency_trace import (
+    DEFAULT_BUCKETS_MS,
+    PrometheusTraceSink,
+    peek_trace_exporter,
+)
+
+TAG = __name__
+logger = setup_logging()
+
+# 单个指标最多保留的标签组合数
+DEFAULT_MAX_SERIES = 200
+OVERFLOW_LABEL = "other"
+
+# 耗时类直方图的桶边界（毫秒），与耗时追踪一致
+LATENCY_BUCKETS_MS = DEFAULT_BUCKETS_MS
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(
+    names: Tuple[str, ...], values: Tuple[str, ...], extra: str = ""
+) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.6g}" if value != int(value) else str(int(value))
+    return str(value)
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Iterable[str] = (),
+        max_series=DEFAULT_MAX_SERIES,
+    ):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._overflowed = False
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        if key in self._series or len(self._series) < self.max_series:
+            return key
+        # 超出上限，新组合全部计入 other
+        if not self._overflowed:
+            self._overflowed = True
+            logger.bind(tag=TAG).warning(
+                f"指标 {self.name} 的标签组合超过 {self.max_series} 个，后续新组合计入 {OVERFLOW_LABEL}"
+            )
+        return tuple(OVERFLOW_LABEL for _ in self.label_names)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._series.items())
+        for key, value in items:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def dec(self, value: float = 1, **labels):
+        self.inc(-value, **labels)
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name,
+        help_text,
+        labels=(),
+        buckets=LATENCY_BUCKETS_MS,
+        max_series=DEFAULT_MAX_SERIES,
+    ):
+        super().__init__(name, help_text, labels, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        # 每个标签组合：[各桶计数（非累计）..., +Inf桶计数, 总和]
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            plain = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{plain} {series[-1]:.1f}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()) -> Gauge:
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(
+        self, name, help_text, labels=(), buckets=LATENCY_BUCKETS_MS
+    ) -> Histogram:
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        """注册采集时调用的函数，返回 Prometheus 文本行"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"指标采集失败: {collector.__name__}, {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------------------------------------------------------------------------
+# 埋点使用的指标
+# ---------------------------------------------------------------------------
+
+connections_total = registry.counter(
+    "xiaozhi_connections_total", "累计建立的WebSocket连接数", ("source",)
+)
+provider_latency_ms = registry.histogram(
+    "xiaozhi_provider_latency_ms",
+    "各服务的耗时(毫秒)，LLM为首字耗时",
+    ("kind", "provider"),
+)
+provider_errors_total = registry.counter(
+    "xiaozhi_provider_errors_total", "各服务的失败次数", ("kind", "provider")
+)
+tool_call_duration_ms = registry.histogram(
+    "xiaozhi_tool_call_duration_ms",
+    "工具调用耗时(毫秒)",
+    ("tool", "tool_type", "action"),
+)
+ws_bytes_total = registry.counter(
+    "xiaozhi_ws_bytes_total",
+    "WebSocket收发字节数（文本消息按字符数计）",
+    ("direction", "kind"),
+)
+opus_frames_total = registry.counter(
+    "xiaozhi_opus_frames_total", "收发的Opus帧数，rate()即每秒帧数", ("direction",)
+)
+hibernation_wake_ms = registry.histogram(
+    "xiaozhi_hibernation_wake_ms", "空闲休眠的连接恢复耗时(毫秒)"
+)
+init_queue_wait_ms = registry.histogram(
+    "xiaozhi_init_queue_wait_ms", "连接在初始化队列中的等待耗时(毫秒)"
+)
+private_config_fetch_ms = registry.histogram(
+    "xiaozhi_private_config_fetch_ms", "从管理端获取差异化配置的耗时(毫秒)"
+)
+
+
+def provider_name(provider) -> str:
+    """服务实现的模块名（如 fun_local、openai），取值范围由代码决定，可安全用作标签"""
+    return (
+        type(provider).__module__.rsplit(".", 1)[-1] if provider is not None else "none"
+    )
+
+
+class observe_latency:
+    """记录一段代码的耗时，异常时同时计入失败次数
+
+    with observe_latency("asr", conn.asr):
+        ...
+    """
+
+    __slots__ = ("kind", "provider", "start")
+
+    def __init__(self, kind: str, provider):
+        self.kind = kind
+        self.provider = provider_name(provider)
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            provider_errors_total.inc(kind=self.kind, provider=self.provider)
+        else:
+            provider_latency_ms.observe(
+                (time.monotonic() - self.start) * 1000,
+                kind=self.kind,
+                provider=self.provider,
+            )
+        return False
+
+
+# ---------------------------------------------------------------------------
+# 采集时读取的已有状态
+# ---------------------------------------------------------------------------
+
+
+def _gauge_lines(
+    name: str,
+    help_text: str,
+    samples: Iterable[Tuple[Dict[str, str], float]],
+    metric_type="gauge",
+):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        names = tuple(labels.keys())
+        lines.append(
+            f"{name}{_format_labels(names, tuple(labels.values()))} {_format_value(value)}"
+        )
+    return lines
+
+
+def _collect_connections() -> List[str]:
+    """活跃连接数与各队列积压（所有连接求和及最大值，不按连接展开）"""
+    from core.utils.diagnostics import connection_snapshot
+
+    connections = [c for c in connection_snapshot() if not c["closed"]]
+    lines = _gauge_lines(
+        "xiaozhi_connections_active", "当前活跃连接数", [({}, len(connections))]
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_connections_hibernated",
+            "当前处于空闲休眠的连接数",
+            [({}, sum(1 for c in connections if c["hibernated"]))],
+        )
+    )
+    samples = []
+    for queue_name in ("asr_audio", "report", "tts_text", "tts_audio"):
+        sizes = [c["queues"][queue_name] or 0 for c in connections]
+        samples.append(({"queue": queue_name, "stat": "sum"}, sum(sizes)))
+        samples.append(({"queue": queue_name, "stat": "max"}, max(sizes, default=0)))
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_queue_depth",
+            "各连接队列积压，sum为总和，max为单连接最大值",
+            samples,
+        )
+    )
+    return lines
+
+
+def _collect_caches() -> List[str]:
+    """全局缓存、TTS语音缓存与工具结果缓存的命中统计"""
+    from core.utils.cache.manager import cache_manager
+    from core.utils.tts_audio_cache import peek_tts_audio_cache
+    from core.providers.tools.tool_result_cache import tool_result_cache
+
+    requests = []
+    stats = cache_manager.get_statistics()
+    requests.append(({"cache": "global", "result": "hit"}, stats["hits"]))
+    requests.append(({"cache": "global", "result": "miss"}, stats["misses"]))
+    extra = [({"cache": "global", "event": "eviction"}, stats["evictions"])]
+
+    audio_cache = peek_tts_audio_cache()
+    if audio_cache is not None:
+        audio_stats = audio_cache.get_statistics()
+        requests.append(
+            (
+                {"cache": "tts_audio", "result": "hit"},
+                audio_stats["memory_hits"] + audio_stats["disk_hits"],
+            )
+        )
+        requests.append(
+            ({"cache": "tts_audio", "result": "miss"}, audio_stats["misses"])
+        )
+        extra.append(({"cache": "tts_audio", "event": "store"}, audio_stats["stores"]))
+
+    for tool_name, tool_stats in tool_result_cache.get_statistics().items():
+        requests.append(
+            (
+                {"cache": f"tool:{tool_name}", "result": "hit"},
+                tool_stats["hits"] + tool_stats["shared"],
+            )
+        )
+        requests.append(
+            ({"cache": f"tool:{tool_name}", "result": "miss"}, tool_stats["misses"])
+        )
+
+    lines = _gauge_lines(
+        "xiaozhi_cache_requests_total",
+        "缓存查询次数，按命中与否区分",
+        requests,
+        "counter",
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_cache_events_total", "缓存淘汰、写入等事件次数", extra, "counter"
+        )
+    )
+    return lines
+
+
+def _collect_loop_lag() -> List[str]:
+    from core.utils.diagnostics import loop_lag_monitor, LOOP_LAG_BUCKETS_MS
+
+    snapshot = loop_lag_monitor.snapshot()
+    if not snapshot["samples"]:
+        return []
+    name = "xiaozhi_event_loop_lag_ms"
+    lines = [f"# HELP {name} 事件循环延迟(毫秒)", f"# TYPE {name} histogram"]
+    cumulative = 0
+    for bound, count in zip(LOOP_LAG_BUCKETS_MS, loop_lag_monitor.buckets):
+        cumulative += count
+        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {snapshot["samples"]}')
+    lines.append(f"{name}_sum {loop_lag_monitor.total_ms:.1f}")
+    lines.append(f"{name}_count {snapshot['samples']}")
+    return lines
+
+
+def _collect_audio_pacing() -> List[str]:
+    from core.utils.audioRateController import audio_pacing_scheduler
+
+    snapshot = audio_pacing_scheduler.snapshot()
+    lines = _gauge_lines(
+        "xiaozhi_audio_pacing_streams",
+        "等待音频节拍器发送的连接数",
+        [({}, snapshot["streams"])],
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_audio_pacing_ticks_total",
+            "音频节拍器唤醒次数",
+            [({}, snapshot["ticks"])],
+            "counter",
+        )
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_audio_pacing_packets_total",
+            "音频节拍器发送的音频包数",
+            [({}, snapshot["packets"])],
+            "counter",
+        )
+    )
+    return lines
+
+
+def _collect_dsp_workers() -> List[str]:
+    from core.utils.dsp_workers import dsp_worker_pool
+
+    workers = dsp_worker_pool.snapshot()
+    if not workers:
+        return []
+    lines = _gauge_lines(
+        "xiaozhi_dsp_worker_streams",
+        "各DSP工作进程承载的音频流数",
+        [({"worker": str(w["worker"])}, w["streams"]) for w in workers],
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_dsp_worker_queued",
+            "各DSP工作进程待处理的音频包数",
+            [({"worker": str(w["worker"])}, w["queued"]) for w in workers],
+        )
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_dsp_worker_dropped_total",
+            "请求缓冲区已满而丢弃的音频包数",
+            [({"worker": str(w["worker"])}, w["dropped"]) for w in workers],
+            "counter",
+        )
+    )
+    return lines
+
+
+def _collect_housekeeping_timers() -> List[str]:
+    from core.utils.timer_wheel import housekeeping_timers
+
+    snapshot = housekeeping_timers.snapshot()
+    lines = _gauge_lines(
+        "xiaozhi_housekeeping_timers",
+        "共享时间轮中待触发的连接定时器数",
+        [({}, snapshot["timers"])],
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_housekeeping_timers_fired_total",
+            "共享时间轮已触发的定时器数",
+            [({}, snapshot["fired"])],
+            "counter",
+        )
+    )
+    return lines
+
+
+def _collect_admission() -> List[str]:
+    from core.utils.admission import admission_controller
+
+    snapshot = admission_controller.snapshot()
+    if not snapshot["enabled"]:
+        return []
+    lines = _gauge_lines(
+        "xiaozhi_init_connections",
+        "正在初始化与排队等待初始化的连接数",
+        [
+            ({"state": "running"}, snapshot["running"]),
+            ({"state": "queued"}, snapshot["queued"]),
+        ],
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_admission_rejected_total",
+            "准入控制拒绝的连接数",
+            [
+                ({"reason": reason}, snapshot[f"rejected_{reason}"])
+                for reason in ("rate", "queue_full", "queue_timeout")
+            ],
+            "counter",
+        )
+    )
+    return lines
+
+
+def _collect_private_config_cache() -> List[str]:
+    from core.utils.private_config_cache import private_config_cache
+
+    snapshot = private_config_cache.snapshot()
+    if not snapshot["enabled"]:
+        return []
+    lines = _gauge_lines(
+        "xiaozhi_private_config_cache_entries",
+        "已缓存差异化配置的设备数",
+        [({}, snapshot["entries"])],
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_private_config_lookups_total",
+            "获取差异化配置的次数，hit为直接使用缓存，stale为使用缓存并在后台刷新，miss为等待管理端",
+            [
+                ({"result": "hit"}, snapshot["hits"]),
+                ({"result": "stale"}, snapshot["stale_hits"]),
+                ({"result": "miss"}, snapshot["misses"]),
+            ],
+            "counter",
+        )
+    )
+    lines.extend(
+        _gauge_lines(
+            "xiaozhi_private_config_refresh_total",
+            "后台刷新差异化配置的结果",
+            [
+                ({"result": "unchanged"}, snapshot["refresh_unchanged"]),
+                ({"result": "changed"}, snapshot["refresh_changed"]),
+                ({"result": "error"}, snapshot["refresh_errors"]),
+            ],
+            "counter",
+        )
+    )
+    return lines
+
+
+def _collect_latency_trace() -> List[str]:
+    """开启了耗时追踪的 prometheus 输出端时，一并导出各阶段耗时直方图"""
+    exporter = peek_trace_exporter()
+    if exporter is None:
+        return []
+    lines = []
+    for sink in exporter.sinks:
+        if isinstance(sink, PrometheusTraceSink):
+            lines.extend(sink.render().rstrip("\n").split("\n"))
+    return lines
+
+
+for _collector in (
+    _collect_connections,
+    _collect_caches,
+    _collect_loop_lag,
+    _collect_audio_pacing,
+    _collect_dsp_workers,
+    _collect_housekeeping_timers,
+    _collect_admission,
+    _collect_private_config_cache,
+    _collect_latency_trace,
+):
+    registry.register_collector(_collector)
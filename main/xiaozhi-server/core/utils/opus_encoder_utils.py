@@ -8,31 +8,144 @@ import traceback
 import numpy as np
 from opuslib_next import Encoder
 from opuslib_next import constants
-from typing import Optional, Callable, Any
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+# 设备端支持的帧时长（毫秒）
+SUPPORTED_FRAME_DURATIONS = (20, 40, 60)
+DEFAULT_FRAME_DURATION = 60
+
+_APPLICATIONS = {
+    "audio": constants.APPLICATION_AUDIO,
+    "voip": constants.APPLICATION_VOIP,
+    "lowdelay": constants.APPLICATION_RESTRICTED_LOWDELAY,
+}
+
+
+class OpusProfile(NamedTuple):
+    """Opus编码参数，默认值与引入编码档位之前的固定参数一致"""
+
+    bitrate: int = 24000
+    """比特率(bps)"""
+    complexity: int = 10
+    """复杂度0-10，越高音质越好、CPU开销越大"""
+    vbr: bool = True
+    """是否可变码率"""
+    frame_duration: int = DEFAULT_FRAME_DURATION
+    """帧时长(毫秒)，20/40/60"""
+    application: str = "audio"
+    """audio / voip / lowdelay"""
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], frame_duration: int) -> "OpusProfile":
+        application = str(config.get("application", "audio")).lower()
+        if application not in _APPLICATIONS:
+            logging.warning(f"不支持的Opus application: {application}，使用audio")
+            application = "audio"
+        return cls(
+            bitrate=int(config.get("bitrate", cls._field_defaults["bitrate"])),
+            complexity=max(0, min(10, int(config.get("complexity", 10)))),
+            vbr=bool(config.get("vbr", True)),
+            frame_duration=frame_duration,
+            application=application,
+        )
+
+    @property
+    def tag(self) -> str:
+        """用于缓存键等场景的简短描述"""
+        return (
+            f"{self.application}-{self.bitrate}-c{self.complexity}"
+            f"-{'vbr' if self.vbr else 'cbr'}-{self.frame_duration}ms"
+        )
+
+
+def resolve_opus_profile(
+    config: Dict[str, Any], audio_params: Optional[Dict[str, Any]] = None
+) -> OpusProfile:
+    """根据配置和设备 hello 消息中的 audio_params 确定编码参数
+
+    - 档位：设备 audio_params.opus_profile（需为已配置的档位）> 配置 opus_profile（可按智能体下发）> default
+    - 帧时长：档位中指定的 frame_duration > 设备 audio_params.frame_duration > 60ms
+    """
+    profiles = config.get("opus_profiles") or {}
+    audio_params = audio_params or {}
+    name = audio_params.get("opus_profile")
+    if name not in profiles:
+        name = config.get("opus_profile") or "default"
+    profile_config = profiles.get(name) or {}
+
+    frame_duration = profile_config.get("frame_duration") or audio_params.get(
+        "frame_duration"
+    )
+    try:
+        frame_duration = int(frame_duration or DEFAULT_FRAME_DURATION)
+    except (TypeError, ValueError):
+        frame_duration = DEFAULT_FRAME_DURATION
+    if frame_duration not in SUPPORTED_FRAME_DURATIONS:
+        logging.warning(f"不支持的Opus帧时长: {frame_duration}ms，使用{DEFAULT_FRAME_DURATION}ms")
+        frame_duration = DEFAULT_FRAME_DURATION
+    return OpusProfile.from_config(profile_config, frame_duration)
+
+
+# TOC字节中 config 对应的帧时长（单位0.1毫秒）：SILK 0-11、Hybrid 12-15、CELT 16-31
+_TOC_FRAME_TENTH_MS = (
+    [100, 200, 400, 600] * 3 + [100, 200] * 2 + [25, 50, 100, 200] * 4
+)
+
+
+def opus_packet_duration_ms(packet: bytes) -> Optional[float]:
+    """从Opus包的TOC字节解析包时长（毫秒），无法解析时返回 None"""
+    if not packet:
+        return None
+    toc = packet[0]
+    frame_tenth_ms = _TOC_FRAME_TENTH_MS[toc >> 3]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    elif len(packet) > 1:
+        frames = packet[1] & 0x3F
+    else:
+        return None
+    return frame_tenth_ms * frames / 10
+
 
 class OpusEncoderUtils:
     """PCM到Opus的编码器"""
 
-    def __init__(self, sample_rate: int, channels: int, frame_size_ms: int):
+    def __init__(
+        self,
+        sample_rate: int,
+        channels: int,
+        frame_size_ms: int,
+        profile: Optional[OpusProfile] = None,
+    ):
         """
         初始化Opus编码器
 
         Args:
             sample_rate: 采样率 (Hz)
             channels: 通道数 (1=单声道, 2=立体声)
-            frame_size_ms: 帧大小 (毫秒)
+            frame_size_ms: 帧大小 (毫秒)，传入 profile 时以 profile 的帧时长为准
+            profile: 编码参数，默认与原固定参数一致（24kbps、复杂度10）
         """
         self.sample_rate = sample_rate
         self.channels = channels
-        self.frame_size_ms = frame_size_ms
+        self.buffer = np.array([], dtype=np.int16)
+        self.apply_profile(profile or OpusProfile(frame_duration=frame_size_ms))
+
+    def apply_profile(self, profile: OpusProfile):
+        """切换编码参数，重建编码器并清空缓冲区（application 创建后不可修改）"""
+        self.profile = profile
+        self.frame_size_ms = profile.frame_duration
         # 计算每帧样本数 = 采样率 * 帧大小(毫秒) / 1000
-        self.frame_size = (sample_rate * frame_size_ms) // 1000
+        self.frame_size = (self.sample_rate * self.frame_size_ms) // 1000
         # 总帧大小 = 每帧样本数 * 通道数
-        self.total_frame_size = self.frame_size * channels
+        self.total_frame_size = self.frame_size * self.channels
 
         # 比特率和复杂度设置
-        self.bitrate = 24000  # bps
-        self.complexity = 10  # 最高质量
+        self.bitrate = profile.bitrate  # bps
+        self.complexity = profile.complexity
 
         # 缓冲区初始化为空
         self.buffer = np.array([], dtype=np.int16)
@@ -40,10 +153,11 @@ class OpusEncoderUtils:
         try:
             # 创建Opus编码器
             self.encoder = Encoder(
-                sample_rate, channels, constants.APPLICATION_AUDIO  # 音频优化模式
+                self.sample_rate, self.channels, _APPLICATIONS[profile.application]
             )
             self.encoder.bitrate = self.bitrate
             self.encoder.complexity = self.complexity
+            self.encoder.vbr = int(profile.vbr)
             self.encoder.signal = constants.SIGNAL_VOICE  # 语音信号优化
         except Exception as e:
             logging.error(f"初始化Opus编码器失败: {e}")
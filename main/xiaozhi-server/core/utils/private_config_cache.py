@@ -0,0 +1,226 @@
+"""设备差异化配置缓存
+
+每个连接（以及每次视觉分析请求）都要从管理端获取设备的差异化配置，而设备频繁重连、配置很少变化。
+这里按设备缓存获取结果，连接时直接使用缓存，不再等待管理端：
+
+- 缓存在 fresh_seconds 内直接使用；超过后仍先返回缓存，同时在后台重新获取（同一设备同时只有一个请求），
+  按内容指纹判断配置是否变化，变化时替换缓存，下次连接生效。管理端接口不支持条件请求，
+  后台刷新是一次完整的获取，只是不阻塞连接，并不减少管理端的请求量
+- 超过 max_stale_seconds 的缓存不再使用，连接时重新获取
+- 管理端下发 update_config 时清空缓存，之后的连接重新获取
+- 设备未绑定、接口失败（得到空配置）时不缓存
+"""
+
+import copy
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.logger import setup_logging
+from config.config_loader import get_private_config_from_api
+from config.manage_api_client import DeviceNotFoundException, DeviceBindException
+from core.utils.metrics import private_config_fetch_ms
+
+TAG = __name__
+logger = setup_logging()
+
+
+def _request_config(config) -> dict:
+    """获取差异化配置所用的基础配置快照
+
+    连接会把智能体的模块选择合并进自己的 selected_module，而管理端对与请求中 selected_module
+    相同的模块（如VAD、ASR）不再返回；后台刷新若在合并之后读取连接的配置，得到的结果缺少这些模块，
+    会覆盖正确的缓存。因此在连接合并之前复制一份 selected_module 供获取时使用。
+    """
+    snapshot = dict(config or {})
+    if "selected_module" in snapshot:
+        snapshot["selected_module"] = copy.deepcopy(dict(snapshot["selected_module"]))
+    return snapshot
+
+
+def _fingerprint(private_config: dict) -> str:
+    data = json.dumps(private_config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("config", "fingerprint", "fetched_at")
+
+    def __init__(self, private_config: dict, fingerprint: str):
+        self.config = private_config
+        self.fingerprint = fingerprint
+        self.fetched_at = time.monotonic()
+
+
+class PrivateConfigCache:
+    def __init__(
+        self,
+        fetch: Callable[[Any, str, str], Awaitable[dict]] = get_private_config_from_api,
+    ):
+        """
+        Args:
+            fetch: 获取差异化配置的函数，参数与 get_private_config_from_api 相同
+        """
+        self.fetch = fetch
+        self.enabled = False
+        self.fresh_seconds = 60.0
+        self.max_stale_seconds = 86400.0
+        self.max_entries = 10000
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing = set()
+        # 每次清空缓存加一，清空前发出的请求结果不再写入
+        self._generation = 0
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refresh_unchanged": 0,
+            "refresh_changed": 0,
+            "refresh_errors": 0,
+            "invalidations": 0,
+        }
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 private_config_cache 配置"""
+        config = config or {}
+        self.enabled = bool(config.get("enable", False))
+        self.fresh_seconds = float(config.get("fresh_seconds", 60))
+        self.max_stale_seconds = max(
+            float(config.get("max_stale_seconds", 86400)), self.fresh_seconds
+        )
+        self.max_entries = max(int(config.get("max_entries", 10000)), 1)
+        if not self.enabled:
+            self.invalidate()
+
+    @staticmethod
+    def _key(device_id: Optional[str], client_id: Optional[str]) -> str:
+        return f"{device_id}|{client_id}"
+
+    def peek(self, config, device_id: str, client_id: str) -> Optional[dict]:
+        """只查缓存，不等待管理端：命中时返回配置副本（过期的同时在后台刷新），未命中返回 None"""
+        if not self.enabled or device_id is None:
+            return None
+        key = self._key(device_id, client_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry.fetched_at
+        if age > self.max_stale_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        if age > self.fresh_seconds:
+            self.stats["stale_hits"] += 1
+            self._schedule_refresh(key, config, device_id, client_id)
+        else:
+            self.stats["hits"] += 1
+        # 调用方会原地修改配置（如解析插件配置），返回副本
+        return copy.deepcopy(entry.config)
+
+    async def get(self, config, device_id: str, client_id: str) -> dict:
+        """获取差异化配置，缓存未命中时等待管理端；设备未绑定时抛出与接口相同的异常"""
+        if not self.enabled or device_id is None:
+            return await self.fetch(config, device_id, client_id)
+        private_config = self.peek(config, device_id, client_id)
+        if private_config is not None:
+            return private_config
+        self.stats["misses"] += 1
+        private_config = await self._load(
+            self._key(device_id, client_id),
+            _request_config(config),
+            device_id,
+            client_id,
+        )
+        return copy.deepcopy(private_config)
+
+    def invalidate(self, device_id: Optional[str] = None):
+        """清空缓存；指定 device_id 时只清空该设备"""
+        if device_id is None:
+            self._entries.clear()
+            self._generation += 1
+        else:
+            prefix = f"{device_id}|"
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        self.stats["invalidations"] += 1
+
+    async def _load(self, key: str, config, device_id: str, client_id: str) -> dict:
+        # 同一设备同时只向管理端发一个请求，其余调用等待同一结果
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._fetch_and_store(key, config, device_id, client_id)
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _fetch_and_store(
+        self, key: str, config, device_id: str, client_id: str
+    ) -> dict:
+        generation = self._generation
+        begin_time = time.monotonic()
+        try:
+            private_config = await self.fetch(config, device_id, client_id)
+        except (DeviceNotFoundException, DeviceBindException):
+            self._entries.pop(key, None)
+            raise
+        finally:
+            private_config_fetch_ms.observe((time.monotonic() - begin_time) * 1000)
+        if private_config and generation == self._generation:
+            self._entries[key] = _Entry(
+                copy.deepcopy(private_config), _fingerprint(private_config)
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return private_config
+
+    def _schedule_refresh(self, key: str, config, device_id: str, client_id: str):
+        if key in self._inflight:
+            return
+        # 刷新在之后才执行，此时连接的配置可能已合并智能体的模块选择，先取快照
+        task = asyncio.create_task(
+            self._refresh(key, _request_config(config), device_id, client_id)
+        )
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def _refresh(self, key: str, config, device_id: str, client_id: str):
+        entry = self._entries.get(key)
+        old_fingerprint = entry.fingerprint if entry is not None else None
+        try:
+            private_config = await self._load(key, config, device_id, client_id)
+        except (DeviceNotFoundException, DeviceBindException):
+            # 设备已解绑，缓存已清除，下次连接重新获取
+            self.stats["refresh_changed"] += 1
+            return
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            logger.bind(tag=TAG).warning(f"后台刷新差异化配置失败 {device_id}: {e}")
+            return
+        if not private_config:
+            # 接口失败得到空配置，保留原缓存，下次使用时再刷新
+            self.stats["refresh_errors"] += 1
+            return
+        if _fingerprint(private_config) == old_fingerprint:
+            self.stats["refresh_unchanged"] += 1
+        else:
+            self.stats["refresh_changed"] += 1
+            logger.bind(tag=TAG).info(
+                f"设备 {device_id} 的差异化配置已更新，下次连接生效"
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            **self.stats,
+        }
+
+
+private_config_cache = PrivateConfigCache()
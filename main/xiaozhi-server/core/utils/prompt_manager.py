@@ -5,7 +5,9 @@
 
 import os
 import asyncio
+import hashlib
 import threading
+from functools import lru_cache
 from typing import Dict, Any, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -50,6 +52,12 @@ EMOJI_List = [
 ]
 
 
+@lru_cache(maxsize=32)
+def compile_template(template_source: str) -> Template:
+    """解析并编译提示词模板，相同的模板源码只编译一次，所有连接共享"""
+    return Template(template_source)
+
+
 class PromptManager:
     """系统提示词管理器，负责管理和更新系统提示词"""
 
@@ -141,7 +149,7 @@ class PromptManager:
 
         return today_date, today_weekday, lunar_date
 
-    def _get_location_info(self, client_ip: str) -> str:
+    def _get_location_info(self, conn: "ConnectionHandler", client_ip: str) -> str:
         """获取位置信息"""
         try:
             # 先从缓存获取
@@ -149,10 +157,12 @@ class PromptManager:
             if cached_location is not None:
                 return cached_location
 
-            # 缓存未命中，调用API获取
-            from core.utils.util import get_ip_info
+            # 缓存未命中，在事件循环中通过共享的异步客户端获取
+            from core.utils.util import get_ip_info_async
 
-            ip_info = get_ip_info(client_ip, self.logger)
+            ip_info = asyncio.run_coroutine_threadsafe(
+                get_ip_info_async(client_ip, self.logger), conn.loop
+            ).result(timeout=5)
             city = ip_info.get("city", "未知位置")
             location = f"{city}"
 
@@ -221,7 +231,7 @@ class PromptManager:
                 )
             ):
                 # 获取位置信息（使用全局缓存）
-                local_address = self._get_location_info(client_ip)
+                local_address = self._get_location_info(conn, client_ip)
 
             if (
                 self.base_prompt_template
@@ -237,7 +247,9 @@ class PromptManager:
                     self.base_prompt_template
                     and "dynamic_context" in self.base_prompt_template
                 ):
-                    self.context_data = self.context_provider.fetch_all(conn.device_id)
+                    self.context_data = self.context_provider.fetch_all(
+                        conn.device_id, conn.loop
+                    )
                 else:
                     self.context_data = ""
 
@@ -283,9 +295,7 @@ class PromptManager:
             )
             self.logger.bind(tag=TAG).debug(f"获取到选择的语言: {language}")
 
-            # 替换模板变量
-            template = Template(self.base_prompt_template)
-            enhanced_prompt = template.render(
+            render_kwargs = dict(
                 base_prompt=user_prompt,
                 current_time="{{current_time}}",
                 today_date=today_date,
@@ -298,9 +308,27 @@ class PromptManager:
                 client_ip=client_ip,
                 dynamic_context=self.context_data,
                 language=language,
-                *args,
                 **kwargs,
             )
+
+            # 渲染输入（配置、日期、位置、天气、上下文等）未变化时直接复用上次的渲染结果
+            fingerprint = self._render_fingerprint(args, render_kwargs)
+            rendered_cache_key = f"enhanced_prompt:{device_id}"
+            cached_render = self.cache_manager.get(
+                self.CacheType.DEVICE_PROMPT, rendered_cache_key
+            )
+            if cached_render is not None and cached_render[0] == fingerprint:
+                self.logger.bind(tag=TAG).debug(f"复用设备 {device_id} 已渲染的增强提示词")
+                return cached_render[1]
+
+            # 替换模板变量
+            template = compile_template(self.base_prompt_template)
+            enhanced_prompt = template.render(*args, **render_kwargs)
+            self.cache_manager.set(
+                self.CacheType.DEVICE_PROMPT,
+                rendered_cache_key,
+                (fingerprint, enhanced_prompt),
+            )
             device_cache_key = f"device_prompt:{device_id}"
             self.cache_manager.set(
                 self.CacheType.DEVICE_PROMPT, device_cache_key, enhanced_prompt
@@ -313,3 +341,11 @@ class PromptManager:
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"构建增强提示词失败: {e}")
             return user_prompt
+
+    def _render_fingerprint(self, args, render_kwargs) -> str:
+        """计算模板及渲染输入的指纹，任一输入变化都会使已渲染的提示词失效"""
+        digest = hashlib.sha1(self.base_prompt_template.encode("utf-8"))
+        digest.update(repr(args).encode("utf-8"))
+        for key in sorted(render_kwargs):
+            digest.update(f"\0{key}\0{render_kwargs[key]!r}".encode("utf-8"))
+        return digest.hexdigest()
@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, List, Optional
+
+
+class StreamingSentenceSegmenter:
+    """流式文本分句器，将大模型逐段输出的文本切分成适合TTS合成的句子
+
+    只保存尚未切分的文本，每次追加时对新增文本做一次正向扫描，
+    记录每个标点在未切分文本中最后出现的位置，不再重复拼接和查找整段回复。
+
+    切分规则与原 TTSProviderBase._get_segment_text 一致：
+    每次追加最多切出一段，切分点为当前可用标点各自最后出现位置中最靠前的一个；
+    第一句使用包含逗号等的标点集合，以尽快开始合成。
+    标点按单个字符匹配。
+    """
+
+    def __init__(
+        self,
+        punctuations: Iterable[str],
+        first_sentence_punctuations: Optional[Iterable[str]] = None,
+        max_segment_length: int = 0,
+    ):
+        """
+        Args:
+            punctuations: 常规分句标点
+            first_sentence_punctuations: 第一句使用的分句标点，为空时第一句与常规分句一致
+            max_segment_length: 未切分文本超过该长度仍没有分句标点时强制切分，0 表示不限制
+        """
+        self.punctuations = tuple(punctuations)
+        self.first_sentence_punctuations = tuple(
+            first_sentence_punctuations or self.punctuations
+        )
+        self.max_segment_length = max(0, int(max_segment_length or 0))
+        self._tracked = frozenset(self.punctuations + self.first_sentence_punctuations)
+        self.is_first_sentence = True
+        self.reset()
+
+    def reset(self):
+        """清空未切分的文本，用于新一轮对话开始"""
+        self._chunks: List[str] = []
+        self._length = 0
+        # 标点 -> 在未切分文本中最后出现的位置
+        self._last_positions: Dict[str, int] = {}
+
+    def feed(self, delta: str) -> Optional[str]:
+        """追加一段文本，返回可以切出的原始句子（含标点），没有则返回 None"""
+        if delta:
+            offset = self._length
+            tracked = self._tracked
+            last_positions = self._last_positions
+            for i, char in enumerate(delta):
+                if char in tracked:
+                    last_positions[char] = offset + i
+            self._chunks.append(delta)
+            self._length += len(delta)
+        return self._next_segment()
+
+    def remaining(self) -> str:
+        """获取尚未切分的文本"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _next_segment(self) -> Optional[str]:
+        punctuations = (
+            self.first_sentence_punctuations
+            if self.is_first_sentence
+            else self.punctuations
+        )
+        boundary = -1
+        for punct in punctuations:
+            pos = self._last_positions.get(punct, -1)
+            if pos != -1 and (boundary == -1 or pos < boundary):
+                boundary = pos
+
+        if boundary != -1:
+            self.is_first_sentence = False
+            return self._take(boundary + 1)
+        if self.max_segment_length and self._length >= self.max_segment_length:
+            return self._take(self._force_split_position())
+        return None
+
+    def _force_split_position(self) -> int:
+        """超长时优先在限制长度内最后一个标点（含逗号等）处切分，没有则按长度硬切"""
+        text = self.remaining()
+        limit = self.max_segment_length
+        pos = max(text.rfind(punct, 0, limit) for punct in self._tracked)
+        return pos + 1 if pos != -1 else limit
+
+    def _take(self, length: int) -> str:
+        """从未切分文本头部取出指定长度，并平移标点位置"""
+        text = self.remaining()
+        segment, rest = text[:length], text[length:]
+        self._chunks = [rest] if rest else []
+        self._length = len(rest)
+        self._last_positions = {
+            punct: pos - length
+            for punct, pos in self._last_positions.items()
+            if pos >= length
+        }
+        return segment
+
@@ -0,0 +1,100 @@
+import queue
+import threading
+import concurrent.futures
+from typing import Any, Callable, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 任务因句子过期被取消
+_CANCELLED = object()
+
+
+class SynthesisPipeline:
+    """非流式TTS的预合成流水线
+
+    后续句子在前一句播放前就开始合成，最多 max_workers 句同时请求TTS服务；
+    合成结果按提交顺序交给播放回调，过期句子（被打断或已开始新一轮对话）的任务直接取消。
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        is_stale: Callable[[Optional[str]], bool],
+        stop_event: threading.Event,
+    ):
+        """
+        Args:
+            max_workers: 同时合成的最大句数
+            is_stale: 判断某个 sentence_id 的任务是否已过期
+            stop_event: 连接关闭事件
+        """
+        self.max_workers = max_workers
+        self._is_stale = is_stale
+        self._stop_event = stop_event
+        # 连接休眠时单独关闭流水线，连接本身不停止
+        self._closed = threading.Event()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts-synthesis"
+        )
+        # 按提交顺序排列的 (sentence_id, future, 播放回调)
+        self._ordered = queue.Queue()
+        self._emit_thread = threading.Thread(target=self._emit_loop, daemon=True)
+        self._emit_thread.start()
+
+    def submit(
+        self,
+        sentence_id: Optional[str],
+        synthesize: Callable[[], Any],
+        emit: Callable[[Any], None],
+    ):
+        """提交一句话：synthesize 在线程池中并发执行，emit 按提交顺序接收其结果"""
+        future = self._executor.submit(synthesize)
+        self._ordered.put((sentence_id, future, emit))
+
+    def submit_emit(self, sentence_id: Optional[str], emit: Callable[[], None]):
+        """提交无需合成的播放操作（音频文件、结束标记等），排在已提交的句子之后执行"""
+        self._ordered.put((sentence_id, None, lambda _: emit()))
+
+    def _emit_loop(self):
+        while not (self._stop_event.is_set() or self._closed.is_set()):
+            try:
+                sentence_id, future, emit = self._ordered.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                result = self._wait_result(sentence_id, future)
+                if result is _CANCELLED or self._is_stale(sentence_id):
+                    continue
+                emit(result)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"TTS合成结果播放失败: {e}")
+        # 连接关闭，释放合成线程
+        self.shutdown()
+
+    def _wait_result(self, sentence_id, future):
+        """等待合成结果，期间句子过期则取消任务"""
+        if future is None:
+            return None
+        while True:
+            if (
+                self._is_stale(sentence_id)
+                or self._stop_event.is_set()
+                or self._closed.is_set()
+            ):
+                future.cancel()
+                return _CANCELLED
+            try:
+                return future.result(timeout=0.05)
+            except concurrent.futures.TimeoutError:
+                continue
+
+    def close(self):
+        """停止播放线程并释放合成线程"""
+        self._closed.set()
+        self.shutdown()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,100 @@
+"""模拟服务（synthetic）的公共工具
+
+模拟的ASR、LLM、TTS、记忆和意图识别不访问网络，用于压测和回归测试时单独衡量服务自身的开销。
+延迟按配置的分布采样，可按比例注入故障，输出内容由输入和随机种子决定，多次运行结果一致。
+
+延迟配置示例（单位毫秒）：
+    latency_ms: 300                                        # 固定延迟
+    latency_ms: {distribution: uniform, min: 100, max: 500}
+    latency_ms: {distribution: normal, mean: 300, stddev: 50}
+    latency_ms: {distribution: lognormal, mean: 300, stddev: 120}
+"""
+
+import math
+import zlib
+import random
+import threading
+from typing import Any, Dict, Sequence
+
+
+class SyntheticFailure(Exception):
+    """模拟服务注入的故障"""
+
+    pass
+
+
+class LatencyModel:
+    """按配置的分布采样延迟"""
+
+    def __init__(self, spec: Any, rng: random.Random, lock: threading.Lock):
+        if spec is None or isinstance(spec, (int, float, str)):
+            spec = {"distribution": "fixed", "value": float(spec or 0)}
+        self.distribution = spec.get("distribution", "fixed")
+        self.spec = spec
+        self._rng = rng
+        self._lock = lock
+        if self.distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"不支持的延迟分布: {self.distribution}")
+
+    def sample_ms(self) -> float:
+        spec = self.spec
+        if self.distribution == "fixed":
+            return max(0.0, float(spec.get("value", spec.get("mean", 0))))
+        with self._lock:
+            if self.distribution == "uniform":
+                value = self._rng.uniform(float(spec.get("min", 0)), float(spec.get("max", 0)))
+            elif self.distribution == "normal":
+                value = self._rng.gauss(float(spec.get("mean", 0)), float(spec.get("stddev", 0)))
+            else:
+                # 按期望的均值和标准差换算对数正态分布参数
+                mean = max(float(spec.get("mean", 0)), 1e-6)
+                stddev = float(spec.get("stddev", 0))
+                sigma = math.sqrt(math.log(1 + (stddev / mean) ** 2))
+                mu = math.log(mean) - sigma**2 / 2
+                value = self._rng.lognormvariate(mu, sigma)
+        return max(float(spec.get("min", 0)), value)
+
+    def sample(self) -> float:
+        """采样延迟，单位秒"""
+        return self.sample_ms() / 1000
+
+
+class SyntheticBehavior:
+    """模拟服务的延迟与故障注入，各模拟服务按配置创建
+
+    Args:
+        config: 服务配置，读取 seed、failure_rate 以及指定的延迟配置项
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.seed = config.get("seed", 0)
+        self.failure_rate = float(config.get("failure_rate", 0) or 0)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def latency(self, spec: Any) -> LatencyModel:
+        return LatencyModel(spec, self._rng, self._lock)
+
+    def maybe_fail(self, what: str):
+        """按 failure_rate 注入故障"""
+        if self.failure_rate <= 0:
+            return
+        with self._lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise SyntheticFailure(f"模拟{what}故障")
+
+    def pick(self, choices: Sequence, key) -> Any:
+        """按输入内容和随机种子确定性地选择输出，同样的输入总是得到同样的结果"""
+        if not choices:
+            return None
+        return choices[self._hash(key) % len(choices)]
+
+    def chance(self, ratio: float, key) -> bool:
+        """按输入内容确定性地判断是否命中给定比例"""
+        return ratio > 0 and (self._hash(key) % 10000) < ratio * 10000
+
+    def _hash(self, key) -> int:
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        return zlib.crc32(f"{self.seed}:".encode("utf-8") + bytes(key))
@@ -0,0 +1,220 @@
+"""连接级定时任务的共享分层时间轮
+
+空闲超时、AEC缓存过期、唤醒后恢复VAD等连接级定时任务统一登记到进程内的一个时间轮，
+由一个协程按 tick 推进，替代每个连接各自常驻的定时检查协程。
+登记、取消都是 O(1)；活动时间的更新不需要改动定时器，到期时再检查实际活动时间并重新登记。
+音频发送节拍器（audioRateController）使用另一个 tick 为 20ms 的实例。
+"""
+
+import math
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 每层槽位数（2的幂），三层覆盖 tick * 64^3（tick为100ms时约7小时）
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 3
+# 每执行这么多个到期回调让出一次事件循环
+FIRE_BATCH = 500
+
+
+class TimerHandle:
+    """时间轮中的一个定时器，调用 cancel() 取消"""
+
+    __slots__ = ("due_tick", "callback", "args", "_wheel", "_slot")
+
+    def __init__(self, wheel: "TimerWheel", due_tick: int, callback, args):
+        self.due_tick = due_tick
+        self.callback = callback
+        self.args = args
+        self._wheel = wheel
+        # 当前所在的槽位，已触发或已取消时为 None
+        self._slot: Optional[Set["TimerHandle"]] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self):
+        # 已取出等待执行（分批执行中）的定时器也不再回调
+        self.callback = None
+        if self._slot is not None:
+            self._slot.discard(self)
+            self._slot = None
+            self._wheel._scheduled -= 1
+
+
+class TimerWheel:
+    """分层时间轮：第0层每槽一个 tick，上层每槽是下一层一整圈，到期前逐层下放"""
+
+    def __init__(self, tick_ms: float = 100):
+        self.tick = tick_ms / 1000
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._levels: List[List[Set[TimerHandle]]] = []
+        self._origin = time.monotonic()
+        self._current_tick = 0
+        self._scheduled = 0
+        self.ticks = 0
+        self.fired = 0
+        self.max_tick_lag_ms = 0.0
+
+    def configure(self, config: Optional[Dict[str, Any]]):
+        """读取 tick_ms 配置（如 housekeeping_timers），需在登记第一个定时器前调用"""
+        config = config or {}
+        if "tick_ms" in config:
+            self.tick = max(float(config["tick_ms"]), 1) / 1000
+
+    def ensure_running(self):
+        """确保推进协程在当前事件循环中运行，登记定时器时自动调用"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        if self._loop is not loop:
+            # 首次使用或事件循环已更换（如测试中多次 asyncio.run），重建时间轮；
+            # 旧时间轮中的定时器不会再触发，标记为非等待状态
+            for level in self._levels:
+                for slot in level:
+                    for handle in slot:
+                        handle._slot = None
+            self._loop = loop
+            self._levels = [[set() for _ in range(SLOTS)] for _ in range(LEVELS)]
+            self._origin = time.monotonic()
+            self._current_tick = 0
+            self._scheduled = 0
+            self._wakeup = asyncio.Event()
+        else:
+            # 同一事件循环中推进协程已结束（如被 stop），保留已登记的定时器继续推进
+            self._wakeup.set()
+        self._task = loop.create_task(self._run())
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒后在事件循环中调用 callback(*args)，返回协程时作为任务运行"""
+        self._prepare()
+        due_tick = self._current_tick + max(1, round(delay / self.tick))
+        return self._add(due_tick, callback, args)
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        """在距 when（time.monotonic 时间）最近的 tick 调用 callback(*args)，误差不超过半个 tick"""
+        self._prepare()
+        due_tick = math.ceil((when - self._origin) / self.tick - 0.5)
+        return self._add(max(due_tick, self._current_tick + 1), callback, args)
+
+    def _prepare(self):
+        self.ensure_running()
+        if self._scheduled == 0:
+            # 空闲期间时间轮不推进，没有待触发的定时器时直接对齐到当前时间
+            self._current_tick = int((time.monotonic() - self._origin) / self.tick)
+
+    def _add(self, due_tick: int, callback: Callable, args) -> TimerHandle:
+        handle = TimerHandle(self, due_tick, callback, args)
+        self._insert(handle)
+        self._scheduled += 1
+        self._wakeup.set()
+        return handle
+
+    def _insert(self, handle: TimerHandle):
+        delta = handle.due_tick - self._current_tick
+        if delta <= 0:
+            # 已到期（下放时恰好到期）放入下一个 tick
+            handle.due_tick = self._current_tick + 1
+            delta = 1
+        for level in range(LEVELS):
+            if delta < 1 << (SLOT_BITS * (level + 1)) or level == LEVELS - 1:
+                break
+        # 超出最高层范围的放在最高层最远的槽，下放时会按实际到期时间重新登记
+        shift = SLOT_BITS * level
+        tick = min(handle.due_tick, self._current_tick + (1 << (shift + SLOT_BITS)) - 1)
+        slot = self._levels[level][(tick >> shift) & (SLOTS - 1)]
+        slot.add(handle)
+        handle._slot = slot
+
+    def _advance(self, tick: int) -> List[TimerHandle]:
+        """推进到 tick，返回到期的定时器"""
+        self._current_tick = tick
+        # 上层槽在对应区间开始时下放到下层（先高层后低层）
+        for level in range(LEVELS - 1, 0, -1):
+            shift = SLOT_BITS * level
+            if tick & ((1 << shift) - 1):
+                continue
+            index = (tick >> shift) & (SLOTS - 1)
+            slot = self._levels[level][index]
+            if slot:
+                self._levels[level][index] = set()
+                for handle in slot:
+                    self._insert(handle)
+
+        index = tick & (SLOTS - 1)
+        slot = self._levels[0][index]
+        if not slot:
+            return []
+        self._levels[0][index] = set()
+        due = []
+        for handle in slot:
+            if handle.due_tick <= tick:
+                handle._slot = None
+                due.append(handle)
+            else:
+                self._insert(handle)
+        self._scheduled -= len(due)
+        return due
+
+    async def _run(self):
+        while True:
+            if self._scheduled == 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            next_tick = self._current_tick + 1
+            delay = self._origin + next_tick * self.tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            now = time.monotonic()
+            current = max(next_tick, int((now - self._origin) / self.tick))
+            self.max_tick_lag_ms = max(
+                self.max_tick_lag_ms,
+                (now - self._origin - next_tick * self.tick) * 1000,
+            )
+            # 事件循环卡顿时逐个补上错过的 tick，保证上层槽按顺序下放
+            due = []
+            for tick in range(self._current_tick + 1, current + 1):
+                due.extend(self._advance(tick))
+            self.ticks += 1
+
+            for index, handle in enumerate(due, 1):
+                if index % FIRE_BATCH == 0:
+                    # 大量定时器同时到期时分批执行，中间让出事件循环
+                    await asyncio.sleep(0)
+                if handle.callback is None:
+                    continue
+                try:
+                    result = handle.callback(*handle.args)
+                    if asyncio.iscoroutine(result):
+                        self._loop.create_task(result)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"定时任务执行异常: {e}")
+            self.fired += len(due)
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tick_ms": round(self.tick * 1000, 1),
+            "timers": self._scheduled,
+            "ticks": self.ticks,
+            "fired": self.fired,
+            "max_tick_lag_ms": round(self.max_tick_lag_ms, 1),
+        }
+
+
+housekeeping_timers = TimerWheel()
@@ -0,0 +1,234 @@
+"""TTS语音缓存
+
+按 TTS提供者、配置（音色、语速、音调等）、采样率、音频格式和规范化后的文本
+缓存已编码的音频帧，重复的句子直接播放缓存，不再请求TTS服务。
+
+- 内存层：按字节数限制的LRU
+- 磁盘层：p3格式文件（4字节头 + 音频帧），进程重启后仍可命中，按字节数限制淘汰最久未使用的文件
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config.logger import setup_logging
+from core.utils import p3
+
+TAG = __name__
+logger = setup_logging()
+
+# 每多少次查询输出一次统计日志
+STATS_LOG_INTERVAL = 200
+
+
+class TTSAudioCache:
+    def __init__(
+        self,
+        memory_max_bytes: int,
+        disk_dir: Optional[str],
+        disk_max_bytes: int,
+        max_text_length: int,
+    ):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_length = max_text_length
+        self._memory: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bytes_served": 0,
+        }
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+
+    @staticmethod
+    def build_key(provider: str, config_digest: str, sample_rate, audio_format, text):
+        raw = f"{provider}|{config_digest}|{sample_rate}|{audio_format}|{text}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, text: str) -> bool:
+        """只缓存短句，长回复几乎不会重复"""
+        return bool(text) and len(text) <= self.max_text_length
+
+    def get(self, key: str) -> Optional[List[bytes]]:
+        frames = None
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+        if frames is None:
+            frames = self._load_from_disk(key)
+            with self._lock:
+                if frames is not None:
+                    self._stats["disk_hits"] += 1
+                    self._put_memory(key, frames)
+                else:
+                    self._stats["misses"] += 1
+        if frames is not None:
+            with self._lock:
+                self._stats["bytes_served"] += sum(len(frame) for frame in frames)
+        self._maybe_log_stats()
+        return frames
+
+    def put(self, key: str, frames: List[bytes]):
+        if not frames:
+            return
+        frames = [bytes(frame) for frame in frames]
+        with self._lock:
+            self._put_memory(key, frames)
+            self._stats["stores"] += 1
+        if self.disk_dir:
+            try:
+                self._save_to_disk(key, frames)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"写入TTS磁盘缓存失败: {e}")
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4)
+            if lookups
+            else 0.0
+        )
+        return stats
+
+    def _put_memory(self, key: str, frames: List[bytes]):
+        """写入内存层，调用方需持有锁"""
+        size = sum(len(frame) for frame in frames)
+        if size > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= sum(len(frame) for frame in old)
+        self._memory[key] = frames
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(len(frame) for frame in evicted)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.p3")
+
+    def _load_from_disk(self, key: str) -> Optional[List[bytes]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            frames, _ = p3.decode_opus_from_bytes(data)
+            # 更新访问时间，淘汰时按最久未使用
+            os.utime(path, None)
+            return frames
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取TTS磁盘缓存失败: {path}, {e}")
+            return None
+
+    def _save_to_disk(self, key: str, frames: List[bytes]):
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = p3.encode_opus_to_bytes(frames)
+        # 先写临时文件再替换，避免并发读到半个文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += len(data)
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        """返回 (访问时间, 文件大小, 路径) 列表"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".p3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_disk(self):
+        """淘汰最久未使用的文件，直到占用降到上限的90%"""
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.9
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_bytes = total
+        logger.bind(tag=TAG).debug(f"TTS磁盘缓存淘汰 {removed} 个文件")
+
+    def _maybe_log_stats(self):
+        stats = self.get_statistics()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        if lookups % STATS_LOG_INTERVAL == 0:
+            logger.bind(tag=TAG).info(
+                f"TTS语音缓存统计: 命中率 {stats['hit_rate']:.2%}, "
+                f"内存 {stats['memory_entries']} 条/{stats['memory_bytes'] / 1024:.0f}KB, "
+                f"磁盘 {stats['disk_bytes'] / 1024:.0f}KB, "
+                f"累计命中音频 {stats['bytes_served'] / 1024:.0f}KB"
+            )
+
+
+_audio_cache: Optional[TTSAudioCache] = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_tts_audio_cache(config: Dict[str, Any]) -> Optional[TTSAudioCache]:
+    """获取进程内共享的TTS语音缓存，未开启时返回 None"""
+    global _audio_cache
+    cache_config = config.get("tts_audio_cache") or {}
+    if not cache_config.get("enable", False):
+        return None
+    if _audio_cache is None:
+        with _audio_cache_lock:
+            if _audio_cache is None:
+                _audio_cache = TTSAudioCache(
+                    memory_max_bytes=int(
+                        cache_config.get("memory_max_mb", 64) * 1024 * 1024
+                    ),
+                    disk_dir=cache_config.get("disk_dir") or None,
+                    disk_max_bytes=int(
+                        cache_config.get("disk_max_mb", 512) * 1024 * 1024
+                    ),
+                    max_text_length=int(cache_config.get("max_text_length", 50)),
+                )
+    return _audio_cache
+
+
+def peek_tts_audio_cache() -> Optional[TTSAudioCache]:
+    """返回已创建的TTS语音缓存，未创建时返回 None，不会按配置新建"""
+    return _audio_cache
@@ -73,7 +73,11 @@ def is_private_ip(ip_addr):
         return False  # IP address format error or insufficient segments
 
 
+IP_INFO_URL = "https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={ip}"
+
+
 def get_ip_info(ip_addr, logger):
+    """同步获取IP归属地，只能在线程中调用，事件循环中请使用 get_ip_info_async"""
     try:
         # 导入全局缓存管理器
         from core.utils.cache.manager import cache_manager, CacheType
@@ -84,10 +88,9 @@ def get_ip_info(ip_addr, logger):
             return cached_ip_info
 
         # 缓存未命中，调用API
-        if is_private_ip(ip_addr):
-            ip_addr = ""
-        url = f"https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={ip_addr}"
-        resp = requests.get(url).json()
+        query_ip = "" if is_private_ip(ip_addr) else ip_addr
+        url = IP_INFO_URL.format(ip=query_ip)
+        resp = requests.get(url, timeout=3).json()
         ip_info = {"city": resp.get("city")}
 
         # 存入缓存
@@ -98,6 +101,28 @@ def get_ip_info(ip_addr, logger):
         return {}
 
 
+async def get_ip_info_async(ip_addr, logger):
+    """异步获取IP归属地，不阻塞事件循环"""
+    try:
+        from core.utils.cache.manager import cache_manager, CacheType
+        from core.utils.context_provider import get_shared_http_client
+
+        cached_ip_info = cache_manager.get(CacheType.IP_INFO, ip_addr)
+        if cached_ip_info is not None:
+            return cached_ip_info
+
+        query_ip = "" if is_private_ip(ip_addr) else ip_addr
+        client = get_shared_http_client()
+        response = await client.get(IP_INFO_URL.format(ip=query_ip), timeout=3)
+        ip_info = {"city": response.json().get("city")}
+
+        cache_manager.set(CacheType.IP_INFO, ip_addr, ip_info)
+        return ip_info
+    except Exception as e:
+        logger.bind(tag=TAG).error(f"Error getting client ip info: {e}")
+        return {}
+
+
 def write_json_file(file_path, data):
     """将数据写入 JSON 文件"""
     with open(file_path, "w", encoding="utf-8") as file:
@@ -247,7 +272,10 @@ def audio_to_data_stream(
 
 
 async def audio_to_data(
-    audio_file_path: str, is_opus: bool = True, use_cache: bool = True
+    audio_file_path: str,
+    is_opus: bool = True,
+    use_cache: bool = True,
+    frame_duration: int = 60,
 ) -> list[bytes]:
     """
     将音频文件转换为Opus/PCM编码的帧列表
@@ -255,12 +283,13 @@ async def audio_to_data(
         audio_file_path: 音频文件路径
         is_opus: 是否进行Opus编码
         use_cache: 是否使用缓存
+        frame_duration: 帧时长（毫秒），需与连接协商的帧时长一致
     """
     from core.utils.cache.manager import cache_manager
     from core.utils.cache.config import CacheType
 
-    # 生成缓存键，包含文件路径和编码类型
-    cache_key = f"{audio_file_path}:{is_opus}"
+    # 生成缓存键，包含文件路径、编码类型和帧时长
+    cache_key = f"{audio_file_path}:{is_opus}:{frame_duration}"
 
     # 尝试从缓存获取结果
     if use_cache:
@@ -288,8 +317,7 @@ async def audio_to_data(
         encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
 
         # 编码参数
-        frame_duration = 60  # 60ms per frame
-        frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
+        frame_size = int(16000 * frame_duration / 1000)  # 60ms时为960 samples/frame
 
         datas = []
         # 按帧处理所有音频数据（包括最后一帧可能补零）
@@ -325,10 +353,11 @@ async def audio_to_data(
 
 
 def audio_bytes_to_data_stream(
-    audio_bytes, file_type, is_opus, callback: Callable[[Any], Any], sample_rate=16000, opus_encoder=None
+    audio_bytes, file_type, is_opus, callback: Callable[[Any], Any], sample_rate=16000, opus_encoder=None, frame_duration=60
 ) -> None:
     """
     直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    frame_duration 为编码的帧时长（毫秒），p3 文件按原有帧输出
     """
     if file_type == "p3":
         # 直接用p3解码
@@ -340,10 +369,10 @@ def audio_bytes_to_data_stream(
         )
         audio = audio.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
         raw_data = audio.raw_data
-        pcm_to_data_stream(raw_data, is_opus, callback, sample_rate, opus_encoder)
+        pcm_to_data_stream(raw_data, is_opus, callback, sample_rate, opus_encoder, frame_duration)
 
 
-def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] = None, sample_rate=16000, opus_encoder=None):
+def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] = None, sample_rate=16000, opus_encoder=None, frame_duration=60):
     """
     将PCM数据流式编码为Opus或直接输出PCM
 
@@ -353,14 +382,16 @@ def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] =
         callback: 回调函数
         sample_rate: 采样率
         opus_encoder: OpusEncoderUtils对象(推荐提供以保持编码器状态连续)
+        frame_duration: 帧时长（毫秒），提供 opus_encoder 时使用编码器的帧时长
     """
     using_temp_encoder = False
     if is_opus and opus_encoder is None:
         encoder = opuslib_next.Encoder(sample_rate, 1, opuslib_next.APPLICATION_AUDIO)
         using_temp_encoder = True
+    elif opus_encoder is not None:
+        frame_duration = opus_encoder.frame_size_ms
 
     # 编码参数
-    frame_duration = 60  # 60ms per frame
     frame_size = int(sample_rate * frame_duration / 1000)  # samples/frame
 
     # 按帧处理所有音频数据（包括最后一帧可能补零）
@@ -396,8 +427,8 @@ def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
     try:
         pcm_datas = []
 
-        frame_duration = 60  # ms
-        frame_size = int(sample_rate * frame_duration / 1000)  # 960
+        # 按Opus单包最长120ms分配解码缓冲，兼容20/40/60ms等不同帧时长
+        frame_size = int(sample_rate * 120 / 1000)
 
         for opus_frame in opus_datas:
             # 解码为PCM（返回bytes，2字节/采样点）
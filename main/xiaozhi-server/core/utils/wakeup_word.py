@@ -1,140 +1,168 @@
 import os
 import re
+import copy
 import yaml
 import time
+import asyncio
 import hashlib
-import portalocker
-from typing import Dict
+import threading
+from typing import Dict, List, Optional
+from config.logger import setup_logging
+from core.utils import p3
 
+TAG = __name__
+logger = setup_logging()
 
-class FileLock:
-    def __init__(self, file, timeout=5):
-        self.file = file
-        self.timeout = timeout
-        self.start_time = None
+# 唤醒词回复短于该时长（毫秒）视为生成失败
+MIN_RESPONSE_MS = 480
 
-    def __enter__(self):
-        self.start_time = time.time()
-        while True:
-            try:
-                portalocker.lock(self.file, portalocker.LOCK_EX | portalocker.LOCK_NB)
-                return self.file
-            except portalocker.LockException:
-                if time.time() - self.start_time > self.timeout:
-                    raise TimeoutError("获取文件锁超时")
-                time.sleep(0.1)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        portalocker.unlock(self.file)
+class WakeupWordsConfig:
+    """唤醒词回复管理
 
+    回复按音色、输出采样率和帧时长保存为已编码好的Opus帧（p3文件），启动时全部加载到内存，
+    唤醒时只需查内存后直接发送；更新回复时先在线程池中写文件，不阻塞事件循环，写入成功后再更新内存。
+    """
 
-class WakeupWordsConfig:
     def __init__(self):
         self.config_file = "data/.wakeup_words.yaml"
         self.assets_dir = "config/assets/wakeup_words"
         self._ensure_directories()
-        self._config_cache = None
-        self._last_load_time = 0
-        self._cache_ttl = 1  # 缓存有效期（秒）
-        self._lock_timeout = 5  # 文件锁超时时间（秒）
+        # 写文件在线程池中执行，多个更新按顺序落盘
+        self._save_lock = threading.Lock()
+        self._config: Dict = self._read_config_file()
+        # (音色哈希, 采样率, 帧时长) -> Opus帧
+        self._frames: Dict[tuple, List[bytes]] = {}
+        self._load_frames()
 
     def _ensure_directories(self):
         """确保必要的目录存在"""
         os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
         os.makedirs(self.assets_dir, exist_ok=True)
 
-    def _load_config(self) -> Dict:
-        """加载配置文件，使用缓存机制"""
-        current_time = time.time()
-
-        # 如果缓存有效，直接返回缓存
-        if (
-            self._config_cache is not None
-            and current_time - self._last_load_time < self._cache_ttl
-        ):
-            return self._config_cache
-
+    def _read_config_file(self) -> Dict:
         try:
-            with open(self.config_file, "a+", encoding="utf-8") as f:
-                with FileLock(f, timeout=self._lock_timeout):
-                    f.seek(0)
-                    content = f.read()
-                    config = yaml.safe_load(content) if content else {}
-                    self._config_cache = config
-                    self._last_load_time = current_time
-                    return config
-        except (TimeoutError, IOError) as e:
-            print(f"加载配置文件失败: {e}")
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
             return {}
         except Exception as e:
-            print(f"加载配置文件时发生未知错误: {e}")
+            logger.bind(tag=TAG).error(f"加载唤醒词回复配置失败: {e}")
             return {}
 
-    def _save_config(self, config: Dict):
-        """保存配置到文件，使用文件锁保护"""
-        try:
-            with open(self.config_file, "w", encoding="utf-8") as f:
-                with FileLock(f, timeout=self._lock_timeout):
-                    yaml.dump(config, f, allow_unicode=True)
-                    self._config_cache = config
-                    self._last_load_time = time.time()
-        except (TimeoutError, IOError) as e:
-            print(f"保存配置文件失败: {e}")
-            raise
-        except Exception as e:
-            print(f"保存配置文件时发生未知错误: {e}")
-            raise
-
-    def get_wakeup_response(self, voice: str) -> Dict:
-        voice = hashlib.md5(voice.encode()).hexdigest()
-        """获取唤醒词回复配置"""
-        config = self._load_config()
-
-        if not config or voice not in config:
-            return None
-
-        # 检查文件大小
-        file_path = config[voice]["file_path"]
-        if not os.path.exists(file_path) or os.stat(file_path).st_size < (15 * 1024):
-            return None
+    def _load_frames(self):
+        """加载已保存的唤醒词回复音频
 
-        return config[voice]
-
-    def update_wakeup_response(self, voice: str, file_path: str, text: str):
-        """更新唤醒词回复配置"""
-        try:
-            # 过滤表情符号
-            filtered_text = re.sub(r'[\U0001F600-\U0001F64F\U0001F900-\U0001F9FF]', '', text)
-            
-            config = self._load_config()
-            voice_hash = hashlib.md5(voice.encode()).hexdigest()
-            config[voice_hash] = {
-                "voice": voice,
-                "file_path": file_path,
-                "time": time.time(),
-                "text": filtered_text,
-            }
-            self._save_config(config)
-        except Exception as e:
-            print(f"更新唤醒词回复配置失败: {e}")
-            raise
-
-    def generate_file_path(self, voice: str) -> str:
-        """生成音频文件路径，使用voice的哈希值作为文件名"""
-        try:
-            # 生成voice的哈希值
-            voice_hash = hashlib.md5(voice.encode()).hexdigest()
-            file_path = os.path.join(self.assets_dir, f"{voice_hash}.wav")
-
-            # 如果文件已存在，先删除
-            if os.path.exists(file_path):
+        旧版本保存的wav文件和未记录帧时长的回复不再使用，会在下次刷新时重新生成
+        """
+        for voice_hash, entry in self._config.items():
+            for response_key, response in (entry.get("responses") or {}).items():
                 try:
-                    os.remove(file_path)
+                    sample_rate, frame_duration = self._parse_response_key(response_key)
+                except ValueError:
+                    continue
+                file_path = response.get("file_path")
+                try:
+                    frames, _ = p3.decode_opus_from_file(file_path)
                 except Exception as e:
-                    print(f"删除已存在的音频文件失败: {e}")
-                    raise
-
-            return file_path
+                    logger.bind(tag=TAG).warning(f"加载唤醒词回复音频失败: {file_path}, {e}")
+                    continue
+                if len(frames) * frame_duration >= MIN_RESPONSE_MS:
+                    self._frames[(voice_hash, sample_rate, frame_duration)] = frames
+
+    @staticmethod
+    def _voice_hash(voice: str) -> str:
+        return hashlib.md5(voice.encode()).hexdigest()
+
+    @staticmethod
+    def _response_key(sample_rate: int, frame_duration: int) -> str:
+        return f"{int(sample_rate)}_{int(frame_duration)}"
+
+    @staticmethod
+    def _parse_response_key(response_key) -> tuple:
+        """解析回复键 "采样率_帧时长"，旧版本只有采样率的键抛出 ValueError"""
+        sample_rate, frame_duration = str(response_key).split("_")
+        return int(sample_rate), int(frame_duration)
+
+    def get_wakeup_response(
+        self, voice: str, sample_rate: int, frame_duration: int
+    ) -> Optional[Dict]:
+        """获取唤醒词回复，返回包含 text、time 和 Opus 帧 frames 的字典，没有可用回复时返回 None"""
+        voice_hash = self._voice_hash(voice)
+        frames = self._frames.get((voice_hash, int(sample_rate), int(frame_duration)))
+        if frames is None:
+            return None
+        response = self._config[voice_hash]["responses"][
+            self._response_key(sample_rate, frame_duration)
+        ]
+        return {
+            "voice": voice,
+            "text": response.get("text"),
+            "time": response.get("time", 0),
+            "frames": frames,
+        }
+
+    async def update_wakeup_response(
+        self,
+        voice: str,
+        sample_rate: int,
+        frame_duration: int,
+        frames: List[bytes],
+        text: str,
+    ):
+        """更新唤醒词回复：在线程池中写入文件，写入成功后内存中生效"""
+        if not isinstance(frames, list) or not all(
+            isinstance(frame, (bytes, bytearray)) for frame in frames
+        ):
+            logger.bind(tag=TAG).warning(
+                f"唤醒词回复音频不是Opus帧列表，已忽略: {type(frames).__name__}"
+            )
+            return
+        if len(frames) * frame_duration < MIN_RESPONSE_MS:
+            logger.bind(tag=TAG).warning(f"唤醒词回复音频过短，已忽略: {text}")
+            return
+        # 过滤表情符号
+        filtered_text = re.sub(
+            r"[\U0001F600-\U0001F64F\U0001F900-\U0001F9FF]", "", text
+        )
+        voice_hash = self._voice_hash(voice)
+        sample_rate = int(sample_rate)
+        frame_duration = int(frame_duration)
+        response_key = self._response_key(sample_rate, frame_duration)
+        file_path = os.path.join(self.assets_dir, f"{voice_hash}_{response_key}.p3")
+
+        config = copy.deepcopy(self._config)
+        entry = config.get(voice_hash)
+        if not entry or "responses" not in entry:
+            # 新音色或旧版本的wav配置
+            entry = config[voice_hash] = {"voice": voice, "responses": {}}
+        entry["responses"][response_key] = {
+            "file_path": file_path,
+            "time": time.time(),
+            "text": filtered_text,
+        }
+        frames = list(frames)
+        try:
+            await asyncio.to_thread(self._persist, config, file_path, frames)
         except Exception as e:
-            print(f"生成音频文件路径失败: {e}")
-            raise
\ No newline at end of file
+            # 保留原有回复，下次唤醒时再尝试更新
+            logger.bind(tag=TAG).error(f"保存唤醒词回复失败: {e}")
+            return
+        self._config = config
+        self._frames[(voice_hash, sample_rate, frame_duration)] = frames
+
+    def _persist(self, config: Dict, file_path: str, frames: List[bytes]):
+        """写入音频和配置文件，先写临时文件再替换，避免读到半个文件"""
+        with self._save_lock:
+            self._atomic_write(file_path, p3.encode_opus_to_bytes(frames))
+            self._atomic_write(
+                self.config_file,
+                yaml.dump(config, allow_unicode=True).encode("utf-8"),
+            )
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -33,6 +33,8 @@ _setup_websockets_logger()
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api_async
 from core.auth import AuthManager, AuthenticationError
+from core.utils.admission import admission_controller, AdmissionRejected
+from core.utils.private_config_cache import private_config_cache
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
 
@@ -146,6 +148,14 @@ class WebSocketServer:
     async def _http_response(self, websocket, request_headers):
         # 检查是否为 WebSocket 升级请求
         if request_headers.headers.get("connection", "").lower() == "upgrade":
+            # 超出准入能力时在握手阶段直接拒绝，告诉客户端多久后重试
+            try:
+                await admission_controller.admit()
+            except AdmissionRejected as e:
+                self.logger.bind(tag=TAG).debug(f"拒绝新连接: {e}")
+                response = websocket.respond(503, "Server busy, retry later\n")
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response
             # 如果是 WebSocket 请求，返回 None 允许握手继续
             return None
         else:
@@ -174,6 +184,8 @@ class WebSocketServer:
                 )
                 # 更新配置
                 self.config = new_config
+                # 智控台修改配置后下发 update_config，已缓存的设备差异化配置一并失效
+                private_config_cache.invalidate()
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
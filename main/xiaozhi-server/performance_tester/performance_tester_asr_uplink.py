@@ -0,0 +1,198 @@
+import gzip
+import json
+import time
+import asyncio
+import multiprocessing
+import websockets
+from tabulate import tabulate
+from core.providers.asr.uplink import AudioUplink, BYTES_PER_MS
+
+description = "流式ASR上行音频合并与压缩压测（本地桩服务，每路CPU与音频送达延迟）"
+
+# 并发识别路数
+STREAMS = 50
+# 每路说话时长（秒），按60ms一帧实时送入
+SPEECH_SECONDS = 3
+FRAME_MS = 60
+HOST = "127.0.0.1"
+PORT = 8765
+# (名称, 合并包时长ms, gzip压缩级别，0为不压缩, 是否在接收音频的流程中直接发送)
+CASES = [
+    ("逐帧直接发送 gzip9（改造前）", 0, 9, True),
+    ("逐帧 gzip1", 0, 1, False),
+    ("逐帧 不压缩", 0, 0, False),
+    ("合并120ms gzip1", 120, 1, False),
+    ("合并120ms 不压缩", 120, 0, False),
+    ("合并200ms gzip1", 200, 1, False),
+    ("合并200ms 不压缩", 200, 0, False),
+]
+
+
+def build_header(last: bool, compressed: bool) -> bytearray:
+    """与 doubao_stream 的音频请求头一致"""
+    header = bytearray(b"\x11")
+    header.append((0x02 << 4) | (0x02 if last else 0x00))
+    header.append((0x01 << 4) | (0x01 if compressed else 0x00))
+    header.append(0x00)
+    return header
+
+
+def encode_packet(pcm: bytes, compress_level: int, last: bool = False) -> bytearray:
+    payload = (
+        gzip.compress(pcm, compresslevel=compress_level) if compress_level else pcm
+    )
+    packet = build_header(last, compress_level > 0)
+    packet.extend(len(payload).to_bytes(4, "big"))
+    packet.extend(payload)
+    return packet
+
+
+async def stub_handler(websocket):
+    """桩识别服务：解压并记录每个包的到达时间与累计字节数，收到结束包后返回"""
+    arrivals = []
+    received = 0
+    async for message in websocket:
+        compressed = message[2] & 0x0F == 0x01
+        payload = bytes(message[8:])
+        if compressed:
+            payload = gzip.decompress(payload)
+        received += len(payload)
+        arrivals.append((received, time.monotonic()))
+        if message[1] & 0x0F == 0x02:
+            await websocket.send(json.dumps({"text": "识别结果", "arrivals": arrivals}))
+
+
+def run_stub_server():
+    async def serve():
+        async with websockets.serve(stub_handler, HOST, PORT, max_size=None):
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+class DirectUplink:
+    """改造前的方式：每帧在接收音频的流程中压缩并等待发送完成"""
+
+    def __init__(self, ws, compress_level):
+        self.ws = ws
+        self.compress_level = compress_level
+
+    async def push(self, pcm):
+        await self.ws.send(encode_packet(pcm, self.compress_level))
+
+    async def flush(self):
+        pass
+
+
+class CoalescedUplink:
+    def __init__(self, ws, packet_ms, compress_level):
+        self.uplink = AudioUplink(
+            {"uplink_packet_ms": packet_ms},
+            lambda pcm: encode_packet(pcm, compress_level),
+        )
+        self.uplink.start(ws)
+
+    async def push(self, pcm):
+        self.uplink.push(pcm)
+
+    async def flush(self):
+        await self.uplink.flush()
+
+
+async def run_stream(index, packet_ms, compress_level, direct, frame):
+    async with websockets.connect(f"ws://{HOST}:{PORT}", max_size=None) as ws:
+        if direct:
+            uplink = DirectUplink(ws, compress_level)
+        else:
+            uplink = CoalescedUplink(ws, packet_ms, compress_level)
+        pushes = []
+        # 错开各路的起始时间，模拟设备随机开始说话
+        await asyncio.sleep(index * FRAME_MS / 1000 / STREAMS)
+        start = time.monotonic()
+        frames = SPEECH_SECONDS * 1000 // FRAME_MS
+        for number in range(frames):
+            pushes.append(((number + 1) * len(frame), time.monotonic()))
+            await uplink.push(frame)
+            await asyncio.sleep(
+                max(0, start + (number + 1) * FRAME_MS / 1000 - time.monotonic())
+            )
+        end_time = time.monotonic()
+        await uplink.flush()
+        await ws.send(encode_packet(b"", compress_level, last=True))
+        result = json.loads(await ws.recv())
+        final_ms = (time.monotonic() - end_time) * 1000
+        if not direct:
+            uplink.uplink.stop()
+
+    # 每帧音频从送入到服务端收到的延迟
+    arrivals = result["arrivals"]
+    delays = []
+    position = 0
+    for total, pushed_at in pushes:
+        while arrivals[position][0] < total:
+            position += 1
+        delays.append((arrivals[position][1] - pushed_at) * 1000)
+    return delays, final_ms, len(arrivals) - 1
+
+
+async def run_case(name, packet_ms, compress_level, direct, frame):
+    cpu_start = time.process_time()
+    results = await asyncio.gather(
+        *(
+            run_stream(index, packet_ms, compress_level, direct, frame)
+            for index in range(STREAMS)
+        )
+    )
+    cpu_seconds = time.process_time() - cpu_start
+    delays = sorted(delay for result in results for delay in result[0])
+    final_ms = sorted(result[1] for result in results)
+    messages = sum(result[2] for result in results)
+    return [
+        name,
+        f"{messages / STREAMS / SPEECH_SECONDS:.1f}",
+        f"{cpu_seconds * 1e6 / STREAMS / SPEECH_SECONDS:.0f}",
+        f"{sum(delays) / len(delays):.1f}",
+        f"{delays[len(delays) * 99 // 100]:.1f}",
+        f"{sum(final_ms) / len(final_ms):.1f}",
+    ]
+
+
+async def main():
+    server = multiprocessing.Process(target=run_stub_server, daemon=True)
+    server.start()
+    await asyncio.sleep(1)
+    # 伪随机样本近似语音的压缩率，避免全零数据被过度压缩
+    frame = bytes(
+        (int(64 + 63 * ((i * 7919) % 97) / 97) & 0xFF)
+        for i in range(FRAME_MS * BYTES_PER_MS)
+    )
+    rows = []
+    try:
+        for name, packet_ms, compress_level, direct in CASES:
+            rows.append(await run_case(name, packet_ms, compress_level, direct, frame))
+    finally:
+        server.terminate()
+
+    print(
+        f"\n{STREAMS} 路并发，每路 {SPEECH_SECONDS} 秒音频（{FRAME_MS}ms一帧实时送入），"
+        "桩服务在独立进程中运行；CPU为本进程（客户端）的CPU时间，"
+        "送达延迟为每帧从送入到服务端收到的时间，结束延迟为说完后到收到识别结果的时间"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "方式",
+                "每路每秒消息数",
+                "每路每秒CPU(us)",
+                "平均送达延迟(ms)",
+                "P99送达延迟(ms)",
+                "结束延迟(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+import time
+import asyncio
+from collections import deque
+from tabulate import tabulate
+from core.utils.audioRateController import AudioRateController, AudioPacingScheduler
+
+description = (
+    "音频发送节拍器压测（对比每连接独立发送协程与共享时间轮的事件循环CPU占用）"
+)
+
+# 模拟的并发连接数
+CONNECTIONS = [100, 500, 1000, 2000]
+# 每个连接发送的音频时长（秒）
+AUDIO_SECONDS = 6
+FRAME_DURATION = 60
+
+
+class LegacyRateController:
+    """改造前的实现：每个连接一个发送协程，每个音频包之前 asyncio.sleep 到播放时间"""
+
+    def __init__(self, frame_duration=60):
+        self.frame_duration = frame_duration
+        self.queue = deque()
+        self.play_position = 0
+        self.start_timestamp = None
+        self.queue_empty_event = asyncio.Event()
+        self.queue_has_data_event = asyncio.Event()
+        self.pending_send_task = None
+
+    def add_audio(self, packet, duration_ms=None):
+        self.queue.append((packet, duration_ms or self.frame_duration))
+        self.queue_empty_event.clear()
+        self.queue_has_data_event.set()
+
+    async def _check_queue(self, send_audio_callback):
+        while self.queue:
+            if self.start_timestamp is None:
+                self.start_timestamp = time.monotonic()
+            packet, duration_ms = self.queue[0]
+            while True:
+                elapsed_ms = (time.monotonic() - self.start_timestamp) * 1000
+                if elapsed_ms < self.play_position:
+                    await asyncio.sleep((self.play_position - elapsed_ms) / 1000)
+                else:
+                    break
+            self.queue.popleft()
+            self.play_position += duration_ms
+            await send_audio_callback(packet)
+        self.queue_empty_event.set()
+        self.queue_has_data_event.clear()
+
+    def start_sending(self, send_audio_callback):
+        async def _send_loop():
+            while True:
+                await self.queue_has_data_event.wait()
+                await self._check_queue(send_audio_callback)
+
+        self.pending_send_task = asyncio.create_task(_send_loop())
+
+    def stop_sending(self):
+        self.pending_send_task.cancel()
+
+
+async def run_case(name: str, connections: int):
+    packets = AUDIO_SECONDS * 1000 // FRAME_DURATION
+    scheduler = AudioPacingScheduler()
+    lateness = []
+    controllers = []
+
+    for _ in range(connections):
+        if name == "legacy":
+            controller = LegacyRateController(FRAME_DURATION)
+        else:
+            controller = AudioRateController(FRAME_DURATION, scheduler=scheduler)
+
+        async def send(packet, controller=controller):
+            # 本包理论发送时间 = 开始时间 + 发送前的播放位置
+            ideal = (
+                controller.start_timestamp
+                + (controller.play_position - FRAME_DURATION) / 1000
+            )
+            lateness.append((time.monotonic() - ideal) * 1000)
+
+        controller.start_sending(send)
+        controllers.append(controller)
+
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    # 各连接错开开始，模拟真实场景中TTS首包到达时间不一致
+    for index, controller in enumerate(controllers):
+        for packet in range(packets):
+            controller.add_audio(packet)
+        if index % 50 == 49:
+            await asyncio.sleep(0.001)
+    await asyncio.gather(*(c.queue_empty_event.wait() for c in controllers))
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.monotonic() - wall_start
+
+    for controller in controllers:
+        controller.stop_sending()
+    scheduler.stop()
+
+    lateness.sort()
+    total = len(lateness)
+    return [
+        name,
+        connections,
+        total,
+        f"{cpu_seconds / wall_seconds * 100:.1f}%",
+        f"{cpu_seconds * 1e6 / total:.1f}",
+        f"{lateness[total // 2]:.1f}",
+        f"{lateness[int(total * 0.99)]:.1f}",
+        f"{lateness[-1]:.1f}",
+        f"{lateness[0]:.1f}",
+        scheduler.snapshot()["ticks"] if name != "legacy" else "-",
+    ]
+
+
+async def main():
+    rows = []
+    for connections in CONNECTIONS:
+        for name in ("legacy", "scheduler"):
+            rows.append(await run_case(name, connections))
+            print(f"完成: {name} x {connections}")
+
+    print(
+        f"\n每连接发送 {AUDIO_SECONDS}s 音频（{FRAME_DURATION}ms/包），发送回调为空操作，"
+        "CPU占用为事件循环线程在发送期间的CPU时间占比；延迟为实际发送时间与理论播放时间之差（毫秒，负数为提前）"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "实现",
+                "连接数",
+                "发送包数",
+                "CPU占用",
+                "CPU(us/包)",
+                "延迟P50(ms)",
+                "延迟P99(ms)",
+                "延迟最大(ms)",
+                "延迟最小(ms)",
+                "节拍次数",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import copy
+import time
+import asyncio
+import tracemalloc
+from tabulate import tabulate
+from config.settings import load_config
+from config.layered_config import LayeredConfig
+
+description = "连接级配置创建压测（对比整份深拷贝与写时复制配置层的耗时与内存）"
+
+# 同时重连的设备数
+RECONNECTS = 5000
+
+
+def build_private_config(config):
+    """模拟智控台下发的差异化配置（每个连接各自一份新对象）"""
+    selected = config["selected_module"]
+    private_config = {"selected_module": {}}
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        name = selected.get(module)
+        if name and name in config.get(module, {}):
+            private_config[module] = {name: copy.deepcopy(config[module][name])}
+            private_config["selected_module"][module] = name
+    private_config["prompt"] = "你是一个叫小智的台湾女孩，说话机车，声音好听。"
+    private_config["correct_words"] = ["小知|小智"]
+    return private_config
+
+
+def apply_private_config(conn_config, private_config):
+    """按 ConnectionHandler._initialize_private_config_async 的方式写入连接配置"""
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        if private_config.get(module) is not None:
+            conn_config[module] = private_config[module]
+            conn_config["selected_module"][module] = private_config["selected_module"][
+                module
+            ]
+    conn_config["prompt"] = private_config["prompt"]
+    select_tts_module = conn_config["selected_module"]["TTS"]
+    conn_config["TTS"][select_tts_module]["correct_words"] = private_config[
+        "correct_words"
+    ]
+    # helloHandle 中对欢迎消息的修改
+    welcome_msg = conn_config["xiaozhi"]
+    welcome_msg["session_id"] = "00000000"
+    welcome_msg["audio_params"]["frame_duration"] = 60
+
+
+async def reconnect(mode, config, private_config):
+    if mode == "deepcopy":
+        conn_config = copy.deepcopy(config)
+    else:
+        conn_config = LayeredConfig(config)
+    apply_private_config(conn_config, private_config)
+    await asyncio.sleep(0)
+    return conn_config
+
+
+async def run_case(mode, config):
+    private_configs = [build_private_config(config) for _ in range(RECONNECTS)]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    cpu_start = time.process_time()
+    # 所有连接同时建立，模拟网关重启后的重连风暴
+    conn_configs = await asyncio.gather(
+        *(reconnect(mode, config, private) for private in private_configs)
+    )
+    cpu_seconds = time.process_time() - cpu_start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_connection_kb = (current - baseline) / len(conn_configs) / 1024
+    del conn_configs
+    return [
+        mode,
+        RECONNECTS,
+        f"{cpu_seconds * 1000:.0f}",
+        f"{cpu_seconds * 1e6 / RECONNECTS:.1f}",
+        f"{per_connection_kb:.1f}",
+        f"{(peak - baseline) / 1024 / 1024:.1f}",
+    ]
+
+
+async def main():
+    config = await load_config()
+    rows = []
+    for mode in ("deepcopy", "layered"):
+        rows.append(await run_case(mode, config))
+    print(
+        f"\n{RECONNECTS} 个连接同时建立并写入差异化配置；耗时含 tracemalloc 开销，用于相对比较；"
+        "内存为所有连接存活时每个连接配置的常驻增量（不含差异化配置本身）"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "方式",
+                "连接数",
+                "总CPU(ms)",
+                "每连接CPU(us)",
+                "每连接内存(KB)",
+                "峰值增量(MB)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+import time
+import wave
+import asyncio
+import numpy as np
+import opuslib_next
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.vad import create_instance
+from core.utils.dsp_workers import DspWorkerPool
+
+description = "音频前端DSP工作进程压测（Opus解码 + VAD推理吞吐随工作进程数的变化）"
+
+AUDIO_FILE = "config/assets/wakeup_words.wav"
+SAMPLE_RATE = 16000
+FRAME_DURATION = 60
+FRAME_SIZE = SAMPLE_RATE * FRAME_DURATION // 1000
+# 同时说话的设备数
+STREAMS = 200
+# 每个设备发送的音频包数
+PACKETS_PER_STREAM = 100
+# 工作进程数，0 表示在本进程事件循环中处理（未开启DSP工作进程时的方式）
+WORKER_COUNTS = [0, 1, 2, 4]
+RING_SLOTS = 1024
+
+
+def encode_opus_frames(path: str):
+    """将录音转换为设备上行使用的16kHz单声道60ms Opus帧"""
+    with wave.open(path, "rb") as wav_file:
+        source_rate = wav_file.getframerate()
+        samples = np.frombuffer(
+            wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+        )
+    positions = np.arange(0, len(samples), source_rate / SAMPLE_RATE)
+    pcm = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_VOIP)
+    frames = []
+    for start in range(0, len(pcm) - FRAME_SIZE, FRAME_SIZE):
+        frames.append(
+            encoder.encode(pcm[start : start + FRAME_SIZE].tobytes(), FRAME_SIZE)
+        )
+    return frames
+
+
+class InlineStream:
+    """本进程内处理：与连接未开启DSP工作进程时相同的解码与VAD推理"""
+
+    def __init__(self, vad):
+        self.vad = vad
+        self.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1)
+        self.client_audio_buffer = bytearray()
+
+    def process(self, opus_packet: bytes):
+        pcm = self.decoder.decode(opus_packet, FRAME_SIZE * 2)
+        return self.vad.speech_probs(self, pcm)
+
+
+async def run_inline(vad_config, frames):
+    vad = create_instance(vad_config["type"], vad_config["config"])
+    streams = [InlineStream(vad) for _ in range(STREAMS)]
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    for index in range(PACKETS_PER_STREAM):
+        packet = frames[index % len(frames)]
+        for stream in streams:
+            stream.process(packet)
+        # 与真实连接一样，每轮让出事件循环
+        await asyncio.sleep(0)
+    return time.monotonic() - wall_start, time.process_time() - cpu_start
+
+
+async def run_workers(workers, vad_config, frames):
+    pool = DspWorkerPool(workers=workers, ring_slots=RING_SLOTS)
+    pool.start()
+    received = [0]
+
+    def on_result(frame):
+        received[0] += 1
+
+    streams = []
+    for _ in range(STREAMS):
+        stream = pool.open_stream(vad_config, on_result)
+        if stream is None:
+            raise RuntimeError("DSP工作进程启动失败")
+        streams.append(stream)
+
+    # 先让每个流处理一个包，排除工作进程启动与模型加载的时间
+    for stream in streams:
+        stream.submit_audio(frames[0])
+    while received[0] < STREAMS:
+        await asyncio.sleep(0.01)
+    received[0] = 0
+
+    total = STREAMS * PACKETS_PER_STREAM
+    # 未处理完的包不超过各工作进程缓冲区容量的一半，避免丢包
+    max_in_flight = workers * RING_SLOTS // 2
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    submitted = 0
+    for index in range(PACKETS_PER_STREAM):
+        packet = frames[index % len(frames)]
+        for stream in streams:
+            while submitted - received[0] >= max_in_flight:
+                await asyncio.sleep(0.001)
+            stream.submit_audio(packet)
+            submitted += 1
+        await asyncio.sleep(0)
+    while received[0] < total:
+        await asyncio.sleep(0.001)
+    result = time.monotonic() - wall_start, time.process_time() - cpu_start
+
+    for stream in streams:
+        stream.close()
+    pool.stop()
+    return result
+
+
+async def main():
+    config = await load_config()
+    select_vad_module = config["selected_module"]["VAD"]
+    vad_module_config = config["VAD"][select_vad_module]
+    vad_config = {
+        "type": vad_module_config.get("type", select_vad_module),
+        "config": vad_module_config,
+    }
+    frames = encode_opus_frames(AUDIO_FILE)
+    total = STREAMS * PACKETS_PER_STREAM
+
+    rows = []
+    baseline = None
+    for workers in WORKER_COUNTS:
+        if workers == 0:
+            wall_seconds, cpu_seconds = await run_inline(vad_config, frames)
+        else:
+            wall_seconds, cpu_seconds = await run_workers(workers, vad_config, frames)
+        throughput = total / wall_seconds
+        baseline = baseline or throughput
+        rows.append(
+            [
+                "本进程" if workers == 0 else "工作进程",
+                workers,
+                f"{throughput:.0f}",
+                f"{throughput * FRAME_DURATION / 1000:.0f}",
+                f"{throughput / baseline:.2f}x",
+                f"{cpu_seconds * 1e6 / total:.1f}",
+            ]
+        )
+        print(f"完成: 工作进程数 {workers}")
+
+    print(
+        f"\n{STREAMS} 路音频流，每路 {PACKETS_PER_STREAM} 个{FRAME_DURATION}ms Opus包，VAD: {select_vad_module}；"
+        "可承载设备数 = 每秒处理包数 × 帧时长，即能实时处理的同时说话设备数；"
+        "主进程CPU为事件循环所在进程每包消耗的CPU时间"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "处理方式",
+                "工作进程数",
+                "包/秒",
+                "可承载设备数",
+                "相对本进程",
+                "主进程CPU(us/包)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+import os
+import wave
+import asyncio
+from collections import deque
+import numpy as np
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.vad import create_instance
+from core.utils.asr import create_instance as create_asr_instance
+from core.utils.end_of_turn import EndOfTurnDetector
+
+description = "自适应说话结束判定离线评估（节省的等待时长与误切率）"
+
+# 录制的会话音频（16kHz单声道wav，每个文件为一段包含多轮说话和句中停顿的完整录音），
+# 目录不存在时使用 config/assets 中的音频
+SESSIONS_DIR = "tmp/sessions"
+FALLBACK_DIR = "config/assets"
+# 提供流式识别中间结果的ASR配置，无法加载时只用语音概率与说话时长评估
+STREAM_ASR = "SherpaStreamASR"
+SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 512
+CHUNK_MS = CHUNK_SAMPLES * 1000 / SAMPLE_RATE
+# 固定静音阈值（毫秒），即不开启自适应判定时每轮都要等待的时长
+MAX_SILENCE_MS = 1000
+# 参考标注：静音超过该时长（或录音结束）视为用户确实说完，短于该时长的是句中停顿
+REFERENCE_SILENCE_MS = 2000
+# 待评估的最短静音下限（毫秒）
+FLOORS = [200, 300, 500]
+
+
+class SessionState:
+    """离线计算语音概率用的状态对象，属性名与连接对象一致"""
+
+    def __init__(self):
+        self.client_audio_buffer = bytearray()
+
+
+def load_session(path: str) -> bytes:
+    with wave.open(path, "rb") as wav_file:
+        source_rate = wav_file.getframerate()
+        samples = np.frombuffer(
+            wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+        )
+    if source_rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), source_rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16).tobytes()
+
+
+def analyze_session(vad, asr, pcm: bytes):
+    """逐块计算语音概率、VAD说话状态和当时的识别中间结果"""
+    state = SessionState()
+    stream = asr.recognizer.create_stream() if asr else None
+    probs, voiced, partials = [], [], []
+    window = deque(maxlen=5)
+    last_is_voice = False
+    text = ""
+    chunk_bytes = CHUNK_SAMPLES * 2
+    for start in range(0, len(pcm) - chunk_bytes + 1, chunk_bytes):
+        chunk = pcm[start : start + chunk_bytes]
+        if stream is not None:
+            text, _ = asr._decode(stream, [chunk])
+        for prob in vad.speech_probs(state, chunk):
+            # 与 VAD 的双阈值和滑动窗口判定一致
+            if prob >= vad.vad_threshold:
+                last_is_voice = True
+            elif prob <= vad.vad_threshold_low:
+                last_is_voice = False
+            window.append(last_is_voice)
+            probs.append(prob)
+            voiced.append(window.count(True) >= vad.frame_window_threshold)
+            partials.append(text)
+    return probs, voiced, partials
+
+
+def find_pauses(voiced):
+    """找出说话后的每段静音：(说话开始块, 最后有声块, 恢复说话块或None)"""
+    pauses = []
+    speech_start = None
+    last_voice = None
+    for index, is_voice in enumerate(voiced):
+        if is_voice:
+            if last_voice is not None and index > last_voice + 1:
+                pauses.append((speech_start, last_voice, index))
+                silence_ms = (index - last_voice - 1) * CHUNK_MS
+                if silence_ms >= REFERENCE_SILENCE_MS:
+                    speech_start = index
+            if speech_start is None:
+                speech_start = index
+            last_voice = index
+    if last_voice is not None:
+        pauses.append((speech_start, last_voice, None))
+    return pauses
+
+
+def evaluate(detector, sessions):
+    """返回 (说完时平均等待ms, 误切次数, 句中停顿数, 说完次数)"""
+    waits, premature, mid_pauses, turn_ends = [], 0, 0, 0
+    for probs, voiced, partials in sessions:
+        for speech_start, last_voice, resume in find_pauses(voiced):
+            end = len(voiced) if resume is None else resume
+            pause_ms = (end - last_voice - 1) * CHUNK_MS
+            is_turn_end = resume is None or pause_ms >= REFERENCE_SILENCE_MS
+            speech_ms = (last_voice - speech_start) * CHUNK_MS
+            fired_at = None
+            for index in range(last_voice + 1, end):
+                silence_ms = (index - last_voice) * CHUNK_MS
+                if detector.is_end_of_turn(
+                    silence_ms,
+                    speech_ms,
+                    probs[last_voice + 1 : index + 1],
+                    partials[index],
+                ):
+                    fired_at = silence_ms
+                    break
+            if is_turn_end:
+                turn_ends += 1
+                # 录音结束前仍未判定说完时按固定阈值计
+                waits.append(fired_at if fired_at is not None else MAX_SILENCE_MS)
+            else:
+                mid_pauses += 1
+                if fired_at is not None:
+                    premature += 1
+    average_wait = sum(waits) / len(waits) if waits else 0.0
+    return average_wait, premature, mid_pauses, turn_ends
+
+
+async def main():
+    config = await load_config()
+    select_vad_module = config["selected_module"]["VAD"]
+    vad_config = config["VAD"][select_vad_module]
+    vad = create_instance(vad_config.get("type", select_vad_module), vad_config)
+
+    asr = None
+    try:
+        asr_config = config["ASR"][STREAM_ASR]
+        asr = create_asr_instance(asr_config.get("type", STREAM_ASR), asr_config, True)
+    except Exception as e:
+        print(f"未加载流式识别（{e}），只使用语音概率与说话时长评估")
+
+    audio_dir = SESSIONS_DIR if os.path.isdir(SESSIONS_DIR) else FALLBACK_DIR
+    sessions = []
+    for file_name in sorted(os.listdir(audio_dir)):
+        if file_name.endswith(".wav"):
+            pcm = load_session(os.path.join(audio_dir, file_name))
+            sessions.append(analyze_session(vad, asr, pcm))
+            print(f"已分析: {file_name}")
+
+    strategies = [
+        ("固定阈值", EndOfTurnDetector({}, MAX_SILENCE_MS, vad.vad_threshold_low))
+    ]
+    for floor in FLOORS:
+        strategies.append(
+            (
+                f"自适应 下限{floor}ms",
+                EndOfTurnDetector(
+                    {"adaptive_endpoint": True, "min_silence_floor_ms": floor},
+                    MAX_SILENCE_MS,
+                    vad.vad_threshold_low,
+                ),
+            )
+        )
+
+    rows = []
+    baseline_wait = None
+    for name, detector in strategies:
+        average_wait, premature, mid_pauses, turn_ends = evaluate(detector, sessions)
+        baseline_wait = average_wait if baseline_wait is None else baseline_wait
+        rows.append(
+            [
+                name,
+                turn_ends,
+                f"{average_wait:.0f}",
+                f"{baseline_wait - average_wait:.0f}",
+                f"{premature}/{mid_pauses}",
+                f"{premature * 100 / mid_pauses:.1f}%" if mid_pauses else "-",
+            ]
+        )
+
+    print(
+        f"\n{len(sessions)} 段录音（{audio_dir}），固定阈值 {MAX_SILENCE_MS}ms；"
+        f"静音超过 {REFERENCE_SILENCE_MS}ms 或录音结束视为说完，更短的静音为句中停顿，"
+        "在句中停顿处判定说完即为误切"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "策略",
+                "说完次数",
+                "说完后等待(ms)",
+                "节省(ms)",
+                "误切/句中停顿",
+                "误切率",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+
+import psutil
+import websockets
+import opuslib_next
+from pydub import AudioSegment
+from tabulate import tabulate
+
+from core.auth import AuthManager
+from config.settings import load_config
+
+description = "设备集群端到端压测（模拟多台设备通过WebSocket协议对话）"
+
+SAMPLE_RATE = 16000
+FRAME_DURATION = 60  # 毫秒
+FRAME_SIZE = SAMPLE_RATE * FRAME_DURATION // 1000
+# 等待服务端hello回复的最长时间（秒）
+HELLO_TIMEOUT = 10
+# 每轮对话等待回复结束的最长时间（秒）
+ROUND_TIMEOUT = 60
+
+DEFAULT_OPTIONS = {
+    "url": "",  # 为空时使用 ws://127.0.0.1:{server.port}/xiaozhi/v1/
+    "devices": 20,
+    "connect_rate": 10,
+    "rounds": 3,
+    "mqtt_ratio": 0.0,
+    "abort_ratio": 0.0,
+    "think_time": 1.0,
+    "audio_files": ["config/assets/wakeup_words.wav"],
+    "server_pid": None,
+    "output": "data/fleet_report.json",
+}
+
+
+def encode_wav_to_opus(file_path: str) -> List[bytes]:
+    """将录音转换为设备上行使用的16kHz单声道60ms Opus帧"""
+    audio = AudioSegment.from_file(file_path, parameters=["-nostdin"])
+    pcm = audio.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2).raw_data
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_VOIP)
+    frames = []
+    for i in range(0, len(pcm), FRAME_SIZE * 2):
+        chunk = pcm[i : i + FRAME_SIZE * 2]
+        if len(chunk) < FRAME_SIZE * 2:
+            chunk += b"\x00" * (FRAME_SIZE * 2 - len(chunk))
+        frames.append(encoder.encode(chunk, FRAME_SIZE))
+    return frames
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 1)
+
+
+class FleetStats:
+    def __init__(self):
+        self.connect_started = 0
+        self.connected = 0
+        self.connect_failed = 0
+        self.connect_latencies: List[float] = []
+        self.first_connect_at: Optional[float] = None
+        self.last_connect_at: Optional[float] = None
+        self.ttfa: List[float] = []
+        self.rounds_ok = 0
+        self.rounds_timeout = 0
+        self.rounds_no_audio = 0
+        self.aborts = 0
+        self.errors: Dict[str, int] = {}
+        self.audio_bytes_received = 0
+
+    def add_error(self, error: Exception):
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class ServerSampler:
+    """每秒采样被测服务进程的CPU、内存和线程数"""
+
+    def __init__(self, pid: Optional[int]):
+        self.process = psutil.Process(pid) if pid else None
+        self.cpu_samples: List[float] = []
+        self.max_rss = 0
+        self.max_threads = 0
+        self._task = None
+
+    @staticmethod
+    def find_pid(port: int) -> Optional[int]:
+        """按监听端口查找服务进程"""
+        try:
+            for conn in psutil.net_connections(kind="tcp"):
+                if (
+                    conn.status == psutil.CONN_LISTEN
+                    and conn.laddr
+                    and conn.laddr.port == port
+                    and conn.pid
+                ):
+                    return conn.pid
+        except (psutil.AccessDenied, PermissionError):
+            pass
+        return None
+
+    def start(self):
+        if self.process is None:
+            return
+        self.process.cpu_percent(interval=None)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(1)
+            try:
+                with self.process.oneshot():
+                    self.cpu_samples.append(self.process.cpu_percent(interval=None))
+                    self.max_rss = max(self.max_rss, self.process.memory_info().rss)
+                    self.max_threads = max(self.max_threads, self.process.num_threads())
+            except psutil.Error:
+                return
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def report(self) -> Dict:
+        if self.process is None:
+            return {"pid": None}
+        return {
+            "pid": self.process.pid,
+            "cpu_percent_avg": (
+                round(sum(self.cpu_samples) / len(self.cpu_samples), 1)
+                if self.cpu_samples
+                else None
+            ),
+            "cpu_percent_max": max(self.cpu_samples) if self.cpu_samples else None,
+            "rss_mb_max": round(self.max_rss / 1024 / 1024, 1),
+            "threads_max": self.max_threads,
+        }
+
+
+class DeviceSimulator:
+    """模拟一台设备：hello握手、按实时节奏上行Opus、listen/abort控制消息、可选MQTT网关帧格式"""
+
+    def __init__(self, index: int, options: Dict, audios: List[List[bytes]], auth, stats):
+        self.index = index
+        self.options = options
+        self.audios = audios
+        self.auth = auth
+        self.stats = stats
+        self.device_id = f"fleet-{index:05d}-{uuid.uuid4().hex[:6]}"
+        self.client_id = uuid.uuid4().hex
+        self.use_mqtt = random.random() < options["mqtt_ratio"]
+        self.sequence = 0
+        self._first_audio = asyncio.Event()
+        self._tts_stop = asyncio.Event()
+        self._hello = asyncio.Event()
+        self._listen_stop_at = 0.0
+
+    def _headers(self):
+        headers = {
+            "device-id": self.device_id,
+            "client-id": self.client_id,
+            "protocol-version": "1",
+        }
+        if self.auth:
+            token = self.auth.generate_token(self.client_id, self.device_id)
+            headers["authorization"] = f"Bearer {token}"
+        return headers
+
+    def _pack(self, opus_packet: bytes) -> bytes:
+        """MQTT网关转发的音频带16字节头部，格式与服务端下行一致"""
+        if not self.use_mqtt:
+            return opus_packet
+        header = bytearray(16)
+        header[0] = 1
+        header[2:4] = len(opus_packet).to_bytes(2, "big")
+        header[4:8] = self.sequence.to_bytes(4, "big")
+        header[12:16] = len(opus_packet).to_bytes(4, "big")
+        self.sequence += 1
+        return bytes(header) + opus_packet
+
+    async def run(self):
+        url = self.options["url"]
+        if self.use_mqtt:
+            url = url + ("&" if "?" in url else "?") + "from=mqtt_gateway"
+        self.stats.connect_started += 1
+        start = time.monotonic()
+        try:
+            async with websockets.connect(
+                url, additional_headers=self._headers(), max_size=None
+            ) as ws:
+                reader = asyncio.create_task(self._read(ws))
+                try:
+                    await ws.send(
+                        json.dumps(
+                            {
+                                "type": "hello",
+                                "version": 1,
+                                "transport": "websocket",
+                                "features": {},
+                                "audio_params": {
+                                    "format": "opus",
+                                    "sample_rate": SAMPLE_RATE,
+                                    "channels": 1,
+                                    "frame_duration": FRAME_DURATION,
+                                },
+                            }
+                        )
+                    )
+                    await asyncio.wait_for(self._hello.wait(), HELLO_TIMEOUT)
+                    now = time.monotonic()
+                    self.stats.connected += 1
+                    self.stats.connect_latencies.append((now - start) * 1000)
+                    if self.stats.first_connect_at is None:
+                        self.stats.first_connect_at = start
+                    self.stats.last_connect_at = now
+
+                    for _ in range(self.options["rounds"]):
+                        await self._round(ws)
+                        await asyncio.sleep(self.options["think_time"])
+                finally:
+                    reader.cancel()
+        except Exception as e:
+            if not self._hello.is_set():
+                self.stats.connect_failed += 1
+            self.stats.add_error(e)
+
+    async def _read(self, ws):
+        async for message in ws:
+            if isinstance(message, bytes):
+                if self.use_mqtt and len(message) >= 16:
+                    message = message[16:]
+                self.stats.audio_bytes_received += len(message)
+                if not self._first_audio.is_set() and self._listen_stop_at:
+                    self.stats.ttfa.append(
+                        (time.monotonic() - self._listen_stop_at) * 1000
+                    )
+                    self._first_audio.set()
+                continue
+            try:
+                msg = json.loads(message)
+            except ValueError:
+                continue
+            if msg.get("type") == "hello":
+                self._hello.set()
+            elif msg.get("type") == "tts" and msg.get("state") == "stop":
+                self._tts_stop.set()
+
+    async def _send_audio(self, ws, frames: List[bytes]):
+        """按实时节奏发送，每帧间隔60ms"""
+        start = time.monotonic()
+        for i, frame in enumerate(frames):
+            delay = start + i * FRAME_DURATION / 1000 - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await ws.send(self._pack(frame))
+
+    async def _round(self, ws):
+        self._first_audio.clear()
+        self._tts_stop.clear()
+        self._listen_stop_at = 0.0
+        await ws.send(json.dumps({"type": "listen", "state": "start", "mode": "manual"}))
+        await self._send_audio(ws, random.choice(self.audios))
+        await ws.send(json.dumps({"type": "listen", "state": "stop"}))
+        self._listen_stop_at = time.monotonic()
+
+        try:
+            await asyncio.wait_for(self._first_audio.wait(), ROUND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats.rounds_no_audio += 1
+            return
+
+        if random.random() < self.options["abort_ratio"]:
+            await ws.send(json.dumps({"type": "abort"}))
+            self.stats.aborts += 1
+
+        remaining = ROUND_TIMEOUT - (time.monotonic() - self._listen_stop_at)
+        try:
+            await asyncio.wait_for(self._tts_stop.wait(), max(remaining, 0.1))
+            self.stats.rounds_ok += 1
+        except asyncio.TimeoutError:
+            self.stats.rounds_timeout += 1
+
+
+def load_options(config: Dict) -> Dict:
+    options = dict(DEFAULT_OPTIONS)
+    options.update(
+        {
+            key: value
+            for key, value in (config.get("module_test", {}).get("fleet") or {}).items()
+            if value is not None
+        }
+    )
+    if not options["url"]:
+        port = int(config.get("server", {}).get("port", 8000))
+        options["url"] = f"ws://127.0.0.1:{port}/xiaozhi/v1/"
+    return options
+
+
+def build_report(options, stats: FleetStats, sampler: ServerSampler, duration: float):
+    connect_window = (
+        stats.last_connect_at - stats.first_connect_at
+        if stats.connected > 1
+        else 0.0
+    )
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "options": {k: v for k, v in options.items() if k != "output"},
+        "duration_s": round(duration, 1),
+        "connections": {
+            "attempted": stats.connect_started,
+            "succeeded": stats.connected,
+            "failed": stats.connect_failed,
+            "per_second": (
+                round(stats.connected / connect_window, 1) if connect_window else None
+            ),
+            "handshake_ms_p50": percentile(stats.connect_latencies, 50),
+            "handshake_ms_p99": percentile(stats.connect_latencies, 99),
+        },
+        "time_to_first_audio_ms": {
+            "count": len(stats.ttfa),
+            "p50": percentile(stats.ttfa, 50),
+            "p90": percentile(stats.ttfa, 90),
+            "p99": percentile(stats.ttfa, 99),
+            "max": round(max(stats.ttfa), 1) if stats.ttfa else None,
+        },
+        "rounds": {
+            "completed": stats.rounds_ok,
+            "no_audio": stats.rounds_no_audio,
+            "timeout": stats.rounds_timeout,
+            "aborted": stats.aborts,
+        },
+        "audio_mb_received": round(stats.audio_bytes_received / 1024 / 1024, 2),
+        "errors": stats.errors,
+        "server": sampler.report(),
+    }
+
+
+def print_report(report: Dict):
+    connections = report["connections"]
+    ttfa = report["time_to_first_audio_ms"]
+    rounds = report["rounds"]
+    server = report["server"]
+    rows = [
+        ["连接成功/失败", f"{connections['succeeded']}/{connections['failed']}"],
+        ["建连速率(个/秒)", connections["per_second"]],
+        ["握手耗时 p50/p99(ms)", f"{connections['handshake_ms_p50']}/{connections['handshake_ms_p99']}"],
+        ["首包音频 p50/p99(ms)", f"{ttfa['p50']}/{ttfa['p99']}"],
+        ["完成/无音频/超时/打断轮数", f"{rounds['completed']}/{rounds['no_audio']}/{rounds['timeout']}/{rounds['aborted']}"],
+        ["服务CPU 平均/峰值(%)", f"{server.get('cpu_percent_avg')}/{server.get('cpu_percent_max')}"],
+        ["服务内存峰值(MB)", server.get("rss_mb_max")],
+        ["服务线程数峰值", server.get("threads_max")],
+        ["错误", report["errors"] or "-"],
+    ]
+    print(tabulate(rows, headers=["指标", "结果"], tablefmt="github"))
+
+
+async def run_fleet(config: Dict) -> Dict:
+    options = load_options(config)
+    audios = [encode_wav_to_opus(path) for path in options["audio_files"]]
+
+    auth = None
+    auth_config = config.get("server", {}).get("auth", {})
+    if auth_config.get("enabled", False):
+        auth = AuthManager(
+            secret_key=config["server"]["auth_key"],
+            expire_seconds=auth_config.get("expire_seconds", None),
+        )
+
+    pid = options["server_pid"] or ServerSampler.find_pid(
+        urlparse(options["url"]).port or 80
+    )
+    sampler = ServerSampler(pid)
+    if pid is None:
+        print("未找到被测服务进程，只统计客户端指标（可在 module_test.fleet.server_pid 中指定）")
+
+    stats = FleetStats()
+    print(
+        f"\n开始压测 {options['url']}：{options['devices']} 台设备，"
+        f"每秒新建 {options['connect_rate']} 个连接，每台 {options['rounds']} 轮对话"
+    )
+    sampler.start()
+    start = time.monotonic()
+    tasks = []
+    for index in range(options["devices"]):
+        device = DeviceSimulator(index, options, audios, auth, stats)
+        tasks.append(asyncio.create_task(device.run()))
+        await asyncio.sleep(1 / options["connect_rate"])
+    await asyncio.gather(*tasks)
+    duration = time.monotonic() - start
+    await sampler.stop()
+
+    report = build_report(options, stats, sampler, duration)
+    output = options["output"]
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"压测报告已保存到 {output}")
+    return report
+
+
+async def main():
+    report = await run_fleet(await load_config())
+    print_report(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+import math
+import time
+import asyncio
+import threading
+import tracemalloc
+import opuslib_next
+from tabulate import tabulate
+from config.settings import load_config
+from config.logger import setup_logging
+from core.connection import ConnectionHandler
+from core.providers.tts.default import DefaultTTS
+from core.utils.dialogue import Message
+from core.utils.modules_initialize import initialize_modules
+
+description = "空闲连接休眠压测（休眠前后每连接常驻内存、线程数与恢复耗时）"
+
+# 同时保持的空闲连接数
+CONNECTIONS = 200
+# 每个连接休眠前已有的对话轮数
+TURNS = 20
+# 每个连接休眠前处理过的上行音频帧数（60ms一帧）
+FRAMES = 50
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 960
+
+
+def build_packets():
+    """一段正弦波编码成的Opus包，用于让解码器与VAD建立连接级状态"""
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_VOIP)
+    packets = []
+    for index in range(FRAMES):
+        samples = bytearray()
+        for n in range(FRAME_SAMPLES):
+            t = (index * FRAME_SAMPLES + n) / SAMPLE_RATE
+            value = int(8000 * math.sin(2 * math.pi * 220 * t))
+            samples += value.to_bytes(2, "little", signed=True)
+        packets.append(encoder.encode(bytes(samples), FRAME_SAMPLES))
+    return packets
+
+
+async def open_connection(config, modules, packets):
+    conn = ConnectionHandler(config, modules["vad"], modules["asr"], None, None, None)
+    conn.loop = asyncio.get_running_loop()
+    conn.vad = modules["vad"]
+    conn.asr = modules["asr"]
+    conn.hibernation_idle_seconds = 300
+    conn.tts = DefaultTTS(config, delete_audio_file=True)
+    await conn.tts.open_audio_channels(conn)
+    conn.dialogue.put(Message(role="system", content=config.get("prompt") or ""))
+    for turn in range(TURNS):
+        conn.dialogue.put(
+            Message(role="user", content=f"第{turn}个问题，今天天气怎么样")
+        )
+        conn.dialogue.put(
+            Message(
+                role="assistant", content="今天晴，最高气温二十五度，适合出门走走。"
+            )
+        )
+    conn.current_speaker = "小明"
+    conn.introduced_speakers.add("小明")
+    for packet in packets:
+        pcm_frame = conn._decode_opus_packet(packet)
+        conn.vad.is_vad(conn, pcm_frame)
+    conn.reset_audio_states()
+    return conn
+
+
+def percentile(values, ratio):
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def main():
+    config = await load_config()
+    modules = initialize_modules(setup_logging(), config, init_vad=True, init_asr=True)
+    packets = build_packets()
+    base_threads = threading.active_count()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    connections = [
+        await open_connection(config, modules, packets) for _ in range(CONNECTIONS)
+    ]
+    active_kb = (tracemalloc.get_traced_memory()[0] - baseline) / CONNECTIONS / 1024
+    active_threads = threading.active_count() - base_threads
+
+    # 休眠时等待TTS线程退出（线程每秒检查一次停止事件），所有连接并发休眠
+    hibernate_start = time.monotonic()
+    await asyncio.gather(*(conn.hibernate() for conn in connections))
+    hibernate_seconds = time.monotonic() - hibernate_start
+    # 等线程池中的空闲线程退出
+    await asyncio.sleep(1)
+    hibernated_kb = (tracemalloc.get_traced_memory()[0] - baseline) / CONNECTIONS / 1024
+    hibernated_threads = threading.active_count() - base_threads
+    snapshot_kb = (
+        sum(len(conn._hibernation_snapshot or b"") for conn in connections)
+        / CONNECTIONS
+        / 1024
+    )
+    tracemalloc.stop()
+
+    # 恢复耗时：还原快照并重新打开TTS通道，首帧耗时另含解码器与VAD状态的重建
+    wake_ms, first_frame_ms = [], []
+    for conn in connections:
+        start = time.monotonic()
+        await conn.wake()
+        wake_ms.append((time.monotonic() - start) * 1000)
+        pcm_frame = conn._decode_opus_packet(packets[0])
+        conn.vad.is_vad(conn, pcm_frame)
+        first_frame_ms.append((time.monotonic() - start) * 1000)
+    for conn in connections:
+        conn.stop_event.set()
+    wake_ms.sort()
+    first_frame_ms.sort()
+
+    print(
+        f"\n{CONNECTIONS} 个连接，每个连接 {TURNS} 轮对话、处理过 {FRAMES} 帧音频；"
+        "内存为 tracemalloc 统计的Python堆增量，不含线程栈，线程数另列"
+    )
+    print(
+        tabulate(
+            [
+                ["活跃", f"{active_kb:.1f}", "-", active_threads, "-"],
+                [
+                    "休眠",
+                    f"{hibernated_kb:.1f}",
+                    f"{snapshot_kb:.2f}",
+                    hibernated_threads,
+                    f"{hibernate_seconds:.1f}",
+                ],
+            ],
+            headers=[
+                "状态",
+                "每连接内存(KB)",
+                "其中快照(KB)",
+                "线程数",
+                "全部休眠耗时(s)",
+            ],
+            tablefmt="github",
+        )
+    )
+    print(
+        tabulate(
+            [
+                [
+                    "恢复",
+                    f"{percentile(wake_ms, 0.5):.2f}",
+                    f"{percentile(wake_ms, 0.99):.2f}",
+                    f"{wake_ms[-1]:.2f}",
+                ],
+                [
+                    "恢复并处理首帧",
+                    f"{percentile(first_frame_ms, 0.5):.2f}",
+                    f"{percentile(first_frame_ms, 0.99):.2f}",
+                    f"{first_frame_ms[-1]:.2f}",
+                ],
+            ],
+            headers=["耗时", "P50(ms)", "P99(ms)", "最大(ms)"],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+import time
+import asyncio
+import tracemalloc
+from tabulate import tabulate
+from core.utils.timer_wheel import TimerWheel
+
+description = "空闲连接定时任务压测（每连接常驻检查协程对比共享时间轮的事件循环开销）"
+
+# 空闲连接数
+CONNECTIONS = 10000
+# 统计时长（秒）
+DURATION = 30
+# 与连接中的取值一致：超时检查间隔、AEC缓存清理间隔、二道关闭超时
+TIMEOUT_CHECK_INTERVAL = 10
+AEC_CACHE_CHECK_INTERVAL = 30
+TIMEOUT_SECONDS = 180
+# 事件循环延迟探测间隔（秒）
+PROBE_INTERVAL = 0.01
+
+
+class IdleConnection:
+    """只保留定时任务相关状态的空闲连接"""
+
+    def __init__(self):
+        self.last_activity_time = time.time() * 1000
+        self.aec_audio_cache_time = {}
+        self.closed = False
+        self.wakeups = 0
+
+    def timeout_expired(self) -> bool:
+        self.wakeups += 1
+        return time.time() * 1000 - self.last_activity_time > TIMEOUT_SECONDS * 1000
+
+    def clean_aec_cache(self):
+        self.wakeups += 1
+        now = time.time()
+        for ts in [t for t, c in self.aec_audio_cache_time.items() if now - c > 120]:
+            self.aec_audio_cache_time.pop(ts, None)
+
+
+class TaskConnection(IdleConnection):
+    """改造前：每个连接两个常驻协程"""
+
+    def start(self, wheel):
+        self.tasks = [
+            asyncio.create_task(self._check_timeout()),
+            asyncio.create_task(self._check_aec_cache_expiry()),
+        ]
+
+    async def _check_timeout(self):
+        while not self.closed:
+            if self.timeout_expired():
+                break
+            await asyncio.sleep(TIMEOUT_CHECK_INTERVAL)
+
+    async def _check_aec_cache_expiry(self):
+        while not self.closed:
+            self.clean_aec_cache()
+            await asyncio.sleep(AEC_CACHE_CHECK_INTERVAL)
+
+    def close(self):
+        self.closed = True
+        for task in self.tasks:
+            task.cancel()
+
+
+class WheelConnection(IdleConnection):
+    """改造后：定时器登记在共享时间轮中"""
+
+    def start(self, wheel):
+        self.wheel = wheel
+        self.timeout_timer = wheel.call_later(TIMEOUT_SECONDS, self._check_timeout)
+        self.aec_expiry_timer = wheel.call_later(
+            AEC_CACHE_CHECK_INTERVAL, self._check_aec_cache_expiry
+        )
+
+    def _check_timeout(self):
+        if not self.timeout_expired():
+            remaining_ms = (
+                self.last_activity_time + TIMEOUT_SECONDS * 1000 - time.time() * 1000
+            )
+            self.timeout_timer = self.wheel.call_later(
+                max(remaining_ms / 1000, 1), self._check_timeout
+            )
+
+    def _check_aec_cache_expiry(self):
+        self.clean_aec_cache()
+        self.aec_expiry_timer = self.wheel.call_later(
+            AEC_CACHE_CHECK_INTERVAL, self._check_aec_cache_expiry
+        )
+
+    def close(self):
+        self.closed = True
+        self.timeout_timer.cancel()
+        self.aec_expiry_timer.cancel()
+
+
+async def probe_loop_lag(stop: asyncio.Event, lags):
+    while not stop.is_set():
+        start = time.monotonic()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.monotonic() - start - PROBE_INTERVAL) * 1000)
+
+
+async def run_case(name, connection_class):
+    wheel = TimerWheel()
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    setup_start = time.process_time()
+    connections = [connection_class() for _ in range(CONNECTIONS)]
+    for conn in connections:
+        conn.start(wheel)
+    # 让常驻协程都运行到第一次 sleep
+    await asyncio.sleep(0)
+    setup_ms = (time.process_time() - setup_start) * 1000
+    memory_mb = (tracemalloc.get_traced_memory()[0] - baseline_memory) / 1024 / 1024
+    tracemalloc.stop()
+    tasks = len(asyncio.all_tasks())
+
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(probe_loop_lag(stop, lags))
+    cpu_start = time.process_time()
+    await asyncio.sleep(DURATION)
+    cpu_seconds = time.process_time() - cpu_start
+    stop.set()
+    await probe
+
+    wakeups = sum(conn.wakeups for conn in connections)
+    close_start = time.process_time()
+    for conn in connections:
+        conn.close()
+    await asyncio.sleep(0)
+    close_ms = (time.process_time() - close_start) * 1000
+    wheel.stop()
+
+    lags.sort()
+    return [
+        name,
+        tasks,
+        f"{memory_mb:.1f}",
+        f"{setup_ms:.0f}",
+        f"{cpu_seconds * 100 / DURATION:.2f}%",
+        wakeups,
+        f"{lags[len(lags) * 99 // 100]:.2f}",
+        f"{lags[-1]:.2f}",
+        f"{close_ms:.0f}",
+    ]
+
+
+async def main():
+    rows = [
+        await run_case("每连接协程", TaskConnection),
+        await run_case("共享时间轮", WheelConnection),
+    ]
+    print(
+        f"\n{CONNECTIONS} 个空闲连接，统计 {DURATION} 秒；任务数含探测协程与本程序主协程，"
+        "CPU占用为统计期间进程CPU时间占比（探测协程本身每秒约100次唤醒）"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "方式",
+                "任务数",
+                "定时状态内存(MB)",
+                "建立耗时(ms)",
+                "空闲CPU占用",
+                "检查次数",
+                "循环延迟P99(ms)",
+                "循环延迟最大(ms)",
+                "关闭耗时(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+import time
+import wave
+import asyncio
+import numpy as np
+import opuslib_next
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.opus_encoder_utils import (
+    OpusEncoderUtils,
+    OpusProfile,
+    opus_packet_duration_ms,
+)
+
+description = "Opus编码档位CPU开销与音质对比测试（本地编码，无需网络）"
+
+# 测试音频（24kHz单声道）
+AUDIO_FILES = [
+    "config/assets/wakeup_words.wav",
+    "config/assets/bind_not_found.wav",
+    "config/assets/max_output_size.wav",
+]
+# 编码采样率，与 xiaozhi.audio_params.sample_rate 对应
+SAMPLE_RATES = [16000, 24000]
+# 每个档位重复编码的次数，取CPU时间最小值
+REPEAT = 3
+
+
+def load_pcm(path: str, sample_rate: int) -> np.ndarray:
+    with wave.open(path, "rb") as wav_file:
+        source_rate = wav_file.getframerate()
+        samples = np.frombuffer(
+            wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+        )
+        if wav_file.getnchannels() > 1:
+            samples = samples[:: wav_file.getnchannels()]
+    if source_rate != sample_rate:
+        positions = np.arange(0, len(samples), source_rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16)
+
+
+def encode(pcm: np.ndarray, sample_rate: int, profile: OpusProfile):
+    """按TTS流程整段送入编码器，返回 (Opus包列表, CPU耗时秒)"""
+    packets = []
+    encoder = OpusEncoderUtils(sample_rate, 1, profile.frame_duration, profile=profile)
+    start = time.process_time()
+    encoder.encode_pcm_to_opus_stream(pcm.tobytes(), True, packets.append)
+    elapsed = time.process_time() - start
+    encoder.close()
+    return packets, elapsed
+
+
+def decode(packets, sample_rate: int) -> np.ndarray:
+    decoder = opuslib_next.Decoder(sample_rate, 1)
+    max_frame = sample_rate * 120 // 1000
+    pcm = b"".join(decoder.decode(packet, max_frame) for packet in packets)
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+def align(reference: np.ndarray, decoded: np.ndarray, max_lag: int):
+    """补偿编解码器的固定延迟，返回对齐后等长的两段音频"""
+    ref = reference.astype(np.float64)
+    dec = decoded.astype(np.float64)
+    window = min(len(ref), len(dec) - max_lag, len(ref) // 2)
+    best_lag, best_score = 0, -np.inf
+    for lag in range(max_lag):
+        score = np.dot(ref[:window], dec[lag : lag + window])
+        if score > best_score:
+            best_lag, best_score = lag, score
+    dec = dec[best_lag:]
+    length = min(len(ref), len(dec))
+    return ref[:length], dec[:length]
+
+
+def snr_db(reference: np.ndarray, decoded: np.ndarray) -> float:
+    noise = np.sum((reference - decoded) ** 2)
+    if noise == 0:
+        return float("inf")
+    return 10 * np.log10(np.sum(reference**2) / noise)
+
+
+def log_spectral_distance(
+    reference: np.ndarray, decoded: np.ndarray, sample_rate: int
+) -> float:
+    """对数谱距离(dB)，越小越接近原音频，对参数编码（SILK）比SNR更有参考意义"""
+    frame = sample_rate * 20 // 1000
+    window = np.hanning(frame)
+    distances = []
+    for pos in range(0, len(reference) - frame, frame):
+        ref_spec = np.abs(np.fft.rfft(reference[pos : pos + frame] * window)) ** 2
+        dec_spec = np.abs(np.fft.rfft(decoded[pos : pos + frame] * window)) ** 2
+        # 跳过静音帧
+        if ref_spec.sum() < 1e3 * frame:
+            continue
+        diff = 10 * np.log10(ref_spec + 1e-6) - 10 * np.log10(dec_spec + 1e-6)
+        distances.append(np.sqrt(np.mean(diff**2)))
+    return float(np.mean(distances)) if distances else 0.0
+
+
+def benchmark_profile(name: str, profile: OpusProfile, sample_rate: int, audios):
+    audio_seconds = 0.0
+    cpu_seconds = 0.0
+    total_bytes = 0
+    packet_count = 0
+    snrs, lsds = [], []
+    for pcm in audios:
+        best = None
+        for _ in range(REPEAT):
+            packets, elapsed = encode(pcm, sample_rate, profile)
+            best = elapsed if best is None else min(best, elapsed)
+        durations = {opus_packet_duration_ms(packet) for packet in packets}
+        if durations != {float(profile.frame_duration)}:
+            raise AssertionError(f"{name}: Opus包时长与档位不一致: {durations}")
+        audio_seconds += len(pcm) / sample_rate
+        cpu_seconds += best
+        total_bytes += sum(len(packet) for packet in packets)
+        packet_count += len(packets)
+        reference, decoded = align(pcm, decode(packets, sample_rate), sample_rate // 50)
+        snrs.append(snr_db(reference, decoded))
+        lsds.append(log_spectral_distance(reference, decoded, sample_rate))
+
+    cpu_ms_per_second = cpu_seconds * 1000 / audio_seconds
+    return [
+        name,
+        sample_rate,
+        profile.application,
+        profile.complexity,
+        f"{profile.bitrate // 1000}k{'' if profile.vbr else ' CBR'}",
+        profile.frame_duration,
+        f"{cpu_ms_per_second:.2f}",
+        f"{1000 / cpu_ms_per_second:.0f}",
+        f"{total_bytes * 8 / audio_seconds / 1000:.1f}",
+        f"{packet_count / audio_seconds:.1f}",
+        f"{np.mean(snrs):.1f}",
+        f"{np.mean(lsds):.2f}",
+    ]
+
+
+def build_profiles(config):
+    """配置中的档位；default 档位未指定帧时长时按60ms测试"""
+    profiles = {}
+    for name, profile_config in (config.get("opus_profiles") or {}).items():
+        frame_duration = int(profile_config.get("frame_duration") or 60)
+        profiles[name] = OpusProfile.from_config(profile_config, frame_duration)
+    if not profiles:
+        profiles["default"] = OpusProfile()
+    return profiles
+
+
+def run(config):
+    profiles = build_profiles(config)
+    rows = []
+    for sample_rate in SAMPLE_RATES:
+        audios = [load_pcm(path, sample_rate) for path in AUDIO_FILES]
+        for name, profile in profiles.items():
+            rows.append(benchmark_profile(name, profile, sample_rate, audios))
+
+    print(
+        f"\n测试音频 {len(AUDIO_FILES)} 段；CPU耗时为单线程编码每秒音频所需的CPU毫秒数，"
+        "单核路数 = 1000 / CPU耗时；SNR越高、谱距离越小音质越接近原音频"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "档位",
+                "采样率",
+                "application",
+                "复杂度",
+                "码率",
+                "帧时长(ms)",
+                "CPU(ms/音频秒)",
+                "单核实时路数",
+                "实际码率(kbps)",
+                "包/秒",
+                "SNR(dB)",
+                "谱距离(dB)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+async def main():
+    run(await load_config())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
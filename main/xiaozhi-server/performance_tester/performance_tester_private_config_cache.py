@@ -0,0 +1,136 @@
+import time
+import random
+import asyncio
+from tabulate import tabulate
+from core.utils.private_config_cache import PrivateConfigCache
+
+description = "设备差异化配置缓存压测（命中率、管理端请求数与连接获取配置耗时）"
+
+# 设备数与压测时长（秒）
+DEVICES = 300
+DURATION = 20
+# 每台设备平均多少秒重连一次
+RECONNECT_INTERVAL = 2
+# 模拟的管理端接口：平均耗时（毫秒）与可同时处理的请求数
+FETCH_MS = 120
+MANAGER_API_CONCURRENCY = 16
+# 平均多少秒有一台设备的配置在智控台被修改
+CHANGE_INTERVAL = 5
+# (名称, 缓存配置, 修改配置后是否下发 update_config)
+CASES = [
+    ("不缓存（改造前）", {"enable": False}, False),
+    ("缓存，每次使用后后台刷新", {"enable": True, "fresh_seconds": 0}, False),
+    ("缓存，30秒内不刷新", {"enable": True, "fresh_seconds": 30}, False),
+    ("缓存，30秒内不刷新 + update_config", {"enable": True, "fresh_seconds": 30}, True),
+]
+
+
+class StubManagerApi:
+    """每台设备的配置带版本号，修改时版本加一"""
+
+    def __init__(self):
+        self.versions = {}
+        self.requests = 0
+        self.semaphore = asyncio.Semaphore(MANAGER_API_CONCURRENCY)
+
+    async def get_private_config(self, config, device_id, client_id):
+        self.requests += 1
+        async with self.semaphore:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * FETCH_MS / 1000)
+            return {
+                "device_id": device_id,
+                "version": self.versions.get(device_id, 0),
+                "prompt": "你是一个叫小智的台湾女孩",
+                "selected_module": {"LLM": "ChatGLMLLM", "TTS": "EdgeTTS"},
+            }
+
+
+async def device_loop(device_id, cache, api, deadline, samples):
+    """按连接初始化的方式获取配置：先查缓存，未命中再等待管理端"""
+    while time.monotonic() < deadline:
+        await asyncio.sleep(random.expovariate(1 / RECONNECT_INTERVAL))
+        start = time.monotonic()
+        private_config = cache.peek({}, device_id, device_id)
+        if private_config is None:
+            private_config = await cache.get({}, device_id, device_id)
+        elapsed_ms = (time.monotonic() - start) * 1000
+        outdated = private_config["version"] < api.versions.get(device_id, 0)
+        samples.append((elapsed_ms, outdated))
+
+
+async def change_loop(devices, cache, api, push, deadline):
+    """智控台修改配置；开启下发时随后清空缓存"""
+    while time.monotonic() < deadline:
+        await asyncio.sleep(random.expovariate(1 / CHANGE_INTERVAL))
+        device_id = random.choice(devices)
+        api.versions[device_id] = api.versions.get(device_id, 0) + 1
+        if push:
+            cache.invalidate()
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def run_case(name, cache_config, push):
+    random.seed(0)
+    api = StubManagerApi()
+    cache = PrivateConfigCache(api.get_private_config)
+    cache.configure(cache_config)
+    devices = [f"00:00:00:00:{i // 256:02x}:{i % 256:02x}" for i in range(DEVICES)]
+    samples = []
+    deadline = time.monotonic() + DURATION
+    await asyncio.gather(
+        change_loop(devices, cache, api, push, deadline),
+        *(device_loop(d, cache, api, deadline, samples) for d in devices),
+    )
+    # 等待后台刷新结束
+    await asyncio.sleep(FETCH_MS * 2 / 1000)
+
+    stats = cache.snapshot()
+    connects = len(samples)
+    latencies = [s[0] for s in samples]
+    hits = stats["hits"] + stats["stale_hits"]
+    return [
+        name,
+        connects,
+        f"{hits / connects:.1%}" if cache.enabled else "-",
+        f"{api.requests / DURATION:.1f}",
+        f"{percentile(latencies, 0.5):.2f}",
+        f"{percentile(latencies, 0.99):.2f}",
+        f"{sum(1 for s in samples if s[1]) / connects:.2%}",
+    ]
+
+
+async def main():
+    rows = []
+    for name, cache_config, push in CASES:
+        rows.append(await run_case(name, cache_config, push))
+
+    print(
+        f"\n{DEVICES} 台设备，平均每 {RECONNECT_INTERVAL} 秒重连一次，持续 {DURATION} 秒；"
+        f"模拟管理端接口平均 {FETCH_MS}ms（并发 {MANAGER_API_CONCURRENCY}），"
+        f"平均每 {CHANGE_INTERVAL} 秒有一台设备的配置被修改；"
+        "获取配置耗时为连接初始化中等待差异化配置的时间，"
+        "使用旧配置为连接拿到的配置早于智控台最新修改的比例"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "方式",
+                "连接数",
+                "缓存命中率",
+                "管理端请求/秒",
+                "获取配置P50(ms)",
+                "获取配置P99(ms)",
+                "使用旧配置",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+import re
+import time
+import asyncio
+from datetime import datetime
+from jinja2 import Template
+from tabulate import tabulate
+from core.utils.dialogue import CompiledSystemPrompt
+from core.utils.prompt_manager import compile_template, EMOJI_List
+
+description = "系统提示词组装性能测试（本地，无需网络）"
+
+# 每种规模重复执行的次数
+ITERATIONS = 2000
+# 提示词规模（字符数）
+PROMPT_SIZES = [6 * 1024, 32 * 1024, 128 * 1024]
+MEMORY_STR = "用户喜欢听周杰伦的歌，住在广州，养了一只叫豆豆的猫。"
+
+
+def _load_template() -> str:
+    with open("agent-base-prompt.txt", "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _build_system_prompt(template_source: str, size: int) -> str:
+    """渲染基础模板，并用角色设定填充到指定规模"""
+    filler = "你是一个知识渊博、耐心细致的语音助手，擅长用简短的口语回答问题。\n"
+    base_prompt = filler * max(1, size // len(filler))
+    return Template(template_source).render(
+        base_prompt=base_prompt,
+        current_time="{{current_time}}",
+        today_date="2025-01-01",
+        today_weekday="星期三",
+        lunar_date="腊月初二",
+        local_address="广州",
+        weather_info="晴，18~25℃",
+        emojiList=EMOJI_List,
+        dynamic_context="",
+        language="中文",
+        emoji_enabled=True,
+    )
+
+
+def _legacy_assemble(system_prompt: str) -> str:
+    """原实现：每轮对整段提示词做字符串替换和正则替换"""
+    full_prompt = system_prompt.replace(
+        "{{current_time}}", datetime.now().strftime("%H:%M")
+    )
+    return re.sub(
+        r"<memory>.*?</memory>",
+        f"<memory>\n{MEMORY_STR}\n</memory>",
+        full_prompt,
+        flags=re.DOTALL,
+    )
+
+
+def _bench(func, iterations: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run():
+    template_source = _load_template()
+    rows = []
+
+    for size in PROMPT_SIZES:
+        system_prompt = _build_system_prompt(template_source, size)
+        compiled = CompiledSystemPrompt(system_prompt)
+        legacy_us = _bench(lambda: _legacy_assemble(system_prompt), ITERATIONS)
+        compiled_us = _bench(
+            lambda: compiled.render(datetime.now().strftime("%H:%M"), MEMORY_STR),
+            ITERATIONS,
+        )
+        rows.append(
+            [
+                f"{len(system_prompt) // 1024}KB",
+                f"{legacy_us:.1f}",
+                f"{compiled_us:.1f}",
+                f"{legacy_us / compiled_us:.1f}x",
+            ]
+        )
+
+    print("\n每轮系统提示词组装耗时（微秒/轮）")
+    print(
+        tabulate(
+            rows,
+            headers=["提示词大小", "原实现(替换+正则)", "预编译片段拼接", "加速比"],
+            tablefmt="github",
+        )
+    )
+
+    render_kwargs = dict(
+        base_prompt="你是小智",
+        current_time="{{current_time}}",
+        today_date="2025-01-01",
+        today_weekday="星期三",
+        lunar_date="腊月初二",
+        local_address="广州",
+        weather_info="晴，18~25℃",
+        emojiList=EMOJI_List,
+        dynamic_context="",
+        language="中文",
+    )
+    iterations = ITERATIONS // 10
+    parse_us = _bench(
+        lambda: Template(template_source).render(**render_kwargs), iterations
+    )
+    compiled_us = _bench(
+        lambda: compile_template(template_source).render(**render_kwargs), iterations
+    )
+    print("\n增强提示词模板渲染耗时（微秒/次）")
+    print(
+        tabulate(
+            [[f"{parse_us:.1f}", f"{compiled_us:.1f}", f"{parse_us / compiled_us:.1f}x"]],
+            headers=["每次解析模板", "复用已编译模板", "加速比"],
+            tablefmt="github",
+        )
+    )
+
+
+async def main():
+    run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,235 @@
+import time
+import random
+import asyncio
+import websockets
+from tabulate import tabulate
+from core.utils.admission import AdmissionController, AdmissionRejected
+from core.utils.private_config_cache import PrivateConfigCache
+
+description = "重连风暴压测（连接准入控制：接入限速、初始化排队优先级与差异化配置复用）"
+
+HOST = "127.0.0.1"
+PORT = 8766
+# 网络恢复后同时重连的设备数
+DEVICES = 1000
+# 其中断开前正在对话、重连后立即开始说话的比例
+SPEAKING_RATIO = 0.1
+# 风暴期间服务端仍在进行的对话数，每路按60ms节拍发送音频
+LIVE_CONVERSATIONS = 20
+FRAME_MS = 60
+# 模拟的初始化开销：管理端接口耗时、管理端可同时处理的请求数、组件初始化的CPU耗时
+FETCH_MS = 80
+MANAGER_API_CONCURRENCY = 32
+INIT_CPU_MS = 8
+# 客户端未收到 Retry-After 时的重连间隔（秒）
+DEFAULT_RETRY = 1
+ADMISSION_CONFIG = {
+    "enable": True,
+    "accept_rate": 200,
+    "accept_burst": 100,
+    "max_accept_wait": 0.5,
+    "init_concurrency": 16,
+    "init_queue_size": 300,
+    "queue_timeout": 30,
+    "retry_after": 1,
+    "recent_active_seconds": 60,
+}
+# (名称, 准入控制配置, 重连前是否已缓存差异化配置)
+CASES = [
+    ("不限制（改造前）", {"enable": False}, False),
+    ("准入控制", ADMISSION_CONFIG, False),
+    ("准入控制 + 复用差异化配置", ADMISSION_CONFIG, True),
+]
+
+
+class StubServer:
+    """按 ConnectionHandler 的初始化流程模拟：拉取差异化配置、在线程池中初始化组件"""
+
+    def __init__(self, admission: AdmissionController):
+        self.admission = admission
+        self.private_config_cache = PrivateConfigCache(self.fetch_private_config)
+        self.manager_api = asyncio.Semaphore(MANAGER_API_CONCURRENCY)
+        self.manager_api_requests = 0
+
+    async def process_request(self, websocket, request):
+        try:
+            await self.admission.admit()
+        except AdmissionRejected as e:
+            response = websocket.respond(503, "Server busy, retry later\n")
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+        return None
+
+    async def fetch_private_config(self, config, device_id, client_id):
+        self.manager_api_requests += 1
+        async with self.manager_api:
+            await asyncio.sleep(FETCH_MS / 1000)
+        return {"device_id": device_id, "prompt": "你是一个叫小智的台湾女孩"}
+
+    @staticmethod
+    def initialize_components():
+        # 占用GIL的组件初始化，与事件循环争抢CPU
+        end = time.perf_counter() + INIT_CPU_MS / 1000
+        while time.perf_counter() < end:
+            pass
+
+    async def initialize(self, websocket, device_id, ticket):
+        private_config = self.private_config_cache.peek({}, device_id, device_id)
+        try:
+            await self.admission.acquire(ticket)
+        except AdmissionRejected as e:
+            await websocket.close(1013, f"server busy, retry after {e.retry_after}s")
+            return
+        try:
+            if private_config is None:
+                private_config = await self.private_config_cache.get(
+                    {}, device_id, device_id
+                )
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.initialize_components
+            )
+        finally:
+            self.admission.release(ticket)
+        await websocket.send("ready")
+
+    async def handler(self, websocket):
+        device_id = websocket.request.headers["device-id"]
+        ticket = self.admission.create_ticket(device_id)
+        init_task = asyncio.create_task(self.initialize(websocket, device_id, ticket))
+        try:
+            async for _ in websocket:
+                # 排队期间收到音频，提前初始化
+                self.admission.promote(ticket)
+            await init_task
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            init_task.cancel()
+
+
+async def live_conversation(stop, lateness):
+    """服务端正在进行的对话：记录每个60ms音频节拍的延迟"""
+    next_tick = time.monotonic()
+    while not stop.is_set():
+        next_tick += FRAME_MS / 1000
+        await asyncio.sleep(max(0, next_tick - time.monotonic()))
+        lateness.append((time.monotonic() - next_tick) * 1000)
+
+
+async def reconnect(device_id, speaking, storm_start):
+    """设备重连直到初始化完成，返回从风暴开始到就绪的秒数与被拒次数"""
+    rejected = 0
+    while True:
+        try:
+            async with websockets.connect(
+                f"ws://{HOST}:{PORT}",
+                additional_headers={"device-id": device_id},
+                open_timeout=60,
+            ) as ws:
+                if speaking:
+                    await ws.send(b"\x00" * 40)
+                await ws.recv()
+                return time.monotonic() - storm_start, rejected
+        except websockets.exceptions.InvalidStatus as e:
+            rejected += 1
+            retry_after = e.response.headers.get("Retry-After", DEFAULT_RETRY)
+            await asyncio.sleep(float(retry_after))
+        except (websockets.exceptions.ConnectionClosed, OSError):
+            rejected += 1
+            await asyncio.sleep(DEFAULT_RETRY)
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def run_case(name, admission_config, warm_cache):
+    admission = AdmissionController()
+    admission.configure(admission_config)
+    server = StubServer(admission)
+    server.private_config_cache.configure({"enable": warm_cache})
+    devices = [f"00:00:00:00:{i // 256:02x}:{i % 256:02x}" for i in range(DEVICES)]
+    speaking = set(random.sample(devices, int(DEVICES * SPEAKING_RATIO)))
+    if warm_cache:
+        # 断开前已获取过差异化配置
+        await asyncio.gather(
+            *(server.private_config_cache.get({}, d, d) for d in devices)
+        )
+        server.manager_api_requests = 0
+    now = time.monotonic()
+    # 断开前正在对话的设备
+    for device_id in speaking:
+        admission.note_disconnect(device_id, now)
+
+    stop = asyncio.Event()
+    lateness = []
+    async with websockets.serve(
+        server.handler, HOST, PORT, process_request=server.process_request
+    ):
+        live = [
+            asyncio.create_task(live_conversation(stop, lateness))
+            for _ in range(LIVE_CONVERSATIONS)
+        ]
+        storm_start = time.monotonic()
+        results = await asyncio.gather(
+            *(
+                reconnect(device_id, device_id in speaking, storm_start)
+                for device_id in devices
+            )
+        )
+        stop.set()
+        await asyncio.gather(*live)
+
+    ready = dict(zip(devices, results))
+    speaking_ready = [ready[d][0] for d in devices if d in speaking]
+    others_ready = [ready[d][0] for d in devices if d not in speaking]
+    return [
+        name,
+        f"{max(r[0] for r in results):.2f}",
+        f"{percentile(speaking_ready, 0.5):.2f}",
+        f"{percentile(speaking_ready, 0.99):.2f}",
+        f"{percentile(others_ready, 0.5):.2f}",
+        f"{percentile(others_ready, 0.99):.2f}",
+        sum(r[1] for r in results),
+        server.manager_api_requests,
+        f"{percentile(lateness, 0.99):.1f}",
+        f"{max(lateness):.1f}",
+    ]
+
+
+async def main():
+    rows = []
+    for name, admission_config, warm_cache in CASES:
+        rows.append(await run_case(name, admission_config, warm_cache))
+        # 等待端口释放
+        await asyncio.sleep(1)
+
+    print(
+        f"\n{DEVICES} 台设备同时重连（{SPEAKING_RATIO:.0%} 重连后立即说话），"
+        f"期间 {LIVE_CONVERSATIONS} 路对话按 {FRAME_MS}ms 节拍发送音频；"
+        f"模拟管理端接口 {FETCH_MS}ms（并发 {MANAGER_API_CONCURRENCY}），"
+        f"组件初始化占用CPU {INIT_CPU_MS}ms；客户端与服务端在同一进程"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "方式",
+                "全部就绪(s)",
+                "说话设备就绪P50(s)",
+                "说话设备就绪P99(s)",
+                "其他设备就绪P50(s)",
+                "其他设备就绪P99(s)",
+                "被拒次数",
+                "管理端请求数",
+                "对话节拍延迟P99(ms)",
+                "对话节拍延迟最大(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+import time
+import random
+import asyncio
+from tabulate import tabulate
+from core.utils.sentence_segmenter import StreamingSentenceSegmenter
+
+description = "流式分句性能测试（本地，无需网络）"
+
+PUNCTUATIONS = ("。", "？", "?", "！", "!", "；", ";", "：")
+FIRST_SENTENCE_PUNCTUATIONS = ("，", "~", "、", ",") + PUNCTUATIONS
+# 回复长度（字符数）
+RESPONSE_SIZES = [200, 2000, 20000]
+# 一致性校验的随机回复数量
+CHECK_ROUNDS = 2000
+
+
+class LegacySegmenter:
+    """原实现：每次追加都拼接整段回复，并对每个标点做 rfind"""
+
+    def __init__(self):
+        self.tts_text_buff = []
+        self.processed_chars = 0
+        self.is_first_sentence = True
+
+    def feed(self, delta):
+        self.tts_text_buff.append(delta)
+        full_text = "".join(self.tts_text_buff)
+        current_text = full_text[self.processed_chars :]
+        last_punct_pos = -1
+        punctuations_to_use = (
+            FIRST_SENTENCE_PUNCTUATIONS if self.is_first_sentence else PUNCTUATIONS
+        )
+        for punct in punctuations_to_use:
+            pos = current_text.rfind(punct)
+            if (pos != -1 and last_punct_pos == -1) or (
+                pos != -1 and pos < last_punct_pos
+            ):
+                last_punct_pos = pos
+        if last_punct_pos != -1:
+            segment_text_raw = current_text[: last_punct_pos + 1]
+            self.processed_chars += len(segment_text_raw)
+            self.is_first_sentence = False
+            return segment_text_raw
+        return None
+
+    def remaining(self):
+        return "".join(self.tts_text_buff)[self.processed_chars :]
+
+
+def _random_tokens(size: int, rng: random.Random):
+    """模拟大模型流式输出：1~4个字符一段，随机夹杂各种标点"""
+    alphabet = "今天天气很好我们一起去公园散步吧abc xyz123"
+    marks = FIRST_SENTENCE_PUNCTUATIONS + ("\n", "…")
+    tokens, length = [], 0
+    while length < size:
+        token = "".join(
+            rng.choice(marks) if rng.random() < 0.12 else rng.choice(alphabet)
+            for _ in range(rng.randint(1, 4))
+        )
+        tokens.append(token)
+        length += len(token)
+    return tokens
+
+
+def _segment_all(segmenter, tokens):
+    segments = []
+    for token in tokens:
+        segment = segmenter.feed(token)
+        if segment is not None:
+            segments.append(segment)
+    segments.append(segmenter.remaining())
+    return segments
+
+
+def _new_segmenter():
+    return StreamingSentenceSegmenter(PUNCTUATIONS, FIRST_SENTENCE_PUNCTUATIONS)
+
+
+def check_consistency() -> int:
+    """随机生成回复，校验新旧实现切分结果完全一致"""
+    rng = random.Random(20240601)
+    for _ in range(CHECK_ROUNDS):
+        tokens = _random_tokens(rng.randint(1, 400), rng)
+        expected = _segment_all(LegacySegmenter(), tokens)
+        actual = _segment_all(_new_segmenter(), tokens)
+        if expected != actual:
+            raise AssertionError(f"切分结果不一致: {tokens}")
+    return CHECK_ROUNDS
+
+
+def _bench(factory, tokens, repeat: int) -> float:
+    """返回处理整段回复的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _segment_all(factory(), tokens)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run():
+    rounds = check_consistency()
+    print(f"\n一致性校验通过：{rounds} 条随机回复的切分结果与原实现完全一致")
+
+    rng = random.Random(1)
+    rows = []
+    for size in RESPONSE_SIZES:
+        tokens = _random_tokens(size, rng)
+        repeat = max(1, 20000 // size)
+        legacy_ms = _bench(LegacySegmenter, tokens, repeat)
+        new_ms = _bench(_new_segmenter, tokens, repeat)
+        rows.append(
+            [
+                size,
+                len(tokens),
+                f"{legacy_ms:.2f}",
+                f"{new_ms:.2f}",
+                f"{legacy_ms / new_ms:.1f}x",
+                f"{size / (new_ms / 1000) / 1e6:.2f}",
+            ]
+        )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "回复字数",
+                "流式片段数",
+                "原实现(ms)",
+                "增量分句(ms)",
+                "加速比",
+                "吞吐(百万字/秒)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+async def main():
+    run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import os
+import time
+import wave
+import asyncio
+import numpy as np
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.asr import create_instance
+
+description = "本地流式ASR说话结束到出字延迟测试（sherpa-onnx 流式识别对比整句识别）"
+
+AUDIO_DIR = "config/assets"
+SAMPLE_RATE = 16000
+FRAME_DURATION = 60
+FRAME_SIZE = SAMPLE_RATE * FRAME_DURATION // 1000
+OFFLINE_ASR = "SherpaASR"
+STREAM_ASR = "SherpaStreamASR"
+# 每个音频重复测试次数，取中位数
+ROUNDS = 5
+
+
+def load_pcm_frames(path: str):
+    """读取录音并转换为设备上行解码后的16kHz单声道60ms PCM帧"""
+    with wave.open(path, "rb") as wav_file:
+        source_rate = wav_file.getframerate()
+        samples = np.frombuffer(
+            wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+        )
+    positions = np.arange(0, len(samples), source_rate / SAMPLE_RATE)
+    pcm = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return [
+        pcm[start : start + FRAME_SIZE].tobytes()
+        for start in range(0, len(pcm) - FRAME_SIZE + 1, FRAME_SIZE)
+    ]
+
+
+def create_asr(config, name):
+    asr_config = config["ASR"][name]
+    return create_instance(asr_config.get("type", name), asr_config, True)
+
+
+async def offline_latency(asr, frames):
+    """整句识别：说话结束后才开始识别整段音频"""
+    start = time.monotonic()
+    text, _ = await asr.speech_to_text_wrapper([b"".join(frames)], "benchmark")
+    return (time.monotonic() - start) * 1000, text
+
+
+async def stream_latency(asr, frames):
+    """流式识别：说话过程中逐帧增量解码，说话结束后只解码尾部"""
+    stream = asr.recognizer.create_stream()
+    decode_seconds = 0.0
+    for pcm in frames:
+        start = time.monotonic()
+        await asyncio.to_thread(asr._decode, stream, [pcm])
+        decode_seconds += time.monotonic() - start
+    start = time.monotonic()
+    text = await asyncio.to_thread(asr._flush, stream)
+    final_ms = (time.monotonic() - start) * 1000
+    audio_seconds = len(frames) * FRAME_DURATION / 1000
+    return final_ms, text, decode_seconds / audio_seconds
+
+
+async def main():
+    config = await load_config()
+    offline_asr = create_asr(config, OFFLINE_ASR)
+    stream_asr = create_asr(config, STREAM_ASR)
+
+    rows = []
+    for file_name in sorted(os.listdir(AUDIO_DIR)):
+        if not file_name.endswith(".wav"):
+            continue
+        frames = load_pcm_frames(os.path.join(AUDIO_DIR, file_name))
+        offline_results = [
+            await offline_latency(offline_asr, frames) for _ in range(ROUNDS)
+        ]
+        stream_results = [
+            await stream_latency(stream_asr, frames) for _ in range(ROUNDS)
+        ]
+        offline_ms = float(np.median([result[0] for result in offline_results]))
+        stream_ms = float(np.median([result[0] for result in stream_results]))
+        stream_rtf = float(np.median([result[2] for result in stream_results]))
+        rows.append(
+            [
+                file_name,
+                f"{len(frames) * FRAME_DURATION / 1000:.1f}",
+                f"{offline_ms:.0f}",
+                f"{stream_ms:.0f}",
+                f"{stream_rtf:.3f}",
+                offline_results[0][1],
+                stream_results[0][1],
+            ]
+        )
+        print(f"完成: {file_name}")
+
+    print(
+        f"\n说话结束到出字延迟取 {ROUNDS} 次中位数，不含VAD静音判定时间（两种方式相同）；"
+        "流式RTF为说话过程中增量解码耗时与音频时长之比"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "音频",
+                "时长(s)",
+                f"整句识别(ms) {OFFLINE_ASR}",
+                f"流式收尾(ms) {STREAM_ASR}",
+                "流式RTF",
+                "整句识别结果",
+                "流式识别结果",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
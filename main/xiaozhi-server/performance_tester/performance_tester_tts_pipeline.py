@@ -0,0 +1,199 @@
+import time
+import queue
+import asyncio
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tabulate import tabulate
+from core.utils.synthesis_pipeline import SynthesisPipeline
+
+description = "非流式TTS并行预合成测试（本地模拟TTS服务，无需网络）"
+
+# 模拟TTS服务的合成耗时（毫秒）
+TTS_LATENCIES_MS = [300, 800, 1500]
+# 同时合成的句数，1 为原来的逐句合成
+CONCURRENCY_LEVELS = [1, 2, 3, 4]
+# 一轮回复的句子数
+SENTENCE_COUNT = 8
+# 大模型每隔多久输出一句（毫秒）
+LLM_SENTENCE_INTERVAL_MS = 150
+# 每个字的播放时长（毫秒）
+AUDIO_MS_PER_CHAR = 220
+
+SENTENCES = [
+    "好的，",
+    "今天北京天气晴朗，最高气温二十五度。",
+    "空气质量良好，适合户外活动。",
+    "傍晚可能有阵风，出门记得带件外套。",
+    "明天会有小雨，",
+    "建议提前准备雨具。",
+    "后天气温回升，",
+    "还有什么想了解的吗？",
+]
+
+
+class StubTTSHandler(BaseHTTPRequestHandler):
+    """模拟TTS服务：等待固定耗时后按文本长度返回音频"""
+
+    latency_ms = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        text = self.rfile.read(length).decode("utf-8")
+        time.sleep(self.latency_ms / 1000)
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency_ms: int):
+    handler = type("Handler", (StubTTSHandler,), {"latency_ms": latency_ms})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/tts"
+
+
+def synthesize(url: str, text: str) -> str:
+    request = urllib.request.Request(url, data=text.encode("utf-8"), method="POST")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read().decode("utf-8")
+
+
+def produce_sentences(submit):
+    """模拟大模型按固定间隔输出句子"""
+    for index, text in enumerate(SENTENCES[:SENTENCE_COUNT]):
+        time.sleep(LLM_SENTENCE_INTERVAL_MS / 1000)
+        submit(index, text)
+
+
+def run_sequential(url: str):
+    """原流程：文本线程逐句合成，合成完才处理下一句"""
+    ready = []
+    texts = queue.Queue()
+    start = time.perf_counter()
+
+    def worker():
+        while True:
+            item = texts.get()
+            if item is None:
+                return
+            index, text = item
+            audio = synthesize(url, text)
+            ready.append((index, audio, time.perf_counter() - start))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    produce_sentences(lambda index, text: texts.put((index, text)))
+    texts.put(None)
+    thread.join()
+    return ready
+
+
+def run_pipeline(url: str, concurrency: int):
+    """预合成流水线：最多 concurrency 句同时合成，按顺序交给播放"""
+    ready = []
+    stop_event = threading.Event()
+    done = threading.Event()
+    pipeline = SynthesisPipeline(concurrency, lambda _: False, stop_event)
+    start = time.perf_counter()
+
+    def submit(index, text):
+        def emit(audio, index=index):
+            ready.append((index, audio, time.perf_counter() - start))
+
+        pipeline.submit("bench", lambda text=text: synthesize(url, text), emit)
+
+    produce_sentences(submit)
+    pipeline.submit_emit("bench", done.set)
+    done.wait()
+    stop_event.set()
+    pipeline.shutdown()
+    return ready
+
+
+def summarize(ready):
+    """按实时播放模拟设备端：返回 (首句耗时, 句间停顿总和, 最大停顿, 播放结束时间)，单位毫秒"""
+    play_end = None
+    first = None
+    total_gap = 0.0
+    max_gap = 0.0
+    for _, audio, ready_at in ready:
+        ready_ms = ready_at * 1000
+        duration = len(audio) * AUDIO_MS_PER_CHAR
+        if play_end is None:
+            first = ready_ms
+            play_start = ready_ms
+        else:
+            gap = max(0.0, ready_ms - play_end)
+            total_gap += gap
+            max_gap = max(max_gap, gap)
+            play_start = play_end + gap
+        play_end = play_start + duration
+    return first, total_gap, max_gap, play_end
+
+
+def check_order(ready):
+    expected = SENTENCES[:SENTENCE_COUNT]
+    actual = [audio for _, audio, _ in ready]
+    if actual != expected:
+        raise AssertionError(f"播放顺序错误: {actual}")
+
+
+def run():
+    rows = []
+    for latency_ms in TTS_LATENCIES_MS:
+        server, url = start_stub_server(latency_ms)
+        try:
+            for concurrency in CONCURRENCY_LEVELS:
+                if concurrency == 1:
+                    ready = run_sequential(url)
+                else:
+                    ready = run_pipeline(url, concurrency)
+                check_order(ready)
+                first, total_gap, max_gap, play_end = summarize(ready)
+                rows.append(
+                    [
+                        latency_ms,
+                        "逐句合成" if concurrency == 1 else concurrency,
+                        f"{first:.0f}",
+                        f"{total_gap:.0f}",
+                        f"{max_gap:.0f}",
+                        f"{play_end:.0f}",
+                    ]
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    print(
+        f"\n{SENTENCE_COUNT} 句回复，大模型每 {LLM_SENTENCE_INTERVAL_MS}ms 输出一句，"
+        f"每字播放 {AUDIO_MS_PER_CHAR}ms；所有配置的播放顺序均与原文一致"
+    )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "TTS耗时(ms)",
+                "并行句数",
+                "首句就绪(ms)",
+                "句间停顿总和(ms)",
+                "最大停顿(ms)",
+                "播放结束(ms)",
+            ],
+            tablefmt="github",
+        )
+    )
+
+
+async def main():
+    run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -46,6 +46,13 @@ GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC = {
 
 async def fetch_news_from_rss(rss_url):
     """从RSS源获取新闻列表"""
+    from core.utils.cache.manager import cache_manager, CacheType
+
+    # 新闻列表所有设备共用，短时间内重复查询直接使用缓存
+    cached_items = cache_manager.get(CacheType.NEWS, rss_url)
+    if cached_items:
+        return cached_items
+
     try:
         async with httpx.AsyncClient(timeout=httpx.Timeout(5.0, connect=3.0)) as client:
             response = await client.get(rss_url)
@@ -80,6 +87,8 @@ async def fetch_news_from_rss(rss_url):
                 }
             )
 
+        if news_items:
+            cache_manager.set(CacheType.NEWS, rss_url, news_items)
         return news_items
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取RSS新闻失败: {e}")
@@ -112,6 +112,8 @@ GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC = {
 
 async def fetch_news_from_api(conn: "ConnectionHandler", source="thepaper"):
     """从API获取新闻列表"""
+    from core.utils.cache.manager import cache_manager, CacheType
+
     try:
         api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
 
@@ -119,6 +121,11 @@ async def fetch_news_from_api(conn: "ConnectionHandler", source="thepaper"):
         if news_config.get("url"):
             api_url = news_config["url"] + source
 
+        # 新闻列表所有设备共用，短时间内重复查询直接使用缓存
+        cached_items = cache_manager.get(CacheType.NEWS, api_url)
+        if cached_items:
+            return cached_items
+
         headers = {"User-Agent": "Mozilla/5.0"}
         async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=3.0)) as client:
             response = await client.get(api_url, headers=headers)
@@ -126,6 +133,8 @@ async def fetch_news_from_api(conn: "ConnectionHandler", source="thepaper"):
         data = response.json()
 
         if "items" in data:
+            if data["items"]:
+                cache_manager.set(CacheType.NEWS, api_url, data["items"])
             return data["items"]
         else:
             logger.bind(tag=TAG).error(f"获取新闻API响应格式错误: {data}")
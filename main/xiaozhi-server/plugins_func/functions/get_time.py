@@ -1,6 +1,12 @@
 from datetime import datetime
 import cnlunar
-from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from plugins_func.register import (
+    register_function,
+    ToolType,
+    ActionResponse,
+    Action,
+    CachePolicy,
+)
 
 get_lunar_function_desc = {
     "type": "function",
@@ -30,7 +36,19 @@ get_lunar_function_desc = {
 }
 
 
-@register_function("get_lunar", get_lunar_function_desc, ToolType.WAIT)
+def _normalize_lunar_args(arguments):
+    """未指定日期时按当天日期生成缓存键，跨天后自动失效"""
+    date = (arguments.get("date") or "").strip() or datetime.now().strftime("%Y-%m-%d")
+    query = (arguments.get("query") or "").strip()
+    return {"date": date, "query": query}
+
+
+@register_function(
+    "get_lunar",
+    get_lunar_function_desc,
+    ToolType.WAIT,
+    cache=CachePolicy(ttl=3600, normalizer=_normalize_lunar_args),
+)
 def get_lunar(date=None, query=None):
     """
     用于获取当前的阴历/农历，和天干地支、节气、生肖、星座、八字、宜忌等黄历信息
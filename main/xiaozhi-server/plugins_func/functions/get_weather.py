@@ -2,7 +2,7 @@ import httpx
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
-from core.utils.util import get_ip_info
+from core.utils.util import get_ip_info_async
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -181,7 +181,7 @@ async def get_weather(conn: "ConnectionHandler", location: str = None, lang: str
                 location = cached_ip_info.get("city")
             else:
                 # 缓存未命中，调用API获取
-                ip_info = get_ip_info(client_ip, logger)
+                ip_info = await get_ip_info_async(client_ip, logger)
                 if ip_info:
                     cache_manager.set(CacheType.IP_INFO, client_ip, ip_info)
                     location = ip_info.get("city")
@@ -1,7 +1,13 @@
 import httpx
 from config.logger import setup_logging
 from plugins_func.functions.hass_init import initialize_hass_handler
-from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from plugins_func.register import (
+    register_function,
+    ToolType,
+    ActionResponse,
+    Action,
+    CachePolicy,
+)
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -70,7 +76,18 @@ hass_set_state_function_desc = {
 }
 
 
-@register_function("hass_get_state", hass_get_state_function_desc, ToolType.SYSTEM_CTL)
+@register_function(
+    "hass_get_state",
+    hass_get_state_function_desc,
+    ToolType.SYSTEM_CTL,
+    # 设备状态变化较快，只做短时间缓存，合并同一设备的重复查询
+    cache=CachePolicy(
+        ttl=5,
+        scope=CachePolicy.SCOPE_DEVICE,
+        cache_if=lambda result: result.action == Action.REQLLM
+        and str(result.result or "").startswith("设备状态"),
+    ),
+)
 async def hass_get_state(conn: "ConnectionHandler", entity_id=""):
     try:
         ha_response = await handle_hass_get_state(conn, entity_id)
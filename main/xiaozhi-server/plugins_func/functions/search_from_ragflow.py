@@ -1,7 +1,13 @@
 import json
 import httpx
 from config.logger import setup_logging
-from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from plugins_func.register import (
+    register_function,
+    ToolType,
+    ActionResponse,
+    Action,
+    CachePolicy,
+)
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -26,7 +32,18 @@ SEARCH_FROM_RAGFLOW_FUNCTION_DESC = {
 
 
 @register_function(
-    "search_from_ragflow", SEARCH_FROM_RAGFLOW_FUNCTION_DESC, ToolType.SYSTEM_CTL
+    "search_from_ragflow",
+    SEARCH_FROM_RAGFLOW_FUNCTION_DESC,
+    ToolType.SYSTEM_CTL,
+    # 知识库按智能体配置，缓存键包含该配置并按设备隔离；错误提示以 RESPONSE 返回，不缓存
+    cache=CachePolicy(
+        ttl=600,
+        scope=CachePolicy.SCOPE_DEVICE,
+        cache_if=lambda result: result.action == Action.REQLLM,
+        config_key=lambda conn: conn.config.get("plugins", {}).get(
+            "search_from_ragflow", {}
+        ),
+    ),
 )
 async def search_from_ragflow(conn: "ConnectionHandler", question=None):
     # 确保字符串参数正确处理编码
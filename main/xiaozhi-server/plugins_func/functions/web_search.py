@@ -5,6 +5,7 @@ from plugins_func.register import (
     ToolType,
     ActionResponse,
     Action,
+    CachePolicy,
 )
 from typing import TYPE_CHECKING
 
@@ -14,6 +15,9 @@ if TYPE_CHECKING:
 TAG = __name__
 logger = setup_logging()
 
+# 搜索成功结果的标题，用于区分可缓存的结果与错误提示
+SEARCH_RESULT_HEADER = "【联网搜索结果】"
+
 _DEFAULT_DESCRIPTION = (
     "联网搜索工具。当用户明确需要联网搜索问题时使用此工具。"
 )
@@ -63,7 +67,7 @@ async def _search_metaso(api_key: str, query: str, max_results: int) -> str:
     if not webpages:
         return "未找到相关搜索结果。"
 
-    lines = ["【联网搜索结果】"]
+    lines = [SEARCH_RESULT_HEADER]
     for i, item in enumerate(webpages, 1):
         title = item.get("title", "无标题")
         snippet = item.get("summary", "")
@@ -101,7 +105,7 @@ async def _search_tavily(api_key: str, query: str, max_results: int) -> str:
         return "未找到相关搜索结果。"
 
     answer = data.get("answer", "")
-    lines = [f"【联网搜索结果】\n总结：{answer}"]
+    lines = [f"{SEARCH_RESULT_HEADER}\n总结：{answer}"]
     # for i, item in enumerate(results, 1):
     #     title = item.get("title", "无标题")
     #     summary = item.get("content", "")
@@ -112,7 +116,35 @@ async def _search_tavily(api_key: str, query: str, max_results: int) -> str:
     return "\n".join(lines)
 
 
-@register_function("web_search", WEB_SEARCH_FUNCTION_DESC, ToolType.SYSTEM_CTL)
+def _normalize_search_args(arguments):
+    """搜索词忽略大小写和多余空白"""
+    query = arguments.get("query") or ""
+    return {"query": " ".join(str(query).split()).lower()}
+
+
+def _search_config(conn):
+    """搜索结果取决于智能体配置的服务商、密钥与结果数"""
+    return conn.config.get("plugins", {}).get("web_search", {})
+
+
+def _is_search_success(result):
+    """只缓存成功的搜索结果，配置错误、超时等提示不缓存"""
+    return result.action == Action.REQLLM and str(result.result or "").startswith(
+        SEARCH_RESULT_HEADER
+    )
+
+
+@register_function(
+    "web_search",
+    WEB_SEARCH_FUNCTION_DESC,
+    ToolType.SYSTEM_CTL,
+    cache=CachePolicy(
+        ttl=300,
+        normalizer=_normalize_search_args,
+        cache_if=_is_search_success,
+        config_key=_search_config,
+    ),
+)
 async def web_search(conn: "ConnectionHandler", query: str = None):
     logger.bind(tag=TAG).info(f"web_search 被调用 | query={query}")
     if not query:
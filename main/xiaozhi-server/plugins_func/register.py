@@ -42,12 +42,38 @@ class ActionResponse:
         self.response = response  # 直接回复的内容
 
 
+class CachePolicy:
+    """工具结果缓存策略，在 register_function 中声明，由统一工具管理器负责命中与回源
+
+    Args:
+        ttl: 缓存有效期（秒）
+        scope: 缓存范围，global 为所有设备共享，device 为按设备隔离
+        normalizer: 参数归一化函数，接收参数字典，返回用于生成缓存键的字典
+        cache_if: 判断结果是否可缓存的函数，接收 ActionResponse，默认只缓存正常结果
+        config_key: 从连接中取出影响结果的配置（如服务商、密钥、知识库）的函数，
+            计入缓存键，使用不同配置的智能体不共用结果
+    """
+
+    SCOPE_GLOBAL = "global"
+    SCOPE_DEVICE = "device"
+
+    def __init__(
+        self, ttl, scope=SCOPE_GLOBAL, normalizer=None, cache_if=None, config_key=None
+    ):
+        self.ttl = ttl
+        self.scope = scope
+        self.normalizer = normalizer
+        self.cache_if = cache_if
+        self.config_key = config_key
+
+
 class FunctionItem:
-    def __init__(self, name, description, func, type):
+    def __init__(self, name, description, func, type, cache=None):
         self.name = name
         self.description = description
         self.func = func
         self.type = type
+        self.cache = cache  # CachePolicy，为None时不缓存
 
 
 class DeviceTypeRegistry:
@@ -82,11 +108,14 @@ all_function_registry = {}
 module_func_map = {}
 
 
-def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+def register_function(name, desc, type=None, cache=None):
+    """注册函数到函数注册字典的装饰器
+
+    幂等的查询类工具可以通过 cache=CachePolicy(...) 声明结果可缓存
+    """
 
     def decorator(func):
-        all_function_registry[name] = FunctionItem(name, desc, func, type)
+        all_function_registry[name] = FunctionItem(name, desc, func, type, cache)
         # 记录模块名到函数名的映射，用于 expand 模块级别的插件配置
         module_name = func.__module__.split(".")[-1]
         module_func_map.setdefault(module_name, []).append(name)